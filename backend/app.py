@@ -1,25 +1,153 @@
 # backend/app.py
-from flask import Flask, request, jsonify
+from flask import Blueprint, Flask, Response, current_app, request, jsonify, stream_with_context
 from flask_cors import CORS
-import sqlite3
 import uuid
 from datetime import datetime
 import os
+from config.settings import Config, config_by_name
+from utils import db
+from utils import profiler
+from utils import queries
+from utils.db import (get_db_connection, get_read_connection, enable_wal, add_column,
+                      start_replica_refresher, write_transaction)
+from utils.responses import records_body, records_response
+from utils.rate_limit import limiter, rate_limited
+from utils.singleflight import forget_shop, read_flights
+from utils.json_provider import FastJSONProvider
+from utils.compression import init_compression
+from models.product import Product
+from models.inventory import InventoryItem
+from models.transaction import Transaction
+from services import (backup, catalog_ingest, catalog_snapshot, costing, events, export, geo,
+                      ledger, rollups, sessions)
+from services.catalog import (find_product_by_barcode, find_product_json, list_products_json,
+                              warm_catalog)
+from services.inventory_service import apply_sale, apply_restock, apply_stocktake
+from services.low_stock import shop_low_stock
+from services.stats import shop_stats
+from services.events import event_stream, publish_stock_changes
+from services.auth_service import AuthService
+from routes.admin_routes import admin_bp
+from routes.auth_routes import auth_bp
 
-app = Flask(__name__)
-CORS(app)
+api_bp = Blueprint('api', __name__)
 
-# Database configuration
-DATABASE = 'shoptracker.db'
+MAX_HISTORY_ROWS = 1000  # per /transactions request
+MAX_TOP_PRODUCTS = 100  # per /profit request
+MAX_STOCKTAKE_ITEMS = 20000  # counted items per /stocktake request
+MAX_NEARBY_RADIUS_KM = 50.0
+MAX_NEARBY_SHOPS = 100  # per /shops/nearby request
 
-def get_db_connection():
-    conn = sqlite3.connect(DATABASE)
-    conn.row_factory = sqlite3.Row
-    return conn
+def create_app(config=None):
+    """Application factory
+
+    `config` may be a config class/object, a name from config_by_name or a
+    dict of overrides applied on top of the base Config.
+    """
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    if isinstance(config, str):
+        app.config.from_object(config_by_name[config])
+    elif isinstance(config, dict):
+        app.config.update(config)
+    elif config is not None:
+        app.config.from_object(config)
+    
+    # The WAL archiver must be the only checkpointer (services/backup.py)
+    db.configure(app.config['DATABASE'], app.config['READ_REPLICA'],
+                 pool_size=app.config['DB_POOL_SIZE'],
+                 wal_autocheckpoint=0 if app.config['WAL_ARCHIVE_INTERVAL'] else db.DEFAULT_WAL_AUTOCHECKPOINT)
+    ledger.configure(app.config['LEDGER_DIR'], app.config['LEDGER_HOT_MONTHS'])
+    export.configure(app.config['EXPORT_DIR'])
+    costing.configure(app.config['COSTING_METHOD'])
+    catalog_snapshot.configure(app.config['CATALOG_SNAPSHOT'])
+    backup.configure(app.config['BACKUP_DIR'], app.config['BACKUP_KEEP'])
+    sessions.configure(app.config['SECRET_KEY'], app.config['ACCESS_TOKEN_TTL'],
+                       app.config['REFRESH_TOKEN_TTL'])
+    limiter.configure(app.config['RATE_LIMITS'], app.config['RATE_LIMIT_STORE'])
+    profiler.configure(app.config['PROFILE_MAX_SECONDS'], app.config['PROFILE_MAX_OVERHEAD'])
+    events.configure(app.config['EVENT_POLL_INTERVAL'])
+    
+    app.json = FastJSONProvider(app)
+    CORS(app)
+    init_compression(app)
+    
+    app.register_blueprint(api_bp)
+    app.register_blueprint(auth_bp, url_prefix='/auth')
+    app.register_blueprint(admin_bp, url_prefix='/api/admin')
+    return app
+
+def prepare_database():
+    """Create/upgrade the schema and seed data (run once, before workers fork)
+
+    Call after create_app() so the configured database is used.
+    """
+    init_database()
+    seed_common_products()
+    if rollups.backfill_rollups():
+        print("Built daily sales rollups from existing transactions")
+    layers = costing.backfill_cost_layers()
+    if layers:
+        print(f"Opened cost layers for {layers} inventory items")
+    located = geo.backfill_shop_locations()
+    if located:
+        print(f"Indexed locations of {located} shops")
+    snapshot = catalog_snapshot.build_snapshot()
+    if snapshot['built']:
+        print(f"Built catalog snapshot of {snapshot['products']} products")
+    demo_shop_id = create_demo_shop()
+    # Never let the master's pooled connections leak into forked workers
+    db.close_pools()
+    return demo_shop_id
+
+def start_background_jobs(app):
+    """Start the once-per-deployment jobs in this process and return their tasks
+
+    Servers that fork workers run these in a process of their own (jobs.py).
+    """
+    return [
+        start_replica_refresher(app.config['REPLICA_REFRESH_INTERVAL']),
+        ledger.start_ledger_archiver(app.config['LEDGER_ARCHIVE_INTERVAL']),
+        sessions.start_session_pruner(app.config['SESSION_PRUNE_INTERVAL']),
+        catalog_snapshot.start_snapshot_refresher(app.config['CATALOG_SNAPSHOT_INTERVAL']),
+        events.start_event_pruner(app.config['EVENT_PRUNE_INTERVAL']),
+        *backup.start_backup_scheduler(app.config['BACKUP_INTERVAL'], app.config['WAL_ARCHIVE_INTERVAL'])
+    ]
+
+def warmup_worker(app):
+    """Per-worker warmup: open pooled connections and prime caches"""
+    with app.app_context():
+        db.write_pool.fill()
+        db.read_pool.fill()
+        
+        # Compile the hot read statements on every pooled read connection
+        for conn in db.read_pool.idle_connections():
+            queries.warm_connection(conn)
+        
+        products = warm_catalog()
+        shops = AuthService().prime_shop_cache(app.config['WARMUP_SHOP_LIMIT'])
+        limiter.start_tier_refresher(app.config['TIER_REFRESH_INTERVAL'])
+    
+    # One request through the full WSGI stack pulls in Flask/Werkzeug's lazy imports
+    app.test_client().get('/api/health')
+    return {'products': products, 'shops': shops}
+
+def requested_staleness():
+    """Staleness bound in seconds the caller opted into with ?max_staleness="""
+    return request.args.get('max_staleness', type=float)
+
+def coalesced_json(route, shop_id, produce):
+    """JSON response with the body bytes from produce(), shared between identical concurrent reads"""
+    if current_app.config['SINGLE_FLIGHT']:
+        body = read_flights.do((route, shop_id, requested_staleness()), produce)
+    else:
+        body = produce()
+    return Response(body, mimetype='application/json')
 
 def init_database():
     """Initialize database with required tables"""
     conn = get_db_connection()
+    enable_wal(conn)
     
     # Create tables
     conn.execute('''
@@ -33,7 +161,42 @@ def init_database():
             district TEXT,
             registration_date TEXT,
             is_active BOOLEAN DEFAULT 1,
-            subscription_tier TEXT DEFAULT 'free'
+            subscription_tier TEXT DEFAULT 'free',
+            latitude REAL,
+            longitude REAL
+        )
+    ''')
+    add_column(conn, 'shops', 'latitude', 'REAL')
+    add_column(conn, 'shops', 'longitude', 'REAL')
+    # Account of a shop that signs in (services/auth_service.py); NULL for
+    # shops registered without one
+    add_column(conn, 'shops', 'email', 'TEXT')
+    add_column(conn, 'shops', 'password_hash', 'TEXT')
+    add_column(conn, 'shops', 'updated_at', 'TEXT')
+    add_column(conn, 'shops', 'last_login_at', 'TEXT')
+    
+    # Login sessions and the revocation log (services/sessions.py)
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS user_sessions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            shop_id TEXT NOT NULL,
+            token_hash TEXT NOT NULL,
+            device_info TEXT,
+            ip_address TEXT,
+            created_at TEXT,
+            expires_at TEXT NOT NULL,
+            is_active BOOLEAN DEFAULT 1,
+            last_used_at TEXT,
+            revoked_at TEXT,
+            FOREIGN KEY (shop_id) REFERENCES shops (id)
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS revocations (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            shop_id TEXT NOT NULL,
+            session_id INTEGER,
+            revoked_at TEXT NOT NULL
         )
     ''')
     
@@ -81,270 +244,417 @@ def init_database():
             notes TEXT,
             transaction_date TEXT,
             created_by TEXT DEFAULT 'system',
+            cost_of_goods REAL,
             FOREIGN KEY (shop_id) REFERENCES shops (id),
             FOREIGN KEY (product_id) REFERENCES products (id)
         )
     ''')
+    add_column(conn, 'transactions', 'cost_of_goods', 'REAL')
     
-    conn.commit()
-    conn.close()
-
-def seed_common_products():
-    """Add common Nepali products to database"""
-    common_products = [
-        ('Wai Wai Chicken', 'Noodles', 'Wai Wai', 'packet', 20.0),
-        ('Coca Cola 250ml', 'Beverages', 'Coca Cola', 'bottle', 25.0),
-        ('Khukuri Rum 750ml', 'Alcohol', 'Khukuri', 'bottle', 800.0),
-        ('Everest Masala Tea', 'Tea', 'Everest', 'packet', 15.0),
-        ('Dairy Milk Chocolate', 'Chocolates', 'Cadbury', 'piece', 45.0),
-        ('Kurkure Masala Munch', 'Snacks', 'Kurkure', 'packet', 10.0),
-        ('Goldstar Shoes Polish', 'Personal Care', 'Goldstar', 'piece', 35.0),
-        ('Ariel Washing Powder 1kg', 'Household', 'Ariel', 'packet', 180.0),
-        ('Pepsi 250ml', 'Beverages', 'Pepsi', 'bottle', 23.0),
-        ('Maggi Noodles', 'Noodles', 'Maggi', 'packet', 25.0),
-        ('Real Juice 200ml', 'Beverages', 'Real', 'tetrapack', 30.0),
-        ('Lays Classic', 'Snacks', 'Lays', 'packet', 20.0)
-    ]
+    # Daily sales rollups maintained by apply_sale (services/rollups.py)
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS shop_daily_sales (
+            shop_id TEXT NOT NULL,
+            sale_date TEXT NOT NULL,
+            sales_amount REAL DEFAULT 0.0,
+            sales_count INTEGER DEFAULT 0,
+            units_sold INTEGER DEFAULT 0,
+            cost_of_goods REAL DEFAULT 0.0,
+            PRIMARY KEY (shop_id, sale_date)
+        ) WITHOUT ROWID
+    ''')
+    add_column(conn, 'shop_daily_sales', 'cost_of_goods', 'REAL DEFAULT 0.0')
     
-    conn = get_db_connection()
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS product_daily_sales (
+            shop_id TEXT NOT NULL,
+            sale_date TEXT NOT NULL,
+            product_id TEXT NOT NULL,
+            sales_amount REAL DEFAULT 0.0,
+            units_sold INTEGER DEFAULT 0,
+            cost_of_goods REAL DEFAULT 0.0,
+            PRIMARY KEY (shop_id, sale_date, product_id)
+        ) WITHOUT ROWID
+    ''')
+    add_column(conn, 'product_daily_sales', 'cost_of_goods', 'REAL DEFAULT 0.0')
+    
+    # Open cost layers per shop and product (services/costing.py)
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS cost_layers (
+            id INTEGER PRIMARY KEY,
+            shop_id TEXT NOT NULL,
+            product_id TEXT NOT NULL,
+            received_date TEXT NOT NULL,
+            unit_cost REAL NOT NULL,
+            quantity_remaining INTEGER NOT NULL
+        )
+    ''')
     
-    # Check if products already exist
-    existing = conn.execute('SELECT COUNT(*) as count FROM products WHERE is_common = 1').fetchone()
+    # Shop coordinates for radius searches (services/geo.py); rows carry the
+    # shop id as an auxiliary column since shops has no integer key
+    conn.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS shop_locations
+        USING rtree(id, min_lat, max_lat, min_lon, max_lon, +shop_id)
+    ''')
     
-    if existing['count'] == 0:
-        for name, category, brand, unit, price in common_products:
-            product_id = str(uuid.uuid4())
-            conn.execute('''
-                INSERT INTO products (id, name, category, brand, unit, default_price, is_common, created_date)
-                VALUES (?, ?, ?, ?, ?, ?, 1, ?)
-            ''', (product_id, name, category, brand, unit, price, datetime.now().isoformat()))
-        
-        conn.commit()
-        print(f"Added {len(common_products)} common products to database")
+    # Recent stock changes, tailed by every worker with SSE subscribers (services/events.py)
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS stock_events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            shop_id TEXT NOT NULL,
+            product_id TEXT NOT NULL,
+            previous_stock INTEGER NOT NULL,
+            new_stock INTEGER NOT NULL,
+            reorder_level INTEGER NOT NULL,
+            created_at TEXT NOT NULL
+        )
+    ''')
+    
+    # Catalog change counter, compared with the snapshot's (services/catalog_snapshot.py)
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS catalog_version (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            version INTEGER NOT NULL
+        )
+    ''')
+    conn.execute('INSERT OR IGNORE INTO catalog_version (id, version) VALUES (1, 0)')
+    
+    # Archived ledger months (services/ledger.py)
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS ledger_partitions (
+            period TEXT PRIMARY KEY,
+            path TEXT NOT NULL,
+            row_count INTEGER NOT NULL,
+            sealed_at TEXT NOT NULL
+        )
+    ''')
+    
+    # Last transaction written by each named export (services/export.py)
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS export_watermarks (
+            name TEXT PRIMARY KEY,
+            last_transaction_date TEXT NOT NULL,
+            last_transaction_id TEXT NOT NULL,
+            rows INTEGER NOT NULL DEFAULT 0,
+            exported_at TEXT NOT NULL
+        )
+    ''')
+    
+    # The ledger is append-only; rows leave only once their month is archived
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS transactions_append_only
+        BEFORE UPDATE ON transactions
+        BEGIN
+            SELECT RAISE(ABORT, 'transactions are append-only');
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS transactions_delete_archived_only
+        BEFORE DELETE ON transactions
+        WHEN NOT EXISTS (SELECT 1 FROM ledger_partitions
+                         WHERE period = substr(OLD.transaction_date, 1, 7))
+        BEGIN
+            SELECT RAISE(ABORT, 'transactions are append-only');
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS transactions_period_sealed
+        BEFORE INSERT ON transactions
+        WHEN EXISTS (SELECT 1 FROM ledger_partitions
+                     WHERE period = substr(NEW.transaction_date, 1, 7))
+        BEGIN
+            SELECT RAISE(ABORT, 'ledger period is sealed');
+        END
+    ''')
     
+    # Every products change makes the catalog snapshot out of date
+    for event in ('INSERT', 'UPDATE', 'DELETE'):
+        conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS products_catalog_version_{event.lower()}
+            AFTER {event} ON products
+            BEGIN
+                UPDATE catalog_version SET version = version + 1 WHERE id = 1;
+            END
+        ''')
+    
+    # shop_locations follows the shops table; moving or removing a shop
+    # scans the R*Tree for its entry, which is rare enough not to index
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS shops_location_insert
+        AFTER INSERT ON shops
+        WHEN NEW.latitude IS NOT NULL AND NEW.longitude IS NOT NULL
+        BEGIN
+            INSERT INTO shop_locations (min_lat, max_lat, min_lon, max_lon, shop_id)
+            VALUES (NEW.latitude, NEW.latitude, NEW.longitude, NEW.longitude, NEW.id);
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS shops_location_update
+        AFTER UPDATE OF latitude, longitude ON shops
+        BEGIN
+            DELETE FROM shop_locations WHERE shop_id = OLD.id;
+            INSERT INTO shop_locations (min_lat, max_lat, min_lon, max_lon, shop_id)
+            SELECT NEW.latitude, NEW.latitude, NEW.longitude, NEW.longitude, NEW.id
+            WHERE NEW.latitude IS NOT NULL AND NEW.longitude IS NOT NULL;
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS shops_location_delete
+        AFTER DELETE ON shops
+        BEGIN
+            DELETE FROM shop_locations WHERE shop_id = OLD.id;
+        END
+    ''')
+    
+    conn.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_shops_email ON shops(email) WHERE email IS NOT NULL')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_shops_phone ON shops(phone)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_sessions_shop ON user_sessions(shop_id)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_sessions_token ON user_sessions(token_hash)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_sessions_revoked ON user_sessions(revoked_at) '
+                 'WHERE revoked_at IS NOT NULL')
+    prepare_product_keys(conn)
+    conn.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_products_barcode ON products(barcode)')
+    conn.execute('''
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_products_name_brand
+        ON products(name, COALESCE(brand, '')) WHERE barcode IS NULL
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_transactions_shop_date ON transactions(shop_id, transaction_date)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_transactions_date ON transactions(transaction_date)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_cost_layers_item ON cost_layers(shop_id, product_id, id)')
+    
+    # Low stock as an indexed set: stock changes move rows in and out of these
+    # partial indexes, and low-stock reads touch only the rows inside them
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_inventory_low_stock ON inventory(shop_id, product_id)
+        WHERE is_active = 1 AND current_stock <= reorder_level
+    ''')
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_inventory_low_stock_product ON inventory(product_id, shop_id)
+        WHERE is_active = 1 AND current_stock <= reorder_level
+    ''')
+    
+    conn.commit()
     conn.close()
 
+def prepare_product_keys(conn):
+    """Make an existing products table fit its unique barcode and name/brand indexes
+
+    Blank barcodes become NULL. Duplicates cannot be merged without choosing
+    which product the shops' inventory and history should keep, so they stop
+    startup with a list of them instead of a bare constraint error.
+    """
+    indexes = {row[0] for row in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'index' "
+        "AND name IN ('idx_products_barcode', 'idx_products_name_brand')")}
+    if len(indexes) == 2:
+        return
+    conn.execute("UPDATE products SET barcode = NULL WHERE TRIM(barcode) = ''")
+    conn.commit()
+    
+    conflicts = [f"barcode {row[0]!r}: products {row[1]}" for row in conn.execute('''
+        SELECT barcode, GROUP_CONCAT(id, ', ') FROM products
+        WHERE barcode IS NOT NULL GROUP BY barcode HAVING COUNT(*) > 1
+    ''')]
+    conflicts += [f"{row[0]!r} by {row[1] or 'no brand'!r} without a barcode: products {row[2]}"
+                  for row in conn.execute('''
+        SELECT name, COALESCE(brand, ''), GROUP_CONCAT(id, ', ') FROM products
+        WHERE barcode IS NULL GROUP BY name, COALESCE(brand, '') HAVING COUNT(*) > 1
+    ''')]
+    if conflicts:
+        conn.close()
+        raise RuntimeError(
+            f"{len(conflicts)} sets of duplicate products block the unique product indexes:\n  "
+            + '\n  '.join(conflicts[:50])
+            + ('\n  ...' if len(conflicts) > 50 else '')
+            + "\nFor each set either give the products distinct barcodes, or keep one and move "
+              "the others' rows in inventory (merging a shop's stock into one row), transactions, "
+              "cost_layers, product_daily_sales and stock_events to it before deleting them; "
+              "then start again."
+        )
+
+def seed_common_products():
+    """Add common Nepali products to database"""
+    result = catalog_ingest.seed_common_products()
+    if result:
+        print(f"Added {result['inserted']} common products to database")
+
 def create_demo_shop():
     """Create a demo shop for testing"""
     conn = get_db_connection()
-    
-    # Check if demo shop exists
-    existing = conn.execute('SELECT id FROM shops WHERE name = ?', ('Demo Shop',)).fetchone()
-    
-    if not existing:
+    try:
+        # Check if demo shop exists
+        existing = queries.SHOP_ID_BY_NAME.fetchone(conn, ('Demo Shop',))
+        
+        if existing:
+            return existing['id']
+        
         shop_id = str(uuid.uuid4())
-        conn.execute('''
-            INSERT INTO shops (id, name, owner_name, phone, address, city, district, registration_date, is_active)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (shop_id, 'Demo Shop', 'Demo Owner', '9841234567', 'Dhulikhel', 'Dhulikhel', 'Kavrepalanchok', 
-              datetime.now().isoformat(), True))
+        queries.INSERT_SHOP(conn, (shop_id, 'Demo Shop', 'Demo Owner', '9841234567', 'Dhulikhel',
+                                   'Dhulikhel', 'Kavrepalanchok', datetime.now().isoformat(), True,
+                                   27.6195, 85.5386))
         
         conn.commit()
         print(f"Created demo shop with ID: {shop_id}")
         
         return shop_id
-    else:
-        return existing['id']
-    
-    conn.close()
+    finally:
+        conn.close()
 
 # API Routes
 
-@app.route('/api/products', methods=['GET'])
+@api_bp.route('/api/products', methods=['GET'])
 def get_products():
     """Get all products (common + custom products)"""
     try:
-        conn = get_db_connection()
-        
-        # Get filter parameters
-        category = request.args.get('category')
+        # Get filter parameters (None disables a filter)
+        category = request.args.get('category') or None
         is_common = request.args.get('common')
-        search = request.args.get('search')
-        
-        query = 'SELECT * FROM products WHERE 1=1'
-        params = []
-        
-        if category:
-            query += ' AND category = ?'
-            params.append(category)
-        
-        if is_common:
-            query += ' AND is_common = ?'
-            params.append(1 if is_common.lower() == 'true' else 0)
-        
-        if search:
-            query += ' AND (name LIKE ? OR brand LIKE ?)'
-            search_term = f'%{search}%'
-            params.extend([search_term, search_term])
-        
-        query += ' ORDER BY is_common DESC, name ASC'
+        is_common = (1 if is_common.lower() == 'true' else 0) if is_common else None
+        search = request.args.get('search') or None
+        
+        # Served from the shared catalog snapshot when it can answer
+        listed = list_products_json(category, is_common, search)
+        if listed is not None:
+            products, count = listed
+            return Response(b'{"success":true,"products":' + products + b',"count":%d}' % count,
+                            mimetype='application/json')
+        
+        conn = get_read_connection(requested_staleness())
+        try:
+            products = queries.LIST_PRODUCTS.records(Product, conn, {
+                'category': category,
+                'is_common': is_common,
+                'search': f'%{search}%' if search else None,
+            })
+        finally:
+            conn.close()
         
-        products = conn.execute(query, params).fetchall()
-        conn.close()
+        return records_response('products', products, Product)
+    
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@api_bp.route('/api/products/barcode/<code>', methods=['GET'])
+def get_product_by_barcode(code):
+    """Look up a product by its barcode (served from the catalog snapshot)"""
+    try:
+        product = find_product_json(code)
         
-        products_list = []
-        for product in products:
-            products_list.append({
-                'id': product['id'],
-                'name': product['name'],
-                'category': product['category'],
-                'brand': product['brand'],
-                'unit': product['unit'],
-                'default_price': product['default_price'],
-                'is_common': bool(product['is_common']),
-                'image_url': product['image_url']
-            })
+        if product is None:
+            return jsonify({'success': False, 'error': 'Product not found'}), 404
         
-        return jsonify({
-            'success': True,
-            'products': products_list,
-            'count': len(products_list)
-        })
+        return Response(b'{"success":true,"product":' + product + b'}',
+                        mimetype='application/json')
     
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
-@app.route('/api/inventory/<shop_id>', methods=['GET'])
+@api_bp.route('/api/inventory/<shop_id>', methods=['GET'])
+@rate_limited('read')
 def get_inventory(shop_id):
     """Get current inventory for a shop"""
+    def produce():
+        conn = get_read_connection(requested_staleness())
+        try:
+            # Get inventory with product details
+            inventory_items = queries.INVENTORY_BY_SHOP.records(InventoryItem, conn, (shop_id,))
+        finally:
+            conn.close()
+        return records_body('inventory', inventory_items, InventoryItem).encode()
+    
     try:
-        conn = get_db_connection()
+        return coalesced_json('inventory', shop_id, produce)
+    
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@api_bp.route('/api/inventory/sale', methods=['POST'])
+@rate_limited('write')
+def record_sale():
+    """Record a quick sale - reduces inventory"""
+    try:
+        data = request.get_json()
         
-        # Get inventory with product details
-        inventory_items = conn.execute('''
-            SELECT 
-                i.id,
-                i.current_stock,
-                i.selling_price,
-                i.cost_price,
-                i.reorder_level,
-                i.last_updated,
-                p.id as product_id,
-                p.name as product_name,
-                p.category,
-                p.brand,
-                p.unit,
-                p.image_url,
-                CASE WHEN i.current_stock <= i.reorder_level THEN 1 ELSE 0 END as low_stock
-            FROM inventory i
-            JOIN products p ON i.product_id = p.id
-            WHERE i.shop_id = ? AND i.is_active = 1
-            ORDER BY p.name
-        ''', (shop_id,)).fetchall()
+        # Validate required fields
+        required_fields = ['shop_id', 'product_id', 'quantity']
+        for field in required_fields:
+            if field not in data:
+                return jsonify({'success': False, 'error': f'Missing field: {field}'}), 400
         
-        conn.close()
+        shop_id = data['shop_id']
+        product_id = data['product_id']
+        quantity = int(data['quantity'])
+        selling_price = data.get('selling_price', 0.0)
         
-        inventory_list = []
-        for item in inventory_items:
-            inventory_list.append({
-                'id': item['id'],
-                'product_id': item['product_id'],
-                'product_name': item['product_name'],
-                'category': item['category'],
-                'brand': item['brand'],
-                'unit': item['unit'],
-                'current_stock': item['current_stock'],
-                'selling_price': item['selling_price'],
-                'cost_price': item['cost_price'],
-                'reorder_level': item['reorder_level'],
-                'low_stock': bool(item['low_stock']),
-                'last_updated': item['last_updated'],
-                'image_url': item['image_url']
-            })
+        conn = get_db_connection()
+        try:
+            with write_transaction(conn):
+                sale = apply_sale(conn, shop_id, product_id, quantity, selling_price)
+        finally:
+            conn.close()
+        
+        forget_shop(shop_id)
+        publish_stock_changes()
         
         return jsonify({
             'success': True,
-            'inventory': inventory_list,
-            'count': len(inventory_list)
+            'message': 'Sale recorded successfully',
+            'transaction_id': sale['transaction_id'],
+            'new_stock': sale['new_stock'],
+            'total_amount': sale['total_amount']
         })
     
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
-@app.route('/api/inventory/sale', methods=['POST'])
-def record_sale():
-    """Record a quick sale - reduces inventory"""
+@api_bp.route('/api/inventory/scan-sale', methods=['POST'])
+@rate_limited('write')
+def record_scan_sale():
+    """Resolve a scanned barcode and record the sale in one transaction"""
     try:
         data = request.get_json()
         
         # Validate required fields
-        required_fields = ['shop_id', 'product_id', 'quantity']
+        required_fields = ['shop_id', 'barcode']
         for field in required_fields:
             if field not in data:
                 return jsonify({'success': False, 'error': f'Missing field: {field}'}), 400
         
         shop_id = data['shop_id']
-        product_id = data['product_id']
-        quantity = int(data['quantity'])
+        quantity = int(data.get('quantity', 1))
         selling_price = data.get('selling_price', 0.0)
         
-        if quantity <= 0:
-            return jsonify({'success': False, 'error': 'Quantity must be positive'}), 400
-        
         conn = get_db_connection()
-        
-        # Check if inventory exists
-        inventory = conn.execute('''
-            SELECT id, current_stock, selling_price 
-            FROM inventory 
-            WHERE shop_id = ? AND product_id = ?
-        ''', (shop_id, product_id)).fetchone()
-        
-        if not inventory:
-            # Create new inventory entry if doesn't exist
-            inventory_id = str(uuid.uuid4())
-            conn.execute('''
-                INSERT INTO inventory (id, shop_id, product_id, current_stock, selling_price, last_updated)
-                VALUES (?, ?, ?, ?, ?, ?)
-            ''', (inventory_id, shop_id, product_id, 0, selling_price, datetime.now().isoformat()))
-            current_stock = 0
-            used_price = selling_price
-        else:
-            inventory_id = inventory['id']
-            current_stock = inventory['current_stock']
-            used_price = selling_price if selling_price > 0 else inventory['selling_price']
-        
-        # Check if enough stock available
-        if current_stock < quantity:
+        try:
+            with write_transaction(conn):
+                product = find_product_by_barcode(data['barcode'], conn)
+                if product is None:
+                    return jsonify({'success': False, 'error': 'Unknown barcode'}), 404
+                sale = apply_sale(conn, shop_id, product.id, quantity, selling_price)
+        finally:
             conn.close()
-            return jsonify({
-                'success': False, 
-                'error': f'Insufficient stock. Available: {current_stock}, Requested: {quantity}'
-            }), 400
-        
-        # Update inventory
-        new_stock = current_stock - quantity
-        conn.execute('''
-            UPDATE inventory 
-            SET current_stock = ?, selling_price = ?, last_updated = ?
-            WHERE id = ?
-        ''', (new_stock, used_price, datetime.now().isoformat(), inventory_id))
-        
-        # Record transaction
-        transaction_id = str(uuid.uuid4())
-        total_amount = quantity * used_price
-        conn.execute('''
-            INSERT INTO transactions (id, shop_id, product_id, transaction_type, quantity, 
-                                    price_per_unit, total_amount, transaction_date)
-            VALUES (?, ?, ?, 'sale', ?, ?, ?, ?)
-        ''', (transaction_id, shop_id, product_id, quantity, used_price, total_amount, 
-              datetime.now().isoformat()))
         
-        conn.commit()
-        conn.close()
+        forget_shop(shop_id)
+        publish_stock_changes()
         
         return jsonify({
             'success': True,
             'message': 'Sale recorded successfully',
-            'transaction_id': transaction_id,
-            'new_stock': new_stock,
-            'total_amount': total_amount
+            'product': product.to_dict(),
+            'transaction_id': sale['transaction_id'],
+            'new_stock': sale['new_stock'],
+            'total_amount': sale['total_amount']
         })
     
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
-@app.route('/api/inventory/restock', methods=['POST'])
+@api_bp.route('/api/inventory/restock', methods=['POST'])
+@rate_limited('write')
 def record_restock():
     """Record restocking - increases inventory"""
     try:
@@ -362,143 +672,258 @@ def record_restock():
         cost_price = data.get('cost_price', 0.0)
         selling_price = data.get('selling_price', 0.0)
         
-        if quantity <= 0:
-            return jsonify({'success': False, 'error': 'Quantity must be positive'}), 400
-        
         conn = get_db_connection()
+        try:
+            with write_transaction(conn):
+                restock = apply_restock(conn, shop_id, product_id, quantity,
+                                        cost_price, selling_price)
+        finally:
+            conn.close()
         
-        # Check if inventory exists
-        inventory = conn.execute('''
-            SELECT id, current_stock 
-            FROM inventory 
-            WHERE shop_id = ? AND product_id = ?
-        ''', (shop_id, product_id)).fetchone()
-        
-        if not inventory:
-            # Create new inventory entry
-            inventory_id = str(uuid.uuid4())
-            new_stock = quantity
-            conn.execute('''
-                INSERT INTO inventory (id, shop_id, product_id, current_stock, cost_price, 
-                                     selling_price, last_updated)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            ''', (inventory_id, shop_id, product_id, quantity, cost_price, selling_price,
-                  datetime.now().isoformat()))
-        else:
-            # Update existing inventory
-            inventory_id = inventory['id']
-            new_stock = inventory['current_stock'] + quantity
-            
-            update_fields = ['current_stock = ?', 'last_updated = ?']
-            update_values = [new_stock, datetime.now().isoformat()]
-            
-            if cost_price > 0:
-                update_fields.append('cost_price = ?')
-                update_values.append(cost_price)
-            if selling_price > 0:
-                update_fields.append('selling_price = ?')
-                update_values.append(selling_price)
-            
-            update_values.append(inventory_id)
-            
-            conn.execute(f'''
-                UPDATE inventory 
-                SET {', '.join(update_fields)}
-                WHERE id = ?
-            ''', update_values)
-        
-        # Record transaction
-        transaction_id = str(uuid.uuid4())
-        total_cost = quantity * cost_price
-        conn.execute('''
-            INSERT INTO transactions (id, shop_id, product_id, transaction_type, quantity, 
-                                    price_per_unit, total_amount, transaction_date)
-            VALUES (?, ?, ?, 'restock', ?, ?, ?, ?)
-        ''', (transaction_id, shop_id, product_id, quantity, cost_price, total_cost,
-              datetime.now().isoformat()))
-        
-        conn.commit()
-        conn.close()
+        forget_shop(shop_id)
+        publish_stock_changes()
         
         return jsonify({
             'success': True,
             'message': 'Restock recorded successfully',
-            'transaction_id': transaction_id,
-            'new_stock': new_stock,
-            'total_cost': total_cost
+            'transaction_id': restock['transaction_id'],
+            'new_stock': restock['new_stock'],
+            'total_cost': restock['total_cost']
         })
     
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
-@app.route('/api/shops/<shop_id>/stats', methods=['GET'])
+@api_bp.route('/api/inventory/stocktake', methods=['POST'])
+@rate_limited('write')
+def record_stocktake():
+    """Apply a physical count: adjust stock to the counted quantities"""
+    try:
+        data = request.get_json()
+        
+        # Validate required fields
+        required_fields = ['shop_id', 'counts']
+        for field in required_fields:
+            if field not in data:
+                return jsonify({'success': False, 'error': f'Missing field: {field}'}), 400
+        
+        shop_id = data['shop_id']
+        if not isinstance(data['counts'], list) or not data['counts']:
+            return jsonify({'success': False, 'error': 'counts must be a non-empty list'}), 400
+        if len(data['counts']) > MAX_STOCKTAKE_ITEMS:
+            return jsonify({'success': False, 'error': f'At most {MAX_STOCKTAKE_ITEMS} counts per stocktake'}), 400
+        
+        counts = {}
+        for item in data['counts']:
+            product_id = item['product_id']
+            quantity = int(item['quantity'])
+            if quantity < 0:
+                raise ValueError(f'Counted quantity must not be negative: {product_id}')
+            if product_id in counts:
+                raise ValueError(f'Product counted twice: {product_id}')
+            counts[product_id] = quantity
+        
+        conn = get_db_connection()
+        try:
+            with write_transaction(conn):
+                report = apply_stocktake(conn, shop_id, counts, data.get('notes'))
+        finally:
+            conn.close()
+        
+        forget_shop(shop_id)
+        publish_stock_changes()
+        
+        return jsonify({
+            'success': True,
+            'message': f"Stocktake recorded: {report['adjusted_items']} items adjusted",
+            'report': report
+        })
+    
+    except (KeyError, TypeError) as e:
+        return jsonify({'success': False, 'error': f'Invalid count entry: {e}'}), 400
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@api_bp.route('/api/inventory/<shop_id>/low-stock', methods=['GET'])
+@rate_limited('read')
+def get_low_stock(shop_id):
+    """Get a shop's items at or below their reorder level, most urgent first"""
+    try:
+        items = shop_low_stock(shop_id, requested_staleness())
+        
+        return records_response('low_stock', items, InventoryItem)
+    
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@api_bp.route('/api/inventory/<shop_id>/events', methods=['GET'])
+@rate_limited('read')
+def inventory_events(shop_id):
+    """Server-Sent Events stream of stock changes and low-stock crossings"""
+    subscription = events.subscribe(shop_id)
+    return Response(
+        stream_with_context(event_stream(subscription)),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@api_bp.route('/api/shops/<shop_id>/stats', methods=['GET'])
+@rate_limited('read')
 def get_shop_stats(shop_id):
     """Get basic statistics for a shop"""
+    def produce():
+        conn = get_read_connection(requested_staleness())
+        try:
+            stats = shop_stats(conn, shop_id)
+        finally:
+            conn.close()
+        return current_app.json.dumps_bytes({
+            'success': True,
+            'stats': stats
+        })
+    
     try:
-        conn = get_db_connection()
+        return coalesced_json('stats', shop_id, produce)
+    
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@api_bp.route('/api/shops/<shop_id>/transactions', methods=['GET'])
+@rate_limited('read')
+def get_transaction_history(shop_id):
+    """Get a shop's transactions, newest first, across hot and archived months"""
+    try:
+        limit = request.args.get('limit', 100, type=int)
+        if not 0 < limit <= MAX_HISTORY_ROWS:
+            return jsonify({'success': False, 'error': f'limit must be between 1 and {MAX_HISTORY_ROWS}'}), 400
+        
+        transactions = ledger.shop_history(
+            shop_id,
+            start=request.args.get('from') or None,
+            end=request.args.get('to') or None,
+            transaction_type=request.args.get('type') or None,
+            limit=limit,
+            max_staleness=requested_staleness()
+        )
+        
+        return records_response('transactions', transactions, Transaction)
+    
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@api_bp.route('/api/shops/<shop_id>/profit', methods=['GET'])
+@rate_limited('read')
+def get_shop_profit(shop_id):
+    """Revenue, cost of goods sold and margin for a shop, by day and by product"""
+    try:
+        top = request.args.get('top', 10, type=int)
+        if not 0 < top <= MAX_TOP_PRODUCTS:
+            return jsonify({'success': False, 'error': f'top must be between 1 and {MAX_TOP_PRODUCTS}'}), 400
+        
+        profit = costing.shop_profit(
+            shop_id,
+            start=request.args.get('from') or None,
+            end=request.args.get('to') or None,
+            top=top,
+            max_staleness=requested_staleness()
+        )
         
-        # Get total products in inventory
-        total_products = conn.execute('''
-            SELECT COUNT(*) as count FROM inventory WHERE shop_id = ? AND is_active = 1
-        ''', (shop_id,)).fetchone()['count']
-        
-        # Get low stock items
-        low_stock_items = conn.execute('''
-            SELECT COUNT(*) as count FROM inventory 
-            WHERE shop_id = ? AND current_stock <= reorder_level AND is_active = 1
-        ''', (shop_id,)).fetchone()['count']
-        
-        # Get today's sales
-        today = datetime.now().date().isoformat()
-        today_sales = conn.execute('''
-            SELECT COALESCE(SUM(total_amount), 0) as total,
-                   COALESCE(COUNT(*), 0) as transactions
-            FROM transactions 
-            WHERE shop_id = ? AND transaction_type = 'sale' 
-            AND DATE(transaction_date) = ?
-        ''', (shop_id, today)).fetchone()
-        
-        # Get total inventory value
-        inventory_value = conn.execute('''
-            SELECT COALESCE(SUM(current_stock * selling_price), 0) as total
-            FROM inventory 
-            WHERE shop_id = ? AND is_active = 1
-        ''', (shop_id,)).fetchone()['total']
+        return jsonify({
+            'success': True,
+            'profit': profit
+        })
+    
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@api_bp.route('/api/shops/nearby', methods=['GET'])
+def get_nearby_shops():
+    """Shops within radius_km of lat/lon, optionally only those with product_id in stock"""
+    try:
+        for field in ('lat', 'lon'):
+            if field not in request.args:
+                return jsonify({'success': False, 'error': f'Missing parameter: {field}'}), 400
+        
+        radius_km = float(request.args.get('radius_km', 5.0))
+        if not 0 < radius_km <= MAX_NEARBY_RADIUS_KM:
+            return jsonify({'success': False, 'error': f'radius_km must be between 0 and {MAX_NEARBY_RADIUS_KM:g}'}), 400
+        limit = request.args.get('limit', 20, type=int)
+        if not 0 < limit <= MAX_NEARBY_SHOPS:
+            return jsonify({'success': False, 'error': f'limit must be between 1 and {MAX_NEARBY_SHOPS}'}), 400
+        
+        shops = geo.nearby_shops(
+            request.args['lat'],
+            request.args['lon'],
+            radius_km,
+            product_id=request.args.get('product_id') or None,
+            min_quantity=request.args.get('min_quantity', 1, type=int),
+            limit=limit,
+            max_staleness=requested_staleness()
+        )
         
-        conn.close()
+        return jsonify({
+            'success': True,
+            'shops': shops,
+            'count': len(shops)
+        })
+    
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@api_bp.route('/api/shops/<shop_id>/location', methods=['PUT'])
+def update_shop_location(shop_id):
+    """Set the coordinates a shop is found by in /api/shops/nearby"""
+    try:
+        data = request.get_json()
+        
+        # Validate required fields
+        required_fields = ['latitude', 'longitude']
+        for field in required_fields:
+            if field not in data:
+                return jsonify({'success': False, 'error': f'Missing field: {field}'}), 400
+        
+        if not geo.set_shop_location(shop_id, data['latitude'], data['longitude']):
+            return jsonify({'success': False, 'error': 'Shop not found'}), 404
         
         return jsonify({
             'success': True,
-            'stats': {
-                'total_products': total_products,
-                'low_stock_items': low_stock_items,
-                'today_sales_amount': float(today_sales['total']),
-                'today_sales_count': today_sales['transactions'],
-                'inventory_value': float(inventory_value)
-            }
+            'message': 'Shop location updated'
         })
     
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
 # Utility Routes
-@app.route('/api/health', methods=['GET'])
+@api_bp.route('/api/health', methods=['GET'])
 def health_check():
     return jsonify({'status': 'healthy', 'message': 'ShopTracker API is running'})
 
 if __name__ == '__main__':
+    app = create_app('development')
     # Initialize database on startup
-    init_database()
-    seed_common_products()
-    demo_shop_id = create_demo_shop()
+    demo_shop_id = prepare_database()
+    warmup_worker(app)
+    # The development server never forks, so the jobs can share its process
+    start_background_jobs(app)
     
     print(f"ShopTracker API Starting...")
     print(f"Demo Shop ID: {demo_shop_id}")
     print(f"API Endpoints:")
-    print(f"  GET  /api/products")
-    print(f"  GET  /api/inventory/<shop_id>")
-    print(f"  POST /api/inventory/sale")
-    print(f"  POST /api/inventory/restock")
-    print(f"  GET  /api/shops/<shop_id>/stats")
+    for rule in sorted(app.url_map.iter_rules(), key=lambda rule: rule.rule):
+        methods = ','.join(sorted(rule.methods - {'HEAD', 'OPTIONS'}))
+        print(f"  {methods:<5} {rule.rule}")
     
-    app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
+    # use_reloader=False: the reloader would run the database setup twice
+    app.run(debug=True, host='0.0.0.0', port=5000, use_reloader=False)
@@ -0,0 +1,370 @@
+# backend/asgi.py
+"""ASGI entry point: the Flask app behind an async front end
+
+    python asgi.py [--bind 0.0.0.0:5000] [--workers 4]
+    uvicorn asgi:app --workers 4          (schema already prepared)
+
+Every route of app.py, routes/auth_routes.py and routes/admin_routes.py is
+served. The event loop reads request bodies and writes responses, so a slow
+2G client costs a coroutine instead of a worker; a Flask view only borrows a
+thread from a bounded pool (ASGI_THREADS) while it runs. The hot read routes
+and the SSE stream are served natively async on top of utils.async_db and
+services.events, so waiting on the database or for events holds no thread.
+"""
+import argparse
+import asyncio
+import os
+import re
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs
+
+from werkzeug.datastructures import Accept
+from werkzeug.http import parse_accept_header
+
+from app import create_app, prepare_database, warmup_worker
+from models.inventory import InventoryItem
+from services.events import async_event_stream, subscribe
+from services.stats import shop_stats
+from utils import db, queries
+from utils.async_db import AsyncDB
+from utils.compression import choose_encoding, compress
+from utils.rate_limit import limiter
+from utils.responses import records_body
+from utils.singleflight import read_flights
+
+BODY_SPOOL_SIZE = 1024 * 1024  # request bodies above this go to a temp file
+RESPONSE_BUFFER = 64 * 1024  # larger WSGI responses are streamed from the view's thread
+
+
+class ShopTrackerASGI:
+    """ASGI application wrapping the Flask app"""
+
+    def __init__(self, flask_app):
+        self.flask_app = flask_app
+        self.config = flask_app.config
+        self.threads = self.config['ASGI_THREADS']
+        self.db = AsyncDB(self.config['DB_POOL_SIZE'])
+        flask_app.extensions['async_db'] = self.db  # for /api/admin/metrics
+        self._executor = None
+        self.routes = [
+            ('GET', re.compile(r'/api/health'), self.health),
+            ('GET', re.compile(r'/api/inventory/(?P<shop_id>[^/]+)'), self.inventory),
+            ('GET', re.compile(r'/api/inventory/(?P<shop_id>[^/]+)/events'), self.events),
+            ('GET', re.compile(r'/api/shops/(?P<shop_id>[^/]+)/stats'), self.stats),
+        ]
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self.lifespan(receive, send)
+        if scope['type'] != 'http':
+            return
+        for method, pattern, handler in self.routes:
+            match = pattern.fullmatch(scope['path'])
+            if match and scope['method'] in (method, 'HEAD'):
+                return await handler(scope, receive, send, **match.groupdict())
+        return await self.call_flask(scope, receive, send)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await asyncio.get_running_loop().run_in_executor(None, warmup_worker, self.flask_app)
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                if self._executor is not None:
+                    self._executor.shutdown(wait=True)
+                self.db.close()
+                db.close_pools()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    @property
+    def executor(self):
+        """Threads Flask views run on"""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(self.threads, thread_name_prefix='asgi-flask')
+        return self._executor
+
+    # --- Native async routes (same responses as their Flask views) ---------
+
+    async def health(self, scope, receive, send):
+        await self.send_json(scope, send, {'status': 'healthy', 'message': 'ShopTracker API is running'})
+
+    async def inventory(self, scope, receive, send, shop_id):
+        decision = limiter.check(shop_id, 'read')
+        if decision is not None and not decision.allowed:
+            return await self.send_throttled(scope, send, decision)
+        max_staleness = _staleness(scope)
+
+        async def produce():
+            items = await self.db.records(queries.INVENTORY_BY_SHOP, InventoryItem, (shop_id,),
+                                          max_staleness=max_staleness)
+            return records_body('inventory', items, InventoryItem).encode()
+
+        try:
+            body = await self.coalesced(('inventory', shop_id, max_staleness), produce)
+        except Exception as e:
+            return await self.send_json(scope, send, {'success': False, 'error': str(e)}, 500)
+        await self.send_body(scope, send, body, extra_headers=_limit_headers(decision))
+
+    async def stats(self, scope, receive, send, shop_id):
+        decision = limiter.check(shop_id, 'read')
+        if decision is not None and not decision.allowed:
+            return await self.send_throttled(scope, send, decision)
+        max_staleness = _staleness(scope)
+
+        async def produce():
+            stats = await self.db.read(shop_stats, shop_id, max_staleness=max_staleness)
+            return self.flask_app.json.dumps_bytes({'success': True, 'stats': stats})
+
+        try:
+            body = await self.coalesced(('stats', shop_id, max_staleness), produce)
+        except Exception as e:
+            return await self.send_json(scope, send, {'success': False, 'error': str(e)}, 500)
+        await self.send_body(scope, send, body, extra_headers=_limit_headers(decision))
+
+    async def coalesced(self, key, produce):
+        """Body bytes from produce(), shared between identical concurrent reads"""
+        if self.config['SINGLE_FLIGHT']:
+            return await read_flights.do_async(key, produce)
+        return await produce()
+
+    async def events(self, scope, receive, send, shop_id):
+        decision = limiter.check(shop_id, 'read')
+        if decision is not None and not decision.allowed:
+            return await self.send_throttled(scope, send, decision)
+        headers = [(b'content-type', b'text/event-stream; charset=utf-8'),
+                   (b'cache-control', b'no-cache'), (b'x-accel-buffering', b'no')]
+        headers += _limit_headers(decision)
+        await send({'type': 'http.response.start', 'status': 200,
+                    'headers': headers + _cors_headers(scope)})
+        stream = async_event_stream(subscribe(shop_id))
+        # Unsubscribe as soon as the client hangs up, not at the next heartbeat
+        disconnected = asyncio.ensure_future(_disconnect(receive))
+        try:
+            while True:
+                next_chunk = asyncio.ensure_future(stream.__anext__())
+                await asyncio.wait((next_chunk, disconnected), return_when=asyncio.FIRST_COMPLETED)
+                if disconnected.done():
+                    # Let the generator finish cancelling before it is closed
+                    next_chunk.cancel()
+                    try:
+                        await next_chunk
+                    except (asyncio.CancelledError, StopAsyncIteration):
+                        pass
+                    break
+                try:
+                    chunk = next_chunk.result()
+                except StopAsyncIteration:
+                    break
+                await send({'type': 'http.response.body', 'body': chunk.encode(), 'more_body': True})
+            if not disconnected.done():
+                await send({'type': 'http.response.body', 'body': b''})
+        finally:
+            disconnected.cancel()
+            await stream.aclose()
+
+    async def send_json(self, scope, send, payload, status=200, extra_headers=()):
+        await self.send_body(scope, send, self.flask_app.json.dumps(payload).encode(), status,
+                             extra_headers)
+
+    async def send_throttled(self, scope, send, decision):
+        """The 429 utils.rate_limit.too_many_requests sends for Flask views"""
+        await self.send_json(scope, send, {'success': False, 'error': 'Rate limit exceeded',
+                                           'retry_after': decision.retry_after},
+                             429, _limit_headers(decision))
+
+    async def send_body(self, scope, send, body, status=200, extra_headers=()):
+        """Send a JSON body with the compression and CORS headers the Flask app adds"""
+        headers = [(b'content-type', b'application/json'), *extra_headers]
+        min_size = self.config.get('COMPRESS_MIN_SIZE')
+        if min_size is not None and 200 <= status < 300:
+            headers.append((b'vary', b'Accept-Encoding'))
+            encoding = None
+            if len(body) >= min_size:
+                accepted = parse_accept_header(_header(scope, b'accept-encoding'), Accept)
+                encoding = choose_encoding(accepted)
+            if encoding:
+                body = compress(body, encoding, self.config)
+                headers.append((b'content-encoding', encoding.encode()))
+        headers.append((b'content-length', str(len(body)).encode()))
+        await send({'type': 'http.response.start', 'status': status,
+                    'headers': headers + _cors_headers(scope)})
+        await send({'type': 'http.response.body',
+                    'body': b'' if scope['method'] == 'HEAD' else body})
+
+    # --- Everything else: the Flask app on the thread pool -----------------
+
+    async def call_flask(self, scope, receive, send):
+        body = tempfile.SpooledTemporaryFile(max_size=BODY_SPOOL_SIZE)
+        try:
+            max_length = self.flask_app.config.get('MAX_CONTENT_LENGTH')
+            size = 0
+            while True:
+                message = await receive()
+                if message['type'] == 'http.disconnect':
+                    return
+                chunk = message.get('body', b'')
+                size += len(chunk)
+                if max_length is not None and size > max_length:
+                    return await self.send_json(scope, send, {'success': False,
+                                                              'error': 'Request body too large'}, 413)
+                body.write(chunk)
+                if not message.get('more_body'):
+                    break
+            body.seek(0)
+
+            loop = asyncio.get_running_loop()
+            status, headers, chunks, rest = await loop.run_in_executor(
+                self.executor, self._run_view, _environ(scope, body), loop, send)
+            if rest is None:
+                await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+                await send({'type': 'http.response.body', 'body': b''.join(chunks)})
+            else:
+                # Too large to buffer: stream it, holding the thread between chunks
+                await loop.run_in_executor(self.executor, self._stream_view, status, headers,
+                                           chunks, rest, loop, send)
+        finally:
+            body.close()
+
+    def _run_view(self, environ, loop, send):
+        """Call the Flask app; buffer the response unless it is large or streamed"""
+        response = {}
+
+        def start_response(status, headers, exc_info=None):
+            response['status'] = int(status.split(' ', 1)[0])
+            response['headers'] = [(name.lower().encode('latin-1'), value.encode('latin-1'))
+                                   for name, value in headers]
+            return chunks.append
+
+        chunks = []
+        result = self.flask_app(environ, start_response)
+        iterator = iter(result)
+        buffered = 0
+        streamed = any(name == b'content-type' and value.startswith(b'text/event-stream')
+                       for name, value in response['headers'])
+        for chunk in iterator:
+            chunks.append(chunk)
+            buffered += len(chunk)
+            if streamed or buffered > RESPONSE_BUFFER:
+                return response['status'], response['headers'], chunks, (result, iterator)
+        if hasattr(result, 'close'):
+            result.close()
+        return response['status'], response['headers'], chunks, None
+
+    def _stream_view(self, status, headers, chunks, rest, loop, send):
+        result, iterator = rest
+
+        def deliver(message):
+            asyncio.run_coroutine_threadsafe(send(message), loop).result()
+
+        try:
+            deliver({'type': 'http.response.start', 'status': status, 'headers': headers})
+            for chunk in chunks:
+                deliver({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+            for chunk in iterator:
+                deliver({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+            deliver({'type': 'http.response.body', 'body': b''})
+        except OSError:  # client went away
+            pass
+        finally:
+            if hasattr(result, 'close'):
+                result.close()
+
+
+async def _disconnect(receive):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+
+def _header(scope, name):
+    for key, value in scope['headers']:
+        if key == name:
+            return value.decode('latin-1')
+    return None
+
+
+def _staleness(scope):
+    value = parse_qs(scope['query_string'].decode('latin-1')).get('max_staleness')
+    try:
+        return float(value[0]) if value else None
+    except ValueError:
+        return None
+
+
+def _limit_headers(decision):
+    if decision is None:
+        return []
+    return [(name.lower().encode('latin-1'), value.encode('latin-1'))
+            for name, value in decision.headers()]
+
+
+def _cors_headers(scope):
+    """Flask-CORS defaults: echo the Origin if there is one, else *"""
+    origin = _header(scope, b'origin')
+    if origin:
+        return [(b'access-control-allow-origin', origin.encode('latin-1')), (b'vary', b'Origin')]
+    return [(b'access-control-allow-origin', b'*')]
+
+
+def _environ(scope, body):
+    """PEP 3333 environ for an ASGI HTTP scope"""
+    server = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope['query_string'].decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f'HTTP/{scope["http_version"]}',
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': body,
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    if scope.get('client'):
+        environ['REMOTE_ADDR'] = scope['client'][0]
+        environ['REMOTE_PORT'] = str(scope['client'][1])
+    for name, value in scope['headers']:
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if name not in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            name = 'HTTP_' + name
+        environ[name] = f'{environ[name]},{value}' if name in environ else value
+    return environ
+
+
+app = ShopTrackerASGI(create_app(os.environ.get('SHOPTRACKER_CONFIG', 'production')))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve ShopTracker over ASGI (uvicorn)')
+    parser.add_argument('--bind', default=os.environ.get('SHOPTRACKER_BIND', '0.0.0.0:5000'))
+    parser.add_argument('--workers', type=int,
+                        default=int(os.environ.get('WEB_CONCURRENCY', os.cpu_count() or 1)))
+    args = parser.parse_args()
+
+    import uvicorn
+    import jobs
+
+    # Once per deployment, like gunicorn.conf.py's master hooks
+    demo_shop_id = prepare_database()
+    print(f'Database ready ({app.config["DATABASE"]}), demo shop {demo_shop_id}')
+    background = jobs.spawn()
+
+    host, port = args.bind.rsplit(':', 1)
+    try:
+        uvicorn.run('asgi:app', host=host, port=int(port), workers=args.workers,
+                    lifespan='on', timeout_keep_alive=5)
+    finally:
+        jobs.stop(background)
+
+
+if __name__ == '__main__':
+    main()
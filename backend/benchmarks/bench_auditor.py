@@ -0,0 +1,105 @@
+# backend/benchmarks/bench_auditor.py
+"""Inventory vs ledger audit over a large ledger
+
+Builds a database with N shops (default 20,000) stocking 10 products each
+and a ledger of M transactions (default 3,000,000) spread over six months,
+archives the closed months, knocks 1% of the stock figures off, and times
+services.auditor with one worker and with a pool.
+
+    python benchmarks/bench_auditor.py [shops] [transactions]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, init_database  # noqa: E402
+from services import auditor, ledger  # noqa: E402
+from utils import db  # noqa: E402
+
+PRODUCTS = 200
+ITEMS_PER_SHOP = 10
+DAYS = 180
+BATCH = 200_000
+
+
+def build_database(shops, transactions):
+    rng = random.Random(42)
+    first_day = date.today() - timedelta(days=DAYS - 1)
+    items = [(f's{s:06d}', f'p{p}') for s in range(shops)
+             for p in rng.sample(range(PRODUCTS), ITEMS_PER_SHOP)]
+    stock = dict.fromkeys(items, 0)
+
+    conn = db.get_db_connection()
+    with db.write_transaction(conn):
+        conn.executemany('INSERT INTO products (id, name) VALUES (?, ?)',
+                         ((f'p{i}', f'Product {i}') for i in range(PRODUCTS)))
+        conn.executemany('INSERT INTO shops (id, name) VALUES (?, ?)',
+                         ((f's{s:06d}', f'Shop {s}') for s in range(shops)))
+    # Days ascending so every item is restocked before it sells
+    per_day = transactions // DAYS
+    for start in range(0, DAYS * per_day, BATCH):
+        rows = []
+        for n in range(start, min(start + BATCH, DAYS * per_day)):
+            day = first_day + timedelta(days=n // per_day)
+            item = items[rng.randrange(len(items))]
+            if stock[item] >= 3 and rng.random() < 0.7:
+                kind, quantity = 'sale', rng.randint(1, 3)
+                stock[item] -= quantity
+            else:
+                kind, quantity = 'restock', rng.randint(5, 20)
+                stock[item] += quantity
+            rows.append((f't{n}', *item, kind, quantity, f'{day.isoformat()}T12:00:00'))
+        with db.write_transaction(conn):
+            conn.executemany('''
+                INSERT INTO transactions (id, shop_id, product_id, transaction_type, quantity,
+                                          transaction_date)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', rows)
+    drifted = rng.sample(items, len(items) // 100)
+    for item in drifted:
+        stock[item] += rng.choice((-2, -1, 1, 3))
+    with db.write_transaction(conn):
+        conn.executemany('''
+            INSERT INTO inventory (id, shop_id, product_id, current_stock) VALUES (?, ?, ?, ?)
+        ''', ((f'i{shop_id}-{product_id}', shop_id, product_id, quantity)
+              for (shop_id, product_id), quantity in stock.items()))
+    conn.close()
+    return len(drifted)
+
+
+def database_mb(workdir):
+    total = 0
+    for root, _, files in os.walk(workdir):
+        total += sum(os.path.getsize(os.path.join(root, name)) for name in files)
+    return total / 1024 / 1024
+
+
+def main():
+    shops = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    transactions = int(sys.argv[2]) if len(sys.argv) > 2 else 3_000_000
+    with tempfile.TemporaryDirectory() as workdir:
+        create_app({'DATABASE': os.path.join(workdir, 'bench.db')})
+        init_database()
+        started = time.perf_counter()
+        drifted = build_database(shops, transactions)
+        archived = ledger.archive_closed_periods(hot_months=2)
+        db.close_pools()
+        print(f'{shops} shops, {transactions} transactions ({len(archived)} months archived), '
+              f'{database_mb(workdir):.0f} MB on disk, built in {time.perf_counter() - started:.0f} s; '
+              f'{drifted} stock figures drifted\n')
+
+        for workers in (1, os.cpu_count() or 1):
+            started = time.perf_counter()
+            report = auditor.audit_inventory(workers=workers)
+            print(f'  {workers:>2} worker(s): {time.perf_counter() - started:7.1f} s   '
+                  f'{report["items"]} items, {report["mismatches"]} mismatches')
+        db.close_pools()
+
+
+if __name__ == '__main__':
+    main()
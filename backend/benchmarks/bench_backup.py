@@ -0,0 +1,187 @@
+# backend/benchmarks/bench_backup.py
+"""Backups under sales load: copying the file against online backups
+
+Builds a database of N shops (default 2,000) with 200 stocked items each and
+a month of sales, then keeps a writer thread posting a sale every 2 ms while
+it backs the database up with
+  - file copy:  copying shoptracker.db as it is being written (what a cron
+                job would do; the copy is then checked for integrity and for
+                the sales it is missing, which were still only in the WAL),
+  - one step:   the backup API copying every page in one step,
+  - stepped:    services.backup.take_backup() (PAGES_PER_STEP pages per
+                step, STEP_SLEEP between steps, one pinned snapshot),
+and finally runs the WAL archiver once a second for the same length of time.
+For each it prints the backup's duration and throughput and the writer's
+sale latency (p50, p99, max) against the same load with nothing running.
+
+    python benchmarks/bench_backup.py [shops] [seconds]
+"""
+import os
+import random
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, init_database  # noqa: E402
+from services import backup  # noqa: E402
+from utils import db  # noqa: E402
+
+PRODUCTS = 1000
+ITEMS_PER_SHOP = 200
+SALES_PER_SHOP = 100
+WRITE_INTERVAL = 0.002
+
+
+def build_database(shops):
+    rng = random.Random(42)
+    start = datetime.now() - timedelta(days=30)
+    conn = db.get_db_connection()
+    with db.write_transaction(conn):
+        conn.executemany('INSERT INTO products (id, name) VALUES (?, ?)',
+                         ((f'p{i:04d}', f'Product {i}') for i in range(PRODUCTS)))
+        conn.executemany('INSERT INTO shops (id, name) VALUES (?, ?)',
+                         ((f's{s:05d}', f'Shop {s}') for s in range(shops)))
+        conn.executemany('''
+            INSERT INTO inventory (id, shop_id, product_id, current_stock, selling_price)
+            VALUES (?, ?, ?, 1000000, 10)
+        ''', ((f'i{s}-{p}', f's{s:05d}', f'p{p:04d}')
+              for s in range(shops) for p in range(ITEMS_PER_SHOP)))
+        conn.executemany('''
+            INSERT INTO transactions (id, shop_id, product_id, transaction_type, quantity,
+                                      price_per_unit, total_amount, transaction_date)
+            VALUES (?, ?, ?, 'sale', 1, 10, 10, ?)
+        ''', ((f't{s}-{n}', f's{s:05d}', f'p{rng.randrange(ITEMS_PER_SHOP):04d}',
+               (start + timedelta(seconds=rng.randrange(30 * 86400))).isoformat())
+              for s in range(shops) for n in range(SALES_PER_SHOP)))
+    conn.close()
+
+
+class Writer:
+    """Posts a sale every WRITE_INTERVAL seconds and records each one's latency"""
+
+    def __init__(self, app, shops):
+        self.app = app
+        self.shops = shops
+        self.latencies = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run)
+
+    def _run(self):
+        rng = random.Random(7)
+        client = self.app.test_client()
+        while not self._stop.is_set():
+            started = time.perf_counter()
+            response = client.post('/api/inventory/sale', json={
+                'shop_id': f's{rng.randrange(self.shops):05d}',
+                'product_id': f'p{rng.randrange(ITEMS_PER_SHOP):04d}', 'quantity': 1})
+            assert response.status_code == 200, response.data
+            self.latencies.append((time.perf_counter() - started) * 1000)
+            time.sleep(WRITE_INTERVAL)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    def summary(self):
+        quantiles = statistics.quantiles(self.latencies, n=100)
+        return f'{quantiles[49]:>7.1f} {quantiles[98]:>7.1f} {max(self.latencies):>8.1f}'
+
+
+def sales_in(path):
+    conn = sqlite3.connect(f'file:{path}?mode=ro', uri=True)
+    try:
+        check = conn.execute('PRAGMA quick_check').fetchone()[0]
+        return check, conn.execute('SELECT COUNT(*) FROM transactions').fetchone()[0]
+    except sqlite3.DatabaseError as e:
+        return str(e), None
+    finally:
+        conn.close()
+
+
+def file_copy(workdir):
+    target = os.path.join(workdir, 'copy.db')
+    shutil.copyfile(db.DATABASE, target)
+    return target
+
+
+def one_step(workdir):
+    target = os.path.join(workdir, 'one-step.db')
+    source, dest = sqlite3.connect(db.DATABASE), sqlite3.connect(target)
+    try:
+        source.backup(dest)
+    finally:
+        dest.close()
+        source.close()
+    return target
+
+
+def stepped(workdir):
+    report = backup.take_backup()
+    return os.path.join(backup.backup_dir('base'), report['id'] + '.db')
+
+
+def main():
+    shops = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 5
+    with tempfile.TemporaryDirectory() as workdir:
+        app = create_app({'DATABASE': os.path.join(workdir, 'bench.db'), 'RATE_LIMITS': None,
+                          'WAL_ARCHIVE_INTERVAL': 1})
+        init_database()
+        build_database(shops)
+        conn = db.get_db_connection()
+        conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+        conn.close()
+        size = os.path.getsize(db.DATABASE) / 1024 / 1024
+        print(f'{shops} shops, {size:.0f} MB database, a sale every {WRITE_INTERVAL * 1000:g} ms\n')
+        archiver = backup.archiver()
+
+        print(f'  {"backup":<10} {"seconds":>8} {"MB/s":>7}   {"sale p50":>8} {"p99":>7} {"max ms":>8}   copy')
+        with Writer(app, shops) as writer:
+            time.sleep(seconds)
+        print(f'  {"none":<10} {"":>8} {"":>7}   {writer.summary()}')
+
+        for label, method in (('file copy', file_copy), ('one step', one_step), ('stepped', stepped)):
+            # Between runs, as the scheduled archiver would (WAL autocheckpoint is off)
+            archiver.archive()
+            with Writer(app, shops) as writer:
+                time.sleep(0.5)
+                committed = db.get_read_connection()
+                try:
+                    expected = committed.execute('SELECT COUNT(*) FROM transactions').fetchone()[0]
+                finally:
+                    committed.close()
+                started = time.perf_counter()
+                path = method(workdir)
+                elapsed = time.perf_counter() - started
+            check, sales = sales_in(path)
+            missing = f', {expected - sales} committed sales missing' if sales is not None and sales < expected else ''
+            print(f'  {label:<10} {elapsed:>8.2f} {os.path.getsize(path) / 1024 / 1024 / elapsed:>7.0f}'
+                  f'   {writer.summary()}   {check}{missing}')
+
+        archiver.archive()
+        archiver.max_lock_ms = 0.0
+        with Writer(app, shops) as writer:
+            deadline = time.perf_counter() + seconds
+            while time.perf_counter() < deadline:
+                time.sleep(1)
+                archiver.archive()
+        stats = archiver.stats()
+        print(f'  {"WAL archive":<10} {"":>8} {"":>7}   {writer.summary()}   '
+              f'{stats["frames"]} frames, write lock held up to {stats["max_lock_ms"]:.1f} ms')
+        archiver.close()
+        db.close_pools()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+# backend/benchmarks/bench_catalog_ingest.py
+"""Catalog ingest throughput
+
+Loads a synthetic catalog with a naive commit-per-row loop, with the ingest
+upserts issued one execute() per row, and through services.catalog_ingest
+(executemany in chunked transactions), then re-ingests it to measure the
+update path.
+
+    python benchmarks/bench_catalog_ingest.py [rows] [chunk_size]
+"""
+import os
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import init_database  # noqa: E402
+from services.catalog_ingest import BARCODE, CHUNK_SIZE, dedupe, ingest_catalog  # noqa: E402
+from utils import db, queries  # noqa: E402
+
+CATEGORIES = ['Noodles', 'Beverages', 'Snacks', 'Dairy', 'Household', 'Personal Care']
+
+
+def synthetic_catalog(rows):
+    """Products with barcodes, plus every tenth one without (name + brand key)"""
+    return [{
+        'name': f'Product {i}',
+        'category': CATEGORIES[i % len(CATEGORIES)],
+        'brand': f'Brand {i % 500}',
+        'unit': 'packet',
+        'barcode': None if i % 10 == 0 else f'{9000000000000 + i}',
+        'default_price': 10.0 + i % 90,
+        'is_common': i % 100 == 0,
+    } for i in range(rows)]
+
+
+def fresh_database(workdir, name):
+    db.configure(os.path.join(workdir, name))
+    init_database()
+
+
+def per_row_upsert(catalog):
+    """The same upserts issued one execute() per row in a single transaction"""
+    products, _ = dedupe(catalog)
+    now = datetime.now().isoformat()
+    conn = db.get_db_connection()
+    try:
+        with db.write_transaction(conn):
+            for product in products:
+                statement = (queries.UPSERT_PRODUCT_BY_BARCODE if product[BARCODE]
+                             else queries.UPSERT_PRODUCT_BY_NAME_BRAND)
+                conn.execute(statement.sql, (str(uuid.uuid4()),) + product + (now,))
+    finally:
+        conn.close()
+
+
+def per_row_commit(catalog):
+    """One INSERT and one commit per row, like a naive import loop"""
+    conn = db.get_db_connection()
+    try:
+        for product in catalog:
+            conn.execute('''
+                INSERT INTO products (id, name, category, brand, unit, barcode, default_price,
+                                      is_common, created_date)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (str(uuid.uuid4()), product['name'], product['category'], product['brand'],
+                  product['unit'], product['barcode'], product['default_price'],
+                  product['is_common'], datetime.now().isoformat()))
+            conn.commit()
+    finally:
+        conn.close()
+
+
+def report(label, rows, seconds):
+    print(f'  {label:<28} {seconds:8.3f} s  {rows / seconds:>10,.0f} rows/s')
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    chunk_size = int(sys.argv[2]) if len(sys.argv) > 2 else CHUNK_SIZE
+    catalog = synthetic_catalog(rows)
+    print(f'{rows:,} products, chunk size {chunk_size}')
+
+    with tempfile.TemporaryDirectory() as workdir:
+        fresh_database(workdir, 'per_row_commit.db')
+        started = time.perf_counter()
+        per_row_commit(catalog)
+        report('INSERT + commit per row', rows, time.perf_counter() - started)
+
+        fresh_database(workdir, 'per_row.db')
+        started = time.perf_counter()
+        per_row_upsert(catalog)
+        report('upsert, execute per row', rows, time.perf_counter() - started)
+
+        fresh_database(workdir, 'ingest.db')
+        stats = ingest_catalog(catalog, chunk_size)
+        report('ingest (all new)', rows, stats['seconds'])
+
+        stats = ingest_catalog(catalog, chunk_size)
+        report('ingest (all updates)', rows, stats['seconds'])
+        print(f'  inserted={stats["inserted"]} updated={stats["updated"]}')
+        db.close_pools()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,137 @@
+# backend/benchmarks/bench_catalog_snapshot.py
+"""Per-worker memory of a shared catalog snapshot against per-worker caches
+
+Builds a catalog of N products (default 200,000, all with barcodes) and its
+snapshot file, then forks W worker processes (1, 2, 4, 8) that each look up
+every barcode (generated in the worker), either
+  - cache:    loading the catalog into a per-worker dict of Product
+              records, as an in-process cache of the whole catalog would, or
+  - snapshot: through the memory-mapped snapshot (services.catalog).
+Each worker reports how much its private memory (USS: Private_Clean +
+Private_Dirty of /proc/self/smaps_rollup) and RSS grew. Also times single
+barcode lookups through the snapshot and through the database.
+
+    python benchmarks/bench_catalog_snapshot.py [products]
+"""
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, init_database  # noqa: E402
+from models.product import Product  # noqa: E402
+from services import catalog, catalog_snapshot  # noqa: E402
+from utils import db, queries  # noqa: E402
+
+WORKERS = (1, 2, 4, 8)
+CATEGORIES = ('Grains', 'Dairy', 'Snacks', 'Beverages', 'Household', 'Personal Care')
+
+
+def build_database(count):
+    rng = random.Random(42)
+    conn = db.get_db_connection()
+    with db.write_transaction(conn):
+        conn.executemany('''
+            INSERT INTO products (id, name, category, brand, unit, barcode, default_price, is_common)
+            VALUES (?, ?, ?, ?, 'piece', ?, ?, ?)
+        ''', ((f'p{i}', f'Product {i} {rng.choice(CATEGORIES)}', rng.choice(CATEGORIES),
+               f'Brand {i % 500}', f'{9_000_000_000_000 + i}', round(rng.uniform(5, 500), 2),
+               1 if i % 20 == 0 else 0) for i in range(count)))
+    conn.close()
+
+
+def memory_kb():
+    """(USS, RSS) of this process in kB"""
+    values = {}
+    with open('/proc/self/smaps_rollup') as f:
+        for line in f:
+            name, _, rest = line.partition(':')
+            if name in ('Rss', 'Private_Clean', 'Private_Dirty'):
+                values[name] = int(rest.split()[0])
+    return values['Private_Clean'] + values['Private_Dirty'], values['Rss']
+
+
+def barcodes_of(count):
+    return (f'{9_000_000_000_000 + i}' for i in range(count))
+
+
+def worker(mode, count, results):
+    uss_before, rss_before = memory_kb()
+    if mode == 'cache':
+        conn = db.get_read_connection()
+        try:
+            products = queries.LIST_PRODUCTS.records(Product, conn, {
+                'category': None, 'is_common': None, 'search': None})
+        finally:
+            conn.close()
+        cache = {product.barcode: product for product in products}
+        found = sum(1 for barcode in barcodes_of(count) if cache.get(barcode) is not None)
+    else:
+        found = sum(1 for barcode in barcodes_of(count)
+                    if catalog.find_product_json(barcode) is not None)
+    uss_after, rss_after = memory_kb()
+    results.put((found, uss_after - uss_before, rss_after - rss_before))
+
+
+def run(mode, workers, count):
+    context = multiprocessing.get_context('fork')
+    results = context.Queue()
+    processes = [context.Process(target=worker, args=(mode, count, results))
+                 for _ in range(workers)]
+    for process in processes:
+        process.start()
+    reports = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    assert all(found == count for found, _, _ in reports), reports
+    return (sum(uss for _, uss, _ in reports) / 1024 / workers,
+            sum(rss for _, _, rss in reports) / 1024 / workers)
+
+
+def timed_lookups(lookup, barcodes):
+    started = time.perf_counter()
+    for barcode in barcodes:
+        lookup(barcode)
+    return (time.perf_counter() - started) * 1e6 / len(barcodes)
+
+
+def database_lookup(barcode):
+    conn = db.get_read_connection()
+    try:
+        return queries.PRODUCT_BY_BARCODE.records(Product, conn, (barcode,))
+    finally:
+        conn.close()
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    with tempfile.TemporaryDirectory() as workdir:
+        create_app({'DATABASE': os.path.join(workdir, 'bench.db')})
+        init_database()
+        build_database(count)
+        started = time.perf_counter()
+        built = catalog_snapshot.build_snapshot()
+        size = os.path.getsize(catalog_snapshot.snapshot_path()) / 1024 / 1024
+        print(f'{count} products, snapshot {size:.1f} MB built in {time.perf_counter() - started:.1f} s '
+              f'(version {built["version"]})\n')
+        db.close_pools()
+
+        print(f'  {"workers":>7} {"mode":<9} {"private MB/worker":>18} {"RSS MB/worker":>14}')
+        for workers in WORKERS:
+            for mode in ('cache', 'snapshot'):
+                uss, rss = run(mode, workers, count)
+                print(f'  {workers:>7} {mode:<9} {uss:>18.1f} {rss:>14.1f}')
+
+        sample = random.Random(7).sample(list(barcodes_of(count)), 5000)
+        snapshot_us = timed_lookups(catalog.find_product_json, sample)
+        database_us = timed_lookups(database_lookup, sample)
+        print(f'\n  barcode lookup: snapshot {snapshot_us:.1f} us, database {database_us:.1f} us')
+        db.close_pools()
+
+
+if __name__ == '__main__':
+    main()
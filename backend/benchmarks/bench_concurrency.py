@@ -0,0 +1,186 @@
+# backend/benchmarks/bench_concurrency.py
+"""Concurrency capacity: sync gunicorn workers vs the ASGI server (asgi.py)
+
+Starts each server on a scratch database, opens `slow` connections that
+trickle their request headers in over `hold` seconds (a 2G client), and
+meanwhile runs fast clients against /api/shops/<id>/stats and
+/api/products. Reports fast-request throughput and latency while the slow
+clients are connected, how many slow clients were served, and the servers'
+resident memory.
+
+    python benchmarks/bench_concurrency.py [--slow 200] [--hold 5] [--workers 4]
+
+Needs gunicorn and uvicorn installed.
+"""
+import argparse
+import asyncio
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+
+FAST_PATHS = ('/api/shops/{shop_id}/stats', '/api/products')
+
+
+def prepare(workdir):
+    from app import create_app, prepare_database
+    create_app({'DATABASE': os.path.join(workdir, 'bench.db')})
+    return prepare_database()
+
+
+def start_server(kind, port, workers, workdir):
+    # The fast clients all hit the demo shop: keep its rate limit out of the numbers
+    env = dict(os.environ, SHOPTRACKER_DB=os.path.join(workdir, 'bench.db'),
+               SHOPTRACKER_CONFIG='production', SHOPTRACKER_RATE_LIMITS='0')
+    if kind == 'gunicorn':
+        # An empty config file keeps gunicorn.conf.py (eventlet) out of the way
+        config = os.path.join(workdir, 'gunicorn.sync.py')
+        open(config, 'w').close()
+        command = [sys.executable, '-m', 'gunicorn', '-c', config, '-k', 'sync',
+                   '-w', str(workers), '-b', f'127.0.0.1:{port}', '--timeout', '120', 'wsgi:app']
+    else:
+        command = [sys.executable, '-m', 'uvicorn', 'asgi:app', '--workers', str(workers),
+                   '--host', '127.0.0.1', '--port', str(port), '--log-level', 'warning']
+    process = subprocess.Popen(command, cwd=BACKEND, env=env, start_new_session=True,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            asyncio.run(request(port, '/api/health', timeout=1))
+            return process
+        except OSError:
+            time.sleep(0.2)
+    stop_server(process)
+    raise RuntimeError(f'{kind} did not start')
+
+
+def stop_server(process):
+    os.killpg(process.pid, signal.SIGTERM)
+    process.wait(timeout=30)
+
+
+def tree_rss_mb(pid):
+    """Resident memory of a process and its children, in MB"""
+    total = 0
+    pending = [pid]
+    while pending:
+        current = pending.pop()
+        try:
+            with open(f'/proc/{current}/status') as status:
+                total += next(int(line.split()[1]) for line in status if line.startswith('VmRSS'))
+            with open(f'/proc/{current}/task/{current}/children') as children:
+                pending.extend(int(child) for child in children.read().split())
+        except (OSError, StopIteration):
+            continue
+    return total / 1024
+
+
+async def request(port, path, timeout=30, trickle=0.0):
+    """One HTTP/1.1 request; with `trickle` the headers arrive over that many seconds"""
+    reader, writer = await asyncio.wait_for(asyncio.open_connection('127.0.0.1', port), timeout)
+    try:
+        data = f'GET {path} HTTP/1.1\r\nHost: bench\r\nConnection: close\r\n\r\n'.encode()
+        if trickle:
+            pieces = 10
+            step = len(data) // pieces + 1
+            for i in range(0, len(data), step):
+                writer.write(data[i:i + step])
+                await writer.drain()
+                await asyncio.sleep(trickle / pieces)
+        else:
+            writer.write(data)
+        response = await asyncio.wait_for(reader.read(), timeout)
+        if not response.startswith(b'HTTP/1.1 200'):
+            raise OSError(response[:40])
+        return response
+    finally:
+        writer.close()
+
+
+async def slow_client(port, path, hold, results):
+    try:
+        await request(port, path, timeout=hold * 4, trickle=hold)
+        results['served'] += 1
+    except (OSError, asyncio.TimeoutError):
+        results['failed'] += 1
+
+
+async def fast_clients(port, paths, duration, concurrency):
+    latencies = []
+    errors = 0
+    deadline = time.perf_counter() + duration
+
+    async def loop(index):
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                await request(port, paths[index % len(paths)], timeout=duration)
+                latencies.append(time.perf_counter() - started)
+            except (OSError, asyncio.TimeoutError):
+                errors += 1
+            index += 1
+
+    await asyncio.gather(*(loop(i) for i in range(concurrency)))
+    return latencies, errors
+
+
+async def run_load(port, shop_id, slow, hold, concurrency, process):
+    paths = [path.format(shop_id=shop_id) for path in FAST_PATHS]
+    results = {'served': 0, 'failed': 0}
+    slow_tasks = [asyncio.ensure_future(slow_client(port, paths[0], hold, results))
+                  for _ in range(slow)]
+    await asyncio.sleep(0.5)  # let the slow clients connect
+    rss = tree_rss_mb(process.pid)
+    latencies, errors = await fast_clients(port, paths, hold, concurrency)
+    await asyncio.gather(*slow_tasks)
+    return latencies, errors, results, rss
+
+
+def report(kind, latencies, errors, slow, hold, rss, idle_rss):
+    print(f'{kind}')
+    if latencies:
+        latencies.sort()
+        p99 = latencies[int(len(latencies) * 0.99) - 1] if len(latencies) > 1 else latencies[0]
+        print(f'  fast requests: {len(latencies) / hold:8.1f} req/s   '
+              f'p50 {statistics.median(latencies) * 1000:7.1f} ms   p99 {p99 * 1000:7.1f} ms   '
+              f'errors {errors}')
+    else:
+        print(f'  fast requests: none completed, errors {errors}')
+    print(f'  slow clients:  {slow["served"]} served, {slow["failed"]} failed')
+    print(f'  memory:        {idle_rss:.0f} MB idle, {rss:.0f} MB with the slow clients connected')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--slow', type=int, default=200, help='slow clients held open')
+    parser.add_argument('--hold', type=float, default=5.0, help='seconds each slow client takes')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--concurrency', type=int, default=8, help='fast clients')
+    parser.add_argument('--port', type=int, default=8701)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        shop_id = prepare(workdir)
+        print(f'{args.slow} slow clients over {args.hold:g} s, {args.concurrency} fast clients, '
+              f'{args.workers} workers\n')
+        for kind in ('gunicorn', 'uvicorn'):
+            process = start_server(kind, args.port, args.workers, workdir)
+            try:
+                idle_rss = tree_rss_mb(process.pid)
+                latencies, errors, slow, rss = asyncio.run(run_load(
+                    args.port, shop_id, args.slow, args.hold, args.concurrency, process))
+            finally:
+                stop_server(process)
+            report(f'{kind} ({"sync workers" if kind == "gunicorn" else "asgi.py"})',
+                   latencies, errors, slow, args.hold, rss, idle_rss)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+# backend/benchmarks/bench_json.py
+"""Encode time of realistic API payloads per JSON backend
+
+    python benchmarks/bench_json.py [inventory_rows]
+"""
+import gzip
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask  # noqa: E402
+from flask.json.provider import DefaultJSONProvider  # noqa: E402
+
+from utils import json_provider  # noqa: E402
+from utils.json_provider import FastJSONProvider  # noqa: E402
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def inventory_payload(rows):
+    now = datetime(2024, 1, 1, 10, 0, 0)
+    return {
+        'success': True,
+        'inventory': [{
+            'id': f'6f1c2d9e-0000-4000-8000-{i:012d}',
+            'product_id': f'0b7e5a11-0000-4000-8000-{i:012d}',
+            'product_name': f'Wai Wai Chicken {i}',
+            'category': 'Noodles',
+            'brand': 'Wai Wai',
+            'unit': 'packet',
+            'current_stock': i % 40,
+            'selling_price': 20.0 + i % 5,
+            'cost_price': 16.5,
+            'reorder_level': 5,
+            'low_stock': i % 40 <= 5,
+            'last_updated': now - timedelta(minutes=i),
+            'image_url': None,
+        } for i in range(rows)],
+        'count': rows,
+    }
+
+
+def stats_payload():
+    return {
+        'success': True,
+        'stats': {
+            'total_products': 412,
+            'low_stock_items': 17,
+            'today_sales_amount': 15230.5,
+            'today_sales_count': 231,
+            'inventory_value': 284110.25,
+        }
+    }
+
+
+def timeit(func, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    app = Flask(__name__)
+    stdlib = DefaultJSONProvider(app)
+    stdlib.default = json_provider._default
+    fast = FastJSONProvider(app)
+    backend = 'orjson' if json_provider.orjson is not None else 'stdlib (orjson not installed)'
+
+    payloads = [
+        (f'inventory x{rows}', inventory_payload(rows), 5),
+        ('shop stats', stats_payload(), 2000),
+    ]
+    print(f'FastJSONProvider backend: {backend}')
+    for label, payload, repeat in payloads:
+        slow = timeit(lambda: stdlib.dumps(payload), repeat)
+        quick = timeit(lambda: fast.dumps_bytes(payload), repeat)
+        print(f'{label:<18} flask default {slow * 1e6:10.1f} us   fast {quick * 1e6:10.1f} us   '
+              f'speedup {slow / quick:5.1f}x')
+
+    body = fast.dumps_bytes(payloads[0][1])
+    gz_time = timeit(lambda: gzip.compress(body, compresslevel=6), 3)
+    print(f'gzip level 6: {len(body)} -> {len(gzip.compress(body, 6))} bytes in {gz_time * 1000:.1f} ms')
+    if brotli is not None:
+        br_time = timeit(lambda: brotli.compress(body, quality=4), 3)
+        print(f'brotli q4:    {len(body)} -> {len(brotli.compress(body, quality=4))} bytes '
+              f'in {br_time * 1000:.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
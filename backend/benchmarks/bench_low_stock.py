@@ -0,0 +1,127 @@
+# backend/benchmarks/bench_low_stock.py
+"""Low-stock reads: partial indexes against scanning inventory
+
+Builds N shops (default 5,000) with 200 stocked items each, about 2% of them
+at or below their reorder level, then times a shop's low-stock list, the
+low-stock count of the stats endpoint, one product's low shops and the
+products-by-demand ranking through services.low_stock, against the same
+queries written so the planner cannot use the partial indexes (the stock
+test as `current_stock - reorder_level <= 0`).
+
+    python benchmarks/bench_low_stock.py [shops] [queries]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, init_database  # noqa: E402
+from services import low_stock  # noqa: E402
+from utils import db, queries  # noqa: E402
+
+PRODUCTS = 1000
+ITEMS_PER_SHOP = 200
+LOW_SHARE = 0.02
+
+SCAN_BY_SHOP = '''
+    SELECT i.id, p.name, i.current_stock, i.reorder_level
+    FROM inventory i JOIN products p ON p.id = i.product_id
+    WHERE i.shop_id = ? AND i.is_active = 1 AND i.current_stock - i.reorder_level <= 0
+    ORDER BY i.current_stock - i.reorder_level, p.name
+'''
+SCAN_COUNT = '''
+    SELECT COUNT(*) FROM inventory
+    WHERE shop_id = ? AND is_active = 1 AND current_stock - reorder_level <= 0
+'''
+SCAN_FOR_PRODUCT = '''
+    SELECT i.shop_id, s.name, i.current_stock FROM inventory i JOIN shops s ON s.id = i.shop_id
+    WHERE i.product_id = ? AND i.is_active = 1 AND i.current_stock - i.reorder_level <= 0
+    ORDER BY i.shop_id LIMIT 100
+'''
+SCAN_DEMAND = '''
+    SELECT i.product_id, COUNT(*) AS shops, SUM(i.reorder_level - i.current_stock) AS shortfall
+    FROM inventory i
+    WHERE i.is_active = 1 AND i.current_stock - i.reorder_level <= 0
+    GROUP BY i.product_id ORDER BY shops DESC, shortfall DESC LIMIT 20
+'''
+
+
+def build_database(shops):
+    rng = random.Random(42)
+    conn = db.get_db_connection()
+    with db.write_transaction(conn):
+        conn.executemany('INSERT INTO products (id, name) VALUES (?, ?)',
+                         ((f'p{i:04d}', f'Product {i}') for i in range(PRODUCTS)))
+        conn.executemany('INSERT INTO shops (id, name) VALUES (?, ?)',
+                         ((f's{s:05d}', f'Shop {s}') for s in range(shops)))
+        conn.executemany('''
+            INSERT INTO inventory (id, shop_id, product_id, current_stock, reorder_level)
+            VALUES (?, ?, ?, ?, 5)
+        ''', ((f'i{s}-{p}', f's{s:05d}', f'p{p:04d}',
+               rng.randint(0, 5) if rng.random() < LOW_SHARE else rng.randint(6, 200))
+              for s in range(shops) for p in rng.sample(range(PRODUCTS), ITEMS_PER_SHOP)))
+    conn.close()
+
+
+def timed(func, args_list):
+    started = time.perf_counter()
+    for args in args_list:
+        func(*args)
+    return (time.perf_counter() - started) * 1000 / len(args_list)
+
+
+def scan(sql):
+    def run(*params):
+        conn = db.get_read_connection()
+        try:
+            return conn.execute(sql, params).fetchall()
+        finally:
+            conn.close()
+    return run
+
+
+def count_low(shop_id):
+    conn = db.get_read_connection()
+    try:
+        return queries.STATS_LOW_STOCK.fetchone(conn, (shop_id,))
+    finally:
+        conn.close()
+
+
+def main():
+    shops = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    with tempfile.TemporaryDirectory() as workdir:
+        create_app({'DATABASE': os.path.join(workdir, 'bench.db')})
+        init_database()
+        started = time.perf_counter()
+        build_database(shops)
+        low = low_stock.low_stock_demand(limit=PRODUCTS)
+        print(f'{shops} shops, {shops * ITEMS_PER_SHOP} inventory rows, '
+              f'{sum(row["shops"] for row in low)} low (built in {time.perf_counter() - started:.1f} s)\n')
+
+        rng = random.Random(7)
+        shop_ids = [(f's{rng.randrange(shops):05d}',) for _ in range(count)]
+        product_ids = [(f'p{rng.randrange(PRODUCTS):04d}',) for _ in range(count)]
+        cases = [
+            ('shop low-stock list', lambda shop_id: low_stock.shop_low_stock(shop_id),
+             scan(SCAN_BY_SHOP), shop_ids),
+            ('shop low-stock count', count_low, scan(SCAN_COUNT), shop_ids),
+            ('shops low on a product', lambda product_id: low_stock.low_stock_items(product_id),
+             scan(SCAN_FOR_PRODUCT), product_ids),
+            ('products by demand', lambda: low_stock.low_stock_demand(), scan(SCAN_DEMAND),
+             [()] * max(1, count // 20)),
+        ]
+
+        print(f'  {"query":<24} {"partial index":>14} {"scan":>12}')
+        for label, indexed, scanned, args_list in cases:
+            print(f'  {label:<24} {timed(indexed, args_list):>11.3f} ms '
+                  f'{timed(scanned, args_list):>9.3f} ms')
+        db.close_pools()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+# backend/benchmarks/bench_models.py
+"""Memory and serialization cost of inventory listings
+
+Compares the old get_inventory path (sqlite3.Row -> dict per row -> json)
+with slotted InventoryItem records and Record.dumps_many.
+
+    python benchmarks/bench_models.py [rows]
+"""
+import json
+import os
+import sqlite3
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.inventory import InventoryItem  # noqa: E402
+
+QUERY = '''
+    SELECT id, product_id, product_name, category, brand, unit, current_stock,
+           selling_price, cost_price, reorder_level,
+           CASE WHEN current_stock <= reorder_level THEN 1 ELSE 0 END as low_stock,
+           last_updated, image_url
+    FROM items
+'''
+
+
+def build_database(rows):
+    conn = sqlite3.connect(':memory:')
+    conn.execute('''
+        CREATE TABLE items (id TEXT, product_id TEXT, product_name TEXT, category TEXT,
+                            brand TEXT, unit TEXT, current_stock INTEGER, selling_price REAL,
+                            cost_price REAL, reorder_level INTEGER, last_updated TEXT,
+                            image_url TEXT)
+    ''')
+    conn.executemany('INSERT INTO items VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', (
+        (f'inv-{i:08d}', f'prod-{i:08d}', f'Product {i}', 'Snacks', 'Brand', 'packet',
+         i % 50, 20.0 + i % 7, 15.5, 5, '2024-01-01T10:00:00', None)
+        for i in range(rows)
+    ))
+    return conn
+
+
+def dict_rows(conn):
+    conn.row_factory = sqlite3.Row
+    items = []
+    for item in conn.execute(QUERY).fetchall():
+        items.append({
+            'id': item['id'],
+            'product_id': item['product_id'],
+            'product_name': item['product_name'],
+            'category': item['category'],
+            'brand': item['brand'],
+            'unit': item['unit'],
+            'current_stock': item['current_stock'],
+            'selling_price': item['selling_price'],
+            'cost_price': item['cost_price'],
+            'reorder_level': item['reorder_level'],
+            'low_stock': bool(item['low_stock']),
+            'last_updated': item['last_updated'],
+            'image_url': item['image_url']
+        })
+    conn.row_factory = None
+    return items
+
+
+def record_rows(conn):
+    return InventoryItem.fetch_all(conn, QUERY)
+
+
+def measure(label, load, dump, conn, rows):
+    tracemalloc.start()
+    start = time.perf_counter()
+    items = load(conn)
+    load_time = time.perf_counter() - start
+    memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    body = dump(items)
+    dump_time = time.perf_counter() - start
+
+    print(f'{label:<10} load {load_time * 1000:8.1f} ms   '
+          f'memory {memory / 1024 / 1024:7.1f} MiB ({memory / rows:6.1f} B/row)   '
+          f'serialize {dump_time * 1000:8.1f} ms   total {(load_time + dump_time) * 1000:8.1f} ms   '
+          f'{len(body) / 1024 / 1024:.1f} MiB JSON')
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    conn = build_database(rows)
+    print(f'{rows} inventory rows')
+    measure('dicts', dict_rows, json.dumps, conn, rows)
+    measure('records', record_rows, InventoryItem.dumps_many, conn, rows)
+
+
+if __name__ == '__main__':
+    main()
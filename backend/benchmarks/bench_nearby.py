@@ -0,0 +1,110 @@
+# backend/benchmarks/bench_nearby.py
+"""Nearby-shop lookups over many shops
+
+Builds a database with N shops (default 100,000) spread over Nepal, most of
+them clustered around cities, each stocking 10 of 200 products. Then times
+"shops within R km with product P in stock" through services.geo (R*Tree
+candidates joined to inventory's unique index) against the same bounding
+box filter on plain latitude/longitude columns, for a few radii.
+
+    python benchmarks/bench_nearby.py [shops] [queries]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, init_database  # noqa: E402
+from services import geo  # noqa: E402
+from utils import db  # noqa: E402
+
+CITIES = [(27.7172, 85.3240), (28.2096, 83.9856), (26.4525, 87.2718), (27.6710, 85.4298),
+          (27.5291, 84.3542), (28.6980, 80.5931), (27.0104, 84.8770)]
+PRODUCTS = 200
+ITEMS_PER_SHOP = 10
+RADII_KM = (1, 5, 20)
+
+# The same search without the R*Tree: a bounding box over the shops columns
+SCAN_SQL = '''
+    SELECT s.id, s.latitude, s.longitude, i.current_stock
+    FROM shops s
+    JOIN inventory i ON i.shop_id = s.id AND i.product_id = :product_id
+    WHERE s.latitude BETWEEN :min_lat AND :max_lat
+      AND s.longitude BETWEEN :min_lon AND :max_lon
+      AND i.current_stock >= 1 AND s.is_active = 1
+'''
+
+
+def random_point(rng):
+    if rng.random() < 0.7:
+        lat, lon = rng.choice(CITIES)
+        return lat + rng.gauss(0, 0.08), lon + rng.gauss(0, 0.08)
+    return rng.uniform(26.4, 30.4), rng.uniform(80.1, 88.2)
+
+
+def build_database(shops):
+    rng = random.Random(42)
+    conn = db.get_db_connection()
+    with db.write_transaction(conn):
+        conn.executemany('INSERT INTO products (id, name) VALUES (?, ?)',
+                         ((f'p{i}', f'Product {i}') for i in range(PRODUCTS)))
+        conn.executemany('''
+            INSERT INTO shops (id, name, latitude, longitude, is_active) VALUES (?, ?, ?, ?, 1)
+        ''', ((f's{i}', f'Shop {i}', *random_point(rng)) for i in range(shops)))
+        conn.executemany('''
+            INSERT INTO inventory (id, shop_id, product_id, current_stock) VALUES (?, ?, ?, ?)
+        ''', ((f'i{s}-{p}', f's{s}', f'p{p}', rng.randint(0, 30))
+              for s in range(shops) for p in rng.sample(range(PRODUCTS), ITEMS_PER_SHOP)))
+    conn.close()
+
+
+def scan_search(lat, lon, radius_km, product_id):
+    params = geo.bounding_box(lat, lon, radius_km)
+    params['product_id'] = product_id
+    conn = db.get_read_connection()
+    try:
+        rows = conn.execute(SCAN_SQL, params).fetchall()
+    finally:
+        conn.close()
+    return [row for row in rows
+            if geo.distance_km(lat, lon, row['latitude'], row['longitude']) <= radius_km]
+
+
+def timed(func, probes, radius_km):
+    found = 0
+    started = time.perf_counter()
+    for lat, lon, product_id in probes:
+        found += len(func(lat, lon, radius_km, product_id))
+    return (time.perf_counter() - started) * 1000 / len(probes), found / len(probes)
+
+
+def main():
+    shops = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    with tempfile.TemporaryDirectory() as workdir:
+        create_app({'DATABASE': os.path.join(workdir, 'bench.db')})
+        init_database()
+        started = time.perf_counter()
+        build_database(shops)
+        print(f'{shops} shops, {shops * ITEMS_PER_SHOP} inventory rows '
+              f'(built in {time.perf_counter() - started:.1f} s), {count} queries per radius\n')
+
+        rng = random.Random(7)
+        probes = [(*random_point(rng), f'p{rng.randrange(PRODUCTS)}') for _ in range(count)]
+        rtree = lambda lat, lon, radius_km, product_id: geo.nearby_shops(  # noqa: E731
+            lat, lon, radius_km, product_id=product_id, limit=shops)
+
+        print(f'  {"radius":>8} {"R*Tree":>12} {"column scan":>14} {"shops found":>12}')
+        for radius_km in RADII_KM:
+            rtree_ms, found = timed(rtree, probes, radius_km)
+            scan_ms, scan_found = timed(scan_search, probes, radius_km)
+            assert abs(found - scan_found) < 1e-9, (found, scan_found)
+            print(f'  {radius_km:>6} km {rtree_ms:>9.2f} ms {scan_ms:>11.2f} ms {found:>12.1f}')
+        db.close_pools()
+
+
+if __name__ == '__main__':
+    main()
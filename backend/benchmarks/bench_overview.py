@@ -0,0 +1,103 @@
+# backend/benchmarks/bench_overview.py
+"""Fleet overview cost for many shops
+
+Builds a database with N shops (default 10,000), 20 inventory rows per shop
+and 30 days of daily sales rollups, then compares one get_shop_stats-style
+round of queries per shop (the N+1 approach) with services.overview, cold
+and cached.
+
+    python benchmarks/bench_overview.py [shops]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import init_database  # noqa: E402
+from services.overview import fleet_overview, overview_cache  # noqa: E402
+from utils import db, queries  # noqa: E402
+
+DISTRICTS = ['Kathmandu', 'Lalitpur', 'Bhaktapur', 'Kaski', 'Chitwan', 'Morang', 'Kavrepalanchok']
+TIERS = ['free', 'basic', 'premium']
+PRODUCTS = 200
+DAYS = 30
+
+
+def build_database(shops):
+    rng = random.Random(42)
+    today = date.today()
+    days = [(today - timedelta(days=day)).isoformat() for day in range(DAYS)]
+    conn = db.get_db_connection()
+    with db.write_transaction(conn):
+        conn.executemany('INSERT INTO products (id, name, is_common) VALUES (?, ?, 1)',
+                         ((f'p{i}', f'Product {i}') for i in range(PRODUCTS)))
+        conn.executemany('''
+            INSERT INTO shops (id, name, city, district, subscription_tier, is_active)
+            VALUES (?, ?, ?, ?, ?, 1)
+        ''', ((f's{i}', f'Shop {i}', f'City {i % 40}', DISTRICTS[i % len(DISTRICTS)],
+               TIERS[i % len(TIERS)]) for i in range(shops)))
+        conn.executemany('''
+            INSERT INTO inventory (id, shop_id, product_id, current_stock, selling_price, reorder_level)
+            VALUES (?, ?, ?, ?, 25.0, 5)
+        ''', ((f'i{s}-{p}', f's{s}', f'p{p}', rng.randint(0, 50))
+              for s in range(shops) for p in rng.sample(range(PRODUCTS), 20)))
+        conn.executemany('''
+            INSERT INTO shop_daily_sales (shop_id, sale_date, sales_amount, sales_count, units_sold)
+            VALUES (?, ?, ?, ?, ?)
+        ''', ((f's{s}', day, rng.uniform(100, 5000), rng.randint(5, 80), rng.randint(5, 200))
+              for s in range(shops) for day in days))
+        conn.executemany('''
+            INSERT INTO product_daily_sales (shop_id, sale_date, product_id, sales_amount, units_sold)
+            VALUES (?, ?, ?, ?, ?)
+        ''', ((f's{s}', day, f'p{p}', rng.uniform(10, 500), rng.randint(1, 20))
+              for s in range(shops) for day in days for p in rng.sample(range(PRODUCTS), 2)))
+    conn.close()
+
+
+def per_shop_stats(shops):
+    """What a dashboard calling /api/shops/<id>/stats for every shop costs"""
+    today = date.today()
+    tomorrow = (today + timedelta(days=1)).isoformat()
+    conn = db.get_read_connection()
+    try:
+        for shop_id in (f's{i}' for i in range(shops)):
+            queries.STATS_TOTAL_PRODUCTS.fetchone(conn, (shop_id,))
+            queries.STATS_LOW_STOCK.fetchone(conn, (shop_id,))
+            queries.STATS_SALES_BETWEEN.fetchone(conn, (shop_id, today.isoformat(), tomorrow))
+            queries.STATS_INVENTORY_VALUE.fetchone(conn, (shop_id,))
+    finally:
+        conn.close()
+
+
+def timed(label, func, *args, **kwargs):
+    started = time.perf_counter()
+    result = func(*args, **kwargs)
+    print(f'  {label:<36} {(time.perf_counter() - started) * 1000:9.1f} ms')
+    return result
+
+
+def main():
+    shops = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    with tempfile.TemporaryDirectory() as workdir:
+        db.configure(os.path.join(workdir, 'overview.db'))
+        init_database()
+        started = time.perf_counter()
+        build_database(shops)
+        print(f'{shops:,} shops built in {time.perf_counter() - started:.1f} s')
+
+        timed(f'per-shop stats ({shops * 4:,} queries)', per_shop_stats, shops)
+        overview = timed('overview, all shops (cold)', fleet_overview)
+        timed('overview, all shops (cached)', fleet_overview)
+        timed('overview, one district (cold)', fleet_overview, district='Kaski')
+        timed('overview, premium by city (cold)', fleet_overview, tier='premium', group_by='city')
+        print(f'  totals: {overview["totals"]}')
+        print(f'  cache: {overview_cache.stats()}')
+        db.close_pools()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+# backend/benchmarks/bench_profiler.py
+"""Sampling profiler: cost of a sample and what profiling costs a loaded worker
+
+First times Profile.sample() against C client threads (default 4) that loop
+over a sale, an inventory read and a stats read. Then runs the same load
+for S seconds (default 5) with no profile, and with a profile at 100 Hz and
+at 1000 Hz under the MAX_OVERHEAD cap and at 1000 Hz with no cap, printing
+requests per second, request p99, the samples taken and the share of wall
+time the sampler spent sampling.
+
+    python benchmarks/bench_profiler.py [clients] [seconds]
+"""
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, init_database  # noqa: E402
+from utils import db, profiler  # noqa: E402
+
+PRODUCTS = 200
+
+
+def build_database():
+    conn = db.get_db_connection()
+    with db.write_transaction(conn):
+        conn.execute("INSERT INTO shops (id, name) VALUES ('s1', 'Shop 1')")
+        conn.executemany('INSERT INTO products (id, name) VALUES (?, ?)',
+                         ((f'p{i:03d}', f'Product {i}') for i in range(PRODUCTS)))
+        conn.executemany('''
+            INSERT INTO inventory (id, shop_id, product_id, current_stock, selling_price)
+            VALUES (?, 's1', ?, 1000000000, 10)
+        ''', ((f'i{i}', f'p{i:03d}') for i in range(PRODUCTS)))
+    conn.close()
+
+
+class Load:
+    """Client threads looping over a sale, an inventory read and a stats read"""
+
+    def __init__(self, app, clients):
+        self.app = app
+        self.latencies = []
+        self._stop = threading.Event()
+        self._threads = [threading.Thread(target=self._run, args=(n,)) for n in range(clients)]
+
+    def _run(self, n):
+        client = self.app.test_client()
+        requests = (
+            lambda: client.post('/api/inventory/sale', json={
+                'shop_id': 's1', 'product_id': f'p{n:03d}', 'quantity': 1}),
+            lambda: client.get('/api/inventory/s1'),
+            lambda: client.get('/api/shops/s1/stats'),
+        )
+        while not self._stop.is_set():
+            for send in requests:
+                started = time.perf_counter()
+                assert send().status_code == 200
+                self.latencies.append((time.perf_counter() - started) * 1000)
+
+    def __enter__(self):
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join()
+
+
+def sample_cost(app, clients, count=500):
+    with Load(app, clients):
+        time.sleep(0.5)
+        run = profiler.Profile(1)
+        own = threading.get_ident()
+        started = time.thread_time()
+        for _ in range(count):
+            run.sample(own)
+        cost = (time.thread_time() - started) / count
+    depth = statistics.mean(len(stack) for stack in run.stacks) if run.stacks else 0
+    return cost * 1e6, depth
+
+
+def run(app, clients, seconds, interval=None, max_overhead=None):
+    with Load(app, clients) as load:
+        time.sleep(0.5)
+        load.latencies.clear()
+        started = time.perf_counter()
+        if interval is None:
+            time.sleep(seconds)
+            profile = None
+        else:
+            profile = profiler.profile(seconds, interval, max_overhead)
+        elapsed = time.perf_counter() - started
+        latencies = sorted(load.latencies)
+    return len(latencies) / elapsed, latencies[int(len(latencies) * 0.99)], profile
+
+
+def main():
+    clients = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 5
+    with tempfile.TemporaryDirectory() as workdir:
+        app = create_app({'DATABASE': os.path.join(workdir, 'bench.db'), 'RATE_LIMITS': None})
+        init_database()
+        build_database()
+
+        cost, depth = sample_cost(app, clients)
+        print(f'Profile.sample(): {cost:.0f} us of CPU per sample of {clients} busy threads '
+              f'({depth:.0f} frames per stack)\n')
+        print(f'{clients} client threads, {seconds:g} s per run, MAX_OVERHEAD {profiler.MAX_OVERHEAD:.0%}\n')
+        print(f'  {"profile":<22} {"req/s":>7} {"p99 ms":>7} {"samples":>8} {"every ms":>9} {"overhead":>9}')
+        for label, interval, max_overhead in (('none', None, None),
+                                              ('100 Hz', 0.01, None),
+                                              ('1000 Hz', 0.001, None),
+                                              ('1000 Hz, no cap', 0.001, 1.0)):
+            throughput, p99, profile = run(app, clients, seconds, interval, max_overhead)
+            if profile is None:
+                print(f'  {label:<22} {throughput:>7.0f} {p99:>7.1f}')
+                continue
+            summary = profile.summary()
+            print(f'  {label:<22} {throughput:>7.0f} {p99:>7.1f} {summary["samples"]:>8} '
+                  f'{summary["effective_interval_ms"]:>9.1f} {summary["overhead"]:>9.2%}')
+        db.close_pools()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+# backend/benchmarks/bench_rate_limit.py
+"""Token-bucket throttling: cost per request and a noisy free-tier shop
+
+First times limiter.check() alone (the work added to every throttled
+request). Then runs C client threads (default 8) each posting a sale every
+5 ms for one free-tier shop, next to one paying shop that posts a sale every
+20 ms, with RATE_LIMITS off and on; for each run it prints how many sales of
+each shop went through, how many the noisy shop got refused, and the paying
+shop's sale latency. The clients are paced because they share this
+process: a client spinning on cheap 429s would only measure the GIL.
+
+    python benchmarks/bench_rate_limit.py [clients] [seconds]
+"""
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, init_database  # noqa: E402
+from config.settings import Config  # noqa: E402
+from utils import db  # noqa: E402
+from utils.rate_limit import limiter  # noqa: E402
+
+SHOPS = {'noisy': 'free', 'paying': 'premium'}
+NOISY_INTERVAL = 0.005
+PAYING_INTERVAL = 0.02
+
+
+def build_database():
+    conn = db.get_db_connection()
+    with db.write_transaction(conn):
+        conn.execute("INSERT INTO products (id, name) VALUES ('p1', 'Product 1')")
+        for shop_id, tier in SHOPS.items():
+            conn.execute('INSERT INTO shops (id, name, subscription_tier) VALUES (?, ?, ?)',
+                         (shop_id, shop_id.title(), tier))
+            conn.execute('''
+                INSERT INTO inventory (id, shop_id, product_id, current_stock, selling_price)
+                VALUES (?, ?, 'p1', 1000000000, 10)
+            ''', (f'i-{shop_id}', shop_id))
+    conn.close()
+
+
+def check_cost(count=200_000):
+    limiter.configure({'free': {'write': (1e9, 1e9)}})
+    started = time.perf_counter()
+    for i in range(count):
+        limiter.check(f's{i % 1000}', 'write')
+    return (time.perf_counter() - started) * 1e6 / count
+
+
+def run(app, clients, seconds, limits):
+    limiter.configure(limits)
+    if limits:
+        limiter.refresh_tiers()
+    stop = time.monotonic() + seconds
+    counts = {'noisy': 0, 'throttled': 0, 'paying': 0}
+    latencies = []
+    lock = threading.Lock()
+
+    def sale(client, shop_id):
+        return client.post('/api/inventory/sale', json={
+            'shop_id': shop_id, 'product_id': 'p1', 'quantity': 1})
+
+    def noisy():
+        client = app.test_client()
+        while time.monotonic() < stop:
+            status = sale(client, 'noisy').status_code
+            with lock:
+                counts['noisy' if status == 200 else 'throttled'] += 1
+            time.sleep(NOISY_INTERVAL)
+
+    def paying():
+        client = app.test_client()
+        while time.monotonic() < stop:
+            started = time.perf_counter()
+            assert sale(client, 'paying').status_code == 200
+            latencies.append((time.perf_counter() - started) * 1000)
+            counts['paying'] += 1
+            time.sleep(PAYING_INTERVAL)
+
+    threads = [threading.Thread(target=noisy) for _ in range(clients)]
+    threads.append(threading.Thread(target=paying))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    latencies.sort()
+    return counts, statistics.median(latencies), latencies[int(len(latencies) * 0.99)]
+
+
+def main():
+    clients = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 10
+    print(f'limiter.check(): {check_cost():.2f} us per call (memory store)\n')
+    with tempfile.TemporaryDirectory() as workdir:
+        app = create_app({'DATABASE': os.path.join(workdir, 'bench.db'), 'RATE_LIMITS': None})
+        init_database()
+        build_database()
+        print(f'{clients} noisy clients (free tier), 1 paying client (premium), {seconds:g} s per run\n')
+        print(f'  {"throttling":<11} {"noisy sales":>11} {"refused":>8} {"paying sales":>13} '
+              f'{"paying p50":>11} {"p99":>9}')
+        for label, limits in (('off', None), ('on', Config.RATE_LIMITS)):
+            counts, p50, p99 = run(app, clients, seconds, limits)
+            print(f'  {label:<11} {counts["noisy"]:>11} {counts["throttled"]:>8} '
+                  f'{counts["paying"]:>13} {p50:>8.1f} ms {p99:>6.1f} ms')
+        db.close_pools()
+
+
+if __name__ == '__main__':
+    main()
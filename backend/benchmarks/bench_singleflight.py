@@ -0,0 +1,110 @@
+# backend/benchmarks/bench_singleflight.py
+"""Duplicate-heavy read load with and without request coalescing
+
+Builds a few shops with N stocked items each (default 2,000), then runs C
+client threads (default 32) that keep requesting /api/inventory/<shop_id>
+and /api/shops/<shop_id>/stats for a handful of hot shops -- many devices
+of the same shops refreshing together -- with an occasional sale mixed in.
+The same load runs with SINGLE_FLIGHT off and on; for each run it prints
+throughput, latency percentiles and how many inventory queries actually hit
+the database.
+
+    python benchmarks/bench_singleflight.py [items] [clients] [seconds]
+"""
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, init_database  # noqa: E402
+from utils import db, queries  # noqa: E402
+from utils.singleflight import read_flights  # noqa: E402
+
+SHOPS = 4
+WRITE_SHARE = 0.01
+
+
+def build_database(items):
+    rng = random.Random(42)
+    conn = db.get_db_connection()
+    with db.write_transaction(conn):
+        conn.executemany('INSERT INTO products (id, name) VALUES (?, ?)',
+                         ((f'p{i}', f'Product {i}') for i in range(items)))
+        conn.executemany('INSERT INTO shops (id, name) VALUES (?, ?)',
+                         ((f's{s}', f'Shop {s}') for s in range(SHOPS)))
+        conn.executemany('''
+            INSERT INTO inventory (id, shop_id, product_id, current_stock, selling_price)
+            VALUES (?, ?, ?, ?, 12.5)
+        ''', ((f'i{s}-{i}', f's{s}', f'p{i}', rng.randint(100, 1000))
+              for s in range(SHOPS) for i in range(items)))
+    conn.close()
+
+
+def client_loop(app, items, deadline, latencies, seed):
+    rng = random.Random(seed)
+    client = app.test_client()
+    while time.perf_counter() < deadline:
+        shop_id = f's{min(int(rng.expovariate(1.0)), SHOPS - 1)}'  # a few shops are hot
+        started = time.perf_counter()
+        if rng.random() < WRITE_SHARE:
+            response = client.post('/api/inventory/sale', json={
+                'shop_id': shop_id, 'product_id': f'p{rng.randrange(items)}', 'quantity': 1})
+        elif rng.random() < 0.5:
+            response = client.get(f'/api/inventory/{shop_id}')
+        else:
+            response = client.get(f'/api/shops/{shop_id}/stats')
+        assert response.status_code == 200, response.data
+        latencies.append(time.perf_counter() - started)
+
+
+def run(app, items, clients, seconds):
+    queries.reset_stats()
+    read_flights.reset()
+    latencies = []
+    deadline = time.perf_counter() + seconds
+    threads = [threading.Thread(target=client_loop, args=(app, items, deadline, latencies, seed))
+               for seed in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    quantiles = statistics.quantiles(latencies, n=100)
+    return {
+        'rps': len(latencies) / seconds,
+        'p50': quantiles[49] * 1000,
+        'p99': quantiles[98] * 1000,
+        'inventory_queries': queries.INVENTORY_BY_SHOP.calls,
+        'coalesced': read_flights.coalesced,
+    }
+
+
+def main():
+    items = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    clients = int(sys.argv[2]) if len(sys.argv) > 2 else 32
+    seconds = float(sys.argv[3]) if len(sys.argv) > 3 else 10
+    with tempfile.TemporaryDirectory() as workdir:
+        app = create_app({'DATABASE': os.path.join(workdir, 'bench.db'), 'COMPRESS_MIN_SIZE': None,
+                          'RATE_LIMITS': None})
+        init_database()
+        build_database(items)
+        print(f'{SHOPS} shops x {items} items, {clients} clients, {seconds:.0f} s per run, '
+              f'{WRITE_SHARE:.0%} sales\n')
+
+        print(f'  {"single flight":<14} {"req/s":>8} {"p50":>9} {"p99":>9} '
+              f'{"inventory queries":>18} {"coalesced":>10}')
+        for enabled in (False, True):
+            app.config['SINGLE_FLIGHT'] = enabled
+            result = run(app, items, clients, seconds)
+            print(f'  {"on" if enabled else "off":<14} {result["rps"]:>8.0f} '
+                  f'{result["p50"]:>6.1f} ms {result["p99"]:>6.1f} ms '
+                  f'{result["inventory_queries"]:>18} {result["coalesced"]:>10}')
+        db.close_pools()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+# backend/benchmarks/bench_startup.py
+"""Cold start to first request, with and without worker warmup
+
+Each run is a fresh interpreter so imports and caches start cold.
+
+    python benchmarks/bench_startup.py [runs]
+"""
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = r'''
+import json, sys, time
+start = time.perf_counter()
+sys.path.insert(0, {backend!r})
+import app as shoptracker
+imported = time.perf_counter()
+app = shoptracker.create_app({{'DATABASE': {database!r}}})
+created = time.perf_counter()
+if {warmup!r}:
+    shoptracker.warmup_worker(app)
+warm = time.perf_counter()
+client = app.test_client()
+response = client.get('/api/inventory/' + {shop_id!r})
+assert response.status_code == 200, response.data
+first = time.perf_counter()
+client.get('/api/inventory/' + {shop_id!r})
+second = time.perf_counter()
+print(json.dumps({{
+    'import': imported - start, 'create_app': created - imported, 'warmup': warm - created,
+    'first_request': first - warm, 'second_request': second - first, 'total': first - start,
+}}))
+'''
+
+
+def prepare(database):
+    code = (f'import sys; sys.path.insert(0, {BACKEND!r}); import app; '
+            f'app.create_app({{"DATABASE": {database!r}}}); print(app.prepare_database())')
+    output = subprocess.check_output([sys.executable, '-c', code], text=True)
+    return output.strip().splitlines()[-1]
+
+
+def run(database, shop_id, warmup):
+    code = CHILD.format(backend=BACKEND, database=database, shop_id=shop_id, warmup=warmup)
+    return json.loads(subprocess.check_output([sys.executable, '-c', code], text=True))
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    workdir = tempfile.mkdtemp()
+    try:
+        database = os.path.join(workdir, 'shoptracker.db')
+        shop_id = prepare(database)
+        for warmup in (False, True):
+            results = [run(database, shop_id, warmup) for _ in range(runs)]
+            label = 'with warmup' if warmup else 'no warmup'
+            print(f'{label} ({runs} runs, median ms)')
+            for phase in ('import', 'create_app', 'warmup', 'first_request', 'second_request', 'total'):
+                values = sorted(result[phase] for result in results)
+                print(f'  {phase:<15} {values[len(values) // 2] * 1000:8.2f}')
+    finally:
+        shutil.rmtree(workdir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+# backend/benchmarks/bench_stocktake.py
+"""Stocktake cost for a large count
+
+Builds a shop with N stocked items (default 5,000), then applies a count of
+every item through POST /api/inventory/stocktake with a given share of
+items off (default 20%), and again with the same counts (nothing to adjust).
+
+    python benchmarks/bench_stocktake.py [items] [changed-share]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, init_database  # noqa: E402
+from services import costing  # noqa: E402
+from utils import db  # noqa: E402
+
+SHOP_ID = 'bench-shop'
+
+
+def build_database(items):
+    rng = random.Random(42)
+    conn = db.get_db_connection()
+    with db.write_transaction(conn):
+        conn.execute("INSERT INTO shops (id, name) VALUES (?, 'Bench shop')", (SHOP_ID,))
+        conn.executemany('INSERT INTO products (id, name) VALUES (?, ?)',
+                         ((f'p{i}', f'Product {i}') for i in range(items)))
+        conn.executemany('''
+            INSERT INTO inventory (id, shop_id, product_id, current_stock, cost_price, selling_price)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', ((f'i{i}', SHOP_ID, f'p{i}', rng.randint(0, 100), 10.0, 12.5) for i in range(items)))
+    conn.close()
+    costing.backfill_cost_layers()
+
+
+def counts(items, changed):
+    rng = random.Random(7)
+    conn = db.get_read_connection()
+    try:
+        stock = dict(conn.execute('SELECT product_id, current_stock FROM inventory WHERE shop_id = ?',
+                                  (SHOP_ID,)).fetchall())
+    finally:
+        conn.close()
+    return [{'product_id': f'p{i}',
+             'quantity': max(0, stock[f'p{i}'] + rng.choice((-3, -1, 1, 2)))
+             if rng.random() < changed else stock[f'p{i}']}
+            for i in range(items)]
+
+
+def timed(label, client, body):
+    started = time.perf_counter()
+    response = client.post('/api/inventory/stocktake', json=body)
+    elapsed = (time.perf_counter() - started) * 1000
+    report = response.get_json()['report']
+    print(f'  {label:<28} {elapsed:9.1f} ms   {report["adjusted_items"]:>6} adjusted, '
+          f'net value {report["net_value"]:.2f}')
+
+
+def main():
+    items = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    changed = float(sys.argv[2]) if len(sys.argv) > 2 else 0.2
+    with tempfile.TemporaryDirectory() as workdir:
+        app = create_app({'DATABASE': os.path.join(workdir, 'bench.db')})
+        init_database()
+        build_database(items)
+        client = app.test_client()
+        body = {'shop_id': SHOP_ID, 'counts': counts(items, changed)}
+
+        print(f'{items} counted items, {changed:.0%} off')
+        timed('stocktake', client, body)
+        timed('same count again', client, body)
+        db.close_pools()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,10 +1,19 @@
 # backend/config/database_setup.py
+import os
+import sys
 import sqlite3
 import hashlib
 import secrets
-from datetime import datetime, timedelta
 import re
 
+# Also runnable as a script: python config/database_setup.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services import sessions  # noqa: E402
+from utils import queries  # noqa: E402
+from utils.db import add_column  # noqa: E402
+from utils.common_products import COMMON_PRODUCTS  # noqa: E402
+
 def create_tables():
     """Create all database tables"""
     conn = sqlite3.connect('shoptracker.db')
@@ -96,9 +105,24 @@ def create_tables():
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
             expires_at TIMESTAMP NOT NULL,
             is_active BOOLEAN DEFAULT 1,
+            last_used_at TIMESTAMP,
+            revoked_at TIMESTAMP,
             FOREIGN KEY (shop_id) REFERENCES shops (id)
         )
     ''')
+    add_column(conn, 'user_sessions', 'last_used_at', 'TIMESTAMP')
+    add_column(conn, 'user_sessions', 'revoked_at', 'TIMESTAMP')
+    
+    # Revocation and shop change log other processes load from, in commit order
+    # (services/sessions.py); session_id is NULL for a change to the shop itself
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS revocations (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            shop_id INTEGER NOT NULL,
+            session_id INTEGER,
+            revoked_at TIMESTAMP NOT NULL
+        )
+    ''')
     
     # Create password reset tokens table
     cursor.execute('''
@@ -141,11 +165,14 @@ def create_tables():
     # Create indexes for better performance
     cursor.execute('CREATE INDEX IF NOT EXISTS idx_shops_email ON shops(email)')
     cursor.execute('CREATE INDEX IF NOT EXISTS idx_shops_phone ON shops(phone)')
+    cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_products_barcode ON products(barcode)')
     cursor.execute('CREATE INDEX IF NOT EXISTS idx_inventory_shop ON inventory(shop_id)')
     cursor.execute('CREATE INDEX IF NOT EXISTS idx_transactions_shop ON transactions(shop_id)')
     cursor.execute('CREATE INDEX IF NOT EXISTS idx_transactions_date ON transactions(created_at)')
     cursor.execute('CREATE INDEX IF NOT EXISTS idx_sessions_shop ON user_sessions(shop_id)')
     cursor.execute('CREATE INDEX IF NOT EXISTS idx_sessions_token ON user_sessions(token_hash)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_sessions_revoked ON user_sessions(revoked_at) '
+                   'WHERE revoked_at IS NOT NULL')
     cursor.execute('CREATE INDEX IF NOT EXISTS idx_login_attempts_email ON login_attempts(email)')
     cursor.execute('CREATE INDEX IF NOT EXISTS idx_login_attempts_ip ON login_attempts(ip_address)')
     
@@ -156,80 +183,14 @@ def create_tables():
 def insert_sample_products():
     """Insert common products for Nepali shops"""
     conn = sqlite3.connect('shoptracker.db')
-    cursor = conn.cursor()
     
+    # Only barcoded products: INSERT OR IGNORE relies on the barcode index
     common_products = [
-        # Beverages
-        ('Coca Cola 250ml', 'Beverages', 'Coca Cola', '1234567890123', 'bottle', 'Soft drink', None, 1),
-        ('Pepsi 250ml', 'Beverages', 'Pepsi', '1234567890124', 'bottle', 'Soft drink', None, 1),
-        ('Sprite 250ml', 'Beverages', 'Sprite', '1234567890125', 'bottle', 'Soft drink', None, 1),
-        ('Fanta 250ml', 'Beverages', 'Fanta', '1234567890126', 'bottle', 'Soft drink', None, 1),
-        ('Real Juice 200ml', 'Beverages', 'Real', '1234567890127', 'tetra pack', 'Fruit juice', None, 1),
-        
-        # Noodles & Snacks
-        ('Wai Wai Noodles', 'Noodles', 'CG Foods', '1234567890128', 'packet', 'Instant noodles', None, 1),
-        ('Rara Noodles', 'Noodles', 'Chaudhary Group', '1234567890129', 'packet', 'Instant noodles', None, 1),
-        ('Mayos Noodles', 'Noodles', 'Himalayan Snax', '1234567890130', 'packet', 'Instant noodles', None, 1),
-        ('Kurkure', 'Snacks', 'PepsiCo', '1234567890131', 'packet', 'Corn snacks', None, 1),
-        ('Lays Chips', 'Snacks', 'PepsiCo', '1234567890132', 'packet', 'Potato chips', None, 1),
-        
-        # Dairy Products
-        ('DDC Milk 500ml', 'Dairy', 'DDC', '1234567890133', 'packet', 'Fresh milk', None, 1),
-        ('Dairy Development Corporation Curd', 'Dairy', 'DDC', '1234567890134', 'cup', 'Yogurt', None, 1),
-        
-        # Biscuits
-        ('Parle-G Biscuits', 'Biscuits', 'Parle', '1234567890135', 'packet', 'Glucose biscuits', None, 1),
-        ('Tiger Biscuits', 'Biscuits', 'Britannia', '1234567890136', 'packet', 'Cream biscuits', None, 1),
-        ('Monaco Biscuits', 'Biscuits', 'Parle', '1234567890137', 'packet', 'Salty biscuits', None, 1),
-        
-        # Personal Care
-        ('Lux Soap', 'Personal Care', 'Unilever', '1234567890138', 'bar', 'Beauty soap', None, 1),
-        ('Lifebuoy Soap', 'Personal Care', 'Unilever', '1234567890139', 'bar', 'Health soap', None, 1),
-        ('Fair & Lovely 50g', 'Personal Care', 'Unilever', '1234567890140', 'tube', 'Fairness cream', None, 1),
-        
-        # Household Items
-        ('Vim Bar', 'Household', 'Hindustan Unilever', '1234567890141', 'bar', 'Dishwash bar', None, 1),
-        ('Surf Excel 1kg', 'Household', 'Unilever', '1234567890142', 'packet', 'Detergent powder', None, 1),
-        
-        # Cigarettes & Tobacco
-        ('Surya Cigarettes', 'Tobacco', 'Surya Tobacco', '1234567890143', 'packet', 'Cigarettes', None, 1),
-        ('Khukuri Rum 180ml', 'Alcohol', 'Khukuri', '1234567890144', 'bottle', 'Local rum', None, 1),
-        
-        # Stationery
-        ('Pilot Pen', 'Stationery', 'Pilot', '1234567890145', 'piece', 'Ball pen', None, 1),
-        ('Copy Book', 'Stationery', 'Local', '1234567890146', 'piece', 'Exercise book', None, 1),
-        
-        # Mobile & Electronics
-        ('Mobile Recharge Card', 'Services', 'Telecom', '1234567890147', 'card', 'Phone recharge', None, 1),
-        
-        # Additional Nepali Products
-        ('Khukuri Beer 650ml', 'Alcohol', 'Gorkha Brewery', '1234567890148', 'bottle', 'Local beer', None, 1),
-        ('Gorkha Beer 650ml', 'Alcohol', 'Gorkha Brewery', '1234567890149', 'bottle', 'Local beer', None, 1),
-        ('Tuborg Beer 650ml', 'Alcohol', 'Carlsberg', '1234567890150', 'bottle', 'International beer', None, 1),
-        ('Goldstar Beer 650ml', 'Alcohol', 'Carlsberg', '1234567890151', 'bottle', 'Local beer', None, 1),
-        
-        # Rice & Grains
-        ('Basmati Rice 1kg', 'Grains', 'Various', '1234567890152', 'kg', 'Premium rice', None, 1),
-        ('Normal Rice 1kg', 'Grains', 'Local', '1234567890153', 'kg', 'Regular rice', None, 1),
-        ('Lentils (Masuro) 1kg', 'Grains', 'Local', '1234567890154', 'kg', 'Red lentils', None, 1),
-        
-        # Spices & Cooking
-        ('Turmeric Powder 100g', 'Spices', 'Local', '1234567890155', 'packet', 'Spice powder', None, 1),
-        ('Red Chili Powder 100g', 'Spices', 'Local', '1234567890156', 'packet', 'Spice powder', None, 1),
-        ('Garam Masala 50g', 'Spices', 'Everest', '1234567890157', 'packet', 'Spice mix', None, 1),
-        ('Cooking Oil 1L', 'Cooking', 'Various', '1234567890158', 'bottle', 'Refined oil', None, 1),
-        
-        # Tea & Coffee
-        ('Red Label Tea 250g', 'Beverages', 'Brooke Bond', '1234567890159', 'packet', 'Black tea', None, 1),
-        ('Nescafe Coffee 50g', 'Beverages', 'Nestle', '1234567890160', 'jar', 'Instant coffee', None, 1),
+        (p['name'], p['category'], p['brand'], p['barcode'], p['unit'],
+         p['description'], None, 1)
+        for p in COMMON_PRODUCTS if p['barcode']
     ]
-    
-    for product in common_products:
-        cursor.execute('''
-            INSERT OR IGNORE INTO products 
-            (name, category, brand, barcode, unit, description, image_url, is_common)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        ''', product)
+    queries.INSERT_SAMPLE_PRODUCT.executemany(conn, common_products)
     
     conn.commit()
     conn.close()
@@ -280,23 +241,18 @@ def create_shop_account(shop_name, owner_name, email, phone, password, address,
         return {"success": False, "error": "Password must be at least 6 characters long"}
     
     conn = sqlite3.connect('shoptracker.db')
-    cursor = conn.cursor()
     
     try:
         # Check if email or phone already exists
-        cursor.execute('SELECT id FROM shops WHERE email = ? OR phone = ?', (email, phone))
-        if cursor.fetchone():
+        if queries.SHOP_ID_BY_EMAIL_OR_PHONE.fetchone(conn, (email, phone)):
             return {"success": False, "error": "Email or phone number already registered"}
         
         # Hash password
         password_hash = hash_password(password)
         
         # Insert new shop
-        cursor.execute('''
-            INSERT INTO shops 
-            (shop_name, owner_name, email, phone, password_hash, address, city, district, latitude, longitude, shop_type)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (shop_name, owner_name, email, phone, password_hash, address, city, district, latitude, longitude, shop_type))
+        cursor = queries.CREATE_SHOP_ACCOUNT(conn, (shop_name, owner_name, email, phone, password_hash,
+                                                    address, city, district, latitude, longitude, shop_type))
         
         shop_id = cursor.lastrowid
         conn.commit()
@@ -313,21 +269,13 @@ def create_shop_account(shop_name, owner_name, email, phone, password, address,
 def authenticate_shop(email, password, ip_address=None, user_agent=None):
     """Authenticate shop login"""
     conn = sqlite3.connect('shoptracker.db')
-    cursor = conn.cursor()
     
     try:
         # Log login attempt
-        cursor.execute('''
-            INSERT INTO login_attempts (email, ip_address, success, user_agent)
-            VALUES (?, ?, ?, ?)
-        ''', (email, ip_address, False, user_agent))
+        queries.INSERT_LOGIN_ATTEMPT(conn, (email, ip_address, False, user_agent))
         
         # Get shop details
-        cursor.execute('''
-            SELECT id, password_hash, is_active FROM shops WHERE email = ?
-        ''', (email,))
-        
-        shop = cursor.fetchone()
+        shop = queries.LOGIN_STATE_BY_EMAIL.fetchone(conn, (email,))
         
         if not shop:
             conn.commit()
@@ -345,98 +293,50 @@ def authenticate_shop(email, password, ip_address=None, user_agent=None):
             return {"success": False, "error": "Invalid email or password"}
         
         # Update login attempt as successful
-        cursor.execute('''
-            UPDATE login_attempts 
-            SET success = 1 
-            WHERE email = ? AND ip_address = ? AND attempted_at = (
-                SELECT MAX(attempted_at) FROM login_attempts WHERE email = ?
-            )
-        ''', (email, ip_address, email))
+        queries.MARK_LOGIN_ATTEMPT_SUCCESS(conn, (email, ip_address, email))
         
         # Update last login
-        cursor.execute('''
-            UPDATE shops SET last_login_at = CURRENT_TIMESTAMP WHERE id = ?
-        ''', (shop_id,))
+        queries.TOUCH_LAST_LOGIN(conn, (shop_id,))
         
-        # Generate session token
-        session_token = generate_token()
-        token_hash = hashlib.sha256(session_token.encode()).hexdigest()
-        expires_at = datetime.now() + timedelta(days=30)  # 30 days session
-        
-        # Create session
-        cursor.execute('''
-            INSERT INTO user_sessions (shop_id, token_hash, ip_address, expires_at)
-            VALUES (?, ?, ?, ?)
-        ''', (shop_id, token_hash, ip_address, expires_at))
+        # Open a session: short-lived access token plus refresh token
+        tokens = sessions.open_session(conn, shop_id, email, ip_address, user_agent)
         
         conn.commit()
         
-        return {
-            "success": True, 
-            "shop_id": shop_id, 
-            "session_token": session_token,
-            "expires_at": expires_at.isoformat()
-        }
+        return {"success": True, "shop_id": shop_id, **tokens}
         
     except Exception as e:
         return {"success": False, "error": f"Authentication error: {str(e)}"}
     finally:
         conn.close()
 
-def verify_session(session_token):
-    """Verify session token"""
-    if not session_token:
-        return {"success": False, "error": "No session token provided"}
-    
-    token_hash = hashlib.sha256(session_token.encode()).hexdigest()
-    
-    conn = sqlite3.connect('shoptracker.db')
-    cursor = conn.cursor()
+def verify_session(access_token):
+    """Verify an access token (no database lookup)"""
+    if not access_token:
+        return {"success": False, "error": "No access token provided"}
     
     try:
-        cursor.execute('''
-            SELECT s.shop_id, sh.shop_name, sh.owner_name, sh.email 
-            FROM user_sessions s
-            JOIN shops sh ON s.shop_id = sh.id
-            WHERE s.token_hash = ? AND s.is_active = 1 AND s.expires_at > CURRENT_TIMESTAMP
-        ''', (token_hash,))
-        
-        session = cursor.fetchone()
-        
-        if not session:
-            return {"success": False, "error": "Invalid or expired session"}
-        
-        shop_id, shop_name, owner_name, email = session
+        payload = sessions.verify_access_token(access_token)
         
         return {
             "success": True,
-            "shop_id": shop_id,
-            "shop_name": shop_name,
-            "owner_name": owner_name,
-            "email": email
+            "shop_id": payload["shop_id"],
+            "email": payload["email"],
+            "session_id": payload["sid"]
         }
         
     except Exception as e:
-        return {"success": False, "error": f"Session verification error: {str(e)}"}
-    finally:
-        conn.close()
+        return {"success": False, "error": f"Invalid or expired session: {str(e)}"}
 
-def logout_session(session_token):
-    """Logout and deactivate session"""
-    if not session_token:
-        return {"success": False, "error": "No session token provided"}
-    
-    token_hash = hashlib.sha256(session_token.encode()).hexdigest()
+def logout_session(access_token):
+    """Logout and revoke the token's session"""
+    if not access_token:
+        return {"success": False, "error": "No access token provided"}
     
     conn = sqlite3.connect('shoptracker.db')
-    cursor = conn.cursor()
     
     try:
-        cursor.execute('''
-            UPDATE user_sessions SET is_active = 0 WHERE token_hash = ?
-        ''', (token_hash,))
-        
-        conn.commit()
+        sessions.revoke_session(conn, sessions.session_of(access_token))
         
         return {"success": True, "message": "Logged out successfully"}
         
@@ -448,23 +348,19 @@ def logout_session(session_token):
 def cleanup_expired_sessions():
     """Clean up expired sessions and tokens"""
     conn = sqlite3.connect('shoptracker.db')
-    cursor = conn.cursor()
     
     try:
         # Remove expired sessions
-        cursor.execute('DELETE FROM user_sessions WHERE expires_at < CURRENT_TIMESTAMP')
+        sessions.delete_expired_sessions(conn)
         
         # Remove expired password reset tokens
-        cursor.execute('DELETE FROM password_reset_tokens WHERE expires_at < CURRENT_TIMESTAMP')
+        queries.DELETE_EXPIRED_RESET_TOKENS(conn)
         
         # Remove expired email verification tokens
-        cursor.execute('DELETE FROM email_verification_tokens WHERE expires_at < CURRENT_TIMESTAMP')
+        queries.DELETE_EXPIRED_VERIFICATION_TOKENS(conn)
         
         # Remove old login attempts (keep only last 30 days)
-        cursor.execute('''
-            DELETE FROM login_attempts 
-            WHERE attempted_at < datetime('now', '-30 days')
-        ''')
+        queries.DELETE_OLD_LOGIN_ATTEMPTS(conn)
         
         conn.commit()
         print("Expired sessions and tokens cleaned up successfully!")
@@ -508,10 +404,10 @@ if __name__ == "__main__":
         
         # Test session verification
         if login_result.get("success"):
-            session_token = login_result.get("session_token")
-            verify_result = verify_session(session_token)
+            access_token = login_result.get("access_token")
+            verify_result = verify_session(access_token)
             print("Session verification:", verify_result)
             
             # Test logout
-            logout_result = logout_session(session_token)
+            logout_result = logout_session(access_token)
             print("Logout result:", logout_result)
\ No newline at end of file
@@ -0,0 +1,85 @@
+# backend/config/settings.py
+import os
+
+
+class Config:
+    """Base configuration, overridable through environment variables"""
+    SECRET_KEY = os.environ.get('SECRET_KEY', 'your-secret-key-change-in-production')
+    DATABASE = os.environ.get('SHOPTRACKER_DB', 'shoptracker.db')
+    READ_REPLICA = os.environ.get('SHOPTRACKER_READ_REPLICA') or None
+    REPLICA_REFRESH_INTERVAL = float(os.environ.get('SHOPTRACKER_REPLICA_REFRESH', '30'))
+
+    # Per-worker warmup
+    DB_POOL_SIZE = int(os.environ.get('SHOPTRACKER_DB_POOL_SIZE', '8'))
+    WARMUP_SHOP_LIMIT = 500  # recently active shops primed into the auth cache
+    ASGI_THREADS = int(os.environ.get('SHOPTRACKER_ASGI_THREADS', '32'))  # Flask views under asgi.py
+
+    # Transaction ledger: months kept in the hot table, archive location/interval
+    LEDGER_DIR = os.environ.get('SHOPTRACKER_LEDGER_DIR') or None  # None: <database dir>/ledger
+    LEDGER_HOT_MONTHS = int(os.environ.get('SHOPTRACKER_LEDGER_HOT_MONTHS', '2'))
+    LEDGER_ARCHIVE_INTERVAL = 6 * 3600
+    
+    # Columnar exports written by services/export.py and POST /api/admin/exports
+    EXPORT_DIR = os.environ.get('SHOPTRACKER_EXPORT_DIR') or None  # None: <database dir>/exports
+    
+    # Cost of goods sold: 'fifo' cost layers or 'average' (weighted average cost)
+    COSTING_METHOD = os.environ.get('SHOPTRACKER_COSTING_METHOD', 'fifo')
+    
+    # Login sessions (services/sessions.py): access/refresh token lifetimes in seconds
+    ACCESS_TOKEN_TTL = int(os.environ.get('SHOPTRACKER_ACCESS_TOKEN_TTL', '900'))
+    REFRESH_TOKEN_TTL = int(os.environ.get('SHOPTRACKER_REFRESH_TOKEN_TTL', str(30 * 24 * 3600)))
+    SESSION_PRUNE_INTERVAL = 3600
+    
+    # Memory-mapped catalog snapshot shared by the workers (services/catalog_snapshot.py)
+    CATALOG_SNAPSHOT = os.environ.get('SHOPTRACKER_CATALOG_SNAPSHOT') or None  # None: <database>.catalog
+    CATALOG_SNAPSHOT_INTERVAL = 60  # seconds between checks for products changed elsewhere
+    
+    # Online backups and WAL archiving for point-in-time restore (services/backup.py)
+    BACKUP_DIR = os.environ.get('SHOPTRACKER_BACKUP_DIR') or None  # None: <database dir>/backups
+    BACKUP_INTERVAL = float(os.environ.get('SHOPTRACKER_BACKUP_INTERVAL', str(24 * 3600))) or None  # base backups
+    BACKUP_KEEP = 7  # base backups kept
+    WAL_ARCHIVE_INTERVAL = float(os.environ.get('SHOPTRACKER_WAL_ARCHIVE_INTERVAL') or 0) or None  # None: no PITR
+    
+    # SSE stock events (services/events.py): delay before a change made in
+    # another worker reaches this worker's streams, and stock_events pruning
+    EVENT_POLL_INTERVAL = 0.2
+    EVENT_PRUNE_INTERVAL = 300
+    
+    # Shared secret for /api/admin (X-Admin-Token header); unset disables it
+    ADMIN_TOKEN = os.environ.get('SHOPTRACKER_ADMIN_TOKEN') or None
+    
+    # Share one query between identical concurrent inventory/stats reads (utils/singleflight.py)
+    SINGLE_FLIGHT = os.environ.get('SHOPTRACKER_SINGLE_FLIGHT', '1') != '0'
+    
+    # Per-shop token buckets by subscription tier (utils/rate_limit.py):
+    # {tier: {scope: (tokens per second, burst)}}; None disables throttling
+    RATE_LIMITS = None if os.environ.get('SHOPTRACKER_RATE_LIMITS') == '0' else {
+        'free': {'write': (1.0, 30), 'read': (2.0, 60)},
+        'basic': {'write': (5.0, 100), 'read': (10.0, 200)},
+        'premium': {'write': (20.0, 400), 'read': (40.0, 800)},
+    }
+    RATE_LIMIT_STORE = os.environ.get('SHOPTRACKER_RATE_LIMIT_STORE') or None  # None: per process; redis://...
+    TIER_REFRESH_INTERVAL = 60  # seconds before a shop's tier change applies
+    
+    # On-demand sampling profiles (POST /api/admin/profile, utils/profiler.py)
+    PROFILE_MAX_SECONDS = 60
+    PROFILE_MAX_OVERHEAD = 0.01  # fraction of wall time the sampler may hold the GIL
+    
+    # Response compression (None disables it)
+    COMPRESS_MIN_SIZE = 1024
+
+    DEBUG = False
+
+
+class DevelopmentConfig(Config):
+    DEBUG = True
+
+
+class ProductionConfig(Config):
+    pass
+
+
+config_by_name = {
+    'development': DevelopmentConfig,
+    'production': ProductionConfig,
+}
@@ -0,0 +1,49 @@
+# backend/gunicorn.conf.py
+"""Gunicorn settings for the ShopTracker API (eventlet workers)"""
+import multiprocessing
+import os
+import time
+
+bind = os.environ.get('SHOPTRACKER_BIND', '0.0.0.0:5000')
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+worker_class = 'eventlet'
+worker_connections = 1000
+timeout = 30
+keepalive = 5
+# Each worker imports the app itself; the master only prepares the database
+# and starts the background jobs process, and runs no threads of its own
+preload_app = False
+
+_jobs = None
+
+
+def on_starting(server):
+    """Schema checks and seeding, once, in the master before any fork"""
+    from app import create_app, prepare_database
+    app = create_app(os.environ.get('SHOPTRACKER_CONFIG', 'production'))
+    demo_shop_id = prepare_database()
+    server.log.info(f'Database ready ({app.config["DATABASE"]}), demo shop {demo_shop_id}')
+
+
+def when_ready(server):
+    """Background jobs that run once per deployment, in a process of their own (jobs.py)"""
+    global _jobs
+    import jobs
+    _jobs = jobs.spawn()
+    server.log.info(f'Background jobs process started (pid {_jobs.pid})')
+
+
+def on_exit(server):
+    """Stop the background jobs process with the master"""
+    import jobs
+    if _jobs is not None:
+        jobs.stop(_jobs)
+
+
+def post_worker_init(worker):
+    """Per-worker warmup once the app is loaded"""
+    from app import warmup_worker
+    start = time.perf_counter()
+    primed = warmup_worker(worker.wsgi)
+    worker.log.info(f'Worker {worker.pid} warm in {(time.perf_counter() - start) * 1000:.1f} ms '
+                    f'({primed["products"]} products mapped, {primed["shops"]} shops cached)')
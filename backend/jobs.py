@@ -0,0 +1,65 @@
+# backend/jobs.py
+"""Background jobs process for a deployment
+
+    python jobs.py
+
+Runs the jobs that must run once per deployment rather than once per
+worker: the read replica refresher, the ledger archiver, the session
+pruner, the catalog snapshot refresher and the base backup / WAL archiver
+(app.start_background_jobs). gunicorn.conf.py and asgi.py start it as a
+child process once the schema is prepared, instead of running these
+threads in the server's master: the master forks workers at startup and on
+every respawn, and a fork copies any lock another thread holds at that
+moment into a child where no thread will ever release it.
+
+The process stops its jobs on SIGTERM/SIGINT, and exits by itself once the
+process that started it is gone.
+"""
+import os
+import signal
+import subprocess
+import sys
+import threading
+
+PARENT_CHECK_INTERVAL = 1.0  # seconds between checks that the parent is alive
+STOP_TIMEOUT = 30.0  # seconds a job's current run may take to finish on shutdown
+
+
+def spawn():
+    """Start the jobs process as a child of this process; returns its Popen"""
+    return subprocess.Popen([sys.executable, os.path.abspath(__file__)])
+
+
+def stop(process, timeout=STOP_TIMEOUT):
+    """Ask a spawned jobs process to finish its current runs and exit"""
+    if process.poll() is not None:
+        return
+    process.terminate()
+    try:
+        process.wait(timeout + 5)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+def main():
+    from app import create_app, start_background_jobs
+
+    parent = os.getppid()
+    stopping = threading.Event()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, lambda *args: stopping.set())
+
+    app = create_app(os.environ.get('SHOPTRACKER_CONFIG', 'production'))
+    tasks = start_background_jobs(app)
+    print(f'Background jobs running in pid {os.getpid()}: '
+          f'{", ".join(task.name for task in tasks)}', flush=True)
+
+    while not stopping.wait(PARENT_CHECK_INTERVAL):
+        if os.getppid() != parent:
+            break
+    for task in tasks:
+        task.stop(STOP_TIMEOUT)
+
+
+if __name__ == '__main__':
+    main()
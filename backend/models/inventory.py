@@ -1,18 +1,24 @@
-from dataclasses import dataclass
 from typing import Optional
 from datetime import datetime
+from models.record import Record
 
-@dataclass
-class Inventory:
-    id: Optional[str] = None
-    shop_id: str = ""
-    product_id: str = ""
-    current_stock: int = 0
-    selling_price: float = 0.0
-    cost_price: float = 0.0
-    reorder_level: int = 5  # Low stock alert threshold
-    last_updated: Optional[datetime] = None
-    is_active: bool = True
+class Inventory(Record):
+    __slots__ = ('id', 'shop_id', 'product_id', 'current_stock', 'selling_price',
+                 'cost_price', 'reorder_level', 'last_updated', 'is_active')
+
+    def __init__(self, id: Optional[str] = None, shop_id: str = "", product_id: str = "",
+                 current_stock: int = 0, selling_price: float = 0.0, cost_price: float = 0.0,
+                 reorder_level: int = 5,  # Low stock alert threshold
+                 last_updated: Optional[datetime] = None, is_active: bool = True):
+        self.id = id
+        self.shop_id = shop_id
+        self.product_id = product_id
+        self.current_stock = current_stock
+        self.selling_price = selling_price
+        self.cost_price = cost_price
+        self.reorder_level = reorder_level
+        self.last_updated = last_updated
+        self.is_active = bool(is_active)
 
     def to_dict(self):
         return {
@@ -23,7 +29,7 @@ class Inventory:
             'selling_price': self.selling_price,
             'cost_price': self.cost_price,
             'reorder_level': self.reorder_level,
-            'last_updated': self.last_updated.isoformat() if self.last_updated else None,
+            'last_updated': self.last_updated,
             'is_active': self.is_active
         }
 
@@ -43,3 +49,27 @@ class Inventory:
             inventory.last_updated = datetime.fromisoformat(data['last_updated'])
         
         return inventory
+
+
+class InventoryItem(Record):
+    """Inventory row joined with its product, as listed by get_inventory"""
+    __slots__ = ('id', 'product_id', 'product_name', 'category', 'brand', 'unit',
+                 'current_stock', 'selling_price', 'cost_price', 'reorder_level',
+                 'low_stock', 'last_updated', 'image_url')
+
+    def __init__(self, id=None, product_id="", product_name="", category="", brand="",
+                 unit="piece", current_stock=0, selling_price=0.0, cost_price=0.0,
+                 reorder_level=5, low_stock=False, last_updated=None, image_url=None):
+        self.id = id
+        self.product_id = product_id
+        self.product_name = product_name
+        self.category = category
+        self.brand = brand
+        self.unit = unit
+        self.current_stock = current_stock
+        self.selling_price = selling_price
+        self.cost_price = cost_price
+        self.reorder_level = reorder_level
+        self.low_stock = bool(low_stock)
+        self.last_updated = last_updated
+        self.image_url = image_url
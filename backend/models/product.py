@@ -1,19 +1,27 @@
-from dataclasses import dataclass
 from typing import Optional
 from datetime import datetime
+from models.record import Record
 
-@dataclass
-class Product:
-    id: Optional[str] = None
-    name: str = ""
-    category: str = ""
-    brand: str = ""
-    unit: str = "piece"  # piece, kg, liter, packet
-    barcode: Optional[str] = None
-    default_price: float = 0.0
-    image_url: Optional[str] = None
-    is_common: bool = False  # Pre-loaded common products
-    created_date: Optional[datetime] = None
+class Product(Record):
+    __slots__ = ('id', 'name', 'category', 'brand', 'unit', 'barcode',
+                 'default_price', 'image_url', 'is_common', 'created_date')
+
+    def __init__(self, id: Optional[str] = None, name: str = "", category: str = "",
+                 brand: str = "", unit: str = "piece",  # piece, kg, liter, packet
+                 barcode: Optional[str] = None, default_price: float = 0.0,
+                 image_url: Optional[str] = None,
+                 is_common: bool = False,  # Pre-loaded common products
+                 created_date: Optional[datetime] = None):
+        self.id = id
+        self.name = name
+        self.category = category
+        self.brand = brand
+        self.unit = unit
+        self.barcode = barcode
+        self.default_price = default_price
+        self.image_url = image_url
+        self.is_common = bool(is_common)
+        self.created_date = created_date
 
     def to_dict(self):
         return {
@@ -26,7 +34,7 @@ class Product:
             'default_price': self.default_price,
             'image_url': self.image_url,
             'is_common': self.is_common,
-            'created_date': self.created_date.isoformat() if self.created_date else None
+            'created_date': self.created_date
         }
 
     @classmethod
@@ -0,0 +1,90 @@
+# backend/models/record.py
+from datetime import date, datetime
+from decimal import Decimal
+from operator import attrgetter
+import json
+
+
+def _encode_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+
+
+# Column values are encoded with a NUL item separator. NUL inside a string is
+# always escaped as \u0000, so a raw NUL can only ever be a separator.
+_row_encoder = json.JSONEncoder(separators=('\x00', ':'), default=_encode_default)
+
+
+class Record:
+    """Base for compact row models
+
+    Subclasses declare their columns in `__slots__` (in table order) so a
+    record is built straight from a cursor tuple with `from_row` and carries
+    no per-instance `__dict__`. `JSON_FIELDS` picks which columns go into API
+    responses.
+    """
+    __slots__ = ()
+    JSON_FIELDS = None
+
+    @classmethod
+    def columns(cls):
+        """Comma separated column list for SELECTs that feed `from_row`"""
+        return ', '.join(cls.__slots__)
+
+    @classmethod
+    def from_row(cls, row):
+        return cls(*row)
+
+    @classmethod
+    def from_rows(cls, rows):
+        return [cls(*row) for row in rows]
+
+    @classmethod
+    def fetch_all(cls, conn, sql, params=()):
+        """Run a query and build records from plain tuples (no sqlite3.Row)"""
+        cursor = conn.cursor()
+        cursor.row_factory = None
+        return [cls(*row) for row in cursor.execute(sql, params)]
+
+    @classmethod
+    def _json_template(cls):
+        template = cls.__dict__.get('_template')
+        if template is None:
+            fields = tuple(cls.JSON_FIELDS or cls.__slots__)
+            body = ','.join(f'{json.dumps(field)}:%s' for field in fields)
+            getter = attrgetter(*fields)
+            if len(fields) == 1:
+                getter = lambda record, _get=getter: (_get(record),)  # noqa: E731
+            template = ('{' + body + '}', getter)
+            cls._template = template
+        return template
+
+    def to_json(self):
+        """Serialize this record without building an intermediate dict"""
+        return self.dumps_many([self])[1:-1]
+
+    @classmethod
+    def dumps_many(cls, records):
+        """Serialize a list of records to a JSON array in one pass
+
+        All column values are encoded by a single call into the C JSON
+        encoder, then spliced into the object template with one `%`.
+        """
+        if not records:
+            return '[]'
+        template, getter = cls._json_template()
+        encoded = _row_encoder.encode(list(map(getter, records)))
+        values = encoded[2:-2].replace(']\x00[', '\x00').split('\x00')
+        return '[' + ','.join([template] * len(records)) % tuple(values) + ']'
+
+    def __eq__(self, other):
+        if type(other) is not type(self):
+            return NotImplemented
+        return all(getattr(self, field) == getattr(other, field) for field in self.__slots__)
+
+    def __repr__(self):
+        values = ', '.join(f'{field}={getattr(self, field)!r}' for field in self.__slots__)
+        return f'{type(self).__name__}({values})'
@@ -1,19 +1,28 @@
-from dataclasses import dataclass
 from datetime import datetime
 from typing import Optional
+from models.record import Record
 
-@dataclass
-class Shop:
-    id: Optional[str] = None
-    name: str = ""
-    owner_name: str = ""
-    phone: str = ""
-    address: str = ""
-    city: str = ""
-    district: str = ""
-    registration_date: Optional[datetime] = None
-    is_active: bool = True
-    subscription_tier: str = "free"  # free, basic, premium
+class Shop(Record):
+    __slots__ = ('id', 'name', 'owner_name', 'phone', 'address', 'city', 'district',
+                 'registration_date', 'is_active', 'subscription_tier', 'latitude', 'longitude')
+
+    def __init__(self, id: Optional[str] = None, name: str = "", owner_name: str = "",
+                 phone: str = "", address: str = "", city: str = "", district: str = "",
+                 registration_date: Optional[datetime] = None, is_active: bool = True,
+                 subscription_tier: str = "free",  # free, basic, premium
+                 latitude: Optional[float] = None, longitude: Optional[float] = None):
+        self.id = id
+        self.name = name
+        self.owner_name = owner_name
+        self.phone = phone
+        self.address = address
+        self.city = city
+        self.district = district
+        self.registration_date = registration_date
+        self.is_active = bool(is_active)
+        self.subscription_tier = subscription_tier
+        self.latitude = latitude
+        self.longitude = longitude
 
     def to_dict(self):
         return {
@@ -24,9 +33,11 @@ class Shop:
             'address': self.address,
             'city': self.city,
             'district': self.district,
-            'registration_date': self.registration_date.isoformat() if self.registration_date else None,
+            'registration_date': self.registration_date,
             'is_active': self.is_active,
-            'subscription_tier': self.subscription_tier
+            'subscription_tier': self.subscription_tier,
+            'latitude': self.latitude,
+            'longitude': self.longitude
         }
 
     @classmethod
@@ -41,6 +52,8 @@ class Shop:
         shop.district = data.get('district', '')
         shop.is_active = data.get('is_active', True)
         shop.subscription_tier = data.get('subscription_tier', 'free')
+        shop.latitude = data.get('latitude')
+        shop.longitude = data.get('longitude')
         
         if data.get('registration_date'):
             shop.registration_date = datetime.fromisoformat(data['registration_date'])
@@ -1,20 +1,27 @@
 
-from dataclasses import dataclass
 from typing import Optional
 from datetime import datetime
+from models.record import Record
 
-@dataclass
-class Transaction:
-    id: Optional[str] = None
-    shop_id: str = ""
-    product_id: str = ""
-    transaction_type: str = ""  # sale, restock, adjustment
-    quantity: int = 0
-    price_per_unit: float = 0.0
-    total_amount: float = 0.0
-    notes: Optional[str] = None
-    transaction_date: Optional[datetime] = None
-    created_by: str = "system"
+class Transaction(Record):
+    __slots__ = ('id', 'shop_id', 'product_id', 'transaction_type', 'quantity',
+                 'price_per_unit', 'total_amount', 'notes', 'transaction_date', 'created_by')
+
+    def __init__(self, id: Optional[str] = None, shop_id: str = "", product_id: str = "",
+                 transaction_type: str = "",  # sale, restock, adjustment
+                 quantity: int = 0, price_per_unit: float = 0.0, total_amount: float = 0.0,
+                 notes: Optional[str] = None, transaction_date: Optional[datetime] = None,
+                 created_by: str = "system"):
+        self.id = id
+        self.shop_id = shop_id
+        self.product_id = product_id
+        self.transaction_type = transaction_type
+        self.quantity = quantity
+        self.price_per_unit = price_per_unit
+        self.total_amount = total_amount
+        self.notes = notes
+        self.transaction_date = transaction_date
+        self.created_by = created_by
 
     def to_dict(self):
         return {
@@ -26,7 +33,7 @@ class Transaction:
             'price_per_unit': self.price_per_unit,
             'total_amount': self.total_amount,
             'notes': self.notes,
-            'transaction_date': self.transaction_date.isoformat() if self.transaction_date else None,
+            'transaction_date': self.transaction_date,
             'created_by': self.created_by
         }
 
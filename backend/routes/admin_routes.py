@@ -0,0 +1,282 @@
+# backend/routes/admin_routes.py
+import os
+from flask import Blueprint, Response, current_app, request, jsonify, send_from_directory
+from services.auth_service import AuthService, admin_required, shop_cache
+from services.backup import archive_summary
+from services.catalog_snapshot import snapshot_stats
+from services.events import feed
+from services.catalog_ingest import (CHUNK_SIZE, CatalogError, catalog_entries,
+                                     catalog_format, ingest_catalog, parse_catalog)
+from services.export import PARTITION_KEYS, ExportError, export_dir, export_ledger
+from services.low_stock import low_stock_demand, low_stock_items
+from services.overview import fleet_overview, overview_cache
+from utils import db, profiler, queries
+from utils.rate_limit import limiter
+from utils.singleflight import read_flights
+
+MAX_TOP_PRODUCTS = 100
+MAX_LOW_STOCK_ITEMS = 1000  # per /low-stock page
+
+# Create blueprint (registered under /api/admin)
+admin_bp = Blueprint('admin', __name__)
+
+@admin_bp.route('/catalog', methods=['POST'])
+@admin_required
+def upsert_catalog():
+    """Bulk upsert products from a JSON body or an uploaded JSON/CSV file"""
+    try:
+        upload = request.files.get('file')
+
+        if upload is not None:
+            fmt = request.form.get('format') or catalog_format(upload.filename)
+            entries = parse_catalog(upload.read(), fmt)
+        else:
+            data = request.get_json(silent=True)
+            if data is None:
+                return jsonify({'success': False, 'error': 'No catalog provided'}), 400
+            entries = catalog_entries(data)
+
+        chunk_size = request.args.get('chunk_size', CHUNK_SIZE, type=int)
+        if chunk_size <= 0:
+            return jsonify({'success': False, 'error': 'chunk_size must be positive'}), 400
+
+        result = ingest_catalog(entries, chunk_size)
+
+        return jsonify({
+            'success': True,
+            'result': result
+        })
+
+    except CatalogError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@admin_bp.route('/overview', methods=['GET'])
+@admin_required
+def overview():
+    """Fleet-wide sales, low stock and top products, grouped by district or city"""
+    try:
+        top = request.args.get('top', 10, type=int)
+        if not 0 < top <= MAX_TOP_PRODUCTS:
+            return jsonify({'success': False, 'error': f'top must be between 1 and {MAX_TOP_PRODUCTS}'}), 400
+
+        result = fleet_overview(
+            district=request.args.get('district') or None,
+            city=request.args.get('city') or None,
+            tier=request.args.get('subscription_tier') or None,
+            group_by=request.args.get('group_by', 'district'),
+            start=request.args.get('from') or None,
+            end=request.args.get('to') or None,
+            top=top,
+            max_staleness=request.args.get('max_staleness', type=float)
+        )
+
+        return jsonify({
+            'success': True,
+            'overview': result
+        })
+
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@admin_bp.route('/metrics', methods=['GET'])
+@admin_required
+def metrics():
+    """Per-worker counters: coalesced reads, throttling, caches, pools and SQL statement timings"""
+    async_db = current_app.extensions.get('async_db')
+    result = {
+        'pid': os.getpid(),
+        'singleflight': read_flights.stats(),
+        'rate_limit': limiter.stats(),
+        'catalog_snapshot': snapshot_stats(),
+        'caches': {
+            'shops': shop_cache.stats(),
+            'overview': overview_cache.stats()
+        },
+        'pools': {
+            'write': db.write_pool.stats(),
+            'read': db.read_pool.stats(),
+            'connections': db.connection_stats()
+        },
+        'async_db': async_db.stats() if async_db is not None else None,
+        'events': feed.stats(),
+        'profiler': profiler.profiler_stats(),
+        'statements': queries.all_stats()
+    }
+
+    if request.args.get('reset') == 'true':
+        read_flights.reset()
+        limiter.reset()
+        queries.reset_stats()
+
+    return jsonify({
+        'success': True,
+        'metrics': result
+    })
+
+def low_stock_filters():
+    """Brand, category and shop filters shared by the low-stock routes"""
+    return {
+        'brand': request.args.get('brand') or None,
+        'category': request.args.get('category') or None,
+        'district': request.args.get('district') or None,
+        'city': request.args.get('city') or None,
+        'tier': request.args.get('subscription_tier') or None,
+        'max_staleness': request.args.get('max_staleness', type=float)
+    }
+
+@admin_bp.route('/low-stock', methods=['GET'])
+@admin_required
+def low_stock():
+    """Low items across shops, e.g. every shop a distributor should restock"""
+    try:
+        limit = request.args.get('limit', 100, type=int)
+        if not 0 < limit <= MAX_LOW_STOCK_ITEMS:
+            return jsonify({'success': False, 'error': f'limit must be between 1 and {MAX_LOW_STOCK_ITEMS}'}), 400
+
+        after_shop = request.args.get('after_shop')
+        after = (after_shop, request.args.get('after_product', '')) if after_shop else None
+
+        result = low_stock_items(
+            product_id=request.args.get('product_id') or None,
+            after=after,
+            limit=limit,
+            **low_stock_filters()
+        )
+
+        return jsonify({
+            'success': True,
+            'low_stock': result['items'],
+            'count': len(result['items']),
+            'next': result['next']
+        })
+
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@admin_bp.route('/low-stock/products', methods=['GET'])
+@admin_required
+def low_stock_products():
+    """Products ranked by how many shops are low on them, with the total shortfall"""
+    try:
+        top = request.args.get('top', 20, type=int)
+        if not 0 < top <= MAX_TOP_PRODUCTS:
+            return jsonify({'success': False, 'error': f'top must be between 1 and {MAX_TOP_PRODUCTS}'}), 400
+
+        products = low_stock_demand(limit=top, **low_stock_filters())
+
+        return jsonify({
+            'success': True,
+            'products': products
+        })
+
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@admin_bp.route('/shops/<shop_id>/deactivate', methods=['POST'])
+@admin_required
+def deactivate_shop(shop_id):
+    """Deactivate a shop account; its tokens stop working in every worker"""
+    try:
+        result = AuthService().deactivate_shop(shop_id)
+        return jsonify(result), 200 if result['success'] else 404
+
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@admin_bp.route('/backups', methods=['GET'])
+@admin_required
+def backups():
+    """Base backups (with their throughput reports) and how far the WAL archive reaches"""
+    try:
+        return jsonify({
+            'success': True,
+            'backups': archive_summary()
+        })
+
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@admin_bp.route('/profile', methods=['POST'])
+@admin_required
+def profile_worker():
+    """Sample the worker serving this request for ?seconds= and return collapsed stacks
+
+    ?format=json returns the sample counts by route, auth call and SQL
+    statement instead. Profiles cover one worker: the pid is in X-Profile-Pid.
+    """
+    try:
+        seconds = request.args.get('seconds', 10, type=float)
+        if not 0 < seconds <= profiler.MAX_SECONDS:
+            return jsonify({'success': False, 'error': f'seconds must be between 0 and {profiler.MAX_SECONDS:g}'}), 400
+        interval_ms = request.args.get('interval_ms', profiler.DEFAULT_INTERVAL * 1000, type=float)
+        if not profiler.MIN_INTERVAL * 1000 <= interval_ms <= 1000:
+            return jsonify({'success': False, 'error': f'interval_ms must be between {profiler.MIN_INTERVAL * 1000:g} and 1000'}), 400
+        fmt = request.args.get('format', 'collapsed')
+        if fmt not in ('collapsed', 'json'):
+            return jsonify({'success': False, 'error': 'format must be collapsed or json'}), 400
+
+        run = profiler.profile(seconds, interval_ms / 1000,
+                               thread_names=request.args.get('threads') == 'true')
+        pid = os.getpid()
+
+        if fmt == 'json':
+            return jsonify({
+                'success': True,
+                'pid': pid,
+                'profile': run.summary()
+            })
+
+        response = Response(run.collapsed(), mimetype='text/plain')
+        response.headers['Content-Disposition'] = f'attachment; filename=profile-{pid}-{int(run.started_at)}.folded'
+        response.headers['X-Profile-Pid'] = str(pid)
+        response.headers['X-Profile-Samples'] = str(run.samples)
+        response.headers['X-Profile-Overhead'] = f'{run.overhead:.5f}'
+        return response
+
+    except profiler.ProfilerBusy as e:
+        return jsonify({'success': False, 'error': str(e)}), 409
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@admin_bp.route('/exports', methods=['POST'])
+@admin_required
+def run_export():
+    """Export new ledger rows since the export's watermark to partitioned files"""
+    try:
+        data = request.get_json(silent=True) or {}
+
+        partition_by = data.get('partition_by', list(PARTITION_KEYS))
+        if isinstance(partition_by, str):
+            partition_by = [key for key in partition_by.split(',') if key]
+
+        result = export_ledger(
+            name=data.get('name', 'default'),
+            fmt=data.get('format', 'auto'),
+            partition_by=partition_by,
+            full=bool(data.get('full', False))
+        )
+        del result['directory']  # server path; files are fetched through the route below
+
+        return jsonify({
+            'success': True,
+            'export': result
+        })
+
+    except ExportError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@admin_bp.route('/exports/<name>/<path:filename>', methods=['GET'])
+@admin_required
+def download_export(name, filename):
+    """Download one file of a named export"""
+    try:
+        directory = export_dir(name)
+    except ExportError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    return send_from_directory(directory, filename)
@@ -7,6 +7,15 @@ auth_bp = Blueprint('auth', __name__)
 # Initialize auth service
 auth_service = AuthService()
 
+def token_fields(tokens):
+    """Session tokens as returned to the client; `token` is the access token"""
+    return {
+        'token': tokens['access_token'],
+        'expires_in': tokens['expires_in'],
+        'refresh_token': tokens['refresh_token'],
+        'refresh_expires_at': tokens['refresh_expires_at']
+    }
+
 @auth_bp.route('/register', methods=['POST'])
 def register():
     """Register a new shop"""
@@ -17,13 +26,13 @@ def register():
             return jsonify({'message': 'No data provided'}), 400
         
         # Register shop
-        result = auth_service.register_shop(data)
+        result = auth_service.register_shop(data, request.remote_addr, request.user_agent.string)
         
         if result['success']:
             return jsonify({
                 'message': result['message'],
                 'shop_id': result['shop_id'],
-                'token': result['token'],
+                **token_fields(result['tokens']),
                 'shop': result['shop_data']
             }), 201
         else:
@@ -45,12 +54,13 @@ def login():
         password = data.get('password')
         
         # Authenticate shop
-        result = auth_service.login_shop(email, password)
+        result = auth_service.login_shop(email, password, request.remote_addr,
+                                         request.user_agent.string)
         
         if result['success']:
             return jsonify({
                 'message': result['message'],
-                'token': result['token'],
+                **token_fields(result['tokens']),
                 'shop': result['shop_data']
             }), 200
         else:
@@ -125,8 +135,9 @@ def change_password():
         
         shop_id = request.current_shop['id']
         
-        # Change password
-        result = auth_service.change_password(shop_id, current_password, new_password)
+        # Change password (other sessions are logged out)
+        result = auth_service.change_password(shop_id, current_password, new_password,
+                                              keep_session=request.current_session)
         
         if result['success']:
             return jsonify({'message': result['message']}), 200
@@ -175,31 +186,38 @@ def verify_token():
 @auth_bp.route('/logout', methods=['POST'])
 @token_required
 def logout():
-    """Logout (client-side token removal)"""
+    """Logout: revoke this session, or all of the shop's with {"all": true}"""
     try:
-        # In JWT, logout is typically handled client-side by removing the token
-        # For additional security, you could maintain a blacklist of tokens
+        data = request.get_json(silent=True) or {}
+        
+        revoked = auth_service.logout(request.current_session, everywhere=bool(data.get('all')),
+                                      shop_id=request.current_shop['id'])
         
         return jsonify({
-            'message': 'Logged out successfully. Please remove the token from client storage.'
+            'message': 'Logged out successfully',
+            'sessions_revoked': revoked
         }), 200
         
     except Exception as e:
         return jsonify({'message': f'Logout error: {str(e)}'}), 500
 
 @auth_bp.route('/refresh-token', methods=['POST'])
-@token_required
 def refresh_token():
-    """Refresh JWT token"""
+    """Exchange a refresh token for a new access token (the refresh token rotates)"""
     try:
-        shop = request.current_shop
+        data = request.get_json(silent=True)
         
-        # Generate new token
-        new_token = auth_service.generate_token(shop['id'], shop['email'])
+        if not data or not data.get('refresh_token'):
+            return jsonify({'message': 'refresh_token is required'}), 400
+        
+        result = auth_service.refresh_session(data['refresh_token'])
+        
+        if not result['success']:
+            return jsonify({'message': result['message']}), 401
         
         return jsonify({
             'message': 'Token refreshed successfully',
-            'token': new_token
+            **token_fields(result['tokens'])
         }), 200
         
     except Exception as e:
@@ -0,0 +1,189 @@
+# backend/services/auditor.py
+"""Inventory vs ledger consistency audit
+
+For every (shop, product) the ledger balance -- restocks and adjustments
+minus sales, over the hot `transactions` table and every sealed archive --
+should equal `inventory.current_stock`. The audit splits the shop id space
+into ranges and checks them on a process pool. Each range runs inside one
+read snapshot: hot balances are summed into a temporary table with a single
+INSERT ... SELECT, the archived balances of the partitions visible in that
+snapshot are added, and one query returns the items that disagree. Memory
+per worker is bounded by the size of a range, not of the database.
+
+With --fix, each mismatch gets an 'adjustment' transaction that brings the
+ledger in line with the stock on the shelf (the ledger stays insert-only
+and inventory is not touched). Items whose stock or hot ledger changed
+since they were audited are skipped.
+
+    python -m services.auditor [--workers N] [--shops-per-task 500] [--fix]
+                               [--report mismatches.csv] [--database PATH]
+"""
+import argparse
+import csv
+import os
+import sqlite3
+import uuid
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from urllib.request import pathname2url
+
+from services import ledger
+from utils import db, queries
+from utils.db import get_db_connection, get_read_connection, write_transaction
+
+SHOPS_PER_TASK = 500
+MAX_SAMPLE = 100  # mismatches kept in the returned report
+FIX_BATCH = 500  # corrections per write transaction
+CORRECTION_NOTE = 'audit correction'
+KEY_MAX = '\U0010ffff'  # sorts after every shop id
+
+REPORT_FIELDS = ('shop_id', 'product_id', 'expected', 'actual', 'difference')
+
+
+def shop_ranges(shops_per_task=SHOPS_PER_TASK):
+    """Half-open shop id ranges covering every possible id, `shops_per_task` shops each"""
+    bounds = ['']
+    conn = get_read_connection()
+    try:
+        for index, row in enumerate(queries.AUDIT_SHOP_IDS(conn)):
+            if index and index % shops_per_task == 0:
+                bounds.append(row['id'])
+    finally:
+        conn.close()
+    bounds.append(KEY_MAX)
+    return list(zip(bounds, bounds[1:]))
+
+
+def _init_worker(database, ledger_dir):
+    db.DATABASE = database
+    ledger.configure(ledger_dir)
+
+
+def audit_range(lo, hi):
+    """Items of shops in [lo, hi) whose stock differs from the ledger
+
+    Returns (items in the ledger, [(shop_id, product_id, expected, actual,
+    hot_quantity), ...]).
+    """
+    conn = sqlite3.connect(f'file:{pathname2url(os.path.abspath(db.DATABASE))}?mode=ro',
+                           uri=True, cached_statements=queries.STATEMENT_CACHE_SIZE)
+    conn.row_factory = sqlite3.Row
+    try:
+        # Created outside the snapshot: rolling it back would drop the table
+        queries.CREATE_AUDIT_BALANCES(conn)
+        conn.execute('BEGIN')
+        try:
+            partitions = queries.LEDGER_PARTITIONS_BETWEEN.fetchall(conn, ('0000-00', '9999-99'))
+            queries.AUDIT_HOT_BALANCES(conn, (lo, hi))
+            for partition in partitions:
+                archive = ledger.open_partition(partition['path'])
+                try:
+                    cursor = queries.AUDIT_ARCHIVED_BALANCES(archive, (lo, hi))
+                    queries.ADD_ARCHIVED_BALANCE.executemany(conn, cursor)
+                finally:
+                    archive.close()
+            items = queries.COUNT_AUDIT_BALANCES.fetchone(conn)['count']
+            mismatches = queries.AUDIT_MISMATCHES.fetchall(conn, {'lo': lo, 'hi': hi})
+        finally:
+            conn.rollback()
+    finally:
+        conn.close()
+    return items, [tuple(row) for row in mismatches]
+
+
+def apply_corrections(mismatches):
+    """Write an adjustment for each mismatch whose item is unchanged since the audit
+
+    Returns (corrected, skipped).
+    """
+    corrected = skipped = 0
+    conn = get_db_connection()
+    try:
+        for start in range(0, len(mismatches), FIX_BATCH):
+            now = datetime.now().isoformat()
+            with write_transaction(conn):
+                for shop_id, product_id, expected, actual, hot_quantity in \
+                        mismatches[start:start + FIX_BATCH]:
+                    state = queries.AUDIT_ITEM_STATE.fetchone(
+                        conn, {'shop_id': shop_id, 'product_id': product_id})
+                    if (state['current_stock'] or 0) != actual or state['hot_quantity'] != hot_quantity:
+                        skipped += 1
+                        continue
+                    queries.INSERT_ADJUSTMENT(conn, (str(uuid.uuid4()), shop_id, product_id,
+                                                     actual - expected, 0.0, 0.0,
+                                                     CORRECTION_NOTE, now, None))
+                    corrected += 1
+    finally:
+        conn.close()
+    return corrected, skipped
+
+
+def audit_inventory(workers=None, shops_per_task=SHOPS_PER_TASK, fix=False, report_path=None):
+    """Audit every shop on a process pool; optionally correct the ledger
+
+    Mismatches are streamed to `report_path` (CSV) when given; the returned
+    report holds totals and the first MAX_SAMPLE mismatches.
+    """
+    ranges = shop_ranges(shops_per_task)
+    report = {'ranges': len(ranges), 'items': 0, 'mismatches': 0, 'net_difference': 0,
+              'corrected': 0, 'skipped': 0, 'sample': [], 'report_path': report_path}
+    report_file = open(report_path, 'w', newline='') if report_path else None
+    writer = csv.writer(report_file) if report_file else None
+    if writer:
+        writer.writerow(REPORT_FIELDS)
+
+    try:
+        with ProcessPoolExecutor(workers, initializer=_init_worker,
+                                 initargs=(os.path.abspath(db.DATABASE), ledger.ledger_dir())) as pool:
+            futures = [pool.submit(audit_range, lo, hi) for lo, hi in ranges]
+            for future in as_completed(futures):
+                items, mismatches = future.result()
+                report['items'] += items
+                report['mismatches'] += len(mismatches)
+                for shop_id, product_id, expected, actual, _ in mismatches:
+                    row = dict(zip(REPORT_FIELDS, (shop_id, product_id, expected, actual,
+                                                   actual - expected)))
+                    report['net_difference'] += row['difference']
+                    if len(report['sample']) < MAX_SAMPLE:
+                        report['sample'].append(row)
+                    if writer:
+                        writer.writerow(row.values())
+                if fix and mismatches:
+                    corrected, skipped = apply_corrections(mismatches)
+                    report['corrected'] += corrected
+                    report['skipped'] += skipped
+    finally:
+        if report_file:
+            report_file.close()
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, help='processes (default: CPU count)')
+    parser.add_argument('--shops-per-task', type=int, default=SHOPS_PER_TASK)
+    parser.add_argument('--fix', action='store_true',
+                        help='write adjustment transactions for the mismatches')
+    parser.add_argument('--report', help='write every mismatch to this CSV file')
+    parser.add_argument('--database', help='database file (default: SHOPTRACKER_DB)')
+    args = parser.parse_args()
+
+    from app import init_database
+    if args.database:
+        db.configure(args.database)
+    init_database()
+
+    report = audit_inventory(args.workers, args.shops_per_task, args.fix, args.report)
+    for row in report['sample'][:20]:
+        print(f"{row['shop_id']}  {row['product_id']}  expected {row['expected']:>8}  "
+              f"actual {row['actual']:>8}  difference {row['difference']:>+8}")
+    print(f"{report['items']} items in {report['ranges']} shop ranges, "
+          f"{report['mismatches']} mismatches (net {report['net_difference']:+d} units)")
+    if args.fix:
+        print(f"{report['corrected']} corrected, {report['skipped']} skipped (changed during the audit)")
+    db.close_pools()
+    return 1 if report['mismatches'] - report['corrected'] else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
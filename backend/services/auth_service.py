@@ -1,20 +1,32 @@
 # backend/services/auth_service.py
 import jwt
 import hashlib
+import hmac
 import secrets
-from datetime import datetime, timedelta
+import uuid
+from datetime import datetime
 from functools import wraps
 from flask import request, jsonify, current_app
 import sqlite3
 import re
+from services import sessions
+from utils import db, queries
+from utils.cache import LRUCache
+
+# Active shop profiles looked up by token_required on every request
+shop_cache = LRUCache(maxsize=4096, ttl=60)
+# Changes made by other workers reach this one through the revocation log
+sessions.on_shop_change(shop_cache.pop)
 
 class AuthService:
-    def __init__(self, db_path='shoptracker.db'):
+    def __init__(self, db_path=None):
+        # None means the application database configured in utils.db
         self.db_path = db_path
-        self.secret_key = current_app.config.get('SECRET_KEY', 'your-secret-key-change-in-production')
-        
+    
     def get_db_connection(self):
         """Get database connection"""
+        if self.db_path is None:
+            return db.get_db_connection()
         conn = sqlite3.connect(self.db_path)
         conn.row_factory = sqlite3.Row
         return conn
@@ -51,7 +63,7 @@ class AuthService:
         pattern = r'^(\+977-?)?[98]\d{8}$'
         return re.match(pattern, phone) is not None
     
-    def register_shop(self, shop_data):
+    def register_shop(self, shop_data, ip_address=None, device_info=None):
         """Register a new shop"""
         try:
             # Validate required fields
@@ -73,50 +85,44 @@ class AuthService:
                 return {'success': False, 'message': 'Password must be at least 6 characters'}
             
             conn = self.get_db_connection()
-            
-            # Check if email or phone already exists
-            existing = conn.execute(
-                'SELECT id FROM shops WHERE email = ? OR phone = ?',
-                (shop_data['email'], shop_data['phone'])
-            ).fetchone()
-            
-            if existing:
+            try:
+                # Check if email or phone already exists
+                existing = queries.SHOP_ID_BY_EMAIL_OR_PHONE.fetchone(
+                    conn, (shop_data['email'], shop_data['phone']))
+                
+                if existing:
+                    return {'success': False, 'message': 'Email or phone already registered'}
+                
+                # Hash password
+                password_hash = self.hash_password(shop_data['password'])
+                
+                # Insert new shop
+                shop_id = str(uuid.uuid4())
+                queries.REGISTER_SHOP(conn, (
+                    shop_id,
+                    shop_data['shop_name'],
+                    shop_data['owner_name'],
+                    shop_data['email'],
+                    shop_data['phone'],
+                    password_hash,
+                    shop_data['address'],
+                    shop_data.get('city', ''),
+                    shop_data.get('district', ''),
+                    datetime.now().isoformat(),
+                    True
+                ))
+                
+                # Open the first session
+                tokens = sessions.open_session(conn, shop_id, shop_data['email'], ip_address, device_info)
+                conn.commit()
+            finally:
                 conn.close()
-                return {'success': False, 'message': 'Email or phone already registered'}
-            
-            # Hash password
-            password_hash = self.hash_password(shop_data['password'])
-            
-            # Insert new shop
-            cursor = conn.execute('''
-                INSERT INTO shops (shop_name, owner_name, email, phone, password_hash, 
-                                 address, city, district, created_at, is_active)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                shop_data['shop_name'],
-                shop_data['owner_name'],
-                shop_data['email'],
-                shop_data['phone'],
-                password_hash,
-                shop_data['address'],
-                shop_data.get('city', ''),
-                shop_data.get('district', ''),
-                datetime.now().isoformat(),
-                True
-            ))
-            
-            shop_id = cursor.lastrowid
-            conn.commit()
-            conn.close()
-            
-            # Generate JWT token
-            token = self.generate_token(shop_id, shop_data['email'])
             
             return {
                 'success': True,
                 'message': 'Shop registered successfully',
                 'shop_id': shop_id,
-                'token': token,
+                'tokens': tokens,
                 'shop_data': {
                     'id': shop_id,
                     'shop_name': shop_data['shop_name'],
@@ -129,46 +135,37 @@ class AuthService:
         except Exception as e:
             return {'success': False, 'message': f'Registration failed: {str(e)}'}
     
-    def login_shop(self, email, password):
+    def login_shop(self, email, password, ip_address=None, device_info=None):
         """Authenticate shop login"""
         try:
             if not email or not password:
                 return {'success': False, 'message': 'Email and password are required'}
             
             conn = self.get_db_connection()
-            shop = conn.execute('''
-                SELECT id, shop_name, owner_name, email, phone, password_hash, 
-                       is_active, last_login_at
-                FROM shops WHERE email = ?
-            ''', (email,)).fetchone()
-            
-            if not shop:
-                conn.close()
-                return {'success': False, 'message': 'Invalid email or password'}
-            
-            if not shop['is_active']:
-                conn.close()
-                return {'success': False, 'message': 'Account is deactivated'}
-            
-            # Verify password
-            if not self.verify_password(password, shop['password_hash']):
+            try:
+                shop = queries.SHOP_LOGIN_BY_EMAIL.fetchone(conn, (email,))
+                
+                if not shop:
+                    return {'success': False, 'message': 'Invalid email or password'}
+                
+                if not shop['is_active']:
+                    return {'success': False, 'message': 'Account is deactivated'}
+                
+                # Verify password
+                if not self.verify_password(password, shop['password_hash']):
+                    return {'success': False, 'message': 'Invalid email or password'}
+                
+                # Update last login and open a session
+                queries.SET_LAST_LOGIN(conn, (datetime.now().isoformat(), shop['id']))
+                tokens = sessions.open_session(conn, shop['id'], shop['email'], ip_address, device_info)
+                conn.commit()
+            finally:
                 conn.close()
-                return {'success': False, 'message': 'Invalid email or password'}
-            
-            # Update last login
-            conn.execute('''
-                UPDATE shops SET last_login_at = ? WHERE id = ?
-            ''', (datetime.now().isoformat(), shop['id']))
-            conn.commit()
-            conn.close()
-            
-            # Generate JWT token
-            token = self.generate_token(shop['id'], shop['email'])
             
             return {
                 'success': True,
                 'message': 'Login successful',
-                'token': token,
+                'tokens': tokens,
                 'shop_data': {
                     'id': shop['id'],
                     'shop_name': shop['shop_name'],
@@ -182,40 +179,60 @@ class AuthService:
         except Exception as e:
             return {'success': False, 'message': f'Login failed: {str(e)}'}
     
-    def generate_token(self, shop_id, email):
-        """Generate JWT token"""
-        payload = {
-            'shop_id': shop_id,
-            'email': email,
-            'iat': datetime.utcnow(),
-            'exp': datetime.utcnow() + timedelta(days=30)  # Token expires in 30 days
-        }
-        
-        token = jwt.encode(payload, self.secret_key, algorithm='HS256')
-        return token
+    def refresh_session(self, refresh_token):
+        """Exchange a refresh token for a new access token and refresh token"""
+        try:
+            conn = self.get_db_connection()
+            try:
+                tokens = sessions.refresh_session(conn, refresh_token)
+                conn.commit()
+            finally:
+                conn.close()
+            
+            if not tokens:
+                return {'success': False, 'message': 'Invalid or expired refresh token'}
+            return {'success': True, 'tokens': tokens}
+            
+        except Exception as e:
+            return {'success': False, 'message': f'Token refresh failed: {str(e)}'}
+    
+    def logout(self, session_id, everywhere=False, shop_id=None):
+        """Revoke the current session, or every session of the shop"""
+        conn = self.get_db_connection()
+        try:
+            if everywhere:
+                return sessions.revoke_shop_sessions(conn, shop_id)
+            return sessions.revoke_session(conn, session_id)
+        finally:
+            conn.close()
     
     def verify_token(self, token):
-        """Verify JWT token"""
+        """Verify an access token (signature, expiry and revocation; no database hit)"""
         try:
-            payload = jwt.decode(token, self.secret_key, algorithms=['HS256'])
+            payload = sessions.verify_access_token(token)
             return {'success': True, 'payload': payload}
         except jwt.ExpiredSignatureError:
             return {'success': False, 'message': 'Token has expired'}
+        except sessions.SessionRevoked:
+            return {'success': False, 'message': 'Session has been revoked'}
         except jwt.InvalidTokenError:
             return {'success': False, 'message': 'Invalid token'}
     
     def get_shop_by_id(self, shop_id):
         """Get shop details by ID"""
         try:
+            cached = shop_cache.get(shop_id)
+            if cached is not None:
+                return dict(cached)
+            
             conn = self.get_db_connection()
-            shop = conn.execute('''
-                SELECT id, shop_name, owner_name, email, phone, address, 
-                       city, district, created_at, last_login_at, is_active
-                FROM shops WHERE id = ? AND is_active = 1
-            ''', (shop_id,)).fetchone()
-            conn.close()
+            try:
+                shop = queries.SHOP_PROFILE_BY_ID.fetchone(conn, (shop_id,))
+            finally:
+                conn.close()
             
             if shop:
+                shop_cache.set(shop_id, dict(shop))
                 return dict(shop)
             return None
             
@@ -239,72 +256,93 @@ class AuthService:
                 return {'success': False, 'message': 'Invalid phone number format'}
             
             conn = self.get_db_connection()
-            
-            # Check if new phone already exists (if phone is being updated)
-            if 'phone' in updates:
-                existing = conn.execute(
-                    'SELECT id FROM shops WHERE phone = ? AND id != ?',
-                    (updates['phone'], shop_id)
-                ).fetchone()
+            try:
+                # Check if new phone already exists (if phone is being updated)
+                if 'phone' in updates:
+                    existing = queries.PHONE_TAKEN_BY_OTHER.fetchone(conn, (updates['phone'], shop_id))
+                    
+                    if existing:
+                        return {'success': False, 'message': 'Phone number already in use'}
                 
-                if existing:
-                    conn.close()
-                    return {'success': False, 'message': 'Phone number already in use'}
-            
-            # Build update query
-            set_clause = ', '.join([f'{field} = ?' for field in updates.keys()])
-            values = list(updates.values()) + [shop_id]
-            
-            conn.execute(f'''
-                UPDATE shops SET {set_clause}, updated_at = ?
-                WHERE id = ?
-            ''', values + [datetime.now().isoformat()])
-            
-            conn.commit()
-            conn.close()
+                # Fields that are not being updated are passed as NULL and kept
+                params = {field: updates.get(field) for field in allowed_fields}
+                params.update(updated_at=datetime.now().isoformat(), id=shop_id)
+                with sessions.revoking(conn) as revocation:
+                    queries.UPDATE_SHOP_PROFILE(conn, params)
+                    revocation.shop_changed(shop_id)
+            finally:
+                conn.close()
+            shop_cache.pop(shop_id)
             
             return {'success': True, 'message': 'Profile updated successfully'}
             
         except Exception as e:
             return {'success': False, 'message': f'Update failed: {str(e)}'}
     
-    def change_password(self, shop_id, current_password, new_password):
-        """Change shop password"""
+    def change_password(self, shop_id, current_password, new_password, keep_session=None):
+        """Change shop password and revoke every other session"""
         try:
             if len(new_password) < 6:
                 return {'success': False, 'message': 'New password must be at least 6 characters'}
             
             conn = self.get_db_connection()
-            shop = conn.execute(
-                'SELECT password_hash FROM shops WHERE id = ?',
-                (shop_id,)
-            ).fetchone()
-            
-            if not shop:
-                conn.close()
-                return {'success': False, 'message': 'Shop not found'}
-            
-            # Verify current password
-            if not self.verify_password(current_password, shop['password_hash']):
+            try:
+                shop = queries.PASSWORD_HASH_BY_ID.fetchone(conn, (shop_id,))
+                
+                if not shop:
+                    return {'success': False, 'message': 'Shop not found'}
+                
+                # Verify current password
+                if not self.verify_password(current_password, shop['password_hash']):
+                    return {'success': False, 'message': 'Current password is incorrect'}
+                
+                # Hash new password
+                new_password_hash = self.hash_password(new_password)
+                
+                # Update the password and revoke the other sessions together:
+                # neither may commit without the other
+                with sessions.revoking(conn) as revocation:
+                    queries.SET_PASSWORD_HASH(conn, (new_password_hash, datetime.now().isoformat(), shop_id))
+                    revocation.shop_sessions(shop_id, keep=keep_session)
+                    revocation.shop_changed(shop_id)
+            finally:
                 conn.close()
-                return {'success': False, 'message': 'Current password is incorrect'}
-            
-            # Hash new password
-            new_password_hash = self.hash_password(new_password)
-            
-            # Update password
-            conn.execute('''
-                UPDATE shops SET password_hash = ?, updated_at = ?
-                WHERE id = ?
-            ''', (new_password_hash, datetime.now().isoformat(), shop_id))
-            
-            conn.commit()
-            conn.close()
+            shop_cache.pop(shop_id)
             
             return {'success': True, 'message': 'Password changed successfully'}
             
         except Exception as e:
             return {'success': False, 'message': f'Password change failed: {str(e)}'}
+    
+    def deactivate_shop(self, shop_id):
+        """Deactivate a shop and revoke its sessions, in every worker"""
+        conn = self.get_db_connection()
+        try:
+            with sessions.revoking(conn) as revocation:
+                if not queries.DEACTIVATE_SHOP(conn, (datetime.now().isoformat(), shop_id)).rowcount:
+                    return {'success': False, 'message': 'Shop not found or already inactive'}
+                revoked = revocation.shop_sessions(shop_id)
+                revocation.shop_changed(shop_id)
+        finally:
+            conn.close()
+        shop_cache.pop(shop_id)
+        
+        return {'success': True, 'message': 'Shop deactivated', 'revoked_sessions': revoked}
+    
+    def prime_shop_cache(self, limit=500):
+        """Load the most recently active shops into the profile cache"""
+        conn = self.get_db_connection()
+        try:
+            shops = queries.RECENT_SHOP_PROFILES.fetchall(conn, (limit,))
+        except sqlite3.OperationalError:
+            # The database has not been prepared yet (app.init_database)
+            return 0
+        finally:
+            conn.close()
+        
+        for shop in shops:
+            shop_cache.set(shop['id'], dict(shop))
+        return len(shops)
 
 # Authentication decorator
 def token_required(f):
@@ -337,10 +375,27 @@ def token_required(f):
                 return jsonify({'message': 'Shop not found'}), 401
             
             request.current_shop = current_shop
+            request.current_session = result['payload']['sid']
             
         except Exception as e:
             return jsonify({'message': 'Token verification failed'}), 401
         
         return f(*args, **kwargs)
     
-    return decorated
\ No newline at end of file
+    return decorated
+
+def admin_required(f):
+    """Decorator to require the X-Admin-Token header to match ADMIN_TOKEN"""
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        expected = current_app.config.get('ADMIN_TOKEN')
+        if not expected:
+            return jsonify({'message': 'Admin API is disabled'}), 403
+        
+        token = request.headers.get('X-Admin-Token', '')
+        if not hmac.compare_digest(token.encode('utf-8'), expected.encode('utf-8')):
+            return jsonify({'message': 'Invalid admin token'}), 401
+        
+        return f(*args, **kwargs)
+    
+    return decorated
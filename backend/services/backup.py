@@ -0,0 +1,648 @@
+# backend/services/backup.py
+"""Online backups and point-in-time restore of the primary database
+
+Base backups copy the database through SQLite's online backup API,
+PAGES_PER_STEP pages at a time with STEP_SLEEP seconds between steps, so the
+copy never hogs the disk and sales keep committing. Every step reads from one
+read transaction opened up front: without it, each commit another connection
+makes between two steps restarts the backup from page 1, and under steady
+sales it never finishes. In WAL mode readers hold no lock writers wait for;
+writers only wait while that snapshot is pinned and its WAL position noted
+under the write lock, which takes milliseconds.
+
+Point-in-time recovery comes from the WAL archiver. Every
+WAL_ARCHIVE_INTERVAL seconds it takes the write lock, appends the frames
+committed since its last visit to a segment file, opens a read snapshot at
+that point and lets go. It is the only checkpointer (the app's connections
+run with wal_autocheckpoint=0 while archiving is configured) and checkpoints
+only while holding that snapshot, which keeps SQLite from checkpointing --
+and so from later overwriting -- any frame it has not archived yet. A
+restore copies the newest base backup taken before the target time and
+writes the archived frames after the base's WAL position into it, up to the
+last segment archived at or before that time -- what a checkpoint does.
+
+    <backup dir>/base/<id>.db, <id>.json           base backups and their reports
+    <backup dir>/wal/<ms>-<salt1>-<frame>.walseg   archived WAL frames
+
+When the archiver cannot show its archive is continuous (first start, a WAL
+removed by the last connection closing, a missed WAL restart) it records a
+break and takes a new base backup; restores cannot cross a break. Sealed
+ledger partitions (services/ledger.py) are separate, immutable files and are
+not part of these backups.
+
+    python -m services.backup backup [--database PATH]
+    python -m services.backup archive [--database PATH]
+    python -m services.backup list [--database PATH]
+    python -m services.backup restore TARGET [--until 2026-10-19T14:30:00] [--base ID] [--database PATH]
+"""
+import argparse
+import fcntl
+import json
+import os
+import shutil
+import sqlite3
+import struct
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+from utils import db
+from utils.scheduler import PeriodicTask
+
+BACKUP_DIR = os.environ.get('SHOPTRACKER_BACKUP_DIR') or None  # None: next to the database
+KEEP_BASES = 7  # newest base backups kept, with the WAL segments they need
+PAGES_PER_STEP = 256  # pages copied per backup step
+STEP_SLEEP = 0.01  # seconds between backup steps
+CHECKPOINT_FRAMES = 1000  # the archiver checkpoints once the WAL holds this many frames
+BACKUP_CHECK_INTERVAL = 60  # seconds between checks whether a base backup is due
+
+WAL_HEADER = struct.Struct('>IIIIIIII')  # magic, version, page size, checkpoint no., salts, checksum
+FRAME_HEADER = struct.Struct('>IIIIII')  # page no., db pages after commit (0: not a commit), salts, checksum
+SEGMENT_MAGIC = b'STWALSEG'
+SEGMENT_HEADER = struct.Struct('>8sIIIIIId')  # magic, flags, page size, salts, first frame, frames, archived at
+SEGMENT_BREAK = 1  # the archive is not continuous before this segment
+
+_archiver = None
+_scheduled = []
+
+
+class BackupError(Exception):
+    """Raised when a backup cannot be taken or restored"""
+
+
+def configure(backup_dir=None, keep=None):
+    """Set where backups are written and how many base backups are kept"""
+    global BACKUP_DIR, KEEP_BASES
+    if backup_dir:
+        BACKUP_DIR = backup_dir
+    if keep is not None:
+        KEEP_BASES = keep
+
+
+def backup_dir(kind=None):
+    """Base backup directory, or its 'base' or 'wal' subdirectory"""
+    base = BACKUP_DIR or os.path.join(os.path.dirname(os.path.abspath(db.DATABASE)), 'backups')
+    return os.path.abspath(os.path.join(base, kind) if kind else base)
+
+
+@contextmanager
+def _file_lock(name):
+    """One base backup (or one archive cycle) at a time across processes"""
+    os.makedirs(backup_dir(), exist_ok=True)
+    with open(os.path.join(backup_dir(), f'.{name}.lock'), 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _connect():
+    conn = sqlite3.connect(db.DATABASE, timeout=db.BUSY_TIMEOUT, isolation_level=None,
+                           check_same_thread=False)
+    conn.execute('PRAGMA wal_autocheckpoint=0')
+    return conn
+
+
+def _fsync(path):
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+# --- The WAL file ------------------------------------------------------------
+#
+# Frames count from 1; a frame is valid if it carries the header's salts, and
+# the WAL ends at the last valid commit frame (anything after it belongs to a
+# rolled-back transaction, or is still being written).
+
+def _wal_header():
+    """(page size, salt1, salt2) of the WAL, or None if there is none"""
+    try:
+        with open(db.DATABASE + '-wal', 'rb') as f:
+            header = f.read(WAL_HEADER.size)
+    except FileNotFoundError:
+        return None
+    if len(header) < WAL_HEADER.size:
+        return None
+    _, _, page_size, _, salt1, salt2, _, _ = WAL_HEADER.unpack(header)
+    return page_size, salt1, salt2
+
+
+def _wal_frames(page_size, salts, after=0, until=None):
+    """(last committed frame, bytes of the frames after `after` up to it), reading up to frame `until`"""
+    frame_size = FRAME_HEADER.size + page_size
+    with open(db.DATABASE + '-wal', 'rb') as f:
+        f.seek(WAL_HEADER.size + after * frame_size)
+        data = f.read(-1 if until is None else (until - after) * frame_size)
+    last_commit = after
+    for i in range(len(data) // frame_size):
+        _, commit, salt1, salt2, _, _ = FRAME_HEADER.unpack_from(data, i * frame_size)
+        if (salt1, salt2) != salts:
+            break
+        if commit:
+            last_commit = after + i + 1
+    return last_commit, data[:(last_commit - after) * frame_size]
+
+
+def _wal_position():
+    """{'salt1', 'salt2', 'frame'} of the last committed frame, or None without a WAL"""
+    header = _wal_header()
+    if header is None:
+        return None
+    page_size, salt1, salt2 = header
+    frame = frames = 0
+    with open(db.DATABASE + '-wal', 'rb') as f:
+        # Frame headers only: the whole WAL may be large
+        while True:
+            f.seek(WAL_HEADER.size + frames * (FRAME_HEADER.size + page_size))
+            header = f.read(FRAME_HEADER.size)
+            if len(header) < FRAME_HEADER.size:
+                break
+            _, commit, frame_salt1, frame_salt2, _, _ = FRAME_HEADER.unpack(header)
+            if (frame_salt1, frame_salt2) != (salt1, salt2):
+                break
+            frames += 1
+            if commit:
+                frame = frames
+    return {'salt1': salt1, 'salt2': salt2, 'frame': frame}
+
+
+def _pin(conn):
+    """Open a read transaction on `conn`, holding its snapshot until rolled back"""
+    conn.execute('BEGIN')
+    conn.execute('SELECT COUNT(*) FROM sqlite_master').fetchone()
+
+
+# --- Base backups ------------------------------------------------------------
+
+def take_backup(pages_per_step=PAGES_PER_STEP, sleep=STEP_SLEEP, keep=None):
+    """Copy the database into a new base backup without stopping writers; returns its report"""
+    directory = backup_dir('base')
+    os.makedirs(directory, exist_ok=True)
+    with _file_lock('base'):
+        locker, source = _connect(), _connect()
+        try:
+            # Pin the snapshot every step reads, and where the WAL stood at that moment
+            lock_started = time.perf_counter()
+            locker.execute('BEGIN IMMEDIATE')
+            try:
+                _pin(source)
+                wal = _wal_position()
+                created_at = time.time()
+            finally:
+                locker.execute('ROLLBACK')
+            lock_ms = (time.perf_counter() - lock_started) * 1000
+
+            created = datetime.fromtimestamp(created_at)
+            backup_id = f'{created:%Y%m%d-%H%M%S}-{created.microsecond // 1000:03d}'
+            temp_path = os.path.join(directory, f'{backup_id}.db.tmp')
+            progress = {'steps': 0, 'restarts': 0, 'remaining': None, 'pages': 0}
+
+            def on_progress(status, remaining, total):
+                if progress['remaining'] is not None and remaining > progress['remaining']:
+                    progress['restarts'] += 1
+                progress.update(steps=progress['steps'] + 1, remaining=remaining, pages=total)
+                if remaining:
+                    # backup()'s own sleep only applies when a step finds the database busy
+                    time.sleep(sleep)
+
+            copy_started = time.perf_counter()
+            target = sqlite3.connect(temp_path)
+            try:
+                target.execute('PRAGMA synchronous=OFF')  # the finished file is fsynced once
+                source.backup(target, pages=pages_per_step, progress=on_progress)
+                page_size = target.execute('PRAGMA page_size').fetchone()[0]
+            finally:
+                target.close()
+            _fsync(temp_path)
+            seconds = time.perf_counter() - copy_started
+        finally:
+            source.close()
+            locker.close()
+
+        path = os.path.join(directory, f'{backup_id}.db')
+        os.replace(temp_path, path)
+        size = os.path.getsize(path)
+        report = {
+            'id': backup_id,
+            'created_at': created_at,
+            'created': created.isoformat(timespec='seconds'),
+            'wal': wal,
+            'page_size': page_size,
+            'pages': progress['pages'],
+            'bytes': size,
+            'steps': progress['steps'],
+            'restarts': progress['restarts'],
+            'seconds': round(seconds, 3),
+            'mb_per_s': round(size / 1024 / 1024 / seconds, 1) if seconds else None,
+            'lock_ms': round(lock_ms, 2),
+        }
+        with open(path[:-3] + '.json.tmp', 'w') as f:
+            json.dump(report, f, indent=2)
+        os.replace(path[:-3] + '.json.tmp', path[:-3] + '.json')
+        prune_backups(KEEP_BASES if keep is None else keep)
+    return report
+
+
+def list_backups():
+    """Reports of the base backups, oldest first"""
+    directory = backup_dir('base')
+    if not os.path.isdir(directory):
+        return []
+    reports = []
+    for name in sorted(os.listdir(directory)):
+        if name.endswith('.json') and os.path.exists(os.path.join(directory, name[:-5] + '.db')):
+            with open(os.path.join(directory, name)) as f:
+                reports.append(json.load(f))
+    return sorted(reports, key=lambda report: report['created_at'])
+
+
+def backup_if_due(max_age):
+    """Take a base backup if the newest is older than `max_age` seconds"""
+    backups = list_backups()
+    if backups and time.time() - backups[-1]['created_at'] < max_age:
+        return None
+    return take_backup()
+
+
+def prune_backups(keep):
+    """Delete all but the newest `keep` base backups and the segments only they needed"""
+    backups = list_backups()
+    if len(backups) <= keep:
+        return 0
+    directory = backup_dir('base')
+    for report in backups[:-keep]:
+        for extension in ('.db', '.json'):
+            os.remove(os.path.join(directory, report['id'] + extension))
+    oldest = backups[-keep]['created_at']
+    for segment in list_segments():
+        if segment['archived_at'] < oldest:
+            os.remove(segment['path'])
+    return len(backups) - keep
+
+
+# --- WAL archiving -----------------------------------------------------------
+
+def _write_segment(flags, page_size, salts, first, frames, data, archived_at):
+    directory = backup_dir('wal')
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f'{int(archived_at * 1000):013d}-{salts[0]:08x}-{first:010d}.walseg')
+    with open(path + '.tmp', 'wb') as f:
+        f.write(SEGMENT_HEADER.pack(SEGMENT_MAGIC, flags, page_size, salts[0], salts[1], first,
+                                    frames, archived_at))
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(path + '.tmp', path)
+    return path
+
+
+def _read_segment_header(path):
+    with open(path, 'rb') as f:
+        header = f.read(SEGMENT_HEADER.size)
+    magic, flags, page_size, salt1, salt2, first, frames, archived_at = SEGMENT_HEADER.unpack(header)
+    if magic != SEGMENT_MAGIC:
+        raise BackupError(f'Not a WAL segment: {path}')
+    return {'path': path, 'break': bool(flags & SEGMENT_BREAK), 'page_size': page_size,
+            'salt1': salt1, 'salt2': salt2, 'first': first, 'frames': frames,
+            'archived_at': archived_at}
+
+
+def list_segments():
+    """Headers of the archived WAL segments, oldest first"""
+    directory = backup_dir('wal')
+    if not os.path.isdir(directory):
+        return []
+    return [_read_segment_header(os.path.join(directory, name))
+            for name in sorted(os.listdir(directory)) if name.endswith('.walseg')]
+
+
+def _archived_position():
+    """Where the archive ends: the newest of the last segment and the last base backup"""
+    candidates = []
+    segments = list_segments()
+    if segments:
+        last = segments[-1]
+        candidates.append((last['archived_at'], {'salt1': last['salt1'], 'salt2': last['salt2'],
+                                                 'frame': last['first'] + last['frames']}))
+    backups = list_backups()
+    if backups:
+        candidates.append((backups[-1]['created_at'], backups[-1]['wal']))
+    if not candidates:
+        return None, False
+    return max(candidates, key=lambda candidate: candidate[0])[1], True
+
+
+def _follows(position, salt1):
+    """Whether a WAL with `salt1` is the generation right after `position`'s"""
+    return position is None or salt1 == (position['salt1'] + 1) & 0xFFFFFFFF
+
+
+class WalArchiver:
+    """Copies committed WAL frames into segment files"""
+
+    def __init__(self):
+        self.position = None  # {'salt1', 'salt2', 'frame'} archived up to
+        self.resumed = False
+        self.cycles = 0
+        self.frames = 0
+        self.bytes = 0
+        self.breaks = 0
+        self.max_lock_ms = 0.0
+        self.last = None
+        self._conn = None
+        self._pinned = None  # read snapshot at self.position, held between cycles
+        self._lock = threading.Lock()
+
+    def archive(self):
+        """Archive the frames committed since the last cycle, checkpointing a long WAL"""
+        with self._lock, _file_lock('wal'):
+            # Kept open: SQLite checkpoints and deletes the WAL when its last connection closes
+            if self._conn is None:
+                self._conn, self._pinned = _connect(), _connect()
+            if not self.resumed:
+                self.position, self.resumed = _archived_position()
+            copied = self._copy_committed()
+            result = self._archive_pass()
+            result['frames'] += copied
+            if not result['break'] and self.position and self.position['frame'] >= CHECKPOINT_FRAMES:
+                # Backfill what is archived outside the write lock (the pinned
+                # snapshot stops it there), then a short second pass archives
+                # what came in meanwhile and completes the checkpoint, so the
+                # next writer restarts the WAL instead of growing it
+                self._conn.execute('PRAGMA wal_checkpoint(PASSIVE)')
+                second = self._archive_pass(complete_checkpoint=True)
+                result.update(frames=result['frames'] + second['frames'],
+                              lock_ms=max(result['lock_ms'], second['lock_ms']),
+                              checkpointed=second['checkpointed'])
+            self.cycles += 1
+            self.last = result
+        if result['break']:
+            result['base'] = take_backup()['id']
+        return result
+
+    def _copy_committed(self):
+        """Archive the frames committed so far without taking the write lock
+
+        Safe because this archiver is the only checkpointer and its pinned
+        snapshot keeps every checkpoint -- and so any WAL restart -- behind
+        what it has archived: committed frames stay where they are until they
+        are copied. wal_checkpoint reports how many frames are committed, so a
+        frame still being written is never read.
+        """
+        header = _wal_header()
+        if header is None or not self._pinned.in_transaction:
+            return 0
+        committed = self._conn.execute('PRAGMA wal_checkpoint(PASSIVE)').fetchone()[1]
+        after = self._continues_at(header)
+        if after is None or committed <= after or _wal_header() != header:
+            return 0
+        page_size, salts = header[0], header[1:]
+        archived_at = time.time()
+        last, data = _wal_frames(page_size, salts, after, until=committed)
+        if last > after:
+            _write_segment(0, page_size, salts, after, last - after, data, archived_at)
+            self.position = {'salt1': salts[0], 'salt2': salts[1], 'frame': last}
+            self.frames += last - after
+            self.bytes += len(data)
+        return last - after
+
+    def _archive_pass(self, complete_checkpoint=False):
+        """Under the write lock, copy the WAL's new frames and pin a snapshot at its end"""
+        conn = self._conn
+        checkpointed = None
+        lock_started = time.perf_counter()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            archived_at = time.time()
+            header = _wal_header()
+            after = self._continues_at(header)
+            if header is None:
+                last, data, page_size, salts = 0, b'', 0, None
+            else:
+                page_size, salts = header[0], header[1:]
+                last, data = _wal_frames(page_size, salts, after or 0)
+            if self._pinned.in_transaction:
+                self._pinned.execute('ROLLBACK')
+            if complete_checkpoint and after is not None:
+                checkpointed = self._pinned.execute('PRAGMA wal_checkpoint(PASSIVE)').fetchone()[2]
+            _pin(self._pinned)
+        finally:
+            conn.execute('ROLLBACK')
+        lock_ms = (time.perf_counter() - lock_started) * 1000
+
+        broken = after is None
+        frames = 0 if broken else last - after
+        if broken:
+            # Frames may have been checkpointed away unarchived: start a new timeline
+            _write_segment(SEGMENT_BREAK, page_size, salts or (0, 0), last, 0, b'', archived_at)
+            self.breaks += 1
+        elif frames:
+            _write_segment(0, page_size, salts, after, frames, data, archived_at)
+            self.bytes += len(data)
+        self.position = None if salts is None else {'salt1': salts[0], 'salt2': salts[1], 'frame': last}
+        self.resumed = True
+        self.frames += frames
+        self.max_lock_ms = max(self.max_lock_ms, lock_ms)
+        return {'archived_at': archived_at, 'frames': frames, 'lock_ms': round(lock_ms, 2),
+                'checkpointed': checkpointed, 'break': broken}
+
+    def _continues_at(self, header):
+        """Frame the archive continues after in the current WAL, or None if it has a gap"""
+        if not self.resumed:
+            return None
+        position = self.position
+        if header is None:
+            return 0 if position is None or position['frame'] == 0 else None
+        _, salt1, salt2 = header
+        if position is not None and (salt1, salt2) == (position['salt1'], position['salt2']):
+            return position['frame']
+        return 0 if _follows(position, salt1) else None
+
+    def stats(self):
+        return {'cycles': self.cycles, 'frames': self.frames, 'bytes': self.bytes,
+                'breaks': self.breaks, 'max_lock_ms': round(self.max_lock_ms, 2),
+                'position': self.position, 'last': self.last}
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._pinned.close()
+                self._conn.close()
+                self._conn = self._pinned = None
+
+
+def archiver():
+    """This process's WAL archiver"""
+    global _archiver
+    if _archiver is None:
+        _archiver = WalArchiver()
+    return _archiver
+
+
+def archive_summary():
+    """What a restore can reach: base backups, archived segments and the newest recovery point"""
+    backups = list_backups()
+    segments = [segment for segment in list_segments() if not segment['break']]
+    newest = max([backup['created_at'] for backup in backups[-1:]] +
+                 [segment['archived_at'] for segment in segments[-1:]], default=None)
+    return {
+        'backups': backups,
+        'segments': len(segments),
+        'segment_bytes': sum(os.path.getsize(segment['path']) for segment in segments),
+        'recoverable_to': datetime.fromtimestamp(newest).isoformat(timespec='seconds') if newest else None,
+    }
+
+
+# --- Restore -----------------------------------------------------------------
+
+def _skip_frames(position, segment):
+    """Frames at the start of `segment` the restored file already holds; raises on a gap"""
+    if position is not None and (segment['salt1'], segment['salt2']) == (position['salt1'], position['salt2']):
+        if segment['first'] > position['frame']:
+            raise BackupError(f'WAL frames {position["frame"] + 1}-{segment["first"]} are missing '
+                              f'from the archive')
+        return position['frame'] - segment['first']
+    if segment['first'] == 0 and _follows(position, segment['salt1']):
+        return 0
+    raise BackupError(f'WAL archive is not continuous at {segment["path"]}')
+
+
+def _apply_segment(fd, segment, skip):
+    """Write the segment's page images into the database file, as a checkpoint would"""
+    page_size = segment['page_size']
+    frame_size = FRAME_HEADER.size + page_size
+    with open(segment['path'], 'rb') as f:
+        f.seek(SEGMENT_HEADER.size + skip * frame_size)
+        for _ in range(segment['frames'] - skip):
+            frame = f.read(frame_size)
+            page, commit, _, _, _, _ = FRAME_HEADER.unpack_from(frame)
+            os.pwrite(fd, frame[FRAME_HEADER.size:], (page - 1) * page_size)
+            if commit:
+                os.ftruncate(fd, commit * page_size)
+
+
+def restore(target, until=None, base_id=None):
+    """Rebuild the database as of `until` (epoch seconds; None: newest) into the new file `target`"""
+    if os.path.exists(target):
+        raise BackupError(f'{target} already exists')
+    started = time.perf_counter()
+    backups = [report for report in list_backups() if until is None or report['created_at'] <= until]
+    if base_id is not None:
+        backups = [report for report in backups if report['id'] == base_id]
+    if not backups:
+        raise BackupError('No base backup to restore from' + ('' if until is None else ' before that time'))
+    base = backups[-1]
+
+    temp_path = target + '.tmp'
+    shutil.copyfile(os.path.join(backup_dir('base'), base['id'] + '.db'), temp_path)
+    try:
+        position = base['wal']
+        recovered_to, segments, frames = base['created_at'], 0, 0
+        fd = os.open(temp_path, os.O_RDWR)
+        try:
+            for segment in list_segments():
+                if segment['archived_at'] < base['created_at']:
+                    continue
+                if until is not None and segment['archived_at'] > until:
+                    break
+                if segment['break']:
+                    raise BackupError(f'WAL archive restarted at '
+                                      f'{datetime.fromtimestamp(segment["archived_at"]):%Y-%m-%d %H:%M:%S}; '
+                                      f'restore to an earlier time or from a later base backup')
+                skip = _skip_frames(position, segment)
+                if skip < segment['frames']:
+                    _apply_segment(fd, segment, skip)
+                    segments += 1
+                    frames += segment['frames'] - skip
+                    position = {'salt1': segment['salt1'], 'salt2': segment['salt2'],
+                                'frame': segment['first'] + segment['frames']}
+                recovered_to = segment['archived_at']
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+        conn = sqlite3.connect(temp_path)
+        try:
+            check = conn.execute('PRAGMA integrity_check').fetchone()[0]
+        finally:
+            conn.close()
+        if check != 'ok':
+            raise BackupError(f'Restored database failed its integrity check: {check}')
+        os.replace(temp_path, target)
+    finally:
+        for path in (temp_path, temp_path + '-wal', temp_path + '-shm'):
+            if os.path.exists(path):
+                os.remove(path)
+    return {'base': base['id'], 'segments': segments, 'frames': frames,
+            'recovered_to': datetime.fromtimestamp(recovered_to).isoformat(timespec='seconds'),
+            'seconds': round(time.perf_counter() - started, 3)}
+
+
+# --- Scheduling --------------------------------------------------------------
+
+def start_backup_scheduler(backup_interval, wal_interval=None):
+    """Keep a base backup at most `backup_interval` seconds old and archive the WAL every `wal_interval`
+
+    Run once per deployment (jobs.py). Either interval
+    may be None to disable that job.
+    """
+    if not _scheduled:
+        if backup_interval:
+            _scheduled.append(PeriodicTask('base-backup', min(BACKUP_CHECK_INTERVAL, backup_interval),
+                                           lambda: backup_if_due(backup_interval)))
+        if wal_interval:
+            _scheduled.append(PeriodicTask('wal-archiver', wal_interval, archiver().archive))
+    return [task.start() for task in _scheduled]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('command', choices=['backup', 'archive', 'list', 'restore'])
+    parser.add_argument('target', nargs='?', help='restore: new database file to write')
+    parser.add_argument('--until', help='restore: ISO time to recover to (default: newest)')
+    parser.add_argument('--base', help='restore: id of the base backup to start from')
+    parser.add_argument('--database', help='database file (default: SHOPTRACKER_DB)')
+    args = parser.parse_args()
+
+    from app import init_database
+    if args.database:
+        db.configure(args.database)
+    init_database()
+
+    if args.command == 'backup':
+        report = take_backup()
+        print(f"Base backup {report['id']}: {report['bytes'] / 1024 / 1024:.1f} MB in "
+              f"{report['seconds']:.2f} s ({report['mb_per_s']} MB/s, {report['steps']} steps, "
+              f"writers held {report['lock_ms']:.1f} ms)")
+    elif args.command == 'archive':
+        result = archiver().archive()
+        print(f"Archived {result['frames']} WAL frames (write lock held {result['lock_ms']:.1f} ms)"
+              + (f", new base backup {result['base']}" if result['break'] else ''))
+        archiver().close()
+    elif args.command == 'list':
+        summary = archive_summary()
+        for report in summary['backups']:
+            print(f"{report['id']}  {report['bytes'] / 1024 / 1024:>9.1f} MB  {report['seconds']:>8.2f} s  "
+                  f"{report['mb_per_s']} MB/s")
+        print(f"{summary['segments']} WAL segments ({summary['segment_bytes'] / 1024 / 1024:.1f} MB), "
+              f"recoverable to {summary['recoverable_to']}")
+    else:
+        if not args.target:
+            parser.error('restore needs a TARGET file')
+        until = datetime.fromisoformat(args.until).timestamp() if args.until else None
+        try:
+            result = restore(args.target, until, args.base)
+        except BackupError as e:
+            parser.exit(1, f'Restore failed: {e}\n')
+        print(f"Restored {args.target} from base {result['base']} + {result['frames']} WAL frames "
+              f"({result['segments']} segments) to {result['recovered_to']} in {result['seconds']:.2f} s")
+    db.close_pools()
+
+
+if __name__ == '__main__':
+    main()
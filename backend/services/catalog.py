@@ -0,0 +1,81 @@
+# backend/services/catalog.py
+from models.product import Product
+from services import catalog_snapshot
+from utils.db import get_read_connection
+from utils.queries import PRODUCT_BY_BARCODE
+
+
+def _snapshot_lookup(barcode):
+    """(snapshot, record index) of a barcode in the catalog snapshot, or (snapshot, None)"""
+    snapshot = catalog_snapshot.current_snapshot()
+    if snapshot is None:
+        return None, None
+    index = snapshot.find_barcode(barcode)
+    catalog_snapshot.record_lookup(index is not None)
+    return snapshot, index
+
+
+def _database_lookup(barcode, conn=None):
+    if conn is None:
+        read_conn = get_read_connection()
+        try:
+            rows = PRODUCT_BY_BARCODE.records(Product, read_conn, (barcode,))
+        finally:
+            read_conn.close()
+    else:
+        rows = PRODUCT_BY_BARCODE.records(Product, conn, (barcode,))
+    return rows[0] if rows else None
+
+
+def find_product_by_barcode(barcode, conn=None):
+    """Resolve a barcode to a Product, from the catalog snapshot when possible
+
+    Products added since the snapshot was built are looked up in the
+    database: on `conn` if one is given (so it can be part of the caller's
+    transaction), otherwise on a read-only connection.
+    """
+    snapshot, index = _snapshot_lookup(barcode)
+    if index is not None:
+        return snapshot.product(index)
+    return _database_lookup(barcode, conn)
+
+
+def find_product_json(barcode):
+    """API JSON (bytes) of the product with a barcode, or None
+
+    Served straight from the snapshot's pre-serialized records.
+    """
+    snapshot, index = _snapshot_lookup(barcode)
+    if index is not None:
+        return snapshot.product_json(index)
+    product = _database_lookup(barcode)
+    return product.to_json().encode() if product is not None else None
+
+
+def list_products_json(category=None, is_common=None, search=None):
+    """(JSON array bytes, count) of the matching products from the snapshot
+
+    Returns None when the snapshot cannot answer (none built yet, or LIKE
+    wildcards in the search); the caller queries the database instead.
+    """
+    snapshot = catalog_snapshot.current_snapshot()
+    if snapshot is None:
+        return None
+    indexes = snapshot.matching(category, is_common, search)
+    if indexes is None:
+        return None
+    return snapshot.products_json(indexes), len(indexes)
+
+
+def warm_catalog():
+    """Map the catalog snapshot and read it ahead; returns its product count"""
+    snapshot = catalog_snapshot.current_snapshot()
+    if snapshot is None:
+        return 0
+    snapshot.warm()
+    return snapshot.count
+
+
+def invalidate_catalog():
+    """Rebuild the catalog snapshot after the products table changes"""
+    catalog_snapshot.build_snapshot()
@@ -0,0 +1,422 @@
+# backend/services/catalog_snapshot.py
+"""Immutable product catalog file, memory-mapped by every worker
+
+The products table is compiled into one binary file that each worker maps
+read-only. Pages of a file mapping live once in the OS page cache however
+many processes map them, so adding workers adds no copies of the catalog;
+lookups read straight from the mapping. The file holds, in native byte
+order (it is a local cache, rebuilt on the host that uses it):
+
+    header      magic, catalog version, counts and section offsets
+    records     per product: offset/length of its JSON and of its barcode
+    json        every product pre-serialized as its API JSON object
+    barcodes    the barcode strings
+    table       open-addressing hash table: barcode hash -> record
+    haystack    "name\\0brand\\n" per record, ASCII-lowercased, for search
+    starts      offset of each record in the haystack
+    categories  category id per record, then each category's record list
+    directory   JSON {category: [id, postings offset, postings count]}
+
+Records are in /api/products order (common first, then by name), so the
+common products are a prefix and every filter yields records in order.
+
+A snapshot file is never modified. Rebuilding writes a new file and renames
+it over the old one; each worker checks the file at most every
+CHECK_INTERVAL seconds and maps the new one, while requests holding the old
+mapping finish on it. A snapshot's version is catalog_version.version,
+which triggers on products bump on every change (app.init_database).
+
+    python -m services.catalog_snapshot [--force] [--database PATH]
+"""
+import argparse
+import bisect
+import fcntl
+import hashlib
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+from array import array
+from contextlib import contextmanager
+
+from models.product import Product
+from utils import db, queries
+from utils.scheduler import PeriodicTask
+
+MAGIC = b'STCATLG1'
+CHECK_INTERVAL = 1.0  # seconds between checks for a rebuilt file
+SECTIONS = ('records', 'json', 'barcodes', 'table', 'haystack', 'starts',
+            'category_ids', 'postings', 'directory')
+# magic, version, built_at, count, common_count, table slots, section offsets, end
+HEADER = struct.Struct('=8sQdIII' + 'Q' * len(SECTIONS) + 'Q')
+RECORD = struct.Struct('=IIII')  # json offset, json length, barcode offset, barcode length
+SLOT = struct.Struct('=QI')  # barcode hash (0: empty), record + 1
+NO_CATEGORY = 0xFFFF
+LIKE_WILDCARDS = ('%', '_')
+
+_path = None
+_current = None
+_checked_at = 0.0
+_lock = threading.Lock()
+_refresher = None
+lookups = 0
+hits = 0
+
+
+class SnapshotError(ValueError):
+    """Raised when a file is not a usable catalog snapshot"""
+
+
+def configure(path=None):
+    """Set the snapshot file (None: next to the database)"""
+    global _path, _current
+    _path = path
+    with _lock:
+        _current = None
+
+
+def snapshot_path():
+    return _path or db.DATABASE + '.catalog'
+
+
+def _hash(key):
+    return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), 'little') or 1
+
+
+def compile_snapshot(products, version, built_at=None):
+    """File contents (a list of byte chunks) for `products`, already in list order"""
+    count = len(products)
+    common_count = sum(1 for product in products if product.is_common)
+
+    records = bytearray()
+    json_blob = bytearray()
+    barcodes = bytearray()
+    haystack = bytearray()
+    starts = array('I')
+    category_ids = array('H')
+    categories = {}  # category -> record indexes
+    category_index = {}  # category -> id
+    slots = 1
+    while slots < 2 * count:
+        slots *= 2
+    table = bytearray(SLOT.size * slots)
+
+    for index, product in enumerate(products):
+        body = product.to_json().encode()
+        barcode = (product.barcode or '').encode()
+        records += RECORD.pack(len(json_blob), len(body), len(barcodes), len(barcode))
+        json_blob += body
+        barcodes += barcode
+        starts.append(len(haystack))
+        haystack += ((product.name or '').encode() + b'\0' + (product.brand or '').encode()).lower()
+        haystack += b'\n'
+        if product.category is None:
+            category_ids.append(NO_CATEGORY)
+        else:
+            records_of = categories.get(product.category)
+            if records_of is None:
+                records_of = categories[product.category] = array('I')
+                category_index[product.category] = len(category_index)
+            records_of.append(index)
+            category_ids.append(category_index[product.category])
+        if barcode:
+            key = _hash(barcode)
+            slot = key & (slots - 1)
+            while SLOT.unpack_from(table, slot * SLOT.size)[1]:
+                slot = (slot + 1) & (slots - 1)
+            SLOT.pack_into(table, slot * SLOT.size, key, index + 1)
+
+    if len(categories) >= NO_CATEGORY:
+        raise SnapshotError(f'Too many categories for a snapshot: {len(categories)}')
+    postings = array('I')
+    directory = {}
+    for category_id, (category, records_of) in enumerate(categories.items()):
+        directory[category] = [category_id, len(postings), len(records_of)]
+        postings.extend(records_of)
+
+    sections = [bytes(records), bytes(json_blob), bytes(barcodes), bytes(table),
+                bytes(haystack), starts.tobytes(), category_ids.tobytes(), postings.tobytes(),
+                json.dumps(directory).encode()]
+    offsets = []
+    position = HEADER.size
+    for section in sections:
+        # Keep the arrays aligned to their item size
+        position += -position % 8
+        offsets.append(position)
+        position += len(section)
+    header = HEADER.pack(MAGIC, version, built_at or time.time(), count, common_count, slots,
+                         *offsets, position)
+
+    chunks = [header]
+    written = HEADER.size
+    for offset, section in zip(offsets, sections):
+        chunks.append(b'\0' * (offset - written))
+        chunks.append(section)
+        written = offset + len(section)
+    return chunks
+
+
+class CatalogSnapshot:
+    """A read-only mapping of one snapshot file"""
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self.stat = os.fstat(f.fileno())
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._map) < HEADER.size:
+            raise SnapshotError(f'Not a catalog snapshot: {path}')
+        header = HEADER.unpack_from(self._map)
+        magic, self.version, self.built_at, self.count, self.common_count, self.slots = header[:6]
+        offsets = dict(zip(SECTIONS, header[6:-1]))
+        if magic != MAGIC or header[-1] != len(self._map):
+            raise SnapshotError(f'Not a catalog snapshot, or truncated: {path}')
+
+        view = memoryview(self._map)
+        self._records = offsets['records']
+        self._json = offsets['json']
+        self._barcodes = offsets['barcodes']
+        self._table = offsets['table']
+        self._haystack = offsets['haystack']
+        self._starts = view[offsets['starts']:offsets['starts'] + 4 * self.count].cast('I')
+        self._category_ids = view[offsets['category_ids']:
+                                  offsets['category_ids'] + 2 * self.count].cast('H')
+        postings_end = offsets['directory']
+        postings_end -= (postings_end - offsets['postings']) % 4
+        self._postings = view[offsets['postings']:postings_end].cast('I')
+        self._directory = json.loads(self._map[offsets['directory']:header[-1]])
+        # Padding after the haystack is NUL, which a search term never holds
+        self._haystack_end = offsets['starts']
+        self.size = len(self._map)
+
+    def _record(self, index):
+        return RECORD.unpack_from(self._map, self._records + index * RECORD.size)
+
+    def product_json(self, index):
+        json_offset, json_length, _, _ = self._record(index)
+        start = self._json + json_offset
+        return self._map[start:start + json_length]
+
+    def find_barcode(self, barcode):
+        """Record index of the product with this barcode, or None"""
+        if not self.count:
+            return None
+        key = barcode.encode()
+        wanted = _hash(key)
+        mask = self.slots - 1
+        slot = wanted & mask
+        while True:
+            slot_hash, record = SLOT.unpack_from(self._map, self._table + slot * SLOT.size)
+            if not record:
+                return None
+            if slot_hash == wanted:
+                _, _, barcode_offset, barcode_length = self._record(record - 1)
+                start = self._barcodes + barcode_offset
+                if self._map[start:start + barcode_length] == key:
+                    return record - 1
+            slot = (slot + 1) & mask
+
+    def product(self, index):
+        return Product(**json.loads(self.product_json(index)))
+
+    def _search(self, term, lo, hi):
+        """Records in [lo, hi) whose name or brand contains `term`"""
+        end = self._haystack + self._starts[hi] if hi < self.count else self._haystack_end
+        position = self._haystack + self._starts[lo]
+        found = []
+        while True:
+            position = self._map.find(term, position, end)
+            if position < 0:
+                return found
+            index = bisect.bisect_right(self._starts, position - self._haystack) - 1
+            found.append(index)
+            if index + 1 >= self.count:
+                return found
+            position = self._haystack + self._starts[index + 1]
+
+    def matching(self, category=None, is_common=None, search=None):
+        """Record indexes for the /api/products filters, in list order
+
+        Returns None when the search holds LIKE wildcards, which only the
+        database can evaluate.
+        """
+        lo, hi = 0, self.count
+        if is_common == 1:
+            hi = self.common_count
+        elif is_common == 0:
+            lo = self.common_count
+        if lo >= hi:
+            return []
+
+        category_id = None
+        if category is not None:
+            entry = self._directory.get(category)
+            if entry is None:
+                return []
+            category_id, first, length = entry
+
+        if search is not None:
+            if any(wildcard in search for wildcard in LIKE_WILDCARDS) or '\0' in search or '\n' in search:
+                return None
+            # LIKE folds ASCII case only, as bytes.lower() does
+            found = self._search(search.encode().lower(), lo, hi)
+            if category_id is None:
+                return found
+            return [index for index in found if self._category_ids[index] == category_id]
+
+        if category_id is None:
+            return range(lo, hi)
+        postings = self._postings[first:first + length]
+        return postings[bisect.bisect_left(postings, lo):bisect.bisect_left(postings, hi)]
+
+    def products_json(self, indexes):
+        """JSON array (bytes) of the products at `indexes`"""
+        return b'[' + b','.join(map(self.product_json, indexes)) + b']'
+
+    def warm(self):
+        """Ask the OS to read the whole file ahead (pages are shared between workers)"""
+        if hasattr(self._map, 'madvise') and hasattr(mmap, 'MADV_WILLNEED'):
+            self._map.madvise(mmap.MADV_WILLNEED)
+
+    def stats(self):
+        return {'version': self.version, 'products': self.count, 'bytes': self.size,
+                'built_at': self.built_at}
+
+
+def current_snapshot():
+    """The newest snapshot on disk, or None if there is none yet
+
+    The file is re-checked at most every CHECK_INTERVAL seconds.
+    """
+    global _current, _checked_at
+    now = time.monotonic()
+    snapshot = _current
+    if snapshot is not None and now - _checked_at < CHECK_INTERVAL:
+        return snapshot
+    with _lock:
+        if _current is not None and now - _checked_at < CHECK_INTERVAL:
+            return _current
+        _checked_at = now
+        path = snapshot_path()
+        try:
+            stat = os.stat(path)
+        except OSError:
+            _current = None
+            return None
+        if _current is not None and (stat.st_ino, stat.st_mtime_ns) == \
+                (_current.stat.st_ino, _current.stat.st_mtime_ns):
+            return _current
+        try:
+            _current = CatalogSnapshot(path)
+        except (OSError, ValueError) as e:
+            print(f"Ignoring catalog snapshot {path}: {e}")
+            _current = None
+        return _current
+
+
+def record_lookup(found):
+    global lookups, hits
+    lookups += 1
+    hits += found
+
+
+def snapshot_stats():
+    snapshot = current_snapshot()
+    stats = snapshot.stats() if snapshot is not None else {'version': None}
+    stats.update(path=snapshot_path(), lookups=lookups, hits=hits)
+    return stats
+
+
+def _file_version(path):
+    try:
+        with open(path, 'rb') as f:
+            header = f.read(HEADER.size)
+    except OSError:
+        return None
+    if len(header) < HEADER.size:
+        return None
+    magic, version = HEADER.unpack(header)[:2]
+    return version if magic == MAGIC else None
+
+
+@contextmanager
+def _build_lock(path):
+    """One builder per snapshot file across processes"""
+    with open(path + '.lock', 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def build_snapshot(force=False):
+    """Rebuild the snapshot file if the catalog changed since it was built
+
+    Returns {'version', 'products', 'built'}; the version and the products
+    are read in one snapshot of the database.
+    """
+    global _checked_at
+    path = snapshot_path()
+    with _build_lock(path):
+        conn = db.get_read_connection()
+        try:
+            conn.execute('BEGIN')
+            try:
+                version = queries.CATALOG_VERSION.fetchone(conn)['version']
+                if not force and _file_version(path) == version:
+                    return {'version': version, 'products': None, 'built': False}
+                products = queries.LIST_PRODUCTS.records(Product, conn, {
+                    'category': None, 'is_common': None, 'search': None})
+            finally:
+                conn.rollback()
+        finally:
+            conn.close()
+
+        temp_path = f'{path}.{os.getpid()}.tmp'
+        try:
+            with open(temp_path, 'wb') as f:
+                f.writelines(compile_snapshot(products, version))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+    # This process picks the new file up on its next lookup
+    _checked_at = 0.0
+    return {'version': version, 'products': len(products), 'built': True}
+
+
+def start_snapshot_refresher(interval):
+    """Rebuild the snapshot in the background when products change"""
+    global _refresher
+    if _refresher is None:
+        _refresher = PeriodicTask('catalog-snapshot', interval, build_snapshot)
+    return _refresher.start()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build the memory-mapped catalog snapshot')
+    parser.add_argument('--force', action='store_true', help='rebuild even if it is up to date')
+    parser.add_argument('--database', help='database file (default: SHOPTRACKER_DB)')
+    args = parser.parse_args()
+
+    from app import init_database
+    if args.database:
+        db.configure(args.database)
+    init_database()
+
+    started = time.perf_counter()
+    result = build_snapshot(args.force)
+    if result['built']:
+        print(f"Built {snapshot_path()}: {result['products']} products, version {result['version']} "
+              f"({time.perf_counter() - started:.2f} s)")
+    else:
+        print(f"{snapshot_path()} is up to date (version {result['version']})")
+    db.close_pools()
+
+
+if __name__ == '__main__':
+    main()
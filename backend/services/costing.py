@@ -0,0 +1,116 @@
+# backend/services/costing.py
+"""Cost of goods sold from per-item cost layers
+
+Every restock adds a cost layer (units at a unit cost) for its shop and
+product, and every sale consumes layers oldest first. The cost of the units
+taken is stamped on the sale transaction and added to the daily rollups, so
+profit reports are sums over maintained aggregates rather than a replay of
+the ledger. With the 'average' method an item keeps a single layer whose
+unit cost is re-averaged on each restock (weighted average cost).
+"""
+import os
+from datetime import date, datetime, timedelta
+
+from utils import queries
+from utils.db import get_db_connection, get_read_connection, write_transaction
+
+METHODS = ('fifo', 'average')
+COSTING_METHOD = os.environ.get('SHOPTRACKER_COSTING_METHOD', 'fifo')
+DEFAULT_DAYS = 30  # period covered when no dates are given
+
+
+def configure(method=None):
+    """Choose how restocks are layered: 'fifo' or 'average'"""
+    global COSTING_METHOD
+    if method:
+        if method not in METHODS:
+            raise ValueError(f"costing method must be one of: {', '.join(METHODS)}")
+        COSTING_METHOD = method
+
+
+def receive(conn, shop_id, product_id, quantity, unit_cost, received_at):
+    """Add `quantity` units at `unit_cost` to the item's cost layers
+
+    Must run inside the restock's write transaction.
+    """
+    if COSTING_METHOD == 'average':
+        layers = queries.COST_LAYERS.fetchall(conn, (shop_id, product_id))
+        if layers:
+            units = sum(layer['quantity_remaining'] for layer in layers)
+            value = sum(layer['unit_cost'] * layer['quantity_remaining'] for layer in layers)
+            unit_cost = (value + quantity * unit_cost) / (units + quantity)
+            quantity += units
+            queries.DELETE_COST_LAYERS(conn, (shop_id, product_id))
+    queries.INSERT_COST_LAYER(conn, (shop_id, product_id, received_at, unit_cost, quantity))
+
+
+def consume(conn, shop_id, product_id, quantity, fallback_cost=0.0):
+    """Take `quantity` units from the oldest layers and return their cost
+
+    Must run inside the sale's write transaction. Units beyond the open
+    layers are costed at `fallback_cost` (the item's current cost price).
+    """
+    cost = 0.0
+    remaining = quantity
+    for layer in queries.COST_LAYERS.fetchall(conn, (shop_id, product_id)):
+        taken = min(remaining, layer['quantity_remaining'])
+        cost += taken * layer['unit_cost']
+        remaining -= taken
+        if taken == layer['quantity_remaining']:
+            queries.DELETE_COST_LAYER(conn, (layer['id'],))
+        else:
+            queries.SET_COST_LAYER_REMAINING(conn, (layer['quantity_remaining'] - taken, layer['id']))
+        if not remaining:
+            break
+    return cost + remaining * (fallback_cost or 0.0)
+
+
+def backfill_cost_layers():
+    """Open a layer at the current cost price for stock without layers"""
+    conn = get_db_connection()
+    try:
+        with write_transaction(conn):
+            return queries.BACKFILL_COST_LAYERS(conn, (datetime.now().isoformat(),)).rowcount
+    finally:
+        conn.close()
+
+
+def _margin(revenue, profit):
+    return round(profit / revenue, 4) if revenue else None
+
+
+def shop_profit(shop_id, start=None, end=None, top=10, max_staleness=None):
+    """Revenue, cost of goods, gross profit and margin for one shop
+
+    Answered from the daily rollups and the open cost layers; dates are
+    inclusive and default to the last DEFAULT_DAYS days.
+    """
+    end = date.fromisoformat(end) if end else date.today()
+    start = date.fromisoformat(start) if start else end - timedelta(days=DEFAULT_DAYS - 1)
+    if start > end:
+        raise ValueError('from must not be after to')
+
+    params = {'shop_id': shop_id, 'start': start.isoformat(), 'end': end.isoformat(),
+              'limit': top}
+    conn = get_read_connection(max_staleness)
+    try:
+        totals = dict(queries.PROFIT_TOTALS.fetchone(conn, params))
+        by_day = [dict(row) for row in queries.PROFIT_BY_DAY.fetchall(conn, params)]
+        top_products = [dict(row) for row in queries.PROFIT_BY_PRODUCT.fetchall(conn, params)]
+        stock = dict(queries.STOCK_AT_COST.fetchone(conn, (shop_id,)))
+    finally:
+        conn.close()
+
+    totals['gross_profit'] = totals['revenue'] - totals['cost_of_goods']
+    for row in [totals] + by_day + top_products:
+        row['margin'] = _margin(row['revenue'], row['gross_profit'])
+
+    return {
+        'shop_id': shop_id,
+        'period': {'from': params['start'], 'to': params['end']},
+        'costing_method': COSTING_METHOD,
+        'totals': totals,
+        'by_day': by_day,
+        'top_products': top_products,
+        'stock_at_cost': stock,
+    }
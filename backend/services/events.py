@@ -0,0 +1,340 @@
+# backend/services/events.py
+import asyncio
+import itertools
+import json
+import os
+import queue
+import threading
+
+from utils import queries
+from utils.db import get_db_connection, get_read_connection, write_transaction
+from utils.scheduler import PeriodicTask
+
+# Under the eventlet/gevent workers threading and queue are monkey-patched,
+# so a blocked subscriber parks a green thread, not an OS thread. Under the
+# ASGI server (asgi.py) subscribers use async_event_stream instead.
+#
+# A client's stream is held by whichever worker process accepted it, while
+# the stock change may be made in any other. So changes do not go from the
+# request to the broker: they are inserted into stock_events inside their
+# own write transaction (record_stock_change), and each process with
+# subscribers tails that table (StockEventFeed). Ids follow commit order,
+# so every process delivers a shop's changes in the order they happened.
+
+POLL_INTERVAL = 0.2  # seconds before a change made in another process is delivered
+FEED_BATCH = 500  # changes read per poll
+EVENT_BACKLOG = 10000  # newest stock_events rows kept by the pruner
+
+
+class Subscription:
+    """One SSE client's bounded event queue"""
+
+    def __init__(self, shop_id, maxsize):
+        self.shop_id = shop_id
+        self.queue = queue.Queue(maxsize)
+        self.dropped = 0  # events dropped since the subscriber last emptied its queue
+        self.closed = False
+        self.on_event = None  # called after each put, from the publishing thread
+
+    def wakeup(self):
+        if self.on_event is not None:
+            try:
+                self.on_event()
+            except RuntimeError:  # the consumer's event loop is gone
+                pass
+
+
+class EventBroker:
+    """In-process fan-out of per-shop events to SSE subscribers
+
+    Publishing never blocks: when a subscriber's queue is full its oldest
+    event is dropped. A subscriber that falls more than `max_dropped` events
+    behind is disconnected with an `overflow` event so the client re-fetches
+    the inventory instead of reading an ever older backlog. Emptying its
+    queue catches a subscriber up, so only drops since then count; slow
+    bursts spread over a long connection do not add up to a disconnect.
+    """
+
+    def __init__(self, queue_size=256, max_dropped=1024):
+        self.queue_size = queue_size
+        self.max_dropped = max_dropped
+        self._subscribers = {}
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+
+    def subscribe(self, shop_id):
+        subscription = Subscription(shop_id, self.queue_size)
+        with self._lock:
+            self._subscribers.setdefault(shop_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        subscription.closed = True
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.shop_id)
+            if subscribers:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.shop_id]
+
+    def subscriber_count(self, shop_id=None):
+        with self._lock:
+            if shop_id is not None:
+                return len(self._subscribers.get(shop_id, ()))
+            return sum(len(subs) for subs in self._subscribers.values())
+
+    def disconnect_all(self):
+        """Send every subscriber `overflow` and close its stream"""
+        with self._lock:
+            subscribers = [subscription for subscriptions in self._subscribers.values()
+                           for subscription in subscriptions]
+        for subscription in subscribers:
+            self._disconnect(subscription)
+            subscription.wakeup()
+
+    def publish(self, shop_id, event_type, data):
+        with self._lock:
+            subscribers = list(self._subscribers.get(shop_id, ()))
+        if not subscribers:
+            return 0
+
+        event = (next(self._ids), event_type, json.dumps(data, default=str))
+        for subscription in subscribers:
+            self._offer(subscription, event)
+            subscription.wakeup()
+        return len(subscribers)
+
+    def _offer(self, subscription, event):
+        # Only the subscriber's reads empty the queue (a drop is always
+        # followed by a put), so an empty queue means it has caught up
+        if subscription.queue.empty():
+            subscription.dropped = 0
+        while True:
+            try:
+                subscription.queue.put_nowait(event)
+                return
+            except queue.Full:
+                pass
+            try:
+                subscription.queue.get_nowait()
+                subscription.dropped += 1
+            except queue.Empty:
+                continue
+            if subscription.dropped > self.max_dropped:
+                self._disconnect(subscription)
+                return
+
+    def _disconnect(self, subscription):
+        self.unsubscribe(subscription)
+        overflow = (next(self._ids), 'overflow', json.dumps({'dropped': subscription.dropped}))
+        with subscription.queue.mutex:
+            subscription.queue.queue.clear()
+            subscription.queue.queue.append(overflow)
+            subscription.queue.queue.append(None)
+            subscription.queue.not_empty.notify()
+
+
+class StockEventFeed:
+    """Delivers the stock changes committed by any process to this process's broker
+
+    Follows stock_events only while the process has subscribers, starting
+    from the newest change when the first one subscribes. A change made in
+    another process is delivered within `interval` seconds; one made in this
+    process as soon as publish_stock_changes() wakes the feed. If the pruner
+    removed changes before they were read, every subscriber gets `overflow`
+    and re-fetches the inventory.
+    """
+
+    def __init__(self, broker, interval=POLL_INTERVAL, batch=FEED_BATCH):
+        self.broker = broker
+        self.interval = interval
+        self.batch = batch
+        self.last_id = None  # newest change delivered; None while not following
+        self.delivered = 0
+        self.polls = 0
+        self.gaps = 0
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+        self._pid = None  # process the feed thread runs in
+
+    def follow(self):
+        """Start following, if not already, from the newest change"""
+        with self._lock:
+            if self.last_id is None:
+                conn = get_read_connection()
+                try:
+                    self.last_id = queries.NEWEST_STOCK_EVENT.fetchone(conn)['id']
+                finally:
+                    conn.close()
+            # Threads do not survive a fork
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                threading.Thread(target=self._run, name='stock-event-feed', daemon=True).start()
+
+    def wake(self):
+        """Poll now instead of at the next interval"""
+        self._wake.set()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            try:
+                if self.poll() == self.batch:
+                    self._wake.set()
+            except Exception as e:
+                print(f"stock-event-feed failed: {e}")
+
+    def poll(self):
+        """Deliver the changes committed since the last poll; returns how many"""
+        with self._lock:
+            if self.last_id is None:
+                return 0
+            if not self.broker.subscriber_count():
+                self.last_id = None
+                return 0
+            conn = get_read_connection()
+            try:
+                rows = queries.STOCK_EVENTS_AFTER.fetchall(conn, (self.last_id, self.batch))
+            finally:
+                conn.close()
+            self.polls += 1
+            if rows and rows[0]['id'] != self.last_id + 1:
+                self.gaps += 1
+                self.broker.disconnect_all()
+            for row in rows:
+                _publish_change(self.broker, row['shop_id'], row)
+            if rows:
+                self.last_id = rows[-1]['id']
+                self.delivered += len(rows)
+            return len(rows)
+
+    def stats(self):
+        return {'following': self.last_id is not None, 'last_id': self.last_id,
+                'subscribers': self.broker.subscriber_count(), 'delivered': self.delivered,
+                'polls': self.polls, 'gaps': self.gaps}
+
+
+broker = EventBroker()
+feed = StockEventFeed(broker)
+_pruner = None
+
+
+def configure(poll_interval=None):
+    """Seconds before a stock change made in another worker reaches this one's subscribers"""
+    if poll_interval:
+        feed.interval = poll_interval
+
+
+def subscribe(shop_id):
+    """Subscribe to a shop's stock events, whichever process makes the changes"""
+    subscription = broker.subscribe(shop_id)
+    feed.follow()
+    return subscription
+
+
+def record_stock_change(conn, shop_id, change, created_at):
+    """Queue a stock change for every process's subscribers
+
+    Must run inside the change's write transaction; see
+    publish_stock_changes for after the commit.
+    """
+    queries.INSERT_STOCK_EVENT(conn, (shop_id, change['product_id'], change['previous_stock'],
+                                      change['new_stock'], change['reorder_level'], created_at))
+
+
+def record_stock_changes(conn, shop_id, changes, created_at):
+    """record_stock_change for many changes"""
+    queries.INSERT_STOCK_EVENT.executemany(conn, (
+        (shop_id, change['product_id'], change['previous_stock'], change['new_stock'],
+         change['reorder_level'], created_at) for change in changes))
+
+
+def publish_stock_changes():
+    """Deliver the changes this process just committed without waiting for the next poll"""
+    feed.wake()
+
+
+def _publish_change(broker, shop_id, change):
+    """Publish stock_change, plus low_stock/stock_recovered on a threshold crossing"""
+    previous_stock = change['previous_stock']
+    new_stock = change['new_stock']
+    reorder_level = change['reorder_level']
+    data = {
+        'product_id': change['product_id'],
+        'previous_stock': previous_stock,
+        'current_stock': new_stock,
+        'reorder_level': reorder_level,
+        'low_stock': new_stock <= reorder_level
+    }
+    broker.publish(shop_id, 'stock_change', data)
+    if previous_stock > reorder_level >= new_stock:
+        broker.publish(shop_id, 'low_stock', data)
+    elif previous_stock <= reorder_level < new_stock:
+        broker.publish(shop_id, 'stock_recovered', data)
+
+
+def prune_stock_events(keep=EVENT_BACKLOG):
+    """Delete all but the newest `keep` stock changes"""
+    conn = get_db_connection()
+    try:
+        with write_transaction(conn):
+            return queries.PRUNE_STOCK_EVENTS(conn, (keep,)).rowcount
+    finally:
+        conn.close()
+
+
+def start_event_pruner(interval):
+    """Prune stock_events in the background every `interval` seconds"""
+    global _pruner
+    if _pruner is None:
+        _pruner = PeriodicTask('stock-event-pruner', interval, prune_stock_events)
+    return _pruner.start()
+
+
+def event_stream(subscription, heartbeat=15.0):
+    """Yield Server-Sent Events for a subscription until it is closed"""
+    try:
+        yield 'retry: 3000\n\n'
+        while not subscription.closed or not subscription.queue.empty():
+            try:
+                event = subscription.queue.get(timeout=heartbeat)
+            except queue.Empty:
+                yield ': keepalive\n\n'
+                continue
+            if event is None:
+                break
+            event_id, event_type, payload = event
+            yield f'id: {event_id}\nevent: {event_type}\ndata: {payload}\n\n'
+    finally:
+        broker.unsubscribe(subscription)
+
+
+async def async_event_stream(subscription, heartbeat=15.0):
+    """event_stream for the ASGI server: a waiting client holds no thread"""
+    loop = asyncio.get_running_loop()
+    ready = asyncio.Event()
+    subscription.on_event = lambda: loop.call_soon_threadsafe(ready.set)
+    try:
+        yield 'retry: 3000\n\n'
+        while True:
+            try:
+                event = subscription.queue.get_nowait()
+            except queue.Empty:
+                if subscription.closed:
+                    break
+                ready.clear()
+                # A put between get_nowait() and clear() must not be missed
+                if subscription.queue.empty():
+                    try:
+                        await asyncio.wait_for(ready.wait(), heartbeat)
+                    except asyncio.TimeoutError:
+                        yield ': keepalive\n\n'
+                continue
+            if event is None:
+                break
+            event_id, event_type, payload = event
+            yield f'id: {event_id}\nevent: {event_type}\ndata: {payload}\n\n'
+    finally:
+        subscription.on_event = None
+        broker.unsubscribe(subscription)
@@ -0,0 +1,313 @@
+# backend/services/export.py
+"""Columnar export of the transaction ledger for offline analytics
+
+Streams transactions from the sealed ledger partitions and the hot table,
+joined with products and shops, into files partitioned by date and shop:
+
+    <export dir>/<name>/date=2026-10-19/shop=<shop_id>/part-<export_id>.parquet
+
+Parquet (or Arrow IPC) is written when pyarrow is installed, gzipped CSV
+otherwise. Rows are read `chunk_rows` at a time and every partition is
+written as soon as it is complete, so memory stays bounded whatever the
+ledger size. Each named export keeps a watermark (the last exported
+transaction) in `export_watermarks`; the next run only exports newer rows.
+
+    python -m services.export [--name default] [--format auto] [--full] [--out DIR]
+"""
+import argparse
+import csv
+import gzip
+import json
+import os
+import re
+import sqlite3
+from datetime import datetime, timedelta
+from urllib.request import pathname2url
+
+from services import ledger
+from utils import db, queries
+from utils.db import get_db_connection, get_read_connection, write_transaction
+from utils.lazy import optional_import
+
+EXPORT_DIR = os.environ.get('SHOPTRACKER_EXPORT_DIR') or None  # None: next to the database
+CHUNK_ROWS = 50000  # rows fetched from SQLite per batch
+# Rows younger than this are left for the next run, so a sale committed just
+# after the export started can never end up behind the watermark
+SETTLE_SECONDS = 5
+NAME_PATTERN = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+FORMATS = ('auto', 'parquet', 'arrow', 'csv')
+PARTITION_KEYS = ('date', 'shop')
+EXTENSIONS = {'parquet': '.parquet', 'arrow': '.arrow', 'csv': '.csv.gz'}
+
+# Output columns, in order, with their Arrow types
+COLUMNS = (
+    ('transaction_id', 'string'),
+    ('transaction_date', 'string'),
+    ('date', 'string'),
+    ('shop_id', 'string'),
+    ('shop_name', 'string'),
+    ('district', 'string'),
+    ('city', 'string'),
+    ('product_id', 'string'),
+    ('product_name', 'string'),
+    ('category', 'string'),
+    ('brand', 'string'),
+    ('transaction_type', 'string'),
+    ('quantity', 'int64'),
+    ('price_per_unit', 'float64'),
+    ('total_amount', 'float64'),
+)
+DATE_COLUMN = 2
+SHOP_COLUMN = 3
+
+
+class ExportError(Exception):
+    """Raised for export requests that cannot be served"""
+
+
+def configure(export_dir=None):
+    """Set where named exports are written"""
+    global EXPORT_DIR
+    if export_dir:
+        EXPORT_DIR = export_dir
+
+
+def export_dir(name=None):
+    """Base export directory, or the directory of export `name`"""
+    base = EXPORT_DIR or os.path.join(os.path.dirname(os.path.abspath(db.DATABASE)), 'exports')
+    if name is None:
+        return os.path.abspath(base)
+    if not NAME_PATTERN.match(name):
+        raise ExportError('Export name may only contain letters, digits, - and _')
+    return os.path.abspath(os.path.join(base, name))
+
+
+def resolve_format(fmt):
+    """Pick the output format, falling back to CSV without pyarrow"""
+    if fmt not in FORMATS:
+        raise ExportError(f"format must be one of: {', '.join(FORMATS)}")
+    has_arrow = optional_import('pyarrow') is not None
+    if fmt == 'auto':
+        return 'parquet' if has_arrow else 'csv'
+    if fmt in ('parquet', 'arrow') and not has_arrow:
+        raise ExportError(f'{fmt} export needs pyarrow')
+    return fmt
+
+
+def _open_source(path):
+    """Read-only connection on a ledger file with the main database attached as `catalog`"""
+    conn = sqlite3.connect(f'file:{pathname2url(os.path.abspath(path))}?mode=ro', uri=True,
+                           cached_statements=queries.STATEMENT_CACHE_SIZE)
+    catalog = f'file:{pathname2url(os.path.abspath(db.DATABASE))}?mode=ro'
+    conn.execute('ATTACH DATABASE ? AS catalog', (catalog,))
+    return conn
+
+
+def ledger_sources(since_date):
+    """Ledger files that may hold rows after `since_date`, oldest first"""
+    conn = get_read_connection()
+    try:
+        partitions = queries.LEDGER_PARTITIONS_BETWEEN.fetchall(conn, (since_date[:7], '9999-99'))
+    finally:
+        conn.close()
+    paths = [os.path.join(ledger.ledger_dir(), partition['path']) for partition in reversed(partitions)]
+    return paths + [db.DATABASE]
+
+
+def iter_ledger_chunks(since, until, chunk_rows=CHUNK_ROWS):
+    """Yield lists of export rows ordered by date, shop and time
+
+    `since` is the (transaction_date, id) watermark, exclusive; `until` is an
+    inclusive upper bound on transaction_date taken when the export started.
+    """
+    params = {'since_date': since[0], 'since_id': since[1], 'until': until}
+    for path in ledger_sources(since[0]):
+        conn = _open_source(path)
+        try:
+            cursor = queries.EXPORT_LEDGER(conn, params)
+            while True:
+                rows = cursor.fetchmany(chunk_rows)
+                if not rows:
+                    break
+                yield rows
+        finally:
+            conn.close()
+
+
+class _PartitionWriter:
+    """Writes one partition's rows to a Parquet, Arrow IPC or CSV.gz file"""
+
+    def __init__(self, path, fmt):
+        self.path = path
+        self.fmt = fmt
+        self.rows = 0
+        self.closed = False
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if fmt == 'csv':
+            self._file = gzip.open(path, 'wt', newline='', encoding='utf-8')
+            self._csv = csv.writer(self._file)
+            self._csv.writerow(name for name, _ in COLUMNS)
+            return
+
+        pa = optional_import('pyarrow')
+        self._schema = pa.schema([(name, getattr(pa, type_name)()) for name, type_name in COLUMNS])
+        if fmt == 'parquet':
+            self._writer = optional_import('pyarrow.parquet').ParquetWriter(
+                path, self._schema, compression='zstd')
+        else:
+            self._writer = pa.ipc.new_file(
+                path, self._schema, options=pa.ipc.IpcWriteOptions(compression='zstd'))
+
+    def write(self, rows):
+        if not rows:
+            return
+        self.rows += len(rows)
+        if self.fmt == 'csv':
+            self._csv.writerows(rows)
+            return
+        pa = optional_import('pyarrow')
+        columns = list(zip(*rows))
+        table = pa.Table.from_arrays(
+            [pa.array(column, type=field.type) for column, field in zip(columns, self._schema)],
+            schema=self._schema)
+        if self.fmt == 'parquet':
+            self._writer.write_table(table)
+        else:
+            self._writer.write(table)
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        if self.fmt == 'csv':
+            self._file.close()
+        else:
+            self._writer.close()
+
+
+def partition_path(out_dir, row, partition_by, export_id, extension):
+    parts = [out_dir]
+    if 'date' in partition_by:
+        parts.append(f'date={row[DATE_COLUMN]}')
+    if 'shop' in partition_by:
+        parts.append(f'shop={row[SHOP_COLUMN]}')
+    parts.append(f'part-{export_id}{extension}')
+    return os.path.join(*parts)
+
+
+def get_watermark(name):
+    conn = get_read_connection()
+    try:
+        row = queries.EXPORT_WATERMARK.fetchone(conn, (name,))
+    finally:
+        conn.close()
+    return (row['last_transaction_date'], row['last_transaction_id']) if row else ('', '')
+
+
+def _advance_watermark(name, expected, last, rows):
+    """Move the watermark to `last` unless another run moved it first"""
+    conn = get_db_connection()
+    try:
+        with write_transaction(conn):
+            row = queries.EXPORT_WATERMARK.fetchone(conn, (name,))
+            current = (row['last_transaction_date'], row['last_transaction_id']) if row else ('', '')
+            if expected is not None and current != expected:
+                raise ExportError(f'Export {name!r} was run concurrently; try again')
+            queries.SET_EXPORT_WATERMARK(conn, (name, last[0], last[1], rows,
+                                                datetime.now().isoformat()))
+    finally:
+        conn.close()
+
+
+def export_ledger(name='default', fmt='auto', partition_by=PARTITION_KEYS, full=False,
+                  out_dir=None, chunk_rows=CHUNK_ROWS):
+    """Export transactions newer than the watermark of export `name`
+
+    Files go to `out_dir`, by default the export's own directory. With
+    `full` the watermark is ignored and the whole ledger is exported.
+    Returns a summary with the files written and the new watermark.
+    """
+    out_dir = out_dir or export_dir(name)
+    fmt = resolve_format(fmt)
+    partition_by = tuple(partition_by)
+    if not set(partition_by) <= set(PARTITION_KEYS):
+        raise ExportError(f"partition_by may only contain: {', '.join(PARTITION_KEYS)}")
+    if 'shop' in partition_by and 'date' not in partition_by:
+        # Rows stream in date order, so a shop's rows are only contiguous per day
+        raise ExportError('partitioning by shop needs date partitioning too')
+
+    since = ('', '') if full else get_watermark(name)
+    until = (datetime.now() - timedelta(seconds=SETTLE_SECONDS)).isoformat()
+    export_id = f"{datetime.now().strftime('%Y%m%dT%H%M%S')}-{os.urandom(3).hex()}"
+    extension = EXTENSIONS[fmt]
+
+    files = []
+    writer = None
+    last = since
+    rows_exported = 0
+    try:
+        for rows in iter_ledger_chunks(since, until, chunk_rows):
+            start = 0
+            for index, row in enumerate(rows):
+                path = partition_path(out_dir, row, partition_by, export_id, extension)
+                if writer is None or path != writer.path:
+                    if writer is not None:
+                        writer.write(rows[start:index])
+                        writer.close()
+                    writer = _PartitionWriter(path, fmt)
+                    files.append(writer)
+                    start = index
+            writer.write(rows[start:])
+            rows_exported += len(rows)
+            last = max(last, max((row[1], row[0]) for row in rows))
+        if writer is not None:
+            writer.close()
+        if rows_exported:
+            _advance_watermark(name, since if not full else None, last, rows_exported)
+    except BaseException:
+        # Without a watermark update these rows are exported again next
+        # run, so drop the partial files rather than leave duplicates
+        if writer is not None:
+            writer.close()
+        for partial in files:
+            if os.path.exists(partial.path):
+                os.remove(partial.path)
+        raise
+
+    return {
+        'name': name,
+        'format': fmt,
+        'rows': rows_exported,
+        'directory': out_dir,
+        'files': [{'path': os.path.relpath(written.path, out_dir), 'rows': written.rows}
+                  for written in files],
+        'watermark': {'transaction_date': last[0] or None, 'transaction_id': last[1] or None},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--name', default='default', help='export name the watermark is kept under')
+    parser.add_argument('--format', default='auto', choices=FORMATS)
+    parser.add_argument('--partition-by', default='date,shop', help='comma-separated: date, shop')
+    parser.add_argument('--full', action='store_true', help='ignore the watermark')
+    parser.add_argument('--out', help='output directory (default: <export dir>/<name>)')
+    parser.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS)
+    parser.add_argument('--database', help='database file (default: SHOPTRACKER_DB)')
+    args = parser.parse_args()
+
+    from app import init_database
+    if args.database:
+        db.configure(args.database)
+    init_database()
+
+    partition_by = [key for key in args.partition_by.split(',') if key]
+    summary = export_ledger(args.name, args.format, partition_by, args.full,
+                            args.out, args.chunk_rows)
+    print(f'{summary["rows"]} rows in {len(summary["files"])} {summary["format"]} files')
+    print(json.dumps(summary['watermark']))
+    db.close_pools()
+
+
+if __name__ == '__main__':
+    main()
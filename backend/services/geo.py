@@ -0,0 +1,114 @@
+# backend/services/geo.py
+"""Nearby shops, optionally only those with a product in stock
+
+Shop coordinates are indexed in the `shop_locations` R*Tree, kept in step
+with the shops table by triggers (app.init_database). A radius search asks
+the R*Tree for the shops inside the circle's bounding box, joins those
+candidates to inventory through its (shop_id, product_id) unique index when
+a product is given, and keeps the ones within the exact great-circle
+distance, nearest first.
+"""
+import math
+
+from utils import queries
+from utils.db import get_db_connection, get_read_connection, write_transaction
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+
+def validate_point(latitude, longitude):
+    """Return (latitude, longitude) as floats, raising ValueError if out of range"""
+    latitude, longitude = float(latitude), float(longitude)
+    if not -90 <= latitude <= 90:
+        raise ValueError('latitude must be between -90 and 90')
+    if not -180 <= longitude <= 180:
+        raise ValueError('longitude must be between -180 and 180')
+    return latitude, longitude
+
+
+def bounding_box(latitude, longitude, radius_km):
+    """Latitude/longitude bounds that contain the circle around a point
+
+    Boxes are not wrapped across the antimeridian; near the poles the box
+    widens to every longitude.
+    """
+    lat_delta = radius_km / KM_PER_DEGREE
+    cos_lat = math.cos(math.radians(latitude))
+    if cos_lat < 1e-6 or abs(latitude) + lat_delta >= 90:
+        lon_delta = 180.0
+    else:
+        lon_delta = min(180.0, lat_delta / cos_lat)
+    return {
+        'min_lat': max(-90.0, latitude - lat_delta),
+        'max_lat': min(90.0, latitude + lat_delta),
+        'min_lon': max(-180.0, longitude - lon_delta),
+        'max_lon': min(180.0, longitude + lon_delta),
+    }
+
+
+def distance_km(lat1, lon1, lat2, lon2):
+    """Great-circle (haversine) distance between two points"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def nearby_shops(latitude, longitude, radius_km, product_id=None, min_quantity=1, limit=20,
+                 max_staleness=None):
+    """Active shops within `radius_km` of a point, nearest first
+
+    With `product_id`, only shops holding at least `min_quantity` of it,
+    with their stock and selling price.
+    """
+    latitude, longitude = validate_point(latitude, longitude)
+    if radius_km <= 0:
+        raise ValueError('radius_km must be positive')
+
+    params = bounding_box(latitude, longitude, radius_km)
+    conn = get_read_connection(max_staleness)
+    try:
+        if product_id is None:
+            rows = queries.NEARBY_SHOPS.fetchall(conn, params)
+        else:
+            params.update(product_id=product_id, min_quantity=min_quantity)
+            rows = queries.NEARBY_SHOPS_WITH_PRODUCT.fetchall(conn, params)
+    finally:
+        conn.close()
+
+    shops = []
+    for row in rows:
+        distance = distance_km(latitude, longitude, row['latitude'], row['longitude'])
+        if distance <= radius_km:
+            shop = dict(row)
+            shop['distance_km'] = round(distance, 3)
+            shops.append(shop)
+    shops.sort(key=lambda shop: shop['distance_km'])
+    return shops[:limit]
+
+
+def set_shop_location(shop_id, latitude, longitude):
+    """Store a shop's coordinates; returns False if the shop does not exist"""
+    latitude, longitude = validate_point(latitude, longitude)
+    conn = get_db_connection()
+    try:
+        with write_transaction(conn):
+            return queries.SET_SHOP_LOCATION(conn, (latitude, longitude, shop_id)).rowcount > 0
+    finally:
+        conn.close()
+
+
+def backfill_shop_locations():
+    """Rebuild shop_locations if it does not match the shops with coordinates"""
+    conn = get_db_connection()
+    try:
+        counts = queries.LOCATED_SHOP_COUNTS.fetchone(conn)
+        if counts['shops'] == counts['indexed']:
+            return 0
+        with write_transaction(conn):
+            queries.CLEAR_SHOP_LOCATIONS(conn)
+            return queries.BACKFILL_SHOP_LOCATIONS(conn).rowcount
+    finally:
+        conn.close()
@@ -0,0 +1,206 @@
+# backend/services/inventory_service.py
+import uuid
+from datetime import datetime
+
+from services import costing, events, rollups
+from utils import queries
+
+DEFAULT_REORDER_LEVEL = 5  # inventory.reorder_level column default
+STOCKTAKE_NOTE = 'stocktake'
+
+
+class InsufficientStockError(ValueError):
+    """Raised when a sale asks for more than the shop has in stock"""
+
+
+def apply_sale(conn, shop_id, product_id, quantity, selling_price=0.0):
+    """Reduce stock and record a sale transaction on `conn`
+
+    Must run inside the caller's write transaction. Returns the
+    transaction id, total amount and the stock change.
+    """
+    if quantity <= 0:
+        raise ValueError('Quantity must be positive')
+
+    # Check if inventory exists
+    inventory = queries.INVENTORY_FOR_UPDATE.fetchone(conn, (shop_id, product_id))
+
+    if not inventory:
+        # Create new inventory entry if doesn't exist
+        inventory_id = str(uuid.uuid4())
+        queries.INSERT_INVENTORY(conn, (inventory_id, shop_id, product_id, 0, 0.0,
+                                        selling_price, datetime.now().isoformat()))
+        current_stock = 0
+        reorder_level = DEFAULT_REORDER_LEVEL
+        used_price = selling_price
+        cost_price = 0.0
+    else:
+        inventory_id = inventory['id']
+        current_stock = inventory['current_stock']
+        reorder_level = inventory['reorder_level']
+        used_price = selling_price if selling_price > 0 else inventory['selling_price']
+        cost_price = inventory['cost_price']
+
+    # Check if enough stock available
+    if current_stock < quantity:
+        raise InsufficientStockError(
+            f'Insufficient stock. Available: {current_stock}, Requested: {quantity}')
+
+    # Update inventory
+    new_stock = current_stock - quantity
+    now = datetime.now().isoformat()
+    queries.UPDATE_STOCK_AFTER_SALE(conn, (new_stock, used_price, now, inventory_id))
+
+    # The ledger is append-only, so the sale carries its cost from the start
+    cost_of_goods = costing.consume(conn, shop_id, product_id, quantity, cost_price)
+
+    # Record transaction
+    transaction_id = str(uuid.uuid4())
+    total_amount = quantity * used_price
+    queries.INSERT_TRANSACTION(conn, (transaction_id, shop_id, product_id, 'sale', quantity,
+                                      used_price, total_amount, now, cost_of_goods))
+    rollups.record_sale(conn, shop_id, product_id, quantity, total_amount, now, cost_of_goods)
+
+    sale = {
+        'transaction_id': transaction_id,
+        'product_id': product_id,
+        'previous_stock': current_stock,
+        'new_stock': new_stock,
+        'reorder_level': reorder_level,
+        'total_amount': total_amount,
+        'cost_of_goods': cost_of_goods
+    }
+    events.record_stock_change(conn, shop_id, sale, now)
+    return sale
+
+
+def apply_restock(conn, shop_id, product_id, quantity, cost_price=0.0, selling_price=0.0):
+    """Increase stock and record a restock transaction on `conn`
+
+    Must run inside the caller's write transaction.
+    """
+    if quantity <= 0:
+        raise ValueError('Quantity must be positive')
+
+    # Check if inventory exists
+    inventory = queries.INVENTORY_FOR_UPDATE.fetchone(conn, (shop_id, product_id))
+
+    now = datetime.now().isoformat()
+    if not inventory:
+        # Create new inventory entry
+        inventory_id = str(uuid.uuid4())
+        current_stock = 0
+        reorder_level = DEFAULT_REORDER_LEVEL
+        new_stock = quantity
+        unit_cost = cost_price
+        queries.INSERT_INVENTORY(conn, (inventory_id, shop_id, product_id, quantity,
+                                        cost_price, selling_price, now))
+    else:
+        # Update existing inventory
+        inventory_id = inventory['id']
+        current_stock = inventory['current_stock']
+        reorder_level = inventory['reorder_level']
+        new_stock = current_stock + quantity
+        # A restock without a price is costed at the item's current cost
+        unit_cost = cost_price if cost_price > 0 else inventory['cost_price']
+        queries.UPDATE_STOCK_AFTER_RESTOCK(conn, {
+            'current_stock': new_stock,
+            'last_updated': now,
+            'cost_price': cost_price,
+            'selling_price': selling_price,
+            'id': inventory_id,
+        })
+
+    # Record transaction
+    transaction_id = str(uuid.uuid4())
+    total_cost = quantity * cost_price
+    queries.INSERT_TRANSACTION(conn, (transaction_id, shop_id, product_id, 'restock', quantity,
+                                      cost_price, total_cost, now, None))
+    costing.receive(conn, shop_id, product_id, quantity, unit_cost, now)
+
+    restock = {
+        'transaction_id': transaction_id,
+        'product_id': product_id,
+        'previous_stock': current_stock,
+        'new_stock': new_stock,
+        'reorder_level': reorder_level,
+        'total_cost': total_cost
+    }
+    events.record_stock_change(conn, shop_id, restock, now)
+    return restock
+
+
+def apply_stocktake(conn, shop_id, counts, notes=None):
+    """Set stock to physically counted quantities and record the differences
+
+    `counts` maps product id to counted quantity. The counts go into a
+    temporary table and are diffed against inventory in one query; only
+    items whose stock differs are written, each with an 'adjustment'
+    transaction carrying the signed difference. Shortages consume cost
+    layers (their cost is the adjustment's cost_of_goods) and surpluses
+    open a layer at the item's cost price. Must run inside the caller's
+    write transaction. Returns the variance report.
+    """
+    queries.CREATE_STOCKTAKE_COUNTS(conn)
+    queries.CLEAR_STOCKTAKE_COUNTS(conn)
+    queries.INSERT_STOCKTAKE_COUNT.executemany(conn, counts.items())
+    diff = queries.STOCKTAKE_DIFF.fetchall(conn, (shop_id,))
+    queries.CLEAR_STOCKTAKE_COUNTS(conn)
+
+    unknown = [row['product_id'] for row in diff if row['name'] is None]
+    if unknown:
+        raise ValueError(f"Unknown product ids: {', '.join(sorted(unknown)[:20])}")
+
+    now = datetime.now().isoformat()
+    notes = notes or STOCKTAKE_NOTE
+    new_items, updates, adjustments, variances = [], [], [], []
+    for row in diff:
+        product_id = row['product_id']
+        variance = row['variance']
+        cost_price = row['cost_price']
+        if row['inventory_id'] is None:
+            new_items.append((str(uuid.uuid4()), shop_id, product_id, row['counted'],
+                              0.0, 0.0, now))
+        else:
+            updates.append((row['counted'], now, row['inventory_id']))
+
+        if variance < 0:
+            cost_of_goods = costing.consume(conn, shop_id, product_id, -variance, cost_price)
+            value = -cost_of_goods
+        else:
+            costing.receive(conn, shop_id, product_id, variance, cost_price, now)
+            cost_of_goods = None
+            value = variance * cost_price
+
+        transaction_id = str(uuid.uuid4())
+        adjustments.append((transaction_id, shop_id, product_id, variance, cost_price,
+                            value, notes, now, cost_of_goods))
+        variances.append({
+            'transaction_id': transaction_id,
+            'product_id': product_id,
+            'name': row['name'],
+            'previous_stock': row['previous_stock'],
+            'new_stock': row['counted'],
+            'variance': variance,
+            'reorder_level': row['reorder_level'],
+            'value': value
+        })
+
+    queries.INSERT_INVENTORY.executemany(conn, new_items)
+    queries.SET_COUNTED_STOCK.executemany(conn, updates)
+    queries.INSERT_ADJUSTMENT.executemany(conn, adjustments)
+    events.record_stock_changes(conn, shop_id, variances, now)
+
+    variances.sort(key=lambda item: (-abs(item['value']), -abs(item['variance'])))
+    return {
+        'shop_id': shop_id,
+        'counted_items': len(counts),
+        'adjusted_items': len(variances),
+        'unchanged_items': len(counts) - len(variances),
+        'units_over': sum(item['variance'] for item in variances if item['variance'] > 0),
+        'units_short': -sum(item['variance'] for item in variances if item['variance'] < 0),
+        'value_over': sum(item['value'] for item in variances if item['value'] > 0),
+        'value_short': -sum(item['value'] for item in variances if item['value'] < 0),
+        'net_value': sum(item['value'] for item in variances),
+        'variances': variances
+    }
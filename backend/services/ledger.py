@@ -0,0 +1,247 @@
+# backend/services/ledger.py
+"""Month-partitioned transaction ledger
+
+`transactions` only holds the hot working set: the current month and the
+HOT_MONTHS - 1 months before it. Older months are moved into sealed,
+read-only archive files (one per month, ledger/transactions_YYYY_MM.db)
+recorded in `ledger_partitions`. Triggers created by app.init_database keep
+the ledger append-only: rows cannot be updated, rows can only be deleted
+once their month has been archived, and sealed months accept no new rows.
+
+    python -m services.ledger list [--database PATH]
+    python -m services.ledger archive [--hot-months 2] [--database PATH]
+"""
+import argparse
+import os
+import sqlite3
+from datetime import date, datetime, timedelta
+from urllib.request import pathname2url
+
+from models.transaction import Transaction
+from utils import db, queries
+from utils.db import get_db_connection, get_read_connection, write_transaction
+from utils.scheduler import PeriodicTask
+
+LEDGER_DIR = os.environ.get('SHOPTRACKER_LEDGER_DIR') or None  # None: next to the database
+HOT_MONTHS = int(os.environ.get('SHOPTRACKER_LEDGER_HOT_MONTHS', '2'))
+
+ARCHIVE_SCHEMA = '''
+    CREATE TABLE archive.transactions (
+        id TEXT PRIMARY KEY,
+        shop_id TEXT NOT NULL,
+        product_id TEXT NOT NULL,
+        transaction_type TEXT NOT NULL,
+        quantity INTEGER NOT NULL,
+        price_per_unit REAL DEFAULT 0.0,
+        total_amount REAL DEFAULT 0.0,
+        notes TEXT,
+        transaction_date TEXT,
+        created_by TEXT DEFAULT 'system',
+        cost_of_goods REAL
+    )
+'''
+ARCHIVE_INDEX = 'CREATE INDEX archive.idx_transactions_shop_date ON transactions(shop_id, transaction_date)'
+
+_archiver = None
+
+
+class LedgerError(Exception):
+    """Raised when a period cannot be archived"""
+
+
+def configure(ledger_dir=None, hot_months=None):
+    """Set where archive files live and how many months stay hot"""
+    global LEDGER_DIR, HOT_MONTHS
+    if ledger_dir:
+        LEDGER_DIR = ledger_dir
+    if hot_months is not None:
+        HOT_MONTHS = hot_months
+
+
+def ledger_dir():
+    return LEDGER_DIR or os.path.join(os.path.dirname(os.path.abspath(db.DATABASE)), 'ledger')
+
+
+def period_bounds(period):
+    """('YYYY-MM-01', first day of the next month) for a 'YYYY-MM' period"""
+    year, month = map(int, period.split('-'))
+    start = date(year, month, 1)
+    end = date(year + month // 12, month % 12 + 1, 1)
+    return start.isoformat(), end.isoformat()
+
+
+def _add_months(period, months):
+    year, month = map(int, period.split('-'))
+    index = year * 12 + month - 1 + months
+    return f'{index // 12:04d}-{index % 12 + 1:02d}'
+
+
+def closed_periods(conn, hot_months, today=None):
+    """Months older than the hot window that still have rows in `transactions`"""
+    oldest = queries.LEDGER_OLDEST_TRANSACTION.fetchone(conn)['oldest']
+    if not oldest:
+        return []
+    cutoff = _add_months((today or date.today()).isoformat()[:7], -(hot_months - 1))
+    periods = []
+    period = oldest[:7]
+    while period < cutoff:
+        if queries.LEDGER_COUNT_PERIOD.fetchone(conn, period_bounds(period))['count']:
+            periods.append(period)
+        period = _add_months(period, 1)
+    return periods
+
+
+def _seal(path):
+    """Compact a freshly written archive file and make it read-only"""
+    conn = sqlite3.connect(path)
+    try:
+        conn.execute('PRAGMA journal_mode=DELETE')
+        conn.execute('ANALYZE')
+        conn.execute('VACUUM')
+    finally:
+        conn.close()
+    os.chmod(path, 0o444)
+
+
+def archive_period(period):
+    """Move one closed month out of `transactions` into a sealed archive file
+
+    The archive is written and sealed first; the partition is only recorded
+    (and the hot rows deleted) once the file is complete, in one write
+    transaction. A crash in between leaves the hot rows in place and the
+    next run rebuilds the file.
+    """
+    start, end = period_bounds(period)
+    directory = ledger_dir()
+    os.makedirs(directory, exist_ok=True)
+    filename = f'transactions_{period.replace("-", "_")}.db'
+    path = os.path.join(directory, filename)
+    tmp_path = path + '.tmp'
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+    conn = get_db_connection()
+    try:
+        conn.execute('ATTACH DATABASE ? AS archive', (tmp_path,))
+        try:
+            with write_transaction(conn):
+                conn.execute(ARCHIVE_SCHEMA)
+                archived = queries.LEDGER_COPY_PERIOD(conn, (start, end)).rowcount
+                conn.execute(ARCHIVE_INDEX)
+        finally:
+            conn.execute('DETACH DATABASE archive')
+
+        _seal(tmp_path)
+        os.replace(tmp_path, path)
+
+        with write_transaction(conn):
+            queries.INSERT_LEDGER_PARTITION(conn, (period, filename, archived,
+                                                   datetime.now().isoformat()))
+            deleted = queries.LEDGER_DELETE_PERIOD(conn, (start, end)).rowcount
+            if deleted != archived:
+                raise LedgerError(f'{period}: archived {archived} rows but {deleted} are hot')
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    finally:
+        conn.close()
+    return archived
+
+
+def archive_closed_periods(hot_months=None):
+    """Archive every month older than the hot window, oldest first"""
+    hot_months = hot_months or HOT_MONTHS
+    if hot_months < 1:
+        raise ValueError('At least the current month must stay hot')
+    conn = get_db_connection()
+    try:
+        periods = closed_periods(conn, hot_months)
+    finally:
+        conn.close()
+    return [(period, archive_period(period)) for period in periods]
+
+
+def list_partitions(conn=None):
+    """Archived months, newest first"""
+    own_conn = conn is None
+    conn = conn or get_read_connection()
+    try:
+        return [dict(row) for row in
+                queries.LEDGER_PARTITIONS_BETWEEN.fetchall(conn, ('0000-00', '9999-99'))]
+    finally:
+        if own_conn:
+            conn.close()
+
+
+def open_partition(filename):
+    """Sealed archives never change, so they can be opened immutable"""
+    path = os.path.join(ledger_dir(), filename)
+    uri = f'file:{pathname2url(path)}?mode=ro&immutable=1'
+    return sqlite3.connect(uri, uri=True)
+
+
+def shop_history(shop_id, start=None, end=None, transaction_type=None, limit=100,
+                 max_staleness=None):
+    """A shop's transactions between two dates (inclusive), newest first
+
+    Reads the hot table first and then only the archive partitions whose
+    month overlaps the range, stopping as soon as `limit` rows are found.
+    """
+    start = date.fromisoformat(start).isoformat() if start else '0000-01-01'
+    end = (date.fromisoformat(end) + timedelta(days=1)).isoformat() if end else '9999-12-31'
+    params = {'shop_id': shop_id, 'start': start, 'end': end,
+              'type': transaction_type, 'limit': limit}
+
+    conn = get_read_connection(max_staleness)
+    try:
+        records = queries.LEDGER_SHOP_HISTORY.records(Transaction, conn, params)
+        # `end` is exclusive: a range ending on the last of a month stays in that month
+        last_month = (date.fromisoformat(end) - timedelta(days=1)).isoformat()[:7]
+        partitions = [] if len(records) >= limit else queries.LEDGER_PARTITIONS_BETWEEN.fetchall(
+            conn, (start[:7], last_month))
+    finally:
+        conn.close()
+
+    for partition in partitions:
+        params['limit'] = limit - len(records)
+        archive = open_partition(partition['path'])
+        try:
+            records.extend(queries.LEDGER_SHOP_HISTORY.records(Transaction, archive, params))
+        finally:
+            archive.close()
+        if len(records) >= limit:
+            break
+    return records
+
+
+def start_ledger_archiver(interval):
+    """Archive closed months in the background every `interval` seconds"""
+    global _archiver
+    if _archiver is None:
+        _archiver = PeriodicTask('ledger-archiver', interval, archive_closed_periods)
+    return _archiver.start()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('command', choices=['list', 'archive'])
+    parser.add_argument('--hot-months', type=int, default=HOT_MONTHS)
+    parser.add_argument('--database', help='database file (default: SHOPTRACKER_DB)')
+    args = parser.parse_args()
+
+    from app import init_database
+    if args.database:
+        db.configure(args.database)
+    init_database()
+
+    if args.command == 'archive':
+        for period, rows in archive_closed_periods(args.hot_months):
+            print(f'archived {period}: {rows} transactions')
+    for partition in list_partitions():
+        print(f'{partition["period"]}  {partition["row_count"]:>10}  {partition["path"]}')
+    db.close_pools()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+# backend/services/low_stock.py
+"""Low-stock items of one shop and across shops
+
+An item is low while it is active and current_stock <= reorder_level. The
+idx_inventory_low_stock (shop_id, product_id) and
+idx_inventory_low_stock_product (product_id, shop_id) partial indexes hold
+exactly those rows, so these reads cost in proportion to the number of low
+items rather than to the size of inventory.
+"""
+from models.inventory import InventoryItem
+from utils import queries
+from utils.db import get_read_connection
+
+
+def shop_low_stock(shop_id, max_staleness=None):
+    """A shop's low items, furthest below their reorder level first"""
+    conn = get_read_connection(max_staleness)
+    try:
+        return queries.LOW_STOCK_BY_SHOP.records(InventoryItem, conn, (shop_id,))
+    finally:
+        conn.close()
+
+
+def _filters(brand, category, district, city, tier):
+    return {'brand': brand, 'category': category,
+            'district': district, 'city': city, 'tier': tier}
+
+
+def low_stock_items(product_id=None, brand=None, category=None, district=None, city=None,
+                    tier=None, after=None, limit=100, max_staleness=None):
+    """Low items across matching shops, in (shop_id, product_id) order
+
+    `after` is the (shop_id, product_id) of the last item of the previous
+    page; the result's `next` is the cursor for the following page, None
+    on the last one.
+    """
+    params = _filters(brand, category, district, city, tier)
+    params.update(product_id=product_id, limit=limit)
+    params['after_shop'], params['after_product'] = after or ('', '')
+
+    statement = queries.LOW_STOCK_ACROSS_SHOPS if product_id is None else queries.LOW_STOCK_FOR_PRODUCT
+    conn = get_read_connection(max_staleness)
+    try:
+        items = [dict(row) for row in statement.fetchall(conn, params)]
+    finally:
+        conn.close()
+
+    last = items[-1] if len(items) == limit else None
+    return {
+        'items': items,
+        'next': {'after_shop': last['shop_id'], 'after_product': last['product_id']} if last else None
+    }
+
+
+def low_stock_demand(brand=None, category=None, district=None, city=None, tier=None, limit=20,
+                     max_staleness=None):
+    """Products ranked by how many matching shops are low on them"""
+    params = _filters(brand, category, district, city, tier)
+    params['limit'] = limit
+    conn = get_read_connection(max_staleness)
+    try:
+        return [dict(row) for row in queries.LOW_STOCK_DEMAND.fetchall(conn, params)]
+    finally:
+        conn.close()
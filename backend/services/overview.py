@@ -0,0 +1,80 @@
+# backend/services/overview.py
+from datetime import date, timedelta
+
+from utils import queries
+from utils.cache import LRUCache
+from utils.db import get_read_connection
+
+DEFAULT_DAYS = 30  # period covered when no dates are given
+GROUP_BY = ('district', 'city')
+REGION_TOTALS = ('shops', 'sales_amount', 'sales_count', 'units_sold',
+                 'low_stock_items', 'shops_with_low_stock')
+
+# Fleet-wide numbers change slowly; a short TTL keeps dashboards cheap
+overview_cache = LRUCache(maxsize=256, ttl=30)
+
+
+def _empty_region(name):
+    region = dict.fromkeys(REGION_TOTALS, 0)
+    region['sales_amount'] = 0.0
+    region['region'] = name
+    return region
+
+
+def fleet_overview(district=None, city=None, tier=None, group_by='district',
+                   start=None, end=None, top=10, max_staleness=None):
+    """Sales, low stock and top products across all matching shops
+
+    Answered by four grouped queries over the daily rollups, shops and
+    inventory, whatever the number of shops. Results are cached per filter
+    combination for the cache TTL.
+    """
+    if group_by not in GROUP_BY:
+        raise ValueError(f"group_by must be one of: {', '.join(GROUP_BY)}")
+    end = date.fromisoformat(end) if end else date.today()
+    start = date.fromisoformat(start) if start else end - timedelta(days=DEFAULT_DAYS - 1)
+    if start > end:
+        raise ValueError('from must not be after to')
+
+    key = (district, city, tier, group_by, start, end, top)
+    overview = overview_cache.get(key)
+    if overview is not None:
+        return overview
+
+    params = {
+        'district': district, 'city': city, 'tier': tier, 'group_by': group_by,
+        'start': start.isoformat(), 'end': end.isoformat(), 'limit': top,
+    }
+    conn = get_read_connection(max_staleness)
+    try:
+        shops = queries.OVERVIEW_SHOPS.fetchall(conn, params)
+        sales = queries.OVERVIEW_SALES.fetchall(conn, params)
+        low_stock = queries.OVERVIEW_LOW_STOCK.fetchall(conn, params)
+        top_products = queries.OVERVIEW_TOP_PRODUCTS.fetchall(conn, params)
+    finally:
+        conn.close()
+
+    regions = {}
+    for rows in (shops, sales, low_stock):
+        for row in rows:
+            region = regions.get(row['region'])
+            if region is None:
+                region = regions[row['region']] = _empty_region(row['region'])
+            region.update((column, row[column]) for column in row.keys() if column != 'region')
+
+    by_region = sorted(regions.values(), key=lambda region: -region['sales_amount'])
+    totals = _empty_region(None)
+    del totals['region']
+    for region in by_region:
+        for column in REGION_TOTALS:
+            totals[column] += region[column]
+    overview = {
+        'filters': {'district': district, 'city': city, 'subscription_tier': tier},
+        'group_by': group_by,
+        'period': {'from': params['start'], 'to': params['end']},
+        'totals': totals,
+        'by_region': by_region,
+        'top_products': [dict(row) for row in top_products],
+    }
+    overview_cache.set(key, overview)
+    return overview
@@ -0,0 +1,54 @@
+# backend/services/rollups.py
+from services import ledger
+from utils import queries
+from utils.db import get_db_connection, write_transaction
+
+
+def record_sale(conn, shop_id, product_id, quantity, amount, sold_at, cost_of_goods=0.0):
+    """Add one sale to the daily rollups
+
+    Must run inside the sale's write transaction so the rollups never
+    disagree with the transactions table.
+    """
+    sale_date = sold_at[:10]
+    queries.ADD_SHOP_DAILY_SALE(conn, (shop_id, sale_date, amount, quantity, cost_of_goods))
+    queries.ADD_PRODUCT_DAILY_SALE(conn, (shop_id, sale_date, product_id, amount, quantity,
+                                          cost_of_goods))
+
+
+def rebuild_rollups(conn):
+    """Recompute both rollup tables from the ledger
+
+    Sales come from the hot transactions table and from every archived
+    month. The partitions are listed inside the write transaction, so an
+    archive run cannot move a month between the two reads.
+    """
+    with write_transaction(conn):
+        queries.CLEAR_SHOP_DAILY_SALES(conn)
+        queries.CLEAR_PRODUCT_DAILY_SALES(conn)
+        queries.BACKFILL_SHOP_DAILY_SALES(conn)
+        queries.BACKFILL_PRODUCT_DAILY_SALES(conn)
+        for partition in ledger.list_partitions(conn):
+            archive = ledger.open_partition(partition['path'])
+            try:
+                queries.INSERT_SHOP_DAILY_SALES.executemany(
+                    conn, queries.ARCHIVED_SHOP_DAILY_SALES(archive))
+                queries.INSERT_PRODUCT_DAILY_SALES.executemany(
+                    conn, queries.ARCHIVED_PRODUCT_DAILY_SALES(archive))
+            finally:
+                archive.close()
+
+
+def backfill_rollups():
+    """Build the rollups for a database that has sales but no rollups yet"""
+    conn = get_db_connection()
+    try:
+        if queries.HAS_SHOP_DAILY_SALES.fetchone(conn)['found']:
+            return False
+        if not (queries.HAS_SALE_TRANSACTIONS.fetchone(conn)['found']
+                or ledger.list_partitions(conn)):
+            return False
+        rebuild_rollups(conn)
+        return True
+    finally:
+        conn.close()
@@ -0,0 +1,377 @@
+# backend/services/sessions.py
+"""Login sessions: short-lived access tokens and rotating refresh tokens
+
+Logging in opens a row in `user_sessions` and hands out two tokens:
+
+- an access token, a JWT valid for ACCESS_TOKEN_TTL seconds that names its
+  session (`sid`). Requests are authorised from the token alone.
+- a refresh token, an opaque secret stored only as its SHA-256 hash, which
+  /auth/refresh-token exchanges for a new access token (and a new refresh
+  token) until REFRESH_TOKEN_TTL passes without use or the session is revoked.
+
+Revoking a session (logout, password change) stamps `revoked_at` and
+appends it to the `revocations` log. Each process keeps the ids of sessions
+revoked within the last ACCESS_TOKEN_TTL in memory and rejects their access
+tokens without a query; older revocations need no entry because every
+access token of theirs has expired. Revoking also increments a counter in
+an epoch file next to the database, and a process that reads a different
+counter loads the log entries after the last one it has, so a logout in one
+worker holds in all of them on the next request.
+
+Log entries are numbered (`seq`) under the write lock, so their order is
+the order they committed in. Loading by `revoked_at` instead could skip a
+revocation stamped before another but committed after it, in any process
+that loaded in between.
+
+Changes to a shop itself (profile, password, deactivation) are logged the
+same way with no session, and every entry loaded is passed to the functions
+registered with on_shop_change, which is how per-process caches of shop
+data (auth_service.shop_cache) hear of changes made in other processes.
+"""
+import fcntl
+import hashlib
+import heapq
+import os
+import secrets
+import sqlite3
+import struct
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import jwt
+
+from utils import db, queries
+from utils.scheduler import PeriodicTask
+
+SECRET_KEY = os.environ.get('SECRET_KEY', 'your-secret-key-change-in-production')
+ACCESS_TOKEN_TTL = int(os.environ.get('SHOPTRACKER_ACCESS_TOKEN_TTL', '900'))
+REFRESH_TOKEN_TTL = int(os.environ.get('SHOPTRACKER_REFRESH_TOKEN_TTL', str(30 * 24 * 3600)))
+ALGORITHM = 'HS256'
+
+_pruner = None
+
+
+class SessionRevoked(jwt.InvalidTokenError):
+    """The access token belongs to a session that has been revoked"""
+
+
+def configure(secret_key=None, access_ttl=None, refresh_ttl=None):
+    """Set the signing key and token lifetimes (seconds)"""
+    global SECRET_KEY, ACCESS_TOKEN_TTL, REFRESH_TOKEN_TTL
+    if secret_key:
+        SECRET_KEY = secret_key
+    if access_ttl:
+        ACCESS_TOKEN_TTL = access_ttl
+    if refresh_ttl:
+        REFRESH_TOKEN_TTL = refresh_ttl
+
+
+def _timestamp(moment):
+    return moment.isoformat(sep=' ')
+
+
+EPOCH = struct.Struct('<Q')  # revocation counter at the start of the epoch file
+_epoch_file = None  # (path, pid, descriptor) of this process's handle on the epoch file
+_epoch_lock = threading.Lock()
+
+
+def _epoch_path():
+    return db.DATABASE + '.revocations'
+
+
+def _epoch_fd():
+    """This process's descriptor on the epoch file
+
+    Opened per process: a flock belongs to the open file, which a fork would
+    share with the parent, and the lock would then exclude neither.
+    """
+    global _epoch_file
+    path, pid = _epoch_path(), os.getpid()
+    current = _epoch_file
+    if current is not None and current[:2] == (path, pid):
+        return current[2]
+    with _epoch_lock:
+        if _epoch_file is not None and _epoch_file[:2] == (path, pid):
+            return _epoch_file[2]
+        if _epoch_file is not None and _epoch_file[1] == pid:
+            os.close(_epoch_file[2])
+        _epoch_file = (path, pid, os.open(path, os.O_RDWR | os.O_CREAT, 0o644))
+        return _epoch_file[2]
+
+
+def _read_epoch():
+    return os.pread(_epoch_fd(), EPOCH.size, 0)
+
+
+def _bump_epoch():
+    """Increment the epoch counter; it only ever changes, so no reader can miss a bump"""
+    fd = _epoch_fd()
+    fcntl.flock(fd, fcntl.LOCK_EX)
+    try:
+        data = os.pread(fd, EPOCH.size, 0)
+        counter = EPOCH.unpack(data)[0] if len(data) == EPOCH.size else 0
+        os.pwrite(fd, EPOCH.pack((counter + 1) % 2 ** 64), 0)
+    finally:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+
+
+class RevocationList:
+    """Ids of recently revoked sessions, each kept until its tokens have expired"""
+
+    def __init__(self):
+        self._deadlines = {}  # session id -> time after which none of its tokens is valid
+        self._expiry = []     # heap of (deadline, session id)
+        self._epoch = False   # epoch file state when revocations were last loaded
+        self._seq = 0         # last log entry loaded
+        self._lock = threading.Lock()
+
+    def __contains__(self, session_id):
+        deadline = self._deadlines.get(session_id)
+        return deadline is not None and deadline > time.time()
+
+    def __len__(self):
+        return len(self._deadlines)
+
+    def add(self, session_id, revoked_at):
+        """Record a revocation made at `revoked_at` (a datetime)"""
+        with self._lock:
+            self._add(session_id, revoked_at)
+
+    def _add(self, session_id, revoked_at):
+        deadline = revoked_at.timestamp() + ACCESS_TOKEN_TTL
+        if self._deadlines.get(session_id, 0) < deadline:
+            self._deadlines[session_id] = deadline
+            heapq.heappush(self._expiry, (deadline, session_id))
+
+    def prune(self, now=None):
+        """Forget revocations whose sessions can no longer have a valid token"""
+        now = now or time.time()
+        with self._lock:
+            while self._expiry and self._expiry[0][0] <= now:
+                deadline, session_id = heapq.heappop(self._expiry)
+                if self._deadlines.get(session_id) == deadline:
+                    del self._deadlines[session_id]
+
+    def sync(self):
+        """Load revocations recorded by other processes since the last load"""
+        epoch = _read_epoch()
+        if epoch == self._epoch:
+            return
+        with self._lock:
+            if epoch == self._epoch:
+                return
+            changed = set()
+            # Older revocations have no access token left to reject
+            cutoff = _timestamp(datetime.now() - timedelta(seconds=ACCESS_TOKEN_TTL))
+            conn = db.get_db_connection()
+            try:
+                rows = queries.REVOCATIONS_AFTER.fetchall(conn, (self._seq, cutoff))
+            except sqlite3.OperationalError:
+                # The database has not been prepared yet (app.init_database)
+                rows = []
+            finally:
+                conn.close()
+            for row in rows:
+                if row['session_id'] is not None:
+                    self._add(row['session_id'], datetime.fromisoformat(row['revoked_at']))
+                changed.add(row['shop_id'])
+                self._seq = row['seq']
+            self._epoch = epoch
+        for shop_id in changed:
+            for listener in _shop_listeners:
+                listener(shop_id)
+        self.prune()
+
+
+revoked_sessions = RevocationList()
+_shop_listeners = []
+
+
+def on_shop_change(listener):
+    """Call `listener(shop_id)` when a change to the shop or its sessions is loaded"""
+    _shop_listeners.append(listener)
+    return listener
+
+
+def _hash(token):
+    return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+
+def _issue(session_id, shop_id, email, refresh_token, refresh_expires_at):
+    now = int(time.time())
+    payload = {
+        'shop_id': shop_id,
+        'email': email,
+        'sid': session_id,
+        'iat': now,
+        'exp': now + ACCESS_TOKEN_TTL
+    }
+    return {
+        'session_id': session_id,
+        'access_token': jwt.encode(payload, SECRET_KEY, algorithm=ALGORITHM),
+        'expires_in': ACCESS_TOKEN_TTL,
+        'refresh_token': refresh_token,
+        'refresh_expires_at': refresh_expires_at
+    }
+
+
+def open_session(conn, shop_id, email, ip_address=None, device_info=None):
+    """Record a new session and return its access and refresh tokens
+
+    The caller commits `conn`.
+    """
+    now = datetime.now()
+    refresh_token = secrets.token_urlsafe(32)
+    expires_at = _timestamp(now + timedelta(seconds=REFRESH_TOKEN_TTL))
+    cursor = queries.INSERT_SESSION(conn, (shop_id, _hash(refresh_token), device_info,
+                                           ip_address, _timestamp(now), expires_at))
+    return _issue(cursor.lastrowid, shop_id, email, refresh_token, expires_at)
+
+
+def refresh_session(conn, refresh_token):
+    """Exchange a refresh token for new tokens, or return None if it is not valid
+
+    The presented refresh token stops working. The caller commits `conn`.
+    """
+    if not refresh_token:
+        return None
+    now = datetime.now()
+    token_hash = _hash(refresh_token)
+    session = queries.SESSION_BY_REFRESH_HASH.fetchone(conn, (token_hash, _timestamp(now)))
+    if not session or not session['shop_active']:
+        return None
+
+    new_token = secrets.token_urlsafe(32)
+    expires_at = _timestamp(now + timedelta(seconds=REFRESH_TOKEN_TTL))
+    # Keyed on the old hash too, so a refresh token can only be redeemed once
+    rotated = queries.ROTATE_SESSION_TOKEN(conn, (_hash(new_token), expires_at, _timestamp(now),
+                                                  session['id'], token_hash))
+    if not rotated.rowcount:
+        return None
+    return _issue(session['id'], session['shop_id'], session['email'], new_token, expires_at)
+
+
+def verify_access_token(token):
+    """Return the claims of a valid access token
+
+    Raises jwt.InvalidTokenError (jwt.ExpiredSignatureError, SessionRevoked)
+    otherwise. Only reloading revocations made elsewhere touches the database.
+    """
+    payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    if 'sid' not in payload:
+        raise jwt.InvalidTokenError('token is not bound to a session')
+    revoked_sessions.sync()
+    if payload['sid'] in revoked_sessions:
+        raise SessionRevoked('session has been revoked')
+    return payload
+
+
+def session_of(token):
+    """Session id of a correctly signed access token, even an expired one"""
+    payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM],
+                         options={'verify_exp': False})
+    return payload.get('sid')
+
+
+class Revocation:
+    """Revocations and shop changes written in one write transaction (see revoking)"""
+
+    def __init__(self, conn):
+        self.conn = conn
+        # Stamped under the write lock: a token refreshed before the stamp
+        # committed before it, and none can be refreshed after it
+        self.revoked_at = datetime.now()
+        self.revoked = []
+        self.logged = False
+
+    def session(self, session_id):
+        """Revoke one session; returns whether it was still open"""
+        if not queries.REVOKE_SESSION(self.conn, (_timestamp(self.revoked_at), session_id)).rowcount:
+            return False
+        queries.RECORD_REVOCATION(self.conn, (session_id,))
+        self.revoked.append(session_id)
+        self.logged = True
+        return True
+
+    def shop_sessions(self, shop_id, keep=None):
+        """Revoke every open session of a shop except `keep`; returns how many
+
+        Read under the write lock, so no login can commit a session this misses.
+        """
+        session_ids = [row['id'] for row in queries.OPEN_SESSION_IDS.fetchall(self.conn, (shop_id,))]
+        return sum(self.session(session_id) for session_id in session_ids if session_id != keep)
+
+    def shop_changed(self, shop_id):
+        """Tell every process that the shop's row changed (see on_shop_change)"""
+        queries.RECORD_SHOP_CHANGE(self.conn, (shop_id, _timestamp(self.revoked_at)))
+        self.logged = True
+
+
+@contextmanager
+def revoking(conn):
+    """Write transaction (BEGIN IMMEDIATE) yielding a Revocation
+
+    Other writes made in the block commit together with the revocations.
+    They take effect in this process and are announced to the others only
+    once the transaction has committed. `conn` must have no open transaction.
+    """
+    with db.write_transaction(conn):
+        revocation = Revocation(conn)
+        yield revocation
+    for session_id in revocation.revoked:
+        revoked_sessions.add(session_id, revocation.revoked_at)
+    if revocation.logged:
+        _bump_epoch()
+
+
+def revoke_session(conn, session_id):
+    """Revoke one session with immediate effect; commits `conn`, which must have no open transaction"""
+    with revoking(conn) as revocation:
+        return int(revocation.session(session_id))
+
+
+def revoke_shop_sessions(conn, shop_id, keep=None):
+    """Revoke every session of a shop except `keep`; commits `conn`, which must have no open transaction"""
+    with revoking(conn) as revocation:
+        return revocation.shop_sessions(shop_id, keep)
+
+
+def record_shop_change(conn, shop_id):
+    """Tell every process that the shop's row changed; commits `conn`, which must have no open transaction"""
+    with revoking(conn) as revocation:
+        revocation.shop_changed(shop_id)
+
+
+def delete_expired_sessions(conn):
+    """Delete sessions that expired, or were revoked longer ago than ACCESS_TOKEN_TTL"""
+    now = datetime.now()
+    revoked_before = _timestamp(now - timedelta(seconds=ACCESS_TOKEN_TTL))
+    queries.DELETE_OLD_REVOCATIONS(conn, (revoked_before,))
+    return queries.DELETE_EXPIRED_SESSIONS(conn, {
+        'now': _timestamp(now),
+        'revoked_before': revoked_before
+    }).rowcount
+
+
+def prune_sessions():
+    """Drop stale revocations from memory and dead sessions from the database"""
+    revoked_sessions.prune()
+    conn = db.get_db_connection()
+    try:
+        with db.write_transaction(conn):
+            return delete_expired_sessions(conn)
+    except sqlite3.OperationalError:
+        # The database has not been prepared yet (app.init_database)
+        return 0
+    finally:
+        conn.close()
+
+
+def start_session_pruner(interval):
+    """Prune sessions in the background every `interval` seconds"""
+    global _pruner
+    if _pruner is None:
+        _pruner = PeriodicTask('session-pruner', interval, prune_sessions)
+    return _pruner.start()
@@ -0,0 +1,30 @@
+# backend/services/stats.py
+from datetime import date, timedelta
+
+from utils import queries
+
+
+def shop_stats(conn, shop_id, today=None):
+    """Product count, low stock, today's sales and inventory value for a shop"""
+    today = today or date.today()
+
+    # Get total products in inventory
+    total_products = queries.STATS_TOTAL_PRODUCTS.fetchone(conn, (shop_id,))['count']
+
+    # Get low stock items
+    low_stock_items = queries.STATS_LOW_STOCK.fetchone(conn, (shop_id,))['count']
+
+    # Get today's sales
+    today_sales = queries.STATS_SALES_BETWEEN.fetchone(
+        conn, (shop_id, today.isoformat(), (today + timedelta(days=1)).isoformat()))
+
+    # Get total inventory value
+    inventory_value = queries.STATS_INVENTORY_VALUE.fetchone(conn, (shop_id,))['total']
+
+    return {
+        'total_products': total_products,
+        'low_stock_items': low_stock_items,
+        'today_sales_amount': today_sales['total'],
+        'today_sales_count': today_sales['transactions'],
+        'inventory_value': inventory_value
+    }
@@ -0,0 +1,32 @@
+# backend/tests/conftest.py
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, prepare_database  # noqa: E402
+from services import auth_service, sessions  # noqa: E402
+from utils import db  # noqa: E402
+
+
+@pytest.fixture
+def make_app(tmp_path, monkeypatch):
+    """Factory for an app on a fresh, prepared app schema database
+
+    Returns (app, client, demo shop id); keyword arguments override config.
+    """
+    monkeypatch.chdir(tmp_path)
+    # Process-wide state that would otherwise outlive the test's database
+    monkeypatch.setattr(sessions, 'revoked_sessions', sessions.RevocationList())
+    auth_service.shop_cache.clear()
+
+    def make(**config):
+        app = create_app({'DATABASE': str(tmp_path / 'shoptracker.db'),
+                          'RATE_LIMITS': None, **config})
+        shop_id = prepare_database()
+        return app, app.test_client(), shop_id
+
+    yield make
+    db.close_pools()
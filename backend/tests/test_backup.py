@@ -0,0 +1,102 @@
+# backend/tests/test_backup.py
+import sqlite3
+import time
+
+import pytest
+
+from services import backup
+from utils import db
+
+
+@pytest.fixture
+def archiving_app(make_app, monkeypatch):
+    """App with WAL archiving on; returns (client, shop id, product id, archiver)"""
+    monkeypatch.setattr(backup, 'CHECKPOINT_FRAMES', 50)
+    app, client, shop_id = make_app(WAL_ARCHIVE_INTERVAL=5)
+    product_id = client.get('/api/products').get_json()['products'][0]['id']
+    restock = client.post('/api/inventory/restock', json={
+        'shop_id': shop_id, 'product_id': product_id, 'quantity': 10000, 'cost_price': 1.0})
+    assert restock.status_code == 200
+    archiver = backup.WalArchiver()
+    yield client, shop_id, product_id, archiver
+    archiver.close()
+
+
+def sell(client, shop_id, product_id, times):
+    for _ in range(times):
+        response = client.post('/api/inventory/sale', json={
+            'shop_id': shop_id, 'product_id': product_id, 'quantity': 1})
+        assert response.status_code == 200
+
+
+def counts(path=None):
+    """(stock of the demo shop's items, transactions) in a database file"""
+    conn = sqlite3.connect(path or db.DATABASE)
+    try:
+        return (conn.execute('SELECT SUM(current_stock) FROM inventory').fetchone()[0],
+                conn.execute('SELECT COUNT(*) FROM transactions').fetchone()[0])
+    finally:
+        conn.close()
+
+
+def archive(archiver):
+    result = archiver.archive()
+    # Keep recovery points apart: restores select segments by archive time
+    time.sleep(0.01)
+    return result
+
+
+def test_restore_to_each_recovery_point(archiving_app, tmp_path):
+    client, shop_id, product_id, archiver = archiving_app
+    first = archive(archiver)
+    assert first['break'] and first['base']
+
+    # The break's base backup is taken after its segment, so recovery points start after it
+    marks = []
+    for _ in range(4):
+        sell(client, shop_id, product_id, 30)
+        marks.append((archive(archiver)['archived_at'], counts()))
+    # A base backup taken part way through the archive
+    backup.take_backup()
+    sell(client, shop_id, product_id, 10)
+    marks.append((archive(archiver)['archived_at'], counts()))
+    assert archiver.stats()['breaks'] == 1
+
+    for i, (archived_at, expected) in enumerate(marks):
+        target = str(tmp_path / f'restored-{i}.db')
+        backup.restore(target, until=archived_at)
+        assert counts(target) == expected
+
+    with pytest.raises(backup.BackupError):
+        backup.restore(str(tmp_path / 'restored-0.db'))
+    with pytest.raises(backup.BackupError):
+        backup.restore(str(tmp_path / 'too-early.db'), until=first['archived_at'] - 3600)
+
+
+def test_break_starts_a_new_timeline(archiving_app, tmp_path):
+    client, shop_id, product_id, archiver = archiving_app
+    first = archive(archiver)
+    sell(client, shop_id, product_id, 5)
+    before_break = archive(archiver)['archived_at'], counts()
+    archiver.close()
+
+    # The last connection closing checkpoints and removes the WAL, so the
+    # archive cannot show it is continuous past this point
+    db.close_pools()
+    sell(client, shop_id, product_id, 5)
+    resumed = backup.WalArchiver()
+    try:
+        result = resumed.archive()
+        assert result['break'] and result['base'] != first['base']
+        sell(client, shop_id, product_id, 5)
+        newest = archive(resumed)['archived_at'], counts()
+    finally:
+        resumed.close()
+
+    backup.restore(str(tmp_path / 'before.db'), until=before_break[0])
+    assert counts(str(tmp_path / 'before.db')) == before_break[1]
+    backup.restore(str(tmp_path / 'newest.db'))
+    assert counts(str(tmp_path / 'newest.db')) == newest[1]
+    # The old base cannot be rolled forward across the break
+    with pytest.raises(backup.BackupError, match='restarted'):
+        backup.restore(str(tmp_path / 'across.db'), until=newest[0], base_id=first['base'])
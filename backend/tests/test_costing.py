@@ -0,0 +1,93 @@
+# backend/tests/test_costing.py
+import pytest
+
+from services import costing
+from utils import db, queries
+from utils.db import write_transaction
+
+
+def restock(client, shop_id, product_id, quantity, cost_price):
+    response = client.post('/api/inventory/restock', json={
+        'shop_id': shop_id, 'product_id': product_id, 'quantity': quantity,
+        'cost_price': cost_price, 'selling_price': 10.0})
+    assert response.status_code == 200, response.get_json()
+
+
+def sell(client, shop_id, product_id, quantity):
+    """Record a sale and return its cost of goods"""
+    response = client.post('/api/inventory/sale', json={
+        'shop_id': shop_id, 'product_id': product_id, 'quantity': quantity})
+    assert response.status_code == 200, response.get_json()
+    conn = db.get_db_connection()
+    try:
+        return conn.execute('SELECT cost_of_goods FROM transactions WHERE id = ?',
+                            (response.get_json()['transaction_id'],)).fetchone()[0]
+    finally:
+        conn.close()
+
+
+def layers(shop_id, product_id):
+    conn = db.get_db_connection()
+    try:
+        return [(layer['unit_cost'], layer['quantity_remaining'])
+                for layer in queries.COST_LAYERS.fetchall(conn, (shop_id, product_id))]
+    finally:
+        conn.close()
+
+
+def first_product(client):
+    return client.get('/api/products').get_json()['products'][0]['id']
+
+
+def test_fifo_consumes_oldest_layers_first(make_app):
+    app, client, shop_id = make_app(COSTING_METHOD='fifo')
+    product_id = first_product(client)
+    restock(client, shop_id, product_id, 10, 5.0)
+    restock(client, shop_id, product_id, 10, 8.0)
+    restock(client, shop_id, product_id, 10, 9.0)
+
+    assert sell(client, shop_id, product_id, 4) == pytest.approx(4 * 5.0)
+    # Empties the first layer and takes into the second
+    assert sell(client, shop_id, product_id, 11) == pytest.approx(6 * 5.0 + 5 * 8.0)
+    # Spans the rest of the second layer and part of the third
+    assert sell(client, shop_id, product_id, 8) == pytest.approx(5 * 8.0 + 3 * 9.0)
+    assert layers(shop_id, product_id) == [(9.0, 7)]
+
+    profit = client.get(f'/api/shops/{shop_id}/profit').get_json()['profit']
+    assert profit['totals']['cost_of_goods'] == pytest.approx(4 * 5.0 + 70.0 + 67.0)
+    assert profit['stock_at_cost'] == {'units': 7, 'value': pytest.approx(63.0)}
+
+
+def test_average_cost_reaverages_on_restock(make_app):
+    app, client, shop_id = make_app(COSTING_METHOD='average')
+    product_id = first_product(client)
+    restock(client, shop_id, product_id, 10, 5.0)
+    restock(client, shop_id, product_id, 30, 9.0)
+    assert layers(shop_id, product_id) == [(pytest.approx(8.0), 40)]
+
+    assert sell(client, shop_id, product_id, 10) == pytest.approx(80.0)
+    # Restocking after a sale averages the remaining units with the new ones
+    restock(client, shop_id, product_id, 10, 13.0)
+    assert layers(shop_id, product_id) == [(pytest.approx(9.25), 40)]
+    assert sell(client, shop_id, product_id, 40) == pytest.approx(370.0)
+    assert layers(shop_id, product_id) == []
+
+
+def test_sale_beyond_open_layers_uses_fallback_cost(make_app):
+    app, client, shop_id = make_app(COSTING_METHOD='fifo')
+    product_id = first_product(client)
+    conn = db.get_db_connection()
+    try:
+        with write_transaction(conn):
+            costing.receive(conn, shop_id, product_id, 3, 4.0, '2026-01-01T00:00:00')
+            costing.receive(conn, shop_id, product_id, 2, 6.0, '2026-01-02T00:00:00')
+        with write_transaction(conn):
+            cost = costing.consume(conn, shop_id, product_id, 8, fallback_cost=7.0)
+        with write_transaction(conn):
+            uncosted = costing.consume(conn, shop_id, product_id, 2)
+    finally:
+        conn.close()
+
+    assert cost == pytest.approx(3 * 4.0 + 2 * 6.0 + 3 * 7.0)
+    assert uncosted == 0.0
+    assert layers(shop_id, product_id) == []
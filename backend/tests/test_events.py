@@ -0,0 +1,35 @@
+# backend/tests/test_events.py
+from services.events import EventBroker
+
+
+def drain(subscription):
+    events = []
+    while not subscription.queue.empty():
+        events.append(subscription.queue.get_nowait())
+    return events
+
+
+def test_drops_since_the_queue_was_last_emptied_count():
+    broker = EventBroker(queue_size=2, max_dropped=3)
+    subscription = broker.subscribe('shop')
+
+    # Three drops per burst; a subscriber that catches up in between stays
+    for _ in range(4):
+        for i in range(5):
+            broker.publish('shop', 'stock_change', {'n': i})
+        assert subscription.dropped == 3
+        assert [event[1] for event in drain(subscription)] == ['stock_change'] * 2
+    assert broker.subscriber_count('shop') == 1
+
+
+def test_subscriber_too_far_behind_is_disconnected():
+    broker = EventBroker(queue_size=2, max_dropped=3)
+    subscription = broker.subscribe('shop')
+
+    for i in range(6):
+        broker.publish('shop', 'stock_change', {'n': i})
+
+    assert broker.subscriber_count('shop') == 0
+    events = drain(subscription)
+    assert events[0][1] == 'overflow' and events[0][2] == '{"dropped": 4}'
+    assert events[1] is None
@@ -0,0 +1,147 @@
+# backend/tests/test_ledger.py
+import os
+import sqlite3
+
+import pytest
+
+from services import ledger, rollups
+from utils import db, queries
+
+OLD_SALES = ['2020-01-15T10:00:00', '2020-01-20T10:00:00', '2020-02-03T09:00:00',
+             '2020-02-03T17:30:00']
+
+
+@pytest.fixture
+def shop(make_app, tmp_path, monkeypatch):
+    """A shop with one product restocked and OLD_SALES in closed months"""
+    monkeypatch.setattr(ledger, 'LEDGER_DIR', str(tmp_path / 'ledger'))
+    app, client, shop_id = make_app()
+    product_id = client.get('/api/products').get_json()['products'][0]['id']
+    response = client.post('/api/inventory/restock', json={
+        'shop_id': shop_id, 'product_id': product_id, 'quantity': 100,
+        'cost_price': 5.0, 'selling_price': 9.0})
+    assert response.status_code == 200, response.get_json()
+    conn = db.get_db_connection()
+    try:
+        for i, sold_at in enumerate(OLD_SALES):
+            add_sale(conn, f'old-{i}', shop_id, product_id, sold_at)
+        conn.commit()
+    finally:
+        conn.close()
+    return client, shop_id, product_id
+
+
+def add_sale(conn, transaction_id, shop_id, product_id, sold_at):
+    conn.execute('''
+        INSERT INTO transactions (id, shop_id, product_id, transaction_type, quantity,
+                                  price_per_unit, total_amount, transaction_date, cost_of_goods)
+        VALUES (?, ?, ?, 'sale', 1, 9.0, 9.0, ?, 5.0)
+    ''', (transaction_id, shop_id, product_id, sold_at))
+
+
+def rebuilt_rollups():
+    conn = db.get_db_connection()
+    try:
+        rollups.rebuild_rollups(conn)
+        return ([tuple(row) for row in conn.execute(
+                    'SELECT * FROM shop_daily_sales ORDER BY shop_id, sale_date')],
+                [tuple(row) for row in conn.execute(
+                    'SELECT * FROM product_daily_sales ORDER BY shop_id, sale_date, product_id')])
+    finally:
+        conn.close()
+
+
+def test_rebuild_rollups_includes_archived_months(shop):
+    before = rebuilt_rollups()
+
+    assert [period for period, _ in ledger.archive_closed_periods()] == ['2020-01', '2020-02']
+
+    assert rebuilt_rollups() == before
+    shop_days = [row[1] for row in before[0]]
+    assert {'2020-01-15', '2020-01-20', '2020-02-03'} <= set(shop_days)
+
+
+def hot_ids(shop_id):
+    conn = db.get_db_connection()
+    try:
+        return {row[0] for row in conn.execute(
+            'SELECT id FROM transactions WHERE shop_id = ?', (shop_id,))}
+    finally:
+        conn.close()
+
+
+def test_ledger_is_append_only(shop):
+    client, shop_id, product_id = shop
+    ledger.archive_closed_periods()
+    conn = db.get_db_connection()
+    try:
+        with pytest.raises(sqlite3.IntegrityError, match='append-only'):
+            conn.execute('UPDATE transactions SET quantity = 2 WHERE shop_id = ?', (shop_id,))
+        # Hot months cannot lose rows either
+        with pytest.raises(sqlite3.IntegrityError, match='append-only'):
+            conn.execute('DELETE FROM transactions WHERE shop_id = ?', (shop_id,))
+        with pytest.raises(sqlite3.IntegrityError, match='sealed'):
+            add_sale(conn, 'late', shop_id, product_id, '2020-01-31T12:00:00')
+        # A closed month that has not been archived still takes rows
+        add_sale(conn, 'unsealed', shop_id, product_id, '2020-03-01T08:00:00')
+        conn.rollback()
+    finally:
+        conn.close()
+
+
+def test_archive_crash_leaves_hot_rows_and_the_next_run_rebuilds(shop, monkeypatch):
+    client, shop_id, product_id = shop
+    before = hot_ids(shop_id)
+    # A run killed while writing leaves its temporary file behind
+    os.makedirs(ledger.ledger_dir())
+    leftover = os.path.join(ledger.ledger_dir(), 'transactions_2020_01.db.tmp')
+    with open(leftover, 'wb') as f:
+        f.write(b'partial')
+
+    def crash(conn, params=()):
+        raise sqlite3.OperationalError('disk I/O error')
+    # The archive file is sealed in place, then recording the partition fails
+    monkeypatch.setattr(queries, 'INSERT_LEDGER_PARTITION', crash)
+    with pytest.raises(sqlite3.OperationalError):
+        ledger.archive_closed_periods()
+
+    assert hot_ids(shop_id) == before
+    assert ledger.list_partitions() == []
+    assert not os.path.exists(leftover)
+
+    monkeypatch.undo()
+    monkeypatch.setattr(ledger, 'LEDGER_DIR', os.path.dirname(leftover))
+    assert ledger.archive_closed_periods() == [('2020-01', 2), ('2020-02', 2)]
+    assert hot_ids(shop_id) == before - {'old-0', 'old-1', 'old-2', 'old-3'}
+    assert sorted(os.listdir(ledger.ledger_dir())) == ['transactions_2020_01.db',
+                                                       'transactions_2020_02.db']
+    history = ledger.shop_history(shop_id, end='2020-12-31')
+    assert [t.id for t in history] == ['old-3', 'old-2', 'old-1', 'old-0']
+
+
+def test_shop_history_stops_at_the_limit_across_partitions(shop, monkeypatch):
+    client, shop_id, product_id = shop
+    ledger.archive_closed_periods()
+    restock, = hot_ids(shop_id)
+    opened = []
+    open_partition = ledger.open_partition
+
+    def spy(filename):
+        opened.append(filename)
+        return open_partition(filename)
+    monkeypatch.setattr(ledger, 'open_partition', spy)
+
+    def history(**kwargs):
+        opened.clear()
+        return [t.id for t in ledger.shop_history(shop_id, **kwargs)]
+
+    # The restock is hot; February alone fills the limit
+    assert history(limit=3) == [restock, 'old-3', 'old-2']
+    assert opened == ['transactions_2020_02.db']
+    assert history(limit=4) == [restock, 'old-3', 'old-2', 'old-1']
+    assert opened == ['transactions_2020_02.db', 'transactions_2020_01.db']
+    assert history(limit=1) == [restock]
+    assert opened == []
+    # Only partitions overlapping the range are read
+    assert history(start='2020-01-16', end='2020-01-31', transaction_type='sale') == ['old-1']
+    assert opened == ['transactions_2020_01.db']
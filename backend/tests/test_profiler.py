@@ -0,0 +1,81 @@
+# backend/tests/test_profiler.py
+"""Runs without Flask, so it can be checked on the oldest supported Python"""
+import functools
+import sys
+import threading
+import time
+
+from utils import profiler
+
+
+def traced(func):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        return func(*args, **kwargs)
+    return wrapper
+
+
+@traced
+def decorated():
+    return 1
+
+
+class Spinner:
+    def __init__(self):
+        self.stop = threading.Event()
+
+    def spin(self):
+        def inner():
+            while not self.stop.is_set():
+                pass
+        inner()
+
+    @staticmethod
+    def helper():
+        pass
+
+    @property
+    def stopped(self):
+        return self.stop.is_set()
+
+
+def test_qualnames_without_co_qualname():
+    names = profiler._qualnames(globals())
+    assert names[Spinner.spin.__code__] == 'Spinner.spin'
+    inner = next(const for const in Spinner.spin.__code__.co_consts if hasattr(const, 'co_name'))
+    assert names[inner] == 'Spinner.spin.<locals>.inner'
+    assert names[Spinner.helper.__code__] == 'Spinner.helper'
+    assert names[Spinner.stopped.fget.__code__] == 'Spinner.stopped'
+    assert names[decorated.__wrapped__.__code__] == 'decorated'
+    assert names[decorated.__code__] == 'traced.<locals>.wrapper'
+
+
+def test_qualnames_agree_with_the_interpreter():
+    if sys.version_info < (3, 11):
+        return
+    for module in (sys.modules[__name__], threading, profiler):
+        for code, qualname in profiler._qualnames(vars(module)).items():
+            assert qualname == code.co_qualname
+
+
+def test_sample_labels_busy_threads_and_skips_idle_ones():
+    spinner, idle = Spinner(), threading.Event()
+    threads = [threading.Thread(target=spinner.spin), threading.Thread(target=idle.wait)]
+    for thread in threads:
+        thread.start()
+    run = profiler.Profile(1)
+    try:
+        for _ in range(20):
+            run.sample(threading.get_ident())
+            time.sleep(0.001)
+    finally:
+        spinner.stop.set()
+        idle.set()
+        for thread in threads:
+            thread.join()
+
+    labels = {label for stack in run.stacks for label in stack}
+    assert f'{__name__}:Spinner.spin' in labels
+    assert f'{__name__}:Spinner.spin.<locals>.inner' in labels
+    assert not any(stack[-1].startswith('threading:') and 'wait' in stack[-1] for stack in run.stacks)
+    assert run.idle >= 20
@@ -0,0 +1,53 @@
+# backend/tests/test_schema.py
+import pytest
+
+import app
+from utils import db
+
+
+def insert_products(rows):
+    conn = db.get_db_connection()
+    try:
+        conn.execute('DROP INDEX idx_products_barcode')
+        conn.execute('DROP INDEX idx_products_name_brand')
+        conn.executemany('INSERT INTO products (id, name, brand, barcode) VALUES (?, ?, ?, ?)', rows)
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def product_indexes():
+    conn = db.get_db_connection()
+    try:
+        return {row[0] for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE name LIKE 'idx_products_%'")}
+    finally:
+        conn.close()
+
+
+def test_blank_barcodes_become_null(make_app):
+    make_app()
+    insert_products([('blank-1', 'Soap', 'A', ''), ('blank-2', 'Soap', 'B', '  ')])
+
+    app.init_database()
+
+    conn = db.get_db_connection()
+    try:
+        rows = conn.execute("SELECT barcode FROM products WHERE id LIKE 'blank-%'").fetchall()
+    finally:
+        conn.close()
+    assert [row[0] for row in rows] == [None, None]
+    assert {'idx_products_barcode', 'idx_products_name_brand'} <= product_indexes()
+
+
+def test_duplicates_stop_startup_with_their_ids(make_app):
+    make_app()
+    insert_products([('dup-1', 'Rice', 'A', '123'), ('dup-2', 'Rice 5kg', 'A', '123'),
+                     ('dup-3', 'Salt', None, ''), ('dup-4', 'Salt', '', None)])
+
+    with pytest.raises(RuntimeError) as error:
+        app.init_database()
+    message = str(error.value)
+    assert 'dup-1, dup-2' in message or 'dup-2, dup-1' in message
+    assert 'dup-3, dup-4' in message or 'dup-4, dup-3' in message
+    assert 'idx_products_barcode' not in product_indexes()
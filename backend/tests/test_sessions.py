@@ -0,0 +1,214 @@
+# backend/tests/test_sessions.py
+import os
+import sqlite3
+import subprocess
+import sys
+import textwrap
+from datetime import datetime, timedelta
+
+import jwt
+import pytest
+
+from services import sessions
+from services.auth_service import AuthService
+from utils import db, queries
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+ACCOUNT = {'shop_name': 'Test Shop', 'owner_name': 'Owner', 'email': 'shop@example.com',
+           'phone': '981234567', 'password': 'secret1', 'address': 'Address'}
+
+
+@pytest.fixture
+def shop_id(make_app):
+    make_app()
+    result = AuthService().register_shop(ACCOUNT)
+    assert result['success'], result
+    return result['shop_id']
+
+
+def open_session(shop_id):
+    conn = db.get_db_connection()
+    try:
+        tokens = sessions.open_session(conn, shop_id, 'shop@example.com')
+        conn.commit()
+        return tokens
+    finally:
+        conn.close()
+
+
+def refresh(refresh_token):
+    conn = db.get_db_connection()
+    try:
+        tokens = sessions.refresh_session(conn, refresh_token)
+        conn.commit()
+        return tokens
+    finally:
+        conn.close()
+
+
+def in_other_process(code):
+    script = f'from utils import db\ndb.configure({db.DATABASE!r})\n' + textwrap.dedent(code)
+    subprocess.run([sys.executable, '-c', script], cwd=BACKEND, check=True)
+
+
+def revoke_in_other_process(session_id):
+    in_other_process(f'''
+        from services import sessions
+        conn = db.get_db_connection()
+        try:
+            sessions.revoke_session(conn, {session_id!r})
+        finally:
+            conn.close()
+    ''')
+
+
+def test_register_and_log_in_through_the_api(make_app):
+    app, client, _ = make_app()
+    registered = client.post('/auth/register', json=ACCOUNT)
+    assert registered.status_code == 201, registered.get_json()
+
+    login = client.post('/auth/login', json={'email': ACCOUNT['email'], 'password': ACCOUNT['password']})
+    assert login.status_code == 200, login.get_json()
+    headers = {'Authorization': f"Bearer {login.get_json()['token']}"}
+    profile = client.get('/auth/profile', headers=headers).get_json()
+    assert profile['shop']['shop_name'] == 'Test Shop'
+    assert profile['shop']['id'] == registered.get_json()['shop']['id']
+
+    wrong = client.post('/auth/login', json={'email': ACCOUNT['email'], 'password': 'wrong1'})
+    assert wrong.status_code == 401
+    taken = client.post('/auth/register', json=ACCOUNT)
+    assert taken.status_code == 400
+
+
+def test_refresh_rotates_the_refresh_token(shop_id):
+    tokens = open_session(shop_id)
+    assert sessions.verify_access_token(tokens['access_token'])['sid'] == tokens['session_id']
+
+    rotated = refresh(tokens['refresh_token'])
+    assert rotated['session_id'] == tokens['session_id']
+    assert rotated['refresh_token'] != tokens['refresh_token']
+    assert sessions.verify_access_token(rotated['access_token'])['shop_id'] == shop_id
+
+    # The old refresh token was redeemed; the new one still works once
+    assert refresh(tokens['refresh_token']) is None
+    assert refresh(rotated['refresh_token']) is not None
+
+
+def test_revocation_in_another_process_is_seen(shop_id):
+    tokens = open_session(shop_id)
+    other = open_session(shop_id)
+    sessions.verify_access_token(tokens['access_token'])
+
+    revoke_in_other_process(tokens['session_id'])
+
+    with pytest.raises(sessions.SessionRevoked):
+        sessions.verify_access_token(tokens['access_token'])
+    assert sessions.verify_access_token(other['access_token'])['sid'] == other['session_id']
+    assert refresh(tokens['refresh_token']) is None
+
+
+def test_revocation_committed_out_of_order_is_seen(shop_id):
+    first = open_session(shop_id)
+    second = open_session(shop_id)
+
+    conn = db.get_db_connection()
+    try:
+        sessions.revoke_session(conn, second['session_id'])
+        with pytest.raises(sessions.SessionRevoked):
+            sessions.verify_access_token(second['access_token'])
+
+        # Stamped before the revocation already loaded, committed after it
+        earlier = sessions._timestamp(datetime.now() - timedelta(seconds=5))
+        with db.write_transaction(conn):
+            queries.REVOKE_SESSION(conn, (earlier, first['session_id']))
+            queries.RECORD_REVOCATION(conn, (first['session_id'],))
+        sessions._bump_epoch()
+    finally:
+        conn.close()
+
+    with pytest.raises(sessions.SessionRevoked):
+        sessions.verify_access_token(first['access_token'])
+
+
+def test_epoch_file_stays_one_counter(shop_id):
+    conn = db.get_db_connection()
+    try:
+        for _ in range(50):
+            sessions.revoke_session(conn, open_session(shop_id)['session_id'])
+    finally:
+        conn.close()
+    before = sessions._read_epoch()
+
+    sessions._bump_epoch()
+
+    assert sessions._read_epoch() != before
+    assert os.path.getsize(sessions._epoch_path()) == sessions.EPOCH.size
+
+
+def test_shop_changes_in_another_process_reach_the_shop_cache(shop_id):
+    tokens = open_session(shop_id)
+    auth = AuthService()
+    sessions.verify_access_token(tokens['access_token'])
+    assert auth.get_shop_by_id(shop_id)['shop_name'] == 'Test Shop'
+
+    in_other_process(f'''
+        from services.auth_service import AuthService
+        assert AuthService().update_shop_profile({shop_id!r}, {{'shop_name': 'Renamed'}})['success']
+    ''')
+    sessions.verify_access_token(tokens['access_token'])
+    assert auth.get_shop_by_id(shop_id)['shop_name'] == 'Renamed'
+
+    in_other_process(f'''
+        from services.auth_service import AuthService
+        assert AuthService().deactivate_shop({shop_id!r})['revoked_sessions'] == 2
+    ''')
+    with pytest.raises(sessions.SessionRevoked):
+        sessions.verify_access_token(tokens['access_token'])
+    assert auth.get_shop_by_id(shop_id) is None
+    assert refresh(tokens['refresh_token']) is None
+
+
+def test_password_change_commits_with_its_revocations(shop_id, monkeypatch):
+    kept, other = open_session(shop_id), open_session(shop_id)
+    auth = AuthService()
+
+    def fail(revocation, shop_id):
+        raise sqlite3.OperationalError('disk I/O error')
+
+    with monkeypatch.context() as patched:
+        patched.setattr(sessions.Revocation, 'shop_changed', fail)
+        result = auth.change_password(shop_id, 'secret1', 'secret2', keep_session=kept['session_id'])
+    assert not result['success']
+    # Neither the new password nor the revocations were committed
+    assert auth.login_shop(ACCOUNT['email'], 'secret1')['success']
+    sessions.verify_access_token(other['access_token'])
+
+    assert auth.change_password(shop_id, 'secret1', 'secret2', keep_session=kept['session_id'])['success']
+    assert auth.login_shop(ACCOUNT['email'], 'secret2')['success']
+    sessions.verify_access_token(kept['access_token'])
+    with pytest.raises(sessions.SessionRevoked):
+        sessions.verify_access_token(other['access_token'])
+
+
+def test_revoke_shop_sessions_keeps_one(shop_id):
+    kept = open_session(shop_id)
+    dropped = open_session(shop_id)
+    conn = db.get_db_connection()
+    try:
+        # The dropped session and the one registering opened
+        assert sessions.revoke_shop_sessions(conn, shop_id, keep=kept['session_id']) == 2
+    finally:
+        conn.close()
+
+    sessions.verify_access_token(kept['access_token'])
+    with pytest.raises(sessions.SessionRevoked):
+        sessions.verify_access_token(dropped['access_token'])
+
+
+def test_access_token_needs_a_session(shop_id):
+    token = jwt.encode({'shop_id': shop_id, 'exp': datetime.now() + timedelta(minutes=1)},
+                       sessions.SECRET_KEY, algorithm=sessions.ALGORITHM)
+    with pytest.raises(jwt.InvalidTokenError):
+        sessions.verify_access_token(token)
@@ -0,0 +1,104 @@
+# backend/tests/test_stocktake.py
+import pytest
+
+from utils import db
+from test_costing import layers, restock
+
+
+def stocktake(client, shop_id, counts):
+    return client.post('/api/inventory/stocktake', json={
+        'shop_id': shop_id,
+        'counts': [{'product_id': product_id, 'quantity': quantity}
+                   for product_id, quantity in counts.items()]})
+
+
+def adjustments(shop_id):
+    conn = db.get_db_connection()
+    try:
+        return {row['product_id']: (row['quantity'], row['total_amount'], row['cost_of_goods'])
+                for row in conn.execute('''
+                    SELECT product_id, quantity, total_amount, cost_of_goods FROM transactions
+                    WHERE shop_id = ? AND transaction_type = 'adjustment'
+                ''', (shop_id,))}
+    finally:
+        conn.close()
+
+
+def stock(client, shop_id):
+    items = client.get(f'/api/inventory/{shop_id}').get_json()['inventory']
+    return {item['product_id']: item['current_stock'] for item in items}
+
+
+@pytest.fixture
+def shop(make_app):
+    """A FIFO shop with four products: two layers, one layer, one layer, none"""
+    app, client, shop_id = make_app(COSTING_METHOD='fifo')
+    products = [p['id'] for p in client.get('/api/products').get_json()['products'][:4]]
+    short, over, unchanged, new = products
+    restock(client, shop_id, short, 10, 5.0)
+    restock(client, shop_id, short, 10, 8.0)
+    restock(client, shop_id, over, 5, 4.0)
+    restock(client, shop_id, unchanged, 7, 2.0)
+    return client, shop_id, products
+
+
+def test_stocktake_reports_variances(shop):
+    client, shop_id, (short, over, unchanged, new) = shop
+
+    response = stocktake(client, shop_id, {short: 14, over: 8, unchanged: 7, new: 2})
+
+    assert response.status_code == 200, response.get_json()
+    report = response.get_json()['report']
+    assert (report['counted_items'], report['adjusted_items'], report['unchanged_items']) == (4, 3, 1)
+    assert (report['units_over'], report['units_short']) == (5, 6)
+    assert report['value_over'] == pytest.approx(3 * 4.0)
+    assert report['value_short'] == pytest.approx(6 * 5.0)
+    assert report['net_value'] == pytest.approx(3 * 4.0 - 6 * 5.0)
+    # Largest value first
+    assert [(item['product_id'], item['previous_stock'], item['new_stock'], item['variance'])
+            for item in report['variances']] == [(short, 20, 14, -6), (over, 5, 8, 3),
+                                                  (new, 0, 2, 2)]
+    assert stock(client, shop_id) == {short: 14, over: 8, unchanged: 7, new: 2}
+
+
+def test_stocktake_records_signed_adjustments(shop):
+    client, shop_id, (short, over, unchanged, new) = shop
+
+    stocktake(client, shop_id, {short: 14, over: 8, unchanged: 7, new: 2})
+
+    assert adjustments(shop_id) == {
+        short: (-6, pytest.approx(-30.0), pytest.approx(30.0)),
+        over: (3, pytest.approx(12.0), None),
+        new: (2, 0.0, None),
+    }
+
+
+def test_shortage_consumes_the_oldest_layers(shop):
+    client, shop_id, (short, over, unchanged, new) = shop
+
+    stocktake(client, shop_id, {short: 3})
+
+    # 10 at 5.0 and 7 of the 8.0 layer are gone
+    assert adjustments(shop_id)[short][2] == pytest.approx(10 * 5.0 + 7 * 8.0)
+    assert layers(shop_id, short) == [(8.0, 3)]
+
+
+def test_surplus_opens_a_layer_at_cost_price(shop):
+    client, shop_id, (short, over, unchanged, new) = shop
+
+    stocktake(client, shop_id, {over: 8, new: 2})
+
+    assert layers(shop_id, over) == [(4.0, 5), (4.0, 3)]
+    assert layers(shop_id, new) == [(0.0, 2)]
+    assert layers(shop_id, unchanged) == [(2.0, 7)]
+
+
+def test_unknown_product_rejects_the_whole_count(shop):
+    client, shop_id, (short, over, unchanged, new) = shop
+
+    response = stocktake(client, shop_id, {short: 14, 'no-such-product': 1})
+
+    assert response.status_code == 400
+    assert 'no-such-product' in response.get_json()['error']
+    assert adjustments(shop_id) == {}
+    assert layers(shop_id, short) == [(5.0, 10), (8.0, 10)]
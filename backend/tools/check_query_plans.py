@@ -0,0 +1,106 @@
+# backend/tools/check_query_plans.py
+"""Query-plan check for every statement in utils.queries
+
+Creates both schemas (app.init_database and config/database_setup.py) in a
+scratch directory, runs EXPLAIN QUERY PLAN on each registered statement and
+exits non-zero if a statement not marked allow_scan does a full table scan.
+Statements for other schemas (attached archive files) are skipped.
+
+    python tools/check_query_plans.py [--verbose]
+"""
+import argparse
+import os
+import re
+import sqlite3
+import sys
+import tempfile
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+
+from utils import db, queries  # noqa: E402
+
+NAMED_PARAM = re.compile(r':([A-Za-z_]\w*)')
+# A virtual table (R*Tree) scan that passes constraints to its own index
+VIRTUAL_INDEX_SEARCH = re.compile(r'VIRTUAL TABLE INDEX \d+:\S')
+
+
+def build_schemas(workdir):
+    """Return {schema: path} with each schema created in its own file"""
+    import app
+    from config import database_setup
+
+    app_db = os.path.join(workdir, 'app.db')
+    db.configure(app_db)
+    app.init_database()
+    db.close_pools()
+
+    # database_setup.py always writes ./shoptracker.db
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        database_setup.create_tables()
+    finally:
+        os.chdir(cwd)
+    return {'app': app_db, 'auth': os.path.join(workdir, 'shoptracker.db')}
+
+
+def placeholder_params(sql):
+    names = NAMED_PARAM.findall(sql)
+    if names:
+        return dict.fromkeys(names)
+    return (None,) * sql.count('?')
+
+
+def explain(conn, stmt):
+    rows = conn.execute('EXPLAIN QUERY PLAN ' + stmt.sql, placeholder_params(stmt.sql)).fetchall()
+    return [row[3] for row in rows]
+
+
+def full_scans(plan):
+    return [detail for detail in plan
+            if detail.startswith('SCAN ') and 'CONSTANT ROW' not in detail
+            and 'USING INDEX' not in detail and 'USING COVERING INDEX' not in detail
+            and not VIRTUAL_INDEX_SEARCH.search(detail)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--verbose', action='store_true', help='print every plan')
+    args = parser.parse_args()
+
+    failures = []
+    with tempfile.TemporaryDirectory() as workdir:
+        connections = {schema: sqlite3.connect(path)
+                       for schema, path in build_schemas(workdir).items()}
+        # Temporary tables live per connection
+        queries.CREATE_STOCKTAKE_COUNTS(connections['app'])
+        queries.CREATE_AUDIT_BALANCES(connections['app'])
+        try:
+            for name, stmt in sorted(queries.STATEMENTS.items()):
+                if stmt.schema not in connections:
+                    # Needs attached databases (e.g. ledger archive files)
+                    print(f'{"skipped":<10} {name}')
+                    continue
+                plan = explain(connections[stmt.schema], stmt)
+                scans = full_scans(plan)
+                status = 'scan ok' if scans and stmt.allow_scan else 'FULL SCAN' if scans else 'ok'
+                if scans and not stmt.allow_scan:
+                    failures.append(name)
+                print(f'{status:<10} {name}')
+                if args.verbose or status == 'FULL SCAN':
+                    for detail in plan:
+                        print(f'             {detail}')
+        finally:
+            for conn in connections.values():
+                conn.close()
+
+    if failures:
+        print(f'\nFAIL: {len(failures)} statement(s) scan a whole table: {", ".join(failures)}')
+        return 1
+    print(f'\nOK: {len(queries.STATEMENTS)} statements checked')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
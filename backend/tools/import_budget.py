@@ -0,0 +1,99 @@
+# backend/tools/import_budget.py
+"""Startup-time budget check for the backend
+
+Imports the WSGI entry point in a fresh interpreter under `python -X importtime`,
+prints the most expensive modules and top-level packages, and exits non-zero
+when the total import time exceeds the budget or when a heavy analytics
+dependency (utils.lazy.HEAVY_MODULES) is imported at boot.
+
+    python tools/import_budget.py [--module wsgi] [--budget-ms 500] [--top 20]
+"""
+import argparse
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+
+from utils.lazy import HEAVY_MODULES  # noqa: E402
+
+
+def measure(module, runs):
+    """Return {module: (self_us, cumulative_us)} from the fastest of `runs` imports"""
+    best = None
+    for _ in range(runs):
+        env = dict(os.environ, PYTHONDONTWRITEBYTECODE='1')
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+            cwd=BACKEND, env=env, capture_output=True, text=True
+        )
+        if result.returncode != 0:
+            sys.stderr.write(result.stderr)
+            raise SystemExit(f'importing {module} failed')
+        timings = parse(result.stderr)
+        if best is None or timings[module][1] < best[module][1]:
+            best = timings
+    return best
+
+
+def parse(output):
+    timings = {}
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        timings[name.strip()] = (int(self_us), int(cumulative_us))
+    return timings
+
+
+def heavy_imports(timings):
+    return sorted(name for name in timings
+                  if any(name == heavy or name.startswith(heavy + '.') for heavy in HEAVY_MODULES))
+
+
+def report(module, timings, top):
+    total_us = timings[module][1]
+    print(f'import {module}: {total_us / 1000:.1f} ms across {len(timings)} modules')
+
+    print(f'\nTop {top} modules by self time (ms):')
+    for name, (self_us, cumulative_us) in sorted(timings.items(), key=lambda item: -item[1][0])[:top]:
+        print(f'  {self_us / 1000:8.2f}  {cumulative_us / 1000:8.2f} cum  {name}')
+
+    packages = defaultdict(int)
+    for name, (self_us, _) in timings.items():
+        packages[name.split('.')[0]] += self_us
+    print(f'\nTop {top} packages by total self time (ms):')
+    for name, self_us in sorted(packages.items(), key=lambda item: -item[1])[:top]:
+        print(f'  {self_us / 1000:8.2f}  {name}')
+    return total_us
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--module', default='wsgi', help='module to import (default: wsgi)')
+    parser.add_argument('--budget-ms', type=float, default=500.0)
+    parser.add_argument('--runs', type=int, default=3, help='imports to run, fastest is reported')
+    parser.add_argument('--top', type=int, default=20)
+    args = parser.parse_args()
+
+    timings = measure(args.module, args.runs)
+    total_us = report(args.module, timings, args.top)
+
+    failures = []
+    heavy = heavy_imports(timings)
+    if heavy:
+        failures.append(f'heavy modules imported at startup: {", ".join(heavy)}')
+    if total_us / 1000 > args.budget_ms:
+        failures.append(f'import time {total_us / 1000:.1f} ms exceeds budget of {args.budget_ms:.0f} ms')
+
+    if failures:
+        print('\nFAIL: ' + '\nFAIL: '.join(failures))
+        return 1
+    print(f'\nOK: within {args.budget_ms:.0f} ms budget, no heavy modules imported')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
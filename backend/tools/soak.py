@@ -0,0 +1,499 @@
+# backend/tools/soak.py
+"""Soak test: drive the API for hours and fail on leaks
+
+Serves the Flask app in this process (through the WSGI test client, from
+--threads client threads) so that it can watch the process doing the work:
+
+  - RSS and open file descriptors (from /proc),
+  - descriptors open on the database files (one or more per sqlite connection),
+  - pooled sqlite connections checked out while nothing runs, and connections
+    garbage-collected without close() (utils.db.connection_stats),
+  - the Python heap under tracemalloc, per allocation site,
+  - threads and SSE subscribers.
+
+The run is a series of cycles. In each cycle every endpoint gets --requests
+requests on its own, and the counters are read (after gc) before and after
+its batch, which is what attributes a leak to an endpoint. Error paths are
+driven too: a missing field, too little stock, an unknown barcode, a
+malformed refresh token, a wrong password. The first --warmup cycles fill
+pools and caches and are not counted.
+
+At the end the whole-process trend of every counter (the median of the last
+third of the samples against the first third) is checked against its limit,
+and a per-endpoint report lists latency, unexpected statuses, heap growth
+per request with its top growing allocation sites, and connections, file
+descriptors, threads or subscribers left behind. Exits 1 if any trend is
+over its limit or any endpoint leaked.
+
+    python tools/soak.py [--duration 2h] [--requests 50]
+                         [--threads 4] [--report soak.json]
+"""
+import argparse
+import gc
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import defaultdict, deque
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+
+SHOPS = 20
+ITEMS_PER_SHOP = 50
+PASSWORD = 'soak-password'
+LATENCY_SAMPLES = 10000  # latencies kept per endpoint
+TOP_SITES = 5  # allocation sites shown per endpoint
+
+# Whole-process counters: (growth that is noise, growth allowed per hour)
+TREND_LIMITS = {
+    'rss_mb': (16.0, 32.0),
+    'heap_mb': (2.0, 8.0),
+    'fds': (0, 0),
+    'db_fds': (0, 0),
+    'checked_out': (0, 0),
+    'dropped': (0, 0),
+    'threads': (0, 0),
+    'subscribers': (0, 0),
+}
+# Per-endpoint counters where anything left behind after warmup is a leak
+ENDPOINT_LEAKS = ('fds', 'db_fds', 'checked_out', 'dropped', 'threads', 'subscribers')
+
+# Allocations made by the harness itself and by the import machinery
+SNAPSHOT_FILTERS = [
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, __file__),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+    tracemalloc.Filter(False, '<unknown>'),
+]
+
+
+def parse_duration(text):
+    """Seconds in '90', '90s', '30m' or '2h'"""
+    units = {'s': 1, 'm': 60, 'h': 3600}
+    if text and text[-1] in units:
+        return float(text[:-1]) * units[text[-1]]
+    return float(text)
+
+
+def rss_mb():
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1024 / 1024
+    except OSError:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # peak, not current
+
+
+def open_fds(database):
+    """(open descriptors, descriptors on the database, its WAL/SHM and replica)"""
+    fd_dir = '/proc/self/fd' if os.path.isdir('/proc/self/fd') else '/dev/fd'
+    fds = on_database = 0
+    for fd in os.listdir(fd_dir):
+        try:
+            target = os.readlink(os.path.join(fd_dir, fd))
+        except OSError:
+            continue  # the directory's own descriptor, already closed
+        fds += 1
+        on_database += target.startswith(database)
+    return fds, on_database
+
+
+class Probe:
+    """Reads every counter the soak watches"""
+
+    def __init__(self, database):
+        self.database = os.path.abspath(database)
+        self.snapshot = None
+
+    def read(self, snapshot=True):
+        from services.events import broker
+        from utils import db
+
+        gc.collect()
+        connections = db.connection_stats()
+        fds, db_fds = open_fds(self.database)
+        sample = {
+            'rss_mb': rss_mb(),
+            'fds': fds,
+            'db_fds': db_fds,
+            'checked_out': connections['open'] - connections['idle'],
+            'dropped': connections['dropped'],
+            'threads': threading.active_count(),
+            'subscribers': broker.subscriber_count(),
+        }
+        if snapshot and tracemalloc.is_tracing():
+            self.snapshot = tracemalloc.take_snapshot().filter_traces(SNAPSHOT_FILTERS)
+            sample['heap_mb'] = sum(trace.size for trace in self.snapshot.traces) / 1024 / 1024
+        return sample
+
+
+class Fixture:
+    """Shops, stocked products and a registered account to drive"""
+
+    def __init__(self, shop_ids=(), products=(), email=None, access_token=None):
+        self.shop_ids = list(shop_ids)
+        self.products = list(products)  # [(product_id, barcode)]
+        self.email = email
+        self.access_token = access_token
+        self._refresh_tokens = {}
+
+    @classmethod
+    def app(cls, client, shops=SHOPS, items=ITEMS_PER_SHOP):
+        """Every product stocked in every shop, and one account to sign in with"""
+        from app import prepare_database
+        from utils import db
+
+        demo_shop_id = prepare_database()
+        conn = db.get_db_connection()
+        try:
+            products = [tuple(row) for row in conn.execute(
+                'SELECT id, barcode FROM products WHERE barcode IS NOT NULL ORDER BY id LIMIT ?', (items,))]
+            shop_ids = [demo_shop_id] + [f'soak-{n:03d}' for n in range(shops - 1)]
+            with db.write_transaction(conn):
+                conn.executemany('INSERT INTO shops (id, name, latitude, longitude) VALUES (?, ?, ?, ?)',
+                                 ((shop_id, f'Soak Shop {shop_id}', 27.6 + n / 1000, 85.5 + n / 1000)
+                                  for n, shop_id in enumerate(shop_ids[1:])))
+        finally:
+            conn.close()
+
+        for shop_id in shop_ids:
+            for product_id, _ in products:
+                response = client.post('/api/inventory/restock', json={
+                    'shop_id': shop_id, 'product_id': product_id, 'quantity': 1_000_000,
+                    'cost_price': 8, 'selling_price': 10})
+                assert response.status_code == 200, response.data
+
+        email = 'soak@example.com'
+        response = client.post('/auth/register', json={
+            'shop_name': 'Soak Account', 'owner_name': 'Soak', 'email': email,
+            'phone': '980000000', 'password': PASSWORD, 'address': 'Dhulikhel'})
+        assert response.status_code == 201, response.data
+        return cls(shop_ids=shop_ids, products=products, email=email,
+                   access_token=response.get_json()['token'])
+
+    def refresh_token(self, client):
+        """This thread's refresh token (each refresh rotates it)"""
+        key = threading.get_ident()
+        if key not in self._refresh_tokens:
+            response = client.post('/auth/login', json={'email': self.email, 'password': PASSWORD})
+            self._refresh_tokens[key] = response.get_json()['refresh_token']
+        return self._refresh_tokens[key]
+
+    def rotate(self, refresh_token):
+        self._refresh_tokens[threading.get_ident()] = refresh_token
+
+
+def app_endpoints(fixture, admin):
+    """[(name, call(client, rng), expected statuses)] of the inventory API"""
+
+    def shop(rng):
+        return rng.choice(fixture.shop_ids)
+
+    def product(rng):
+        return rng.choice(fixture.products)
+
+    def sale(client, rng):
+        return client.post('/api/inventory/sale', json={
+            'shop_id': shop(rng), 'product_id': product(rng)[0], 'quantity': 1, 'selling_price': 10})
+
+    def events(client, rng):
+        response = client.get(f'/api/inventory/{shop(rng)}/events', buffered=False)
+        next(iter(response.response))  # the retry: line, then the client goes away
+        response.close()
+        return response
+
+    return [
+        ('GET /api/health', lambda c, rng: c.get('/api/health'), {200}),
+        ('GET /api/products', lambda c, rng: c.get('/api/products?search=a'), {200}),
+        ('GET /api/products/barcode', lambda c, rng: c.get(f'/api/products/barcode/{product(rng)[1]}'), {200}),
+        ('GET /api/products/barcode (unknown)', lambda c, rng: c.get('/api/products/barcode/0000000000000'), {404}),
+        ('GET /api/inventory', lambda c, rng: c.get(f'/api/inventory/{shop(rng)}'), {200}),
+        ('GET /api/inventory/low-stock', lambda c, rng: c.get(f'/api/inventory/{shop(rng)}/low-stock'), {200}),
+        ('GET /api/inventory/events', events, {200}),
+        ('POST /api/inventory/sale', sale, {200}),
+        ('POST /api/inventory/sale (no stock)', lambda c, rng: c.post('/api/inventory/sale', json={
+            'shop_id': shop(rng), 'product_id': product(rng)[0], 'quantity': 10 ** 9}), {400}),
+        ('POST /api/inventory/sale (missing field)', lambda c, rng: c.post('/api/inventory/sale', json={
+            'shop_id': shop(rng)}), {400}),
+        ('POST /api/inventory/scan-sale', lambda c, rng: c.post('/api/inventory/scan-sale', json={
+            'shop_id': shop(rng), 'barcode': product(rng)[1], 'selling_price': 10}), {200}),
+        ('POST /api/inventory/scan-sale (unknown)', lambda c, rng: c.post('/api/inventory/scan-sale', json={
+            'shop_id': shop(rng), 'barcode': '0000000000000'}), {404}),
+        ('POST /api/inventory/restock', lambda c, rng: c.post('/api/inventory/restock', json={
+            'shop_id': shop(rng), 'product_id': product(rng)[0], 'quantity': 1,
+            'cost_price': 8, 'selling_price': 10}), {200}),
+        ('POST /api/inventory/stocktake', lambda c, rng: c.post('/api/inventory/stocktake', json={
+            'shop_id': shop(rng), 'counts': [{'product_id': product(rng)[0], 'quantity': 1_000_000}]}), {200}),
+        ('GET /api/shops/stats', lambda c, rng: c.get(f'/api/shops/{shop(rng)}/stats'), {200}),
+        ('GET /api/shops/transactions', lambda c, rng: c.get(f'/api/shops/{shop(rng)}/transactions?limit=50'), {200}),
+        ('GET /api/shops/profit', lambda c, rng: c.get(f'/api/shops/{shop(rng)}/profit'), {200}),
+        ('GET /api/shops/nearby', lambda c, rng: c.get('/api/shops/nearby?lat=27.61&lon=85.51&radius_km=10'), {200}),
+        ('PUT /api/shops/location', lambda c, rng: c.put(f'/api/shops/{shop(rng)}/location', json={
+            'latitude': 27.6 + rng.random() / 100, 'longitude': 85.5 + rng.random() / 100}), {200}),
+        ('GET /api/admin/metrics', lambda c, rng: c.get('/api/admin/metrics', headers=admin), {200}),
+        ('GET /api/admin/overview', lambda c, rng: c.get('/api/admin/overview', headers=admin), {200}),
+        ('GET /api/admin/low-stock', lambda c, rng: c.get('/api/admin/low-stock', headers=admin), {200}),
+    ]
+
+
+def auth_endpoints(fixture):
+    """[(name, call(client, rng), expected statuses)] of the auth API"""
+    auth = {'Authorization': f'Bearer {fixture.access_token}'}
+
+    def refresh(client, rng):
+        response = client.post('/auth/refresh-token',
+                               json={'refresh_token': fixture.refresh_token(client)})
+        if response.status_code == 200:
+            fixture.rotate(response.get_json()['refresh_token'])
+        return response
+
+    def register_and_logout(client, rng):
+        tag = uuid.uuid4().hex[:8]
+        response = client.post('/auth/register', json={
+            'shop_name': f'Soak {tag}', 'owner_name': 'Soak', 'email': f'soak-{tag}@example.com',
+            'phone': f'9{rng.randrange(10 ** 8):08d}', 'password': PASSWORD, 'address': 'Dhulikhel'})
+        if response.status_code != 201:
+            return response
+        return client.post('/auth/logout', headers={'Authorization': f'Bearer {response.get_json()["token"]}'})
+
+    return [
+        ('GET /auth/health', lambda c, rng: c.get('/auth/health'), {200}),
+        ('POST /auth/login', lambda c, rng: c.post('/auth/login', json={
+            'email': fixture.email, 'password': PASSWORD}), {200}),
+        ('POST /auth/login (wrong password)', lambda c, rng: c.post('/auth/login', json={
+            'email': fixture.email, 'password': 'wrong-password'}), {401}),
+        ('POST /auth/refresh-token', refresh, {200}),
+        ('POST /auth/refresh-token (malformed)', lambda c, rng: c.post('/auth/refresh-token', json={
+            'refresh_token': 12345}), {401}),
+        ('POST /auth/register + logout', register_and_logout, {200}),
+        ('POST /auth/register (taken)', lambda c, rng: c.post('/auth/register', json={
+            'shop_name': 'Soak', 'owner_name': 'Soak', 'email': fixture.email, 'phone': '980000000',
+            'password': PASSWORD, 'address': 'Dhulikhel'}), {400}),
+        ('GET /auth/profile', lambda c, rng: c.get('/auth/profile', headers=auth), {200}),
+        ('PUT /auth/profile', lambda c, rng: c.put('/auth/profile', headers=auth, json={
+            'city': rng.choice(['Dhulikhel', 'Banepa'])}), {200}),
+        ('PUT /auth/profile (malformed)', lambda c, rng: c.put('/auth/profile', headers=auth, json={
+            'city': ['Dhulikhel']}), {400}),
+        ('POST /auth/change-password (wrong password)', lambda c, rng: c.post(
+            '/auth/change-password', headers=auth,
+            json={'current_password': 'wrong-password', 'new_password': 'another-password'}), {400}),
+        ('POST /auth/verify-token', lambda c, rng: c.post('/auth/verify-token', json={
+            'token': fixture.access_token}), {200}),
+    ]
+
+
+class EndpointStats:
+    """Latencies, unexpected statuses and counter growth of one endpoint"""
+
+    def __init__(self, name, expected):
+        self.name = name
+        self.expected = expected
+        self.requests = 0
+        self.errors = 0
+        self.error_sample = None
+        self.latencies = deque(maxlen=LATENCY_SAMPLES)
+        self.growth = defaultdict(float)  # counter -> growth over the counted cycles
+        self.sites = defaultdict(int)  # allocation site -> bytes grown over the counted cycles
+
+    def record(self, before, after, diff):
+        for key, value in after.items():
+            self.growth[key] += value - before.get(key, value)
+        for stat in diff:
+            self.sites[str(stat.traceback)] += stat.size_diff
+
+    def leaks(self):
+        return {key: self.growth[key] for key in ENDPOINT_LEAKS if self.growth[key] >= 1}
+
+    def report(self):
+        latencies = sorted(self.latencies)
+        return {
+            'requests': self.requests,
+            'unexpected_status': self.errors,
+            'error_sample': self.error_sample,
+            'p50_ms': round(statistics.median(latencies), 2) if latencies else None,
+            'p99_ms': round(latencies[int(len(latencies) * 0.99)], 2) if latencies else None,
+            'heap_bytes_per_request': round(self.growth['heap_mb'] * 1024 * 1024 / self.requests)
+            if self.requests else 0,
+            'growth': {key: round(value, 3) for key, value in self.growth.items()},
+            'leaks': self.leaks(),
+            'top_sites': [{'site': site, 'bytes': size} for site, size in
+                          sorted(self.sites.items(), key=lambda item: -item[1])[:TOP_SITES] if size > 0],
+        }
+
+
+def run_batch(app, call, stats, requests, threads, seed):
+    """`requests` calls of one endpoint spread over `threads` client threads"""
+    lock = threading.Lock()
+
+    def client_thread(index):
+        client = app.test_client()
+        rng = random.Random(seed * 1000 + index)
+        for _ in range(requests // threads + (index < requests % threads)):
+            started = time.perf_counter()
+            try:
+                response = call(client, rng)
+                status, body = response.status_code, response.get_data(as_text=True)[:200]
+            except Exception as e:
+                status, body = None, repr(e)
+            elapsed = (time.perf_counter() - started) * 1000
+            with lock:
+                stats.requests += 1
+                stats.latencies.append(elapsed)
+                if status not in stats.expected:
+                    stats.errors += 1
+                    stats.error_sample = stats.error_sample or f'{status}: {body}'
+
+    workers = [threading.Thread(target=client_thread, args=(index,)) for index in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+
+def trend(samples, key, warmup):
+    """Growth of a counter from the first to the last third of the counted samples"""
+    counted = [sample for sample in samples[warmup:] if key in sample]
+    third = len(counted) // 3
+    if third < 2:
+        return None
+    first, last = counted[:third], counted[-third:]
+    growth = (statistics.median(s[key] for s in last) - statistics.median(s[key] for s in first))
+    hours = (statistics.median(s['elapsed'] for s in last)
+             - statistics.median(s['elapsed'] for s in first)) / 3600
+    return growth, growth / hours if hours > 0 else 0.0
+
+
+def check_trends(samples, warmup, limits):
+    results = {}
+    for key, (noise, per_hour) in limits.items():
+        found = trend(samples, key, warmup)
+        if found is None:
+            continue
+        growth, rate = found
+        results[key] = {'growth': round(growth, 3), 'per_hour': round(rate, 3),
+                        'limit_per_hour': per_hour, 'ok': growth <= noise or rate <= per_hour}
+    return results
+
+
+def print_sample(sample):
+    heap = f'{sample["heap_mb"]:7.1f}' if 'heap_mb' in sample else f'{"-":>7}'
+    print(f'{sample["cycle"]:>5} {sample["elapsed"]:>8.0f} {sample["rss_mb"]:>7.1f} {heap} '
+          f'{sample["fds"]:>5} {sample["db_fds"]:>6} {sample["checked_out"]:>5} {sample["dropped"]:>7} '
+          f'{sample["threads"]:>7} {sample["subscribers"]:>5}', flush=True)
+
+
+def print_report(trends, endpoint_stats):
+    print('\nTrends (median of the last third against the first third):')
+    for key, result in trends.items():
+        verdict = 'ok' if result['ok'] else 'FAIL'
+        print(f'  {key:<12} {result["growth"]:>+10.2f} ({result["per_hour"]:+.2f}/h, '
+              f'limit {result["limit_per_hour"]:g}/h)  {verdict}')
+
+    print(f'\n  {"endpoint":<46} {"requests":>8} {"bad":>5} {"p50 ms":>7} {"p99 ms":>7} {"heap B/req":>10}  leaks')
+    for stats in endpoint_stats:
+        report = stats.report()
+        leaks = ', '.join(f'{key} +{value:g}' for key, value in report['leaks'].items()) or '-'
+        print(f'  {stats.name:<46} {report["requests"]:>8} {report["unexpected_status"]:>5} '
+              f'{report["p50_ms"]:>7.1f} {report["p99_ms"]:>7.1f} {report["heap_bytes_per_request"]:>10}  {leaks}')
+        if report['error_sample']:
+            print(f'      first unexpected response: {report["error_sample"]}')
+
+    growing = sorted(endpoint_stats, key=lambda stats: -stats.report()['heap_bytes_per_request'])[:5]
+    print('\nTop growing allocation sites of the endpoints whose heap grew most:')
+    for stats in growing:
+        report = stats.report()
+        if not report['top_sites']:
+            continue
+        print(f'  {stats.name} ({report["heap_bytes_per_request"]} B/request)')
+        for site in report['top_sites']:
+            print(f'    {site["bytes"]:>+10} B  {site["site"]}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--duration', default='1h', help="how long to run: '90s', '30m', '2h'")
+    parser.add_argument('--requests', type=int, default=50, help='requests per endpoint per cycle')
+    parser.add_argument('--threads', type=int, default=4, help='client threads per endpoint batch')
+    parser.add_argument('--warmup', type=int, default=2, help='cycles not counted')
+    parser.add_argument('--frames', type=int, default=1, help='traceback depth of allocation sites')
+    parser.add_argument('--no-tracemalloc', action='store_true', help='skip heap tracking (less overhead)')
+    parser.add_argument('--max-rss-growth', type=float, default=TREND_LIMITS['rss_mb'][1], help='MB per hour')
+    parser.add_argument('--max-heap-growth', type=float, default=TREND_LIMITS['heap_mb'][1], help='MB per hour')
+    parser.add_argument('--report', help='write samples, trends and the endpoint report to this JSON file')
+    args = parser.parse_args()
+    duration = parse_duration(args.duration)
+    limits = dict(TREND_LIMITS, rss_mb=(TREND_LIMITS['rss_mb'][0], args.max_rss_growth),
+                  heap_mb=(TREND_LIMITS['heap_mb'][0], args.max_heap_growth))
+
+    from app import create_app, warmup_worker
+    from utils import db
+
+    workdir = tempfile.mkdtemp(prefix='shoptracker-soak-')
+    admin_token = uuid.uuid4().hex
+    app = create_app({'DATABASE': os.path.join(workdir, 'shoptracker.db'), 'RATE_LIMITS': None,
+                      'ADMIN_TOKEN': admin_token})
+    admin = {'X-Admin-Token': admin_token}
+    fixture = Fixture.app(app.test_client())
+    calls = app_endpoints(fixture, admin) + auth_endpoints(fixture)
+    warmup_worker(app)
+    endpoint_stats = [EndpointStats(name, expected) for name, _, expected in calls]
+
+    if not args.no_tracemalloc:
+        tracemalloc.start(args.frames)
+    probe = Probe(db.DATABASE)
+    print(f'Soaking {len(calls)} endpoints for {duration:g} s: {args.requests} requests each per cycle, '
+          f'{args.threads} threads, database in {workdir}\n')
+    print(f'{"cycle":>5} {"seconds":>8} {"rss MB":>7} {"heap MB":>7} {"fds":>5} {"db fds":>6} '
+          f'{"conns":>5} {"dropped":>7} {"threads":>7} {"subs":>5}')
+
+    samples = []
+    started = time.monotonic()
+    cycle = 0
+    while cycle <= args.warmup or time.monotonic() - started < duration:
+        before = probe.read()
+        for (name, call, _), stats in zip(calls, endpoint_stats):
+            previous = probe.snapshot
+            run_batch(app, call, stats, args.requests, args.threads, seed=cycle)
+            after = probe.read()
+            if cycle >= args.warmup:
+                diff = probe.snapshot.compare_to(previous, 'traceback') if previous else []
+                stats.record(before, after, diff)
+            else:
+                stats.requests = 0
+                stats.latencies.clear()
+            before = after
+        sample = dict(after, cycle=cycle, elapsed=time.monotonic() - started)
+        samples.append(sample)
+        print_sample(sample)
+        cycle += 1
+
+    trends = check_trends(samples, args.warmup, limits)
+    print_report(trends, endpoint_stats)
+    leaking = [stats.name for stats in endpoint_stats if stats.leaks()]
+    failed = [key for key, result in trends.items() if not result['ok']]
+
+    if args.report:
+        with open(args.report, 'w') as report:
+            json.dump({'duration': duration, 'cycles': cycle, 'samples': samples, 'trends': trends,
+                       'endpoints': {stats.name: stats.report() for stats in endpoint_stats}},
+                      report, indent=2)
+    tracemalloc.stop()
+    db.close_pools()
+
+    if failed or leaking:
+        print(f'\nFAIL: growing {", ".join(failed) or "-"}; leaking endpoints: {", ".join(leaking) or "-"}')
+        return 1
+    print(f'\nOK: {cycle - args.warmup} cycles counted, no growth trend and no endpoint leaked')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,77 @@
+# backend/utils/async_db.py
+"""Async access to the SQLite connection pools (used by asgi.py)
+
+sqlite3 calls block, so they run on a small dedicated thread pool that
+borrows connections from utils.db's pools. A coroutine waiting for a free
+slot holds neither a thread nor a connection: only the `size` queries that
+are actually running do, however many clients are connected.
+"""
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from utils import db
+
+
+class AsyncDB:
+    """Runs blocking database work for coroutines, at most `size` at a time"""
+
+    def __init__(self, size=None):
+        self.size = size or db.POOL_SIZE
+        self.waiting = 0
+        self.running = 0
+        self._slots = None
+        self._executor = None
+
+    def _start(self):
+        # Created on first use so the semaphore binds to the serving loop
+        self._slots = asyncio.Semaphore(self.size)
+        self._executor = ThreadPoolExecutor(self.size, thread_name_prefix='async-db')
+
+    async def run(self, func, *args, **kwargs):
+        """Run a blocking call on a database thread and await its result"""
+        if self._slots is None:
+            self._start()
+        self.waiting += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self.waiting -= 1
+        self.running += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor,
+                                              functools.partial(func, *args, **kwargs))
+        finally:
+            self.running -= 1
+            self._slots.release()
+
+    async def read(self, func, *args, max_staleness=None):
+        """Await func(conn, *args) on a read connection from the pool"""
+        return await self.run(_with_read_connection, func, args, max_staleness)
+
+    async def fetchone(self, statement, params=(), max_staleness=None):
+        return await self.read(statement.fetchone, params, max_staleness=max_staleness)
+
+    async def fetchall(self, statement, params=(), max_staleness=None):
+        return await self.read(statement.fetchall, params, max_staleness=max_staleness)
+
+    async def records(self, statement, record_type, params=(), max_staleness=None):
+        return await self.read(functools.partial(statement.records, record_type), params,
+                               max_staleness=max_staleness)
+
+    def stats(self):
+        return {'size': self.size, 'running': self.running, 'waiting': self.waiting}
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+        self._slots = self._executor = None
+
+
+def _with_read_connection(func, args, max_staleness):
+    conn = db.get_read_connection(max_staleness)
+    try:
+        return func(conn, *args)
+    finally:
+        conn.close()
@@ -1,10 +1,15 @@
+# backend/utils/common_products.py
+# Common products seeded into every database (services/catalog_ingest.py).
+# default_price 0.0 means no suggested price yet.
 COMMON_PRODUCTS = [
     {
         'name': 'Wai Wai Chicken',
         'category': 'Noodles',
         'brand': 'Wai Wai',
         'unit': 'packet',
+        'barcode': None,
         'default_price': 20.0,
+        'description': None,
         'is_common': True
     },
     {
@@ -12,7 +17,9 @@ COMMON_PRODUCTS = [
         'category': 'Beverages',
         'brand': 'Coca Cola',
         'unit': 'bottle',
+        'barcode': '1234567890123',
         'default_price': 25.0,
+        'description': 'Soft drink',
         'is_common': True
     },
     {
@@ -20,7 +27,9 @@ COMMON_PRODUCTS = [
         'category': 'Alcohol',
         'brand': 'Khukuri',
         'unit': 'bottle',
+        'barcode': None,
         'default_price': 800.0,
+        'description': None,
         'is_common': True
     },
     {
@@ -28,7 +37,9 @@ COMMON_PRODUCTS = [
         'category': 'Tea',
         'brand': 'Everest',
         'unit': 'packet',
+        'barcode': None,
         'default_price': 15.0,
+        'description': None,
         'is_common': True
     },
     {
@@ -36,7 +47,9 @@ COMMON_PRODUCTS = [
         'category': 'Chocolates',
         'brand': 'Cadbury',
         'unit': 'piece',
+        'barcode': None,
         'default_price': 45.0,
+        'description': None,
         'is_common': True
     },
     {
@@ -44,7 +57,9 @@ COMMON_PRODUCTS = [
         'category': 'Snacks',
         'brand': 'Kurkure',
         'unit': 'packet',
+        'barcode': None,
         'default_price': 10.0,
+        'description': None,
         'is_common': True
     },
     {
@@ -52,7 +67,9 @@ COMMON_PRODUCTS = [
         'category': 'Personal Care',
         'brand': 'Goldstar',
         'unit': 'piece',
+        'barcode': None,
         'default_price': 35.0,
+        'description': None,
         'is_common': True
     },
     {
@@ -60,7 +77,399 @@ COMMON_PRODUCTS = [
         'category': 'Household',
         'brand': 'Ariel',
         'unit': 'packet',
+        'barcode': None,
         'default_price': 180.0,
+        'description': None,
+        'is_common': True
+    },
+    {
+        'name': 'Pepsi 250ml',
+        'category': 'Beverages',
+        'brand': 'Pepsi',
+        'unit': 'bottle',
+        'barcode': '1234567890124',
+        'default_price': 23.0,
+        'description': 'Soft drink',
+        'is_common': True
+    },
+    {
+        'name': 'Maggi Noodles',
+        'category': 'Noodles',
+        'brand': 'Maggi',
+        'unit': 'packet',
+        'barcode': None,
+        'default_price': 25.0,
+        'description': None,
+        'is_common': True
+    },
+    {
+        'name': 'Real Juice 200ml',
+        'category': 'Beverages',
+        'brand': 'Real',
+        'unit': 'tetrapack',
+        'barcode': '1234567890127',
+        'default_price': 30.0,
+        'description': 'Fruit juice',
+        'is_common': True
+    },
+    {
+        'name': 'Lays Classic',
+        'category': 'Snacks',
+        'brand': 'Lays',
+        'unit': 'packet',
+        'barcode': None,
+        'default_price': 20.0,
+        'description': None,
+        'is_common': True
+    },
+    {
+        'name': 'Sprite 250ml',
+        'category': 'Beverages',
+        'brand': 'Sprite',
+        'unit': 'bottle',
+        'barcode': '1234567890125',
+        'default_price': 0.0,
+        'description': 'Soft drink',
+        'is_common': True
+    },
+    {
+        'name': 'Fanta 250ml',
+        'category': 'Beverages',
+        'brand': 'Fanta',
+        'unit': 'bottle',
+        'barcode': '1234567890126',
+        'default_price': 0.0,
+        'description': 'Soft drink',
+        'is_common': True
+    },
+    {
+        'name': 'Wai Wai Noodles',
+        'category': 'Noodles',
+        'brand': 'CG Foods',
+        'unit': 'packet',
+        'barcode': '1234567890128',
+        'default_price': 0.0,
+        'description': 'Instant noodles',
+        'is_common': True
+    },
+    {
+        'name': 'Rara Noodles',
+        'category': 'Noodles',
+        'brand': 'Chaudhary Group',
+        'unit': 'packet',
+        'barcode': '1234567890129',
+        'default_price': 0.0,
+        'description': 'Instant noodles',
+        'is_common': True
+    },
+    {
+        'name': 'Mayos Noodles',
+        'category': 'Noodles',
+        'brand': 'Himalayan Snax',
+        'unit': 'packet',
+        'barcode': '1234567890130',
+        'default_price': 0.0,
+        'description': 'Instant noodles',
+        'is_common': True
+    },
+    {
+        'name': 'Kurkure',
+        'category': 'Snacks',
+        'brand': 'PepsiCo',
+        'unit': 'packet',
+        'barcode': '1234567890131',
+        'default_price': 0.0,
+        'description': 'Corn snacks',
+        'is_common': True
+    },
+    {
+        'name': 'Lays Chips',
+        'category': 'Snacks',
+        'brand': 'PepsiCo',
+        'unit': 'packet',
+        'barcode': '1234567890132',
+        'default_price': 0.0,
+        'description': 'Potato chips',
+        'is_common': True
+    },
+    {
+        'name': 'DDC Milk 500ml',
+        'category': 'Dairy',
+        'brand': 'DDC',
+        'unit': 'packet',
+        'barcode': '1234567890133',
+        'default_price': 0.0,
+        'description': 'Fresh milk',
+        'is_common': True
+    },
+    {
+        'name': 'Dairy Development Corporation Curd',
+        'category': 'Dairy',
+        'brand': 'DDC',
+        'unit': 'cup',
+        'barcode': '1234567890134',
+        'default_price': 0.0,
+        'description': 'Yogurt',
+        'is_common': True
+    },
+    {
+        'name': 'Parle-G Biscuits',
+        'category': 'Biscuits',
+        'brand': 'Parle',
+        'unit': 'packet',
+        'barcode': '1234567890135',
+        'default_price': 0.0,
+        'description': 'Glucose biscuits',
+        'is_common': True
+    },
+    {
+        'name': 'Tiger Biscuits',
+        'category': 'Biscuits',
+        'brand': 'Britannia',
+        'unit': 'packet',
+        'barcode': '1234567890136',
+        'default_price': 0.0,
+        'description': 'Cream biscuits',
+        'is_common': True
+    },
+    {
+        'name': 'Monaco Biscuits',
+        'category': 'Biscuits',
+        'brand': 'Parle',
+        'unit': 'packet',
+        'barcode': '1234567890137',
+        'default_price': 0.0,
+        'description': 'Salty biscuits',
+        'is_common': True
+    },
+    {
+        'name': 'Lux Soap',
+        'category': 'Personal Care',
+        'brand': 'Unilever',
+        'unit': 'bar',
+        'barcode': '1234567890138',
+        'default_price': 0.0,
+        'description': 'Beauty soap',
+        'is_common': True
+    },
+    {
+        'name': 'Lifebuoy Soap',
+        'category': 'Personal Care',
+        'brand': 'Unilever',
+        'unit': 'bar',
+        'barcode': '1234567890139',
+        'default_price': 0.0,
+        'description': 'Health soap',
+        'is_common': True
+    },
+    {
+        'name': 'Fair & Lovely 50g',
+        'category': 'Personal Care',
+        'brand': 'Unilever',
+        'unit': 'tube',
+        'barcode': '1234567890140',
+        'default_price': 0.0,
+        'description': 'Fairness cream',
+        'is_common': True
+    },
+    {
+        'name': 'Vim Bar',
+        'category': 'Household',
+        'brand': 'Hindustan Unilever',
+        'unit': 'bar',
+        'barcode': '1234567890141',
+        'default_price': 0.0,
+        'description': 'Dishwash bar',
+        'is_common': True
+    },
+    {
+        'name': 'Surf Excel 1kg',
+        'category': 'Household',
+        'brand': 'Unilever',
+        'unit': 'packet',
+        'barcode': '1234567890142',
+        'default_price': 0.0,
+        'description': 'Detergent powder',
+        'is_common': True
+    },
+    {
+        'name': 'Surya Cigarettes',
+        'category': 'Tobacco',
+        'brand': 'Surya Tobacco',
+        'unit': 'packet',
+        'barcode': '1234567890143',
+        'default_price': 0.0,
+        'description': 'Cigarettes',
+        'is_common': True
+    },
+    {
+        'name': 'Khukuri Rum 180ml',
+        'category': 'Alcohol',
+        'brand': 'Khukuri',
+        'unit': 'bottle',
+        'barcode': '1234567890144',
+        'default_price': 0.0,
+        'description': 'Local rum',
+        'is_common': True
+    },
+    {
+        'name': 'Pilot Pen',
+        'category': 'Stationery',
+        'brand': 'Pilot',
+        'unit': 'piece',
+        'barcode': '1234567890145',
+        'default_price': 0.0,
+        'description': 'Ball pen',
+        'is_common': True
+    },
+    {
+        'name': 'Copy Book',
+        'category': 'Stationery',
+        'brand': 'Local',
+        'unit': 'piece',
+        'barcode': '1234567890146',
+        'default_price': 0.0,
+        'description': 'Exercise book',
+        'is_common': True
+    },
+    {
+        'name': 'Mobile Recharge Card',
+        'category': 'Services',
+        'brand': 'Telecom',
+        'unit': 'card',
+        'barcode': '1234567890147',
+        'default_price': 0.0,
+        'description': 'Phone recharge',
+        'is_common': True
+    },
+    {
+        'name': 'Khukuri Beer 650ml',
+        'category': 'Alcohol',
+        'brand': 'Gorkha Brewery',
+        'unit': 'bottle',
+        'barcode': '1234567890148',
+        'default_price': 0.0,
+        'description': 'Local beer',
+        'is_common': True
+    },
+    {
+        'name': 'Gorkha Beer 650ml',
+        'category': 'Alcohol',
+        'brand': 'Gorkha Brewery',
+        'unit': 'bottle',
+        'barcode': '1234567890149',
+        'default_price': 0.0,
+        'description': 'Local beer',
+        'is_common': True
+    },
+    {
+        'name': 'Tuborg Beer 650ml',
+        'category': 'Alcohol',
+        'brand': 'Carlsberg',
+        'unit': 'bottle',
+        'barcode': '1234567890150',
+        'default_price': 0.0,
+        'description': 'International beer',
+        'is_common': True
+    },
+    {
+        'name': 'Goldstar Beer 650ml',
+        'category': 'Alcohol',
+        'brand': 'Carlsberg',
+        'unit': 'bottle',
+        'barcode': '1234567890151',
+        'default_price': 0.0,
+        'description': 'Local beer',
+        'is_common': True
+    },
+    {
+        'name': 'Basmati Rice 1kg',
+        'category': 'Grains',
+        'brand': 'Various',
+        'unit': 'kg',
+        'barcode': '1234567890152',
+        'default_price': 0.0,
+        'description': 'Premium rice',
+        'is_common': True
+    },
+    {
+        'name': 'Normal Rice 1kg',
+        'category': 'Grains',
+        'brand': 'Local',
+        'unit': 'kg',
+        'barcode': '1234567890153',
+        'default_price': 0.0,
+        'description': 'Regular rice',
+        'is_common': True
+    },
+    {
+        'name': 'Lentils (Masuro) 1kg',
+        'category': 'Grains',
+        'brand': 'Local',
+        'unit': 'kg',
+        'barcode': '1234567890154',
+        'default_price': 0.0,
+        'description': 'Red lentils',
+        'is_common': True
+    },
+    {
+        'name': 'Turmeric Powder 100g',
+        'category': 'Spices',
+        'brand': 'Local',
+        'unit': 'packet',
+        'barcode': '1234567890155',
+        'default_price': 0.0,
+        'description': 'Spice powder',
+        'is_common': True
+    },
+    {
+        'name': 'Red Chili Powder 100g',
+        'category': 'Spices',
+        'brand': 'Local',
+        'unit': 'packet',
+        'barcode': '1234567890156',
+        'default_price': 0.0,
+        'description': 'Spice powder',
+        'is_common': True
+    },
+    {
+        'name': 'Garam Masala 50g',
+        'category': 'Spices',
+        'brand': 'Everest',
+        'unit': 'packet',
+        'barcode': '1234567890157',
+        'default_price': 0.0,
+        'description': 'Spice mix',
+        'is_common': True
+    },
+    {
+        'name': 'Cooking Oil 1L',
+        'category': 'Cooking',
+        'brand': 'Various',
+        'unit': 'bottle',
+        'barcode': '1234567890158',
+        'default_price': 0.0,
+        'description': 'Refined oil',
+        'is_common': True
+    },
+    {
+        'name': 'Red Label Tea 250g',
+        'category': 'Beverages',
+        'brand': 'Brooke Bond',
+        'unit': 'packet',
+        'barcode': '1234567890159',
+        'default_price': 0.0,
+        'description': 'Black tea',
+        'is_common': True
+    },
+    {
+        'name': 'Nescafe Coffee 50g',
+        'category': 'Beverages',
+        'brand': 'Nestle',
+        'unit': 'jar',
+        'barcode': '1234567890160',
+        'default_price': 0.0,
+        'description': 'Instant coffee',
         'is_common': True
     }
-]
\ No newline at end of file
+]
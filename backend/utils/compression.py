@@ -0,0 +1,64 @@
+# backend/utils/compression.py
+import gzip
+
+from flask import current_app, request
+
+try:
+    import brotli
+except ImportError:  # optional, gzip is always available
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = ('application/json', 'text/html', 'text/plain', 'text/csv')
+
+
+def init_compression(app):
+    """Compress responses above COMPRESS_MIN_SIZE bytes with br or gzip
+
+    Set COMPRESS_MIN_SIZE to None to turn compression off.
+    """
+    app.config.setdefault('COMPRESS_MIN_SIZE', 1024)
+    app.config.setdefault('COMPRESS_GZIP_LEVEL', 6)
+    app.config.setdefault('COMPRESS_BR_QUALITY', 4)
+    app.after_request(compress_response)
+
+
+def choose_encoding(accepted):
+    """Preferred encoding for a parsed Accept-Encoding header, or None"""
+    if brotli is not None and accepted['br']:
+        return 'br'
+    if accepted['gzip']:
+        return 'gzip'
+    return None
+
+
+def compress(data, encoding, config):
+    """Compress `data` with 'br' or 'gzip' at the configured level"""
+    if encoding == 'br':
+        return brotli.compress(data, quality=config['COMPRESS_BR_QUALITY'])
+    return gzip.compress(data, compresslevel=config['COMPRESS_GZIP_LEVEL'])
+
+
+def compress_response(response):
+    config = current_app.config
+    min_size = config.get('COMPRESS_MIN_SIZE')
+
+    if (min_size is None
+            or response.direct_passthrough
+            or response.is_streamed
+            or response.status_code < 200 or response.status_code >= 300
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+        return response
+
+    response.vary.add('Accept-Encoding')
+    data = response.get_data()
+    if len(data) < min_size:
+        return response
+
+    encoding = choose_encoding(request.accept_encodings)
+    if encoding is None:
+        return response
+
+    response.set_data(compress(data, encoding, config))
+    response.headers['Content-Encoding'] = encoding
+    return response
@@ -0,0 +1,273 @@
+# backend/utils/db.py
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from urllib.request import pathname2url
+
+from utils.queries import STATEMENT_CACHE_SIZE
+from utils.scheduler import PeriodicTask
+
+# Database configuration
+DATABASE = os.environ.get('SHOPTRACKER_DB', 'shoptracker.db')
+READ_REPLICA = os.environ.get('SHOPTRACKER_READ_REPLICA', DATABASE + '.replica')
+REPLICA_REFRESH_INTERVAL = float(os.environ.get('SHOPTRACKER_REPLICA_REFRESH', '30'))
+BUSY_TIMEOUT = 5.0  # seconds a writer waits for the write lock
+POOL_SIZE = 8  # idle connections kept per pool
+# WAL pages before a commit checkpoints; 0 while the WAL archiver of
+# services/backup.py is configured, which must be the only checkpointer
+DEFAULT_WAL_AUTOCHECKPOINT = 1000  # SQLite's default
+WAL_AUTOCHECKPOINT = 0 if os.environ.get('SHOPTRACKER_WAL_ARCHIVE_INTERVAL') else DEFAULT_WAL_AUTOCHECKPOINT
+
+_replica_refresher = None
+
+
+class PooledConnection(sqlite3.Connection):
+    """sqlite3 connection whose close() hands it back to its pool
+
+    Every connection is counted when it is opened and when it is really
+    closed. One garbage-collected without close() is counted as dropped:
+    it never went back to its pool, which is how a leak shows up in
+    CPython even though refcounting frees the sqlite handle right away.
+    """
+    pool = None
+    counts = {'opened': 0, 'closed': 0, 'dropped': 0}  # in this process
+    _counts_lock = threading.RLock()  # __del__ may run while it is held
+    _open = False
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._open = True
+        self._count('opened')
+
+    def close(self):
+        if self.pool is None or not self.pool.release(self):
+            self._close()
+
+    def discard(self):
+        """Really close the connection"""
+        self.pool = None
+        self._close()
+
+    def _close(self):
+        if self._open:
+            self._open = False
+            self._count('closed')
+        super().close()
+
+    def __del__(self):
+        if self._open:
+            self._open = False
+            self._count('dropped')
+
+    @classmethod
+    def _count(cls, event):
+        with cls._counts_lock:
+            cls.counts[event] += 1
+
+
+class ConnectionPool:
+    """Small LIFO pool of idle connections for one database file"""
+
+    def __init__(self, connect, maxsize=POOL_SIZE):
+        self._connect = connect
+        self.maxsize = maxsize
+        self.created = 0
+        self._idle = []
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+            self.created += 1
+        conn = self._connect()
+        conn.pool = self
+        return conn
+
+    def release(self, conn):
+        if conn.in_transaction:
+            conn.rollback()
+        with self._lock:
+            if len(self._idle) < self.maxsize:
+                self._idle.append(conn)
+                return True
+        return False
+
+    def fill(self, count=None):
+        """Pre-open idle connections, returning how many the pool now holds"""
+        count = min(count or self.maxsize, self.maxsize)
+        opened = [self.acquire() for _ in range(count - len(self._idle))]
+        for conn in opened:
+            conn.close()
+        return len(self._idle)
+
+    def idle_connections(self):
+        with self._lock:
+            return list(self._idle)
+
+    def stats(self):
+        return {'maxsize': self.maxsize, 'idle': len(self._idle), 'created': self.created}
+
+    def close_all(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.discard()
+
+
+def _connect_primary():
+    conn = sqlite3.connect(DATABASE, timeout=BUSY_TIMEOUT, factory=PooledConnection,
+                           check_same_thread=False, cached_statements=STATEMENT_CACHE_SIZE)
+    conn.row_factory = sqlite3.Row
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.execute(f'PRAGMA wal_autocheckpoint={WAL_AUTOCHECKPOINT:d}')
+    return conn
+
+
+def _connect_primary_readonly():
+    return _connect_readonly(DATABASE)
+
+
+write_pool = ConnectionPool(_connect_primary)
+read_pool = ConnectionPool(_connect_primary_readonly)
+
+# Connections inherited over fork() must never be used or closed in the child
+_inherited_connections = []
+
+
+def _reset_pools_after_fork():
+    # Another thread of the parent may have held a lock at the fork, and no
+    # thread in the child will ever release the copy: replace, never acquire
+    PooledConnection._counts_lock = threading.RLock()
+    PooledConnection.counts = {'opened': 0, 'closed': 0, 'dropped': 0}
+    for pool in (write_pool, read_pool):
+        pool._lock = threading.Lock()
+        _inherited_connections.extend(pool._idle)
+        pool._idle = []
+
+
+os.register_at_fork(after_in_child=_reset_pools_after_fork)
+
+
+def configure(database=None, read_replica=None, pool_size=None, wal_autocheckpoint=None):
+    """Point the connection layer at a different database file"""
+    global DATABASE, READ_REPLICA, WAL_AUTOCHECKPOINT
+    if database:
+        DATABASE = database
+        READ_REPLICA = read_replica or database + '.replica'
+    elif read_replica:
+        READ_REPLICA = read_replica
+    close_pools()
+    if pool_size is not None:
+        write_pool.maxsize = read_pool.maxsize = pool_size
+    if wal_autocheckpoint is not None:
+        WAL_AUTOCHECKPOINT = wal_autocheckpoint
+
+
+def close_pools():
+    """Close every idle pooled connection (e.g. in the master before forking)"""
+    write_pool.close_all()
+    read_pool.close_all()
+
+
+def connection_stats():
+    """Pooled connections opened in this process: still open, idle in a pool, dropped"""
+    with PooledConnection._counts_lock:
+        counts = dict(PooledConnection.counts)
+    counts['open'] = counts['opened'] - counts['closed'] - counts['dropped']
+    counts['idle'] = len(write_pool.idle_connections()) + len(read_pool.idle_connections())
+    return counts
+
+
+def enable_wal(conn):
+    """Switch the database to WAL so readers never block the writer"""
+    conn.execute('PRAGMA journal_mode=WAL')
+
+
+def add_column(conn, table, column, definition):
+    """Add a column to an existing table unless it is already there"""
+    columns = {row[1] for row in conn.execute(f'PRAGMA table_info({table})')}
+    if column not in columns:
+        conn.execute(f'ALTER TABLE {table} ADD COLUMN {column} {definition}')
+
+
+def get_db_connection():
+    """Get a pooled connection to the primary database (all writes go here)"""
+    return write_pool.acquire()
+
+
+@contextmanager
+def write_transaction(conn):
+    """Run a block inside BEGIN IMMEDIATE, committing or rolling back
+
+    Taking the write lock up front means stock is read and updated under the
+    same lock, so concurrent sales cannot both pass the stock check.
+    """
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        yield conn
+    except BaseException:
+        conn.rollback()
+        raise
+    conn.commit()
+
+
+def get_read_connection(max_staleness=None):
+    """Get a read-only connection for GET routes
+
+    Without a staleness bound this is a WAL snapshot reader on the primary
+    file: it sees every committed write and never takes the write lock.
+    Callers that can tolerate data up to `max_staleness` seconds old are
+    served from the replica file instead, which keeps long queries off the
+    primary entirely. A missing or too old replica falls back to the primary.
+    """
+    if max_staleness is not None:
+        age = replica_age()
+        if age is not None and age <= max_staleness:
+            return _connect_readonly(READ_REPLICA)
+    return read_pool.acquire()
+
+
+def _connect_readonly(path):
+    uri = f'file:{pathname2url(os.path.abspath(path))}?mode=ro'
+    conn = sqlite3.connect(uri, uri=True, factory=PooledConnection, check_same_thread=False,
+                           cached_statements=STATEMENT_CACHE_SIZE)
+    conn.row_factory = sqlite3.Row
+    conn.execute('PRAGMA query_only=1')
+    return conn
+
+
+def replica_age():
+    """Seconds since the replica was last refreshed, or None if there is none"""
+    try:
+        return time.time() - os.path.getmtime(READ_REPLICA)
+    except OSError:
+        return None
+
+
+def refresh_replica():
+    """Copy the primary into the replica file and swap it in atomically"""
+    tmp_path = READ_REPLICA + '.tmp'
+    source = _connect_readonly(DATABASE)
+    target = sqlite3.connect(tmp_path)
+    try:
+        source.backup(target)
+        # Readers open the replica with mode=ro, which needs a rollback journal
+        target.execute('PRAGMA journal_mode=DELETE')
+    finally:
+        target.close()
+        source.close()
+    os.replace(tmp_path, READ_REPLICA)
+
+
+def start_replica_refresher(interval=None):
+    """Refresh the read replica in the background every `interval` seconds"""
+    global _replica_refresher
+    if _replica_refresher is None:
+        _replica_refresher = PeriodicTask('replica-refresher',
+                                          interval or REPLICA_REFRESH_INTERVAL,
+                                          refresh_replica)
+    refresh_replica()
+    return _replica_refresher.start()
@@ -0,0 +1,54 @@
+# backend/utils/lazy.py
+import importlib
+import types
+
+# Heavy analytics/export dependencies from requirements.txt. Backend modules
+# must not import these at module level; tools/import_budget.py fails the
+# build if any of them is loaded while importing the app.
+HEAVY_MODULES = (
+    'pandas', 'numpy', 'scipy', 'plotly', 'matplotlib', 'seaborn',
+    'pyarrow', 'openpyxl', 'xlrd', 'firebase_admin', 'google.cloud',
+)
+
+
+class LazyModule(types.ModuleType):
+    """Module proxy that imports the real module on first attribute access"""
+
+    def __init__(self, name):
+        super().__init__(name)
+        self.__dict__['_module'] = None
+
+    def _load(self):
+        module = self.__dict__['_module']
+        if module is None:
+            module = importlib.import_module(self.__name__)
+            self.__dict__['_module'] = module
+        return module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __dir__(self):
+        return dir(self._load())
+
+
+def lazy_import(name):
+    """Return a proxy for `name` that is only imported when first used
+
+        pd = lazy_import('pandas')   # costs nothing at import time
+        frame = pd.DataFrame(rows)   # pandas is imported here
+    """
+    return LazyModule(name)
+
+
+_optional = {}
+
+
+def optional_import(name):
+    """Import `name` on demand, returning None if it is not installed"""
+    if name not in _optional:
+        try:
+            _optional[name] = importlib.import_module(name)
+        except ImportError:
+            _optional[name] = None
+    return _optional[name]
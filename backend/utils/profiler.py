@@ -0,0 +1,325 @@
+# backend/utils/profiler.py
+"""On-demand statistical sampling profiler for a running worker
+
+POST /api/admin/profile?seconds=N samples the worker that receives the
+request for N seconds and answers with collapsed stacks, one line per
+distinct stack ("root;...;leaf count"), the input of flamegraph.pl,
+speedscope and inferno. Nothing is installed in the worker and no code is
+traced: a sampler thread reads sys._current_frames() every `interval` and
+counts the stack of each thread that is doing something. Threads parked in
+a wait (idle pool threads, the event loop's select, eventlet's hub, the
+request waiting for this profile) are counted apart as idle.
+
+Frames are labelled module:qualified name, so Flask's dispatch, the route
+functions of app.py and routes/, AuthService methods and services appear
+under their own names. Before Python 3.11 code objects carry no qualified
+name, so it is looked up among the functions and classes of the frame's
+module (_qualnames). A frame running one of utils/queries.py's Statement
+methods gets a child frame `sql:<statement name>`, which attributes time
+spent inside SQLite (C code, invisible to a Python profiler) to the
+statement.
+
+Overhead is capped: taking a sample holds the GIL, so after each one the
+sampler sleeps long enough to keep its CPU time spent sampling under
+MAX_OVERHEAD of wall time, stretching the interval on deep stacks or many
+threads. A profile lasts at most MAX_SECONDS, keeps at most MAX_STACKS
+distinct stacks and only one runs per process at a time.
+
+Under eventlet or gevent the sampler is an OS thread taken from the
+unpatched modules, since a green thread would only run while the worker
+is idle; the waiting request sleeps cooperatively.
+"""
+import _thread
+import sys
+import threading
+import time
+from collections import Counter
+from types import CodeType, FunctionType
+
+DEFAULT_INTERVAL = 0.01  # seconds between samples (100 Hz)
+MIN_INTERVAL = 0.001
+MAX_SECONDS = 60.0
+MAX_OVERHEAD = 0.01  # fraction of wall time the sampler may hold the GIL
+MAX_STACKS = 20000  # distinct stacks kept; later new stacks count as [other]
+MAX_DEPTH = 256  # frames kept per stack, counted from the leaf
+
+# Leaf frames (module, function name) of a thread that is waiting rather than working
+IDLE_FRAMES = frozenset({
+    ('threading', 'wait'), ('threading', 'join'), ('threading', '_wait_for_tstate_lock'),
+    ('queue', 'get'), ('socket', 'accept'), ('selectors', 'select'),
+    ('concurrent.futures.thread', '_worker'), ('socketserver', 'serve_forever'),
+    ('utils.profiler', 'profile'),
+})
+IDLE_MODULES = ('eventlet.hubs.', 'gevent.hub', 'gevent._hub')
+COMPREHENSIONS = ('<listcomp>', '<setcomp>', '<dictcomp>', '<genexpr>')
+CO_NEWLOCALS = 0x0002  # inspect.CO_NEWLOCALS, without importing inspect
+DISPATCH_FRAME = 'flask.app:Flask.dispatch_request'
+VIEW_MODULES = ('app', 'routes.admin_routes', 'routes.auth_routes')
+
+_lock = threading.Lock()
+_running = None
+
+
+class ProfilerBusy(Exception):
+    """Another profile is already running in this process"""
+
+
+def configure(max_seconds=None, max_overhead=None):
+    """Limits for on-demand profiles"""
+    global MAX_SECONDS, MAX_OVERHEAD
+    if max_seconds:
+        MAX_SECONDS = float(max_seconds)
+    if max_overhead:
+        MAX_OVERHEAD = float(max_overhead)
+
+
+def _os_thread():
+    """(start_new_thread, get_ident, sleep) of the OS, even when eventlet or gevent patched them"""
+    if 'eventlet' in sys.modules:
+        from eventlet import patcher
+        real_thread = patcher.original('_thread')
+        return real_thread.start_new_thread, real_thread.get_ident, patcher.original('time').sleep
+    if 'gevent' in sys.modules:
+        from gevent import monkey
+        return tuple(monkey.get_original('_thread', ['start_new_thread', 'get_ident'])) + (
+            monkey.get_original('time', 'sleep'),)
+    return _thread.start_new_thread, _thread.get_ident, time.sleep
+
+
+def _statement_codes():
+    from utils.queries import Statement
+    return frozenset(member.__code__ for member in vars(Statement).values()
+                     if callable(member) and hasattr(member, '__code__'))
+
+
+def _qualnames(namespace):
+    """Qualified name of every function code object reachable from a module's globals
+
+    Covers module functions, methods (also static/class methods and
+    properties) of the classes defined there, the functions they wrap and
+    the functions nested in any of them. Functions defined in other modules
+    are left to those modules' own lookups.
+    """
+    names = {}
+
+    def add_code(code, qualname):
+        if code in names:
+            return
+        names[code] = qualname
+        # As the compiler names them: only a function body's children are <locals>
+        local = code.co_flags & CO_NEWLOCALS and code.co_name not in COMPREHENSIONS
+        for const in code.co_consts:
+            if type(const) is CodeType:
+                add_code(const, f'{qualname}{".<locals>." if local else "."}{const.co_name}')
+
+    def add(obj, seen_classes):
+        # type() rather than isinstance/hasattr: globals such as Flask's
+        # request are proxies that raise on attribute access outside a request
+        kind = type(obj)
+        if kind in (staticmethod, classmethod):
+            obj, kind = obj.__func__, type(obj.__func__)
+        elif kind is property:
+            for accessor in (obj.fget, obj.fset, obj.fdel):
+                add(accessor, seen_classes)
+            return
+        if issubclass(kind, type):
+            if obj not in seen_classes and obj.__module__ == module:
+                seen_classes.add(obj)
+                for member in list(vars(obj).values()):
+                    add(member, seen_classes)
+            return
+        while type(obj) is FunctionType:
+            if obj.__globals__ is namespace:
+                add_code(obj.__code__, obj.__qualname__)
+            obj = getattr(obj, '__wrapped__', None)
+
+    module = namespace.get('__name__')
+    seen = set()
+    for value in list(namespace.values()):
+        add(value, seen)
+    return names
+
+
+class Profile:
+    """One sampling run; `stacks` counts collapsed stacks (tuples of frame labels)"""
+
+    def __init__(self, seconds, interval=DEFAULT_INTERVAL, max_overhead=None, thread_names=False):
+        self.seconds = min(float(seconds), MAX_SECONDS)
+        self.interval = max(float(interval), MIN_INTERVAL)
+        self.max_overhead = max_overhead or MAX_OVERHEAD
+        self.thread_names = thread_names
+        self.stacks = Counter()
+        self.samples = 0  # sampler wakeups
+        self.idle = 0  # thread stacks found waiting
+        self.dropped = 0  # stacks over MAX_STACKS, counted as [other]
+        self.sampling_time = 0.0
+        self.started_at = None
+        self.elapsed = 0.0
+        self.finished = False
+        self.error = None
+        self._labels = {}  # code object -> label
+        self._module_qualnames = {}  # module name -> _qualnames() of it, before Python 3.11
+        self._statements = _statement_codes()
+        self._names = {}
+
+    def _label(self, code, frame):
+        label = self._labels.get(code)
+        if label is None:
+            module = frame.f_globals.get('__name__', '?')
+            label = self._labels[code] = f'{module}:{self._qualname(code, frame, module)}'
+        return label
+
+    def _qualname(self, code, frame, module):
+        qualname = getattr(code, 'co_qualname', None)
+        if qualname:
+            return qualname
+        names = self._module_qualnames.get(module)
+        if names is None:
+            names = self._module_qualnames[module] = _qualnames(frame.f_globals)
+        qualname = names.get(code)
+        if qualname:
+            return qualname
+        # Not reachable from the module, e.g. a method of a class made at runtime
+        if code.co_argcount and code.co_varnames[0] == 'self' and 'self' in frame.f_locals:
+            return f'{type(frame.f_locals["self"]).__qualname__}.{code.co_name}'
+        return code.co_name
+
+    def _stack(self, frame):
+        """Frame labels of one thread, root first"""
+        labels = []
+        while frame is not None and len(labels) < MAX_DEPTH:
+            code = frame.f_code
+            if code in self._statements:
+                statement = frame.f_locals.get('self')
+                labels.append(f'sql:{getattr(statement, "name", "?")}')
+            labels.append(self._label(code, frame))
+            frame = frame.f_back
+        if frame is not None:
+            labels.append('[truncated]')
+        labels.reverse()
+        return labels
+
+    def _idle(self, leaf):
+        module = leaf.f_globals.get('__name__', '')
+        return (module, leaf.f_code.co_name) in IDLE_FRAMES or module.startswith(IDLE_MODULES)
+
+    def _thread_name(self, ident):
+        name = self._names.get(ident)
+        if name is None:
+            self._names = {thread.ident: thread.name for thread in threading.enumerate()}
+            name = self._names.setdefault(ident, f'thread-{ident}')
+        return name
+
+    def sample(self, own_ident):
+        """Count the stack of every busy thread but the sampler's own"""
+        for ident, frame in sys._current_frames().items():
+            if ident == own_ident:
+                continue
+            if self._idle(frame):
+                self.idle += 1
+                continue
+            labels = self._stack(frame)
+            if self.thread_names:
+                labels.insert(0, f'thread:{self._thread_name(ident)}')
+            stack = tuple(labels)
+            if stack not in self.stacks and len(self.stacks) >= MAX_STACKS:
+                stack = ('[other]',)
+                self.dropped += 1
+            self.stacks[stack] += 1
+        self.samples += 1
+
+    def run(self, get_ident, sleep):
+        """Sampler thread body: sample until `seconds` have passed"""
+        own_ident = get_ident()
+        clock, cpu_clock = time.perf_counter, time.thread_time
+        self.started_at = time.time()
+        start = clock()
+        deadline = start + self.seconds
+        try:
+            while clock() < deadline:
+                # This thread's CPU time: waiting for the GIL while a request runs costs nothing
+                began = cpu_clock()
+                self.sample(own_ident)
+                cost = cpu_clock() - began
+                self.sampling_time += cost
+                # Sleep at least long enough that sampling stays under max_overhead of wall time
+                sleep(max(self.interval, cost * (1 - self.max_overhead) / self.max_overhead))
+        except Exception as e:
+            self.error = repr(e)
+        finally:
+            self.elapsed = clock() - start
+            self.finished = True
+
+    @property
+    def overhead(self):
+        """Fraction of wall time spent taking samples"""
+        return self.sampling_time / self.elapsed if self.elapsed else 0.0
+
+    def collapsed(self):
+        """Collapsed stacks, one `frame;frame;... count` line each (flamegraph.pl input)"""
+        return ''.join(f'{";".join(stack)} {count}\n' for stack, count in sorted(self.stacks.items()))
+
+    def summary(self, top=20):
+        """Sample counts by route, AuthService/session call and SQL statement"""
+        routes, auth, sql = Counter(), Counter(), Counter()
+        for stack, count in self.stacks.items():
+            if DISPATCH_FRAME in stack:
+                below = stack[stack.index(DISPATCH_FRAME) + 1:]
+                # The view itself, under the decorators wrapping it
+                view = next((label for label in below if label.split(':', 1)[0] in VIEW_MODULES),
+                            below[0] if below else DISPATCH_FRAME)
+                routes[view] += count
+            entered = next((label for label in stack
+                            if label.startswith(('services.auth_service:', 'services.sessions:'))), None)
+            if entered:
+                auth[entered] += count
+            statements = {label for label in stack if label.startswith('sql:')}
+            for label in statements:
+                sql[label[4:]] += count
+        busy = sum(self.stacks.values())
+        return {
+            'samples': self.samples,
+            'busy_stacks': busy,
+            'idle_stacks': self.idle,
+            'distinct_stacks': len(self.stacks),
+            'dropped_stacks': self.dropped,
+            'seconds': round(self.elapsed, 3),
+            'interval_ms': round(self.interval * 1000, 3),
+            'effective_interval_ms': round(self.elapsed / self.samples * 1000, 3) if self.samples else None,
+            'overhead': round(self.overhead, 5),
+            'max_overhead': self.max_overhead,
+            'routes': dict(routes.most_common(top)),
+            'auth': dict(auth.most_common(top)),
+            'sql': dict(sql.most_common(top)),
+            'error': self.error,
+        }
+
+
+def profile(seconds, interval=DEFAULT_INTERVAL, max_overhead=None, thread_names=False):
+    """Sample this process for `seconds` and return the finished Profile
+
+    Blocks the calling thread (cooperatively under eventlet/gevent); raises
+    ProfilerBusy if a profile is already running.
+    """
+    global _running
+    if not _lock.acquire(blocking=False):
+        raise ProfilerBusy('A profile is already running in this worker')
+    try:
+        run = _running = Profile(seconds, interval, max_overhead, thread_names)
+        start_new_thread, get_ident, os_sleep = _os_thread()
+        start_new_thread(run.run, (get_ident, os_sleep))
+        while not run.finished:
+            time.sleep(0.05)
+        return run
+    finally:
+        _running = None
+        _lock.release()
+
+
+def profiler_stats():
+    """The running profile, if any, for /api/admin/metrics"""
+    run = _running
+    if run is None:
+        return {'running': False}
+    return {'running': True, 'seconds': run.seconds, 'samples': run.samples,
+            'started_at': run.started_at}
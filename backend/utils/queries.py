@@ -0,0 +1,1035 @@
+# backend/utils/queries.py
+"""Registry of every SQL statement the backend runs
+
+Each statement has a fixed text, so sqlite3's per-connection statement cache
+(sized by STATEMENT_CACHE_SIZE) always hits, and carries call/time counters
+for the metrics endpoint. tools/check_query_plans.py runs EXPLAIN QUERY PLAN
+over the whole registry.
+
+Optional filters are written as `(:x IS NULL OR col = :x)` instead of being
+concatenated into the text, so one statement covers every combination.
+"""
+import threading
+import time
+
+from models.product import Product
+from models.transaction import Transaction
+
+STATEMENTS = {}
+
+
+class Statement:
+    """A named SQL statement with per-statement timing counters
+
+    `schema` says which schema the statement targets: 'app' for the
+    inventory tables created by app.init_database, 'auth' for the account
+    tables from config/database_setup.py. `allow_scan` marks statements where
+    a full table scan is expected (e.g. LIKE searches). `warmup` holds
+    parameters that match no rows, used to precompile read statements.
+    """
+
+    def __init__(self, name, sql, schema='app', allow_scan=False, warmup=None):
+        if name in STATEMENTS:
+            raise ValueError(f'Duplicate statement name: {name}')
+        self.name = name
+        self.sql = sql
+        self.schema = schema
+        self.allow_scan = allow_scan
+        self.warmup = warmup
+        self.calls = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+        self._lock = threading.Lock()
+        STATEMENTS[name] = self
+
+    def _record(self, elapsed):
+        with self._lock:
+            self.calls += 1
+            self.total_time += elapsed
+            if elapsed > self.max_time:
+                self.max_time = elapsed
+
+    def __call__(self, conn, params=()):
+        """Execute on `conn` and return the cursor"""
+        start = time.perf_counter()
+        try:
+            return conn.execute(self.sql, params)
+        finally:
+            self._record(time.perf_counter() - start)
+
+    def executemany(self, conn, seq_of_params):
+        start = time.perf_counter()
+        try:
+            return conn.executemany(self.sql, seq_of_params)
+        finally:
+            self._record(time.perf_counter() - start)
+
+    def fetchone(self, conn, params=()):
+        start = time.perf_counter()
+        try:
+            return conn.execute(self.sql, params).fetchone()
+        finally:
+            self._record(time.perf_counter() - start)
+
+    def fetchall(self, conn, params=()):
+        start = time.perf_counter()
+        try:
+            return conn.execute(self.sql, params).fetchall()
+        finally:
+            self._record(time.perf_counter() - start)
+
+    def records(self, record_type, conn, params=()):
+        """Fetch all rows as `record_type` records built from plain tuples"""
+        start = time.perf_counter()
+        try:
+            return record_type.fetch_all(conn, self.sql, params)
+        finally:
+            self._record(time.perf_counter() - start)
+
+    def stats(self):
+        return {
+            'name': self.name,
+            'calls': self.calls,
+            'total_ms': round(self.total_time * 1000, 3),
+            'avg_ms': round(self.total_time * 1000 / self.calls, 3) if self.calls else 0.0,
+            'max_ms': round(self.max_time * 1000, 3),
+        }
+
+    def reset(self):
+        with self._lock:
+            self.calls = 0
+            self.total_time = 0.0
+            self.max_time = 0.0
+
+
+def all_stats():
+    """Counters for every statement that has run, slowest total first"""
+    return sorted((stmt.stats() for stmt in STATEMENTS.values() if stmt.calls),
+                  key=lambda stats: -stats['total_ms'])
+
+
+def reset_stats():
+    for stmt in STATEMENTS.values():
+        stmt.reset()
+
+
+def warm_connection(conn, schema='app'):
+    """Compile every read statement with warmup parameters on `conn`"""
+    for stmt in STATEMENTS.values():
+        if stmt.warmup is not None and stmt.schema == schema:
+            conn.execute(stmt.sql, stmt.warmup).fetchall()
+
+
+# --- Products --------------------------------------------------------------
+
+COUNT_COMMON_PRODUCTS = Statement('products.count_common', '''
+    SELECT COUNT(*) as count FROM products WHERE is_common = 1
+''', allow_scan=True)
+
+COUNT_PRODUCTS = Statement('products.count', '''
+    SELECT COUNT(*) as count FROM products
+''', allow_scan=True)
+
+# Catalog ingest. A product is identified by its barcode, or by name + brand
+# when it has none (idx_products_name_brand only covers barcode-less rows).
+BARCODELESS_PRODUCT_KEYS = Statement('products.barcodeless_keys', '''
+    SELECT name, COALESCE(brand, '') FROM products WHERE barcode IS NULL
+''')
+
+ATTACH_PRODUCT_BARCODE = Statement('products.attach_barcode', '''
+    UPDATE OR IGNORE products SET barcode = ?
+    WHERE barcode IS NULL AND name = ? AND COALESCE(brand, '') = COALESCE(?, '')
+''')
+
+UPSERT_PRODUCT_BY_BARCODE = Statement('products.upsert_by_barcode', '''
+    INSERT INTO products (id, name, category, brand, unit, barcode, default_price,
+                          image_url, is_common, created_date)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(barcode) DO UPDATE SET
+        name = excluded.name,
+        category = COALESCE(excluded.category, category),
+        brand = COALESCE(excluded.brand, brand),
+        unit = excluded.unit,
+        default_price = CASE WHEN excluded.default_price > 0
+                             THEN excluded.default_price ELSE default_price END,
+        image_url = COALESCE(excluded.image_url, image_url),
+        is_common = MAX(is_common, excluded.is_common)
+''')
+
+UPSERT_PRODUCT_BY_NAME_BRAND = Statement('products.upsert_by_name_brand', '''
+    INSERT INTO products (id, name, category, brand, unit, barcode, default_price,
+                          image_url, is_common, created_date)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(name, COALESCE(brand, '')) WHERE barcode IS NULL DO UPDATE SET
+        category = COALESCE(excluded.category, category),
+        unit = excluded.unit,
+        default_price = CASE WHEN excluded.default_price > 0
+                             THEN excluded.default_price ELSE default_price END,
+        image_url = COALESCE(excluded.image_url, image_url),
+        is_common = MAX(is_common, excluded.is_common)
+''')
+
+LIST_PRODUCTS = Statement('products.list', f'''
+    SELECT {Product.columns()} FROM products
+    WHERE (:category IS NULL OR category = :category)
+      AND (:is_common IS NULL OR is_common = :is_common)
+      AND (:search IS NULL OR name LIKE :search OR brand LIKE :search)
+    ORDER BY is_common DESC, name ASC
+''', allow_scan=True)
+
+PRODUCT_BY_BARCODE = Statement('products.by_barcode', f'''
+    SELECT {Product.columns()} FROM products WHERE barcode = ?
+''', warmup=('',))
+
+# Bumped by triggers on every products change (services/catalog_snapshot.py)
+CATALOG_VERSION = Statement('products.catalog_version', '''
+    SELECT version FROM catalog_version WHERE id = 1
+''')
+
+# --- Shops (app schema) ----------------------------------------------------
+
+SHOP_ID_BY_NAME = Statement('shops.id_by_name', '''
+    SELECT id FROM shops WHERE name = ?
+''', allow_scan=True)
+
+INSERT_SHOP = Statement('shops.insert', '''
+    INSERT INTO shops (id, name, owner_name, phone, address, city, district, registration_date,
+                       is_active, latitude, longitude)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+''')
+
+# The shops_location_update trigger moves the shop's shop_locations entry
+SET_SHOP_LOCATION = Statement('shops.set_location', '''
+    UPDATE shops SET latitude = ?, longitude = ? WHERE id = ?
+''')
+
+# Shops whose point lies in a bounding box (the R*Tree does the range search)
+NEARBY_SHOPS = Statement('shops.nearby', '''
+    SELECT s.id, s.name, s.address, s.city, s.district, s.latitude, s.longitude
+    FROM shop_locations g
+    JOIN shops s ON s.id = g.shop_id
+    WHERE g.min_lat <= :max_lat AND g.max_lat >= :min_lat
+      AND g.min_lon <= :max_lon AND g.max_lon >= :min_lon
+      AND s.is_active = 1
+''')
+
+# ...that hold at least :min_quantity of a product, via inventory(shop_id, product_id)
+NEARBY_SHOPS_WITH_PRODUCT = Statement('shops.nearby_with_product', '''
+    SELECT s.id, s.name, s.address, s.city, s.district, s.latitude, s.longitude,
+           i.current_stock, i.selling_price
+    FROM shop_locations g
+    JOIN inventory i ON i.shop_id = g.shop_id AND i.product_id = :product_id
+    JOIN shops s ON s.id = g.shop_id
+    WHERE g.min_lat <= :max_lat AND g.max_lat >= :min_lat
+      AND g.min_lon <= :max_lon AND g.max_lon >= :min_lon
+      AND i.current_stock >= :min_quantity AND s.is_active = 1
+''')
+
+LOCATED_SHOP_COUNTS = Statement('shops.located_counts', '''
+    SELECT (SELECT COUNT(*) FROM shops
+            WHERE latitude IS NOT NULL AND longitude IS NOT NULL) AS shops,
+           (SELECT COUNT(*) FROM shop_locations) AS indexed
+''', allow_scan=True)
+
+CLEAR_SHOP_LOCATIONS = Statement('shops.clear_locations', '''
+    DELETE FROM shop_locations
+''', allow_scan=True)
+
+BACKFILL_SHOP_LOCATIONS = Statement('shops.backfill_locations', '''
+    INSERT INTO shop_locations (min_lat, max_lat, min_lon, max_lon, shop_id)
+    SELECT latitude, latitude, longitude, longitude, id FROM shops
+    WHERE latitude IS NOT NULL AND longitude IS NOT NULL
+''', allow_scan=True)
+
+# Shops off the default subscription tier (utils/rate_limit.py)
+SHOP_TIERS = Statement('shops.tiers', '''
+    SELECT id, subscription_tier FROM shops WHERE subscription_tier != ?
+''', allow_scan=True)
+
+# --- Inventory -------------------------------------------------------------
+
+INVENTORY_BY_SHOP = Statement('inventory.list', f'''
+    SELECT
+        i.id,
+        p.id as product_id,
+        p.name as product_name,
+        p.category,
+        p.brand,
+        p.unit,
+        i.current_stock,
+        i.selling_price,
+        i.cost_price,
+        i.reorder_level,
+        CASE WHEN i.current_stock <= i.reorder_level THEN 1 ELSE 0 END as low_stock,
+        i.last_updated,
+        p.image_url
+    FROM inventory i
+    JOIN products p ON i.product_id = p.id
+    WHERE i.shop_id = ? AND i.is_active = 1
+    ORDER BY p.name
+''', warmup=('',))
+
+INVENTORY_FOR_UPDATE = Statement('inventory.for_update', '''
+    SELECT id, current_stock, selling_price, cost_price, reorder_level
+    FROM inventory
+    WHERE shop_id = ? AND product_id = ?
+''')
+
+INSERT_INVENTORY = Statement('inventory.insert', '''
+    INSERT INTO inventory (id, shop_id, product_id, current_stock, cost_price,
+                           selling_price, last_updated)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+''')
+
+UPDATE_STOCK_AFTER_SALE = Statement('inventory.update_sale', '''
+    UPDATE inventory
+    SET current_stock = ?, selling_price = ?, last_updated = ?
+    WHERE id = ?
+''')
+
+# Prices are only overwritten when the restock carries a positive price
+UPDATE_STOCK_AFTER_RESTOCK = Statement('inventory.update_restock', '''
+    UPDATE inventory
+    SET current_stock = :current_stock,
+        last_updated = :last_updated,
+        cost_price = CASE WHEN :cost_price > 0 THEN :cost_price ELSE cost_price END,
+        selling_price = CASE WHEN :selling_price > 0 THEN :selling_price ELSE selling_price END
+    WHERE id = :id
+''')
+
+# --- Transactions ----------------------------------------------------------
+
+# cost_of_goods is stamped on sales only (services/costing.py)
+INSERT_TRANSACTION = Statement('transactions.insert', '''
+    INSERT INTO transactions (id, shop_id, product_id, transaction_type, quantity,
+                              price_per_unit, total_amount, transaction_date, cost_of_goods)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+''')
+
+# --- Stocktake ---------------------------------------------------------------
+
+# Counted quantities of one stocktake, per connection (TEMP)
+CREATE_STOCKTAKE_COUNTS = Statement('stocktake.create_counts', '''
+    CREATE TEMP TABLE IF NOT EXISTS stocktake_counts (
+        product_id TEXT PRIMARY KEY,
+        counted INTEGER NOT NULL
+    )
+''')
+
+CLEAR_STOCKTAKE_COUNTS = Statement('stocktake.clear_counts', '''
+    DELETE FROM temp.stocktake_counts
+''')
+
+INSERT_STOCKTAKE_COUNT = Statement('stocktake.insert_count', '''
+    INSERT INTO temp.stocktake_counts (product_id, counted) VALUES (?, ?)
+''')
+
+# Counted items whose stock differs, plus counts for unknown products
+# (product name NULL); items without an inventory row count as 0 in stock
+STOCKTAKE_DIFF = Statement('stocktake.diff', '''
+    SELECT c.product_id, p.name, i.id AS inventory_id,
+           COALESCE(i.current_stock, 0) AS previous_stock, c.counted,
+           c.counted - COALESCE(i.current_stock, 0) AS variance,
+           COALESCE(i.cost_price, 0.0) AS cost_price,
+           COALESCE(i.reorder_level, 5) AS reorder_level
+    FROM temp.stocktake_counts c
+    LEFT JOIN products p ON p.id = c.product_id
+    LEFT JOIN inventory i ON i.shop_id = ? AND i.product_id = c.product_id
+    WHERE p.id IS NULL OR c.counted != COALESCE(i.current_stock, 0)
+''', allow_scan=True)
+
+SET_COUNTED_STOCK = Statement('stocktake.set_stock', '''
+    UPDATE inventory SET current_stock = ?, last_updated = ? WHERE id = ?
+''')
+
+INSERT_ADJUSTMENT = Statement('transactions.insert_adjustment', '''
+    INSERT INTO transactions (id, shop_id, product_id, transaction_type, quantity,
+                              price_per_unit, total_amount, notes, transaction_date, cost_of_goods)
+    VALUES (?, ?, ?, 'adjustment', ?, ?, ?, ?, ?, ?)
+''')
+
+# --- Cost layers -------------------------------------------------------------
+
+# Open layers of one item, oldest first; consumed layers are deleted
+COST_LAYERS = Statement('costing.layers', '''
+    SELECT id, unit_cost, quantity_remaining FROM cost_layers
+    WHERE shop_id = ? AND product_id = ?
+    ORDER BY id
+''')
+
+INSERT_COST_LAYER = Statement('costing.insert_layer', '''
+    INSERT INTO cost_layers (shop_id, product_id, received_date, unit_cost, quantity_remaining)
+    VALUES (?, ?, ?, ?, ?)
+''')
+
+SET_COST_LAYER_REMAINING = Statement('costing.set_remaining', '''
+    UPDATE cost_layers SET quantity_remaining = ? WHERE id = ?
+''')
+
+DELETE_COST_LAYER = Statement('costing.delete_layer', '''
+    DELETE FROM cost_layers WHERE id = ?
+''')
+
+DELETE_COST_LAYERS = Statement('costing.delete_layers', '''
+    DELETE FROM cost_layers WHERE shop_id = ? AND product_id = ?
+''')
+
+# Opening layers at the current cost price for stock that has none yet
+BACKFILL_COST_LAYERS = Statement('costing.backfill_layers', '''
+    INSERT INTO cost_layers (shop_id, product_id, received_date, unit_cost, quantity_remaining)
+    SELECT i.shop_id, i.product_id, COALESCE(i.last_updated, ?), COALESCE(i.cost_price, 0),
+           i.current_stock
+    FROM inventory i
+    WHERE i.current_stock > 0
+      AND NOT EXISTS (SELECT 1 FROM cost_layers c
+                      WHERE c.shop_id = i.shop_id AND c.product_id = i.product_id)
+''', allow_scan=True)
+
+STOCK_AT_COST = Statement('costing.stock_at_cost', '''
+    SELECT COALESCE(SUM(unit_cost * quantity_remaining), 0.0) as value,
+           COALESCE(SUM(quantity_remaining), 0) as units
+    FROM cost_layers WHERE shop_id = ?
+''')
+
+# --- Ledger partitions -------------------------------------------------------
+
+# Runs unchanged against the hot table and against sealed archive files
+LEDGER_SHOP_HISTORY = Statement('ledger.shop_history', f'''
+    SELECT {Transaction.columns()} FROM transactions
+    WHERE shop_id = :shop_id
+      AND transaction_date >= :start AND transaction_date < :end
+      AND (:type IS NULL OR transaction_type = :type)
+    ORDER BY transaction_date DESC
+    LIMIT :limit
+''')
+
+LEDGER_OLDEST_TRANSACTION = Statement('ledger.oldest_transaction', '''
+    SELECT MIN(transaction_date) as oldest FROM transactions
+''')
+
+LEDGER_COUNT_PERIOD = Statement('ledger.count_period', '''
+    SELECT COUNT(*) as count FROM transactions
+    WHERE transaction_date >= ? AND transaction_date < ?
+''')
+
+# `archive` is the partition file attached by services.ledger.archive_period
+LEDGER_COPY_PERIOD = Statement('ledger.copy_period', '''
+    INSERT INTO archive.transactions
+    SELECT id, shop_id, product_id, transaction_type, quantity, price_per_unit,
+           total_amount, notes, transaction_date, created_by, cost_of_goods
+    FROM main.transactions
+    WHERE transaction_date >= ? AND transaction_date < ?
+    ORDER BY shop_id, transaction_date
+''', schema='ledger')
+
+LEDGER_DELETE_PERIOD = Statement('ledger.delete_period', '''
+    DELETE FROM transactions
+    WHERE transaction_date >= ? AND transaction_date < ?
+''')
+
+INSERT_LEDGER_PARTITION = Statement('ledger.insert_partition', '''
+    INSERT INTO ledger_partitions (period, path, row_count, sealed_at)
+    VALUES (?, ?, ?, ?)
+''')
+
+LEDGER_PARTITIONS_BETWEEN = Statement('ledger.partitions_between', '''
+    SELECT period, path, row_count, sealed_at FROM ledger_partitions
+    WHERE period >= ? AND period <= ?
+    ORDER BY period DESC
+''')
+
+# --- Consistency audit (services/auditor.py) ---------------------------------
+
+AUDIT_SHOP_IDS = Statement('audit.shop_ids', '''
+    SELECT id FROM shops ORDER BY id
+''')
+
+# Ledger balance per item of a shop range: hot rows and archived rows apart
+CREATE_AUDIT_BALANCES = Statement('audit.create_balances', '''
+    CREATE TEMP TABLE IF NOT EXISTS audit_balances (
+        shop_id TEXT NOT NULL,
+        product_id TEXT NOT NULL,
+        hot_quantity INTEGER NOT NULL DEFAULT 0,
+        archived_quantity INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (shop_id, product_id)
+    ) WITHOUT ROWID
+''')
+
+CLEAR_AUDIT_BALANCES = Statement('audit.clear_balances', '''
+    DELETE FROM temp.audit_balances
+''')
+
+AUDIT_HOT_BALANCES = Statement('audit.hot_balances', '''
+    INSERT INTO temp.audit_balances (shop_id, product_id, hot_quantity)
+    SELECT shop_id, product_id,
+           SUM(CASE transaction_type WHEN 'sale' THEN -quantity ELSE quantity END)
+    FROM main.transactions
+    WHERE shop_id >= ? AND shop_id < ?
+    GROUP BY shop_id, product_id
+''')
+
+# Run on a sealed archive file
+AUDIT_ARCHIVED_BALANCES = Statement('audit.archived_balances', '''
+    SELECT shop_id, product_id,
+           SUM(CASE transaction_type WHEN 'sale' THEN -quantity ELSE quantity END) AS quantity
+    FROM transactions
+    WHERE shop_id >= ? AND shop_id < ?
+    GROUP BY shop_id, product_id
+''')
+
+ADD_ARCHIVED_BALANCE = Statement('audit.add_archived_balance', '''
+    INSERT INTO temp.audit_balances (shop_id, product_id, archived_quantity)
+    VALUES (?, ?, ?)
+    ON CONFLICT (shop_id, product_id)
+    DO UPDATE SET archived_quantity = archived_quantity + excluded.archived_quantity
+''')
+
+COUNT_AUDIT_BALANCES = Statement('audit.count_balances', '''
+    SELECT COUNT(*) AS count FROM temp.audit_balances
+''', allow_scan=True)
+
+# Items whose stock differs from their ledger balance, including stocked
+# items without any ledger rows (expected 0)
+AUDIT_MISMATCHES = Statement('audit.mismatches', '''
+    SELECT b.shop_id, b.product_id, b.hot_quantity + b.archived_quantity AS expected,
+           COALESCE(i.current_stock, 0) AS actual, b.hot_quantity
+    FROM temp.audit_balances b
+    LEFT JOIN main.inventory i ON i.shop_id = b.shop_id AND i.product_id = b.product_id
+    WHERE b.hot_quantity + b.archived_quantity != COALESCE(i.current_stock, 0)
+    UNION ALL
+    SELECT i.shop_id, i.product_id, 0, i.current_stock, 0
+    FROM main.inventory i
+    WHERE i.shop_id >= :lo AND i.shop_id < :hi AND i.current_stock != 0
+      AND NOT EXISTS (SELECT 1 FROM temp.audit_balances b
+                      WHERE b.shop_id = i.shop_id AND b.product_id = i.product_id)
+''', allow_scan=True)
+
+# Re-read under the write lock before a correction is written
+AUDIT_ITEM_STATE = Statement('audit.item_state', '''
+    SELECT (SELECT current_stock FROM inventory
+            WHERE shop_id = :shop_id AND product_id = :product_id) AS current_stock,
+           (SELECT COALESCE(SUM(CASE transaction_type WHEN 'sale' THEN -quantity ELSE quantity END), 0)
+            FROM transactions
+            WHERE shop_id = :shop_id AND product_id = :product_id) AS hot_quantity
+''')
+
+# --- Exports -----------------------------------------------------------------
+
+# Runs against the hot database and against each sealed archive file, with the
+# main database attached read-only as `catalog` by services.export. Ordered so
+# every date/shop partition comes out contiguous; SQLite sorts out of core.
+EXPORT_LEDGER = Statement('export.ledger', '''
+    SELECT t.id, t.transaction_date, substr(t.transaction_date, 1, 10) as day,
+           t.shop_id, s.name, s.district, s.city,
+           t.product_id, p.name, p.category, p.brand,
+           t.transaction_type, t.quantity, t.price_per_unit, t.total_amount
+    FROM transactions t
+    LEFT JOIN catalog.shops s ON s.id = t.shop_id
+    LEFT JOIN catalog.products p ON p.id = t.product_id
+    WHERE (t.transaction_date, t.id) > (:since_date, :since_id)
+      AND t.transaction_date <= :until
+    ORDER BY day, t.shop_id, t.transaction_date, t.id
+''', schema='export')
+
+EXPORT_WATERMARK = Statement('export.watermark', '''
+    SELECT name, last_transaction_date, last_transaction_id, rows, exported_at
+    FROM export_watermarks WHERE name = ?
+''')
+
+SET_EXPORT_WATERMARK = Statement('export.set_watermark', '''
+    INSERT INTO export_watermarks (name, last_transaction_date, last_transaction_id, rows, exported_at)
+    VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT(name) DO UPDATE SET
+        last_transaction_date = excluded.last_transaction_date,
+        last_transaction_id = excluded.last_transaction_id,
+        rows = export_watermarks.rows + excluded.rows,
+        exported_at = excluded.exported_at
+''')
+
+# --- Stock events (services/events.py) ---------------------------------------
+
+# Inserted in the stock change's own write transaction, so ids follow commit order
+INSERT_STOCK_EVENT = Statement('events.insert', '''
+    INSERT INTO stock_events (shop_id, product_id, previous_stock, new_stock, reorder_level, created_at)
+    VALUES (?, ?, ?, ?, ?, ?)
+''')
+
+NEWEST_STOCK_EVENT = Statement('events.newest', '''
+    SELECT COALESCE(MAX(id), 0) AS id FROM stock_events
+''')
+
+STOCK_EVENTS_AFTER = Statement('events.after', '''
+    SELECT id, shop_id, product_id, previous_stock, new_stock, reorder_level
+    FROM stock_events WHERE id > ?
+    ORDER BY id LIMIT ?
+''', warmup=(2 ** 62, 1))
+
+PRUNE_STOCK_EVENTS = Statement('events.prune', '''
+    DELETE FROM stock_events WHERE id <= (SELECT MAX(id) FROM stock_events) - ?
+''')
+
+# --- Shop stats ------------------------------------------------------------
+
+STATS_TOTAL_PRODUCTS = Statement('stats.total_products', '''
+    SELECT COUNT(*) as count FROM inventory WHERE shop_id = ? AND is_active = 1
+''', warmup=('',))
+
+# Counted from the idx_inventory_low_stock partial index
+STATS_LOW_STOCK = Statement('stats.low_stock', '''
+    SELECT COUNT(*) as count FROM inventory
+    WHERE shop_id = ? AND current_stock <= reorder_level AND is_active = 1
+''', warmup=('',))
+
+# transaction_date is an ISO-8601 string, so a day is a half-open string range
+STATS_SALES_BETWEEN = Statement('stats.sales_between', '''
+    SELECT COALESCE(SUM(total_amount), 0.0) as total,
+           COUNT(*) as transactions
+    FROM transactions
+    WHERE shop_id = ? AND transaction_type = 'sale'
+      AND transaction_date >= ? AND transaction_date < ?
+''', warmup=('', '', ''))
+
+STATS_INVENTORY_VALUE = Statement('stats.inventory_value', '''
+    SELECT COALESCE(SUM(current_stock * selling_price), 0.0) as total
+    FROM inventory
+    WHERE shop_id = ? AND is_active = 1
+''', warmup=('',))
+
+# --- Sales rollups ----------------------------------------------------------
+
+# Kept up to date by apply_sale inside the sale's write transaction
+ADD_SHOP_DAILY_SALE = Statement('rollups.add_shop_daily_sale', '''
+    INSERT INTO shop_daily_sales (shop_id, sale_date, sales_amount, sales_count, units_sold,
+                                  cost_of_goods)
+    VALUES (?, ?, ?, 1, ?, ?)
+    ON CONFLICT(shop_id, sale_date) DO UPDATE SET
+        sales_amount = sales_amount + excluded.sales_amount,
+        sales_count = sales_count + 1,
+        units_sold = units_sold + excluded.units_sold,
+        cost_of_goods = cost_of_goods + excluded.cost_of_goods
+''')
+
+ADD_PRODUCT_DAILY_SALE = Statement('rollups.add_product_daily_sale', '''
+    INSERT INTO product_daily_sales (shop_id, sale_date, product_id, sales_amount, units_sold,
+                                     cost_of_goods)
+    VALUES (?, ?, ?, ?, ?, ?)
+    ON CONFLICT(shop_id, sale_date, product_id) DO UPDATE SET
+        sales_amount = sales_amount + excluded.sales_amount,
+        units_sold = units_sold + excluded.units_sold,
+        cost_of_goods = cost_of_goods + excluded.cost_of_goods
+''')
+
+HAS_SHOP_DAILY_SALES = Statement('rollups.has_shop_daily_sales', '''
+    SELECT EXISTS(SELECT 1 FROM shop_daily_sales) as found
+''', allow_scan=True)
+
+HAS_SALE_TRANSACTIONS = Statement('rollups.has_sale_transactions', '''
+    SELECT EXISTS(SELECT 1 FROM transactions WHERE transaction_type = 'sale') as found
+''', allow_scan=True)
+
+CLEAR_SHOP_DAILY_SALES = Statement('rollups.clear_shop_daily_sales', '''
+    DELETE FROM shop_daily_sales
+''', allow_scan=True)
+
+CLEAR_PRODUCT_DAILY_SALES = Statement('rollups.clear_product_daily_sales', '''
+    DELETE FROM product_daily_sales
+''', allow_scan=True)
+
+BACKFILL_SHOP_DAILY_SALES = Statement('rollups.backfill_shop_daily_sales', '''
+    INSERT INTO shop_daily_sales (shop_id, sale_date, sales_amount, sales_count, units_sold,
+                                  cost_of_goods)
+    SELECT shop_id, substr(transaction_date, 1, 10), SUM(total_amount), COUNT(*), SUM(quantity),
+           TOTAL(cost_of_goods)
+    FROM transactions
+    WHERE transaction_type = 'sale'
+    GROUP BY shop_id, substr(transaction_date, 1, 10)
+''', allow_scan=True)
+
+BACKFILL_PRODUCT_DAILY_SALES = Statement('rollups.backfill_product_daily_sales', '''
+    INSERT INTO product_daily_sales (shop_id, sale_date, product_id, sales_amount, units_sold,
+                                     cost_of_goods)
+    SELECT shop_id, substr(transaction_date, 1, 10), product_id, SUM(total_amount), SUM(quantity),
+           TOTAL(cost_of_goods)
+    FROM transactions
+    WHERE transaction_type = 'sale'
+    GROUP BY shop_id, substr(transaction_date, 1, 10), product_id
+''', allow_scan=True)
+
+# Run against each archive file; its months never overlap the hot table's
+ARCHIVED_SHOP_DAILY_SALES = Statement('rollups.archived_shop_daily_sales', '''
+    SELECT shop_id, substr(transaction_date, 1, 10), SUM(total_amount), COUNT(*), SUM(quantity),
+           TOTAL(cost_of_goods)
+    FROM transactions
+    WHERE transaction_type = 'sale'
+    GROUP BY shop_id, substr(transaction_date, 1, 10)
+''', allow_scan=True)
+
+ARCHIVED_PRODUCT_DAILY_SALES = Statement('rollups.archived_product_daily_sales', '''
+    SELECT shop_id, substr(transaction_date, 1, 10), product_id, SUM(total_amount), SUM(quantity),
+           TOTAL(cost_of_goods)
+    FROM transactions
+    WHERE transaction_type = 'sale'
+    GROUP BY shop_id, substr(transaction_date, 1, 10), product_id
+''', allow_scan=True)
+
+INSERT_SHOP_DAILY_SALES = Statement('rollups.insert_shop_daily_sales', '''
+    INSERT INTO shop_daily_sales (shop_id, sale_date, sales_amount, sales_count, units_sold,
+                                  cost_of_goods)
+    VALUES (?, ?, ?, ?, ?, ?)
+''')
+
+INSERT_PRODUCT_DAILY_SALES = Statement('rollups.insert_product_daily_sales', '''
+    INSERT INTO product_daily_sales (shop_id, sale_date, product_id, sales_amount, units_sold,
+                                     cost_of_goods)
+    VALUES (?, ?, ?, ?, ?, ?)
+''')
+
+# --- Shop profit -------------------------------------------------------------
+
+PROFIT_TOTALS = Statement('profit.totals', '''
+    SELECT COALESCE(SUM(sales_amount), 0.0) as revenue,
+           COALESCE(SUM(cost_of_goods), 0.0) as cost_of_goods,
+           COALESCE(SUM(sales_count), 0) as sales_count,
+           COALESCE(SUM(units_sold), 0) as units_sold
+    FROM shop_daily_sales
+    WHERE shop_id = :shop_id AND sale_date >= :start AND sale_date <= :end
+''')
+
+PROFIT_BY_DAY = Statement('profit.by_day', '''
+    SELECT sale_date as date, sales_amount as revenue, cost_of_goods,
+           sales_amount - cost_of_goods as gross_profit, sales_count, units_sold
+    FROM shop_daily_sales
+    WHERE shop_id = :shop_id AND sale_date >= :start AND sale_date <= :end
+    ORDER BY sale_date
+''')
+
+# Aggregate first and join products for the top rows only (the scan is of `d`)
+PROFIT_BY_PRODUCT = Statement('profit.by_product', '''
+    SELECT d.product_id, p.name, p.brand, d.revenue, d.cost_of_goods,
+           d.revenue - d.cost_of_goods as gross_profit, d.units_sold
+    FROM (
+        SELECT product_id, SUM(sales_amount) as revenue, SUM(cost_of_goods) as cost_of_goods,
+               SUM(units_sold) as units_sold
+        FROM product_daily_sales
+        WHERE shop_id = :shop_id AND sale_date >= :start AND sale_date <= :end
+        GROUP BY product_id
+        ORDER BY SUM(sales_amount) - SUM(cost_of_goods) DESC
+        LIMIT :limit
+    ) d
+    LEFT JOIN products p ON p.id = d.product_id
+    ORDER BY gross_profit DESC
+''', allow_scan=True)
+
+# --- Fleet overview ----------------------------------------------------------
+
+# Shared shop filter and grouping; NULL parameters disable a filter
+SHOP_FILTER = '''s.is_active = 1
+      AND (:district IS NULL OR s.district = :district)
+      AND (:city IS NULL OR s.city = :city)
+      AND (:tier IS NULL OR s.subscription_tier = :tier)'''
+REGION = "CASE WHEN :group_by = 'city' THEN s.city ELSE s.district END"
+
+OVERVIEW_SHOPS = Statement('overview.shops', f'''
+    SELECT {REGION} as region, COUNT(*) as shops
+    FROM shops s
+    WHERE {SHOP_FILTER}
+    GROUP BY region
+''', allow_scan=True)
+
+OVERVIEW_SALES = Statement('overview.sales', f'''
+    SELECT {REGION} as region,
+           SUM(d.sales_amount) as sales_amount,
+           SUM(d.sales_count) as sales_count,
+           SUM(d.units_sold) as units_sold
+    FROM shops s
+    JOIN shop_daily_sales d ON d.shop_id = s.id
+    WHERE {SHOP_FILTER}
+      AND d.sale_date >= :start AND d.sale_date <= :end
+    GROUP BY region
+''', allow_scan=True)
+
+OVERVIEW_LOW_STOCK = Statement('overview.low_stock', f'''
+    SELECT {REGION} as region,
+           COUNT(*) as low_stock_items,
+           COUNT(DISTINCT i.shop_id) as shops_with_low_stock
+    FROM shops s
+    JOIN inventory i ON i.shop_id = s.id
+    WHERE {SHOP_FILTER}
+      AND i.is_active = 1 AND i.current_stock <= i.reorder_level
+    GROUP BY region
+''')
+
+# Aggregate first and join products for the top rows only
+OVERVIEW_TOP_PRODUCTS = Statement('overview.top_products', f'''
+    SELECT p.id as product_id, p.name, p.brand, p.category,
+           t.units_sold, t.sales_amount
+    FROM (
+        SELECT d.product_id,
+               SUM(d.units_sold) as units_sold,
+               SUM(d.sales_amount) as sales_amount
+        FROM shops s
+        JOIN product_daily_sales d ON d.shop_id = s.id
+        WHERE {SHOP_FILTER}
+          AND d.sale_date >= :start AND d.sale_date <= :end
+        GROUP BY d.product_id
+        ORDER BY units_sold DESC
+        LIMIT :limit
+    ) t
+    JOIN products p ON p.id = t.product_id
+    ORDER BY t.units_sold DESC
+''', allow_scan=True)
+
+# --- Low stock ---------------------------------------------------------------
+
+# Must match the WHERE of the idx_inventory_low_stock* partial indexes
+# (app.init_database) for the planner to read only the low-stock set
+LOW_STOCK = 'i.is_active = 1 AND i.current_stock <= i.reorder_level'
+
+LOW_STOCK_BY_SHOP = Statement('low_stock.by_shop', f'''
+    SELECT
+        i.id,
+        p.id as product_id,
+        p.name as product_name,
+        p.category,
+        p.brand,
+        p.unit,
+        i.current_stock,
+        i.selling_price,
+        i.cost_price,
+        i.reorder_level,
+        1 as low_stock,
+        i.last_updated,
+        p.image_url
+    FROM inventory i
+    JOIN products p ON i.product_id = p.id
+    WHERE i.shop_id = ? AND {LOW_STOCK}
+    ORDER BY i.current_stock - i.reorder_level, p.name
+''', warmup=('',))
+
+LOW_STOCK_COLUMNS = '''i.shop_id, s.name as shop_name, s.phone, s.city, s.district,
+           i.product_id, p.name as product_name, p.brand, p.category, p.unit,
+           i.current_stock, i.reorder_level,
+           i.reorder_level - i.current_stock as shortfall, i.last_updated'''
+
+# Low items across shops in (shop_id, product_id) order, after a cursor
+LOW_STOCK_ACROSS_SHOPS = Statement('low_stock.across_shops', f'''
+    SELECT {LOW_STOCK_COLUMNS}
+    FROM inventory i
+    JOIN shops s ON s.id = i.shop_id
+    JOIN products p ON p.id = i.product_id
+    WHERE {LOW_STOCK}
+      AND (i.shop_id, i.product_id) > (:after_shop, :after_product)
+      AND {SHOP_FILTER}
+      AND (:brand IS NULL OR p.brand = :brand)
+      AND (:category IS NULL OR p.category = :category)
+    ORDER BY i.shop_id, i.product_id
+    LIMIT :limit
+''')
+
+# The shops low on one product, through the (product_id, shop_id) partial index
+LOW_STOCK_FOR_PRODUCT = Statement('low_stock.for_product', f'''
+    SELECT {LOW_STOCK_COLUMNS}
+    FROM inventory i
+    JOIN shops s ON s.id = i.shop_id
+    JOIN products p ON p.id = i.product_id
+    WHERE i.product_id = :product_id AND {LOW_STOCK}
+      AND (i.shop_id, i.product_id) > (:after_shop, :after_product)
+      AND {SHOP_FILTER}
+      AND (:brand IS NULL OR p.brand = :brand)
+      AND (:category IS NULL OR p.category = :category)
+    ORDER BY i.shop_id
+    LIMIT :limit
+''')
+
+# Products by how many matching shops are low on them
+LOW_STOCK_DEMAND = Statement('low_stock.demand', f'''
+    SELECT p.id as product_id, p.name, p.brand, p.category, p.unit,
+           COUNT(*) as shops, SUM(i.reorder_level - i.current_stock) as shortfall
+    FROM inventory i
+    JOIN shops s ON s.id = i.shop_id
+    JOIN products p ON p.id = i.product_id
+    WHERE {LOW_STOCK}
+      AND {SHOP_FILTER}
+      AND (:brand IS NULL OR p.brand = :brand)
+      AND (:category IS NULL OR p.category = :category)
+    GROUP BY i.product_id
+    ORDER BY shops DESC, shortfall DESC
+    LIMIT :limit
+''')
+
+# --- Accounts (app schema) -------------------------------------------------
+
+SHOP_ID_BY_EMAIL_OR_PHONE = Statement('auth.shop_by_email_or_phone', '''
+    SELECT id FROM shops WHERE email = ? OR phone = ?
+''')
+
+REGISTER_SHOP = Statement('auth.register_shop', '''
+    INSERT INTO shops (id, name, owner_name, email, phone, password_hash,
+                       address, city, district, registration_date, is_active)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+''')
+
+SHOP_LOGIN_BY_EMAIL = Statement('auth.shop_login_by_email', '''
+    SELECT id, name AS shop_name, owner_name, email, phone, password_hash,
+           is_active, last_login_at
+    FROM shops WHERE email = ?
+''')
+
+SET_LAST_LOGIN = Statement('auth.set_last_login', '''
+    UPDATE shops SET last_login_at = ? WHERE id = ?
+''')
+
+SHOP_PROFILE_COLUMNS = '''id, name AS shop_name, owner_name, email, phone, address, city,
+                          district, registration_date AS created_at, last_login_at, is_active'''
+
+SHOP_PROFILE_BY_ID = Statement('auth.shop_profile_by_id', f'''
+    SELECT {SHOP_PROFILE_COLUMNS}
+    FROM shops WHERE id = ? AND is_active = 1
+''', warmup=('',))
+
+RECENT_SHOP_PROFILES = Statement('auth.recent_shop_profiles', f'''
+    SELECT {SHOP_PROFILE_COLUMNS}
+    FROM shops WHERE is_active = 1 AND email IS NOT NULL
+    ORDER BY last_login_at DESC LIMIT ?
+''', allow_scan=True)
+
+PHONE_TAKEN_BY_OTHER = Statement('auth.phone_taken_by_other', '''
+    SELECT id FROM shops WHERE phone = ? AND id != ?
+''')
+
+# Fields left NULL keep their current value
+UPDATE_SHOP_PROFILE = Statement('auth.update_shop_profile', '''
+    UPDATE shops
+    SET name = COALESCE(:shop_name, name),
+        owner_name = COALESCE(:owner_name, owner_name),
+        phone = COALESCE(:phone, phone),
+        address = COALESCE(:address, address),
+        city = COALESCE(:city, city),
+        district = COALESCE(:district, district),
+        updated_at = :updated_at
+    WHERE id = :id
+''')
+
+PASSWORD_HASH_BY_ID = Statement('auth.password_hash_by_id', '''
+    SELECT password_hash FROM shops WHERE id = ?
+''')
+
+SET_PASSWORD_HASH = Statement('auth.set_password_hash', '''
+    UPDATE shops SET password_hash = ?, updated_at = ?
+    WHERE id = ?
+''')
+
+DEACTIVATE_SHOP = Statement('auth.deactivate_shop', '''
+    UPDATE shops SET is_active = 0, updated_at = ?
+    WHERE id = ? AND is_active = 1
+''')
+
+# --- Accounts of config/database_setup.py (auth schema) ---------------------
+
+CREATE_SHOP_ACCOUNT = Statement('auth.create_shop_account', '''
+    INSERT INTO shops
+    (shop_name, owner_name, email, phone, password_hash, address, city, district, latitude, longitude, shop_type)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+''', schema='auth')
+
+LOGIN_STATE_BY_EMAIL = Statement('auth.login_state_by_email', '''
+    SELECT id, password_hash, is_active FROM shops WHERE email = ?
+''', schema='auth')
+
+TOUCH_LAST_LOGIN = Statement('auth.touch_last_login', '''
+    UPDATE shops SET last_login_at = CURRENT_TIMESTAMP WHERE id = ?
+''', schema='auth')
+
+INSERT_SAMPLE_PRODUCT = Statement('auth.insert_sample_product', '''
+    INSERT OR IGNORE INTO products
+    (name, category, brand, barcode, unit, description, image_url, is_common)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+''', schema='auth')
+
+# --- Login attempts ----------------------------------------------------------
+
+INSERT_LOGIN_ATTEMPT = Statement('login_attempts.insert', '''
+    INSERT INTO login_attempts (email, ip_address, success, user_agent)
+    VALUES (?, ?, ?, ?)
+''', schema='auth')
+
+MARK_LOGIN_ATTEMPT_SUCCESS = Statement('login_attempts.mark_success', '''
+    UPDATE login_attempts
+    SET success = 1
+    WHERE email = ? AND ip_address = ? AND attempted_at = (
+        SELECT MAX(attempted_at) FROM login_attempts WHERE email = ?
+    )
+''', schema='auth')
+
+DELETE_OLD_LOGIN_ATTEMPTS = Statement('login_attempts.delete_old', '''
+    DELETE FROM login_attempts
+    WHERE attempted_at < datetime('now', '-30 days')
+''', schema='auth', allow_scan=True)
+
+# --- Sessions (app schema) ---------------------------------------------------
+
+# token_hash is the SHA-256 of the session's current refresh token
+INSERT_SESSION = Statement('sessions.insert', '''
+    INSERT INTO user_sessions (shop_id, token_hash, device_info, ip_address, created_at, expires_at)
+    VALUES (?, ?, ?, ?, ?, ?)
+''')
+
+SESSION_BY_REFRESH_HASH = Statement('sessions.by_refresh_hash', '''
+    SELECT s.id, s.shop_id, sh.email, sh.is_active AS shop_active
+    FROM user_sessions s
+    JOIN shops sh ON s.shop_id = sh.id
+    WHERE s.token_hash = ? AND s.revoked_at IS NULL AND s.expires_at > ?
+''')
+
+ROTATE_SESSION_TOKEN = Statement('sessions.rotate', '''
+    UPDATE user_sessions SET token_hash = ?, expires_at = ?, last_used_at = ?
+    WHERE id = ? AND token_hash = ? AND revoked_at IS NULL
+''')
+
+OPEN_SESSION_IDS = Statement('sessions.open_ids', '''
+    SELECT id FROM user_sessions WHERE shop_id = ? AND revoked_at IS NULL
+''')
+
+REVOKE_SESSION = Statement('sessions.revoke', '''
+    UPDATE user_sessions SET is_active = 0, revoked_at = ?
+    WHERE id = ? AND revoked_at IS NULL
+''')
+
+# seq is assigned under the write lock, so it follows commit order
+RECORD_REVOCATION = Statement('sessions.record_revocation', '''
+    INSERT INTO revocations (shop_id, session_id, revoked_at)
+    SELECT shop_id, id, revoked_at FROM user_sessions WHERE id = ?
+''')
+
+# No session: the shop's own row changed (services/sessions.py on_shop_change)
+RECORD_SHOP_CHANGE = Statement('sessions.record_shop_change', '''
+    INSERT INTO revocations (shop_id, revoked_at) VALUES (?, ?)
+''')
+
+REVOCATIONS_AFTER = Statement('sessions.revocations_after', '''
+    SELECT seq, shop_id, session_id, revoked_at FROM revocations
+    WHERE seq > ? AND revoked_at >= ?
+    ORDER BY seq
+''')
+
+DELETE_OLD_REVOCATIONS = Statement('sessions.delete_old_revocations', '''
+    DELETE FROM revocations WHERE revoked_at < ?
+''', allow_scan=True)
+
+# Revoked rows are kept while access tokens issued before the revocation live
+DELETE_EXPIRED_SESSIONS = Statement('sessions.delete_expired', '''
+    DELETE FROM user_sessions WHERE expires_at < :now OR revoked_at < :revoked_before
+''', allow_scan=True)
+
+# --- Password and verification tokens (auth schema) ----------------------------
+
+DELETE_EXPIRED_RESET_TOKENS = Statement('tokens.delete_expired_reset', '''
+    DELETE FROM password_reset_tokens WHERE expires_at < CURRENT_TIMESTAMP
+''', schema='auth', allow_scan=True)
+
+DELETE_EXPIRED_VERIFICATION_TOKENS = Statement('tokens.delete_expired_verification', '''
+    DELETE FROM email_verification_tokens WHERE expires_at < CURRENT_TIMESTAMP
+''', schema='auth', allow_scan=True)
+
+# Every statement above plus headroom for ad-hoc SQL (DDL, PRAGMAs)
+STATEMENT_CACHE_SIZE = len(STATEMENTS) + 32
@@ -0,0 +1,259 @@
+# backend/utils/rate_limit.py
+"""Per-shop token-bucket throttling by subscription tier
+
+Each shop has one bucket per scope ('write' for stock changes, 'read' for
+the heavy reads) holding up to `burst` tokens and refilled at `rate` tokens
+per second; a request takes one token or is answered 429. Rates and bursts
+come from the shop's subscription tier (RATE_LIMITS). The hot path never
+touches the database: tiers are held in memory and reloaded by a per-worker
+background task, so a tier change applies within TIER_REFRESH_INTERVAL, and
+shops not yet loaded get the default tier.
+
+Buckets live in process memory by default, so each worker throttles on its
+own. RATE_LIMIT_STORE='redis://...' shares them between workers and hosts
+through one atomic script per request (needs the redis package); if Redis
+cannot be reached, requests are let through.
+
+Responses carry RateLimit-Limit (burst), RateLimit-Remaining (whole tokens
+left) and RateLimit-Reset (seconds until the bucket is full again); a 429
+adds Retry-After.
+"""
+import math
+import threading
+import time
+from functools import wraps
+
+from flask import current_app, jsonify, request
+
+from utils import queries
+from utils.db import get_read_connection
+from utils.scheduler import PeriodicTask
+
+DEFAULT_TIER = 'free'  # shops.subscription_tier column default
+IDLE_BUCKET_SECONDS = 3600  # buckets untouched this long are dropped (they would be full)
+
+
+class MemoryBucketStore:
+    """Token buckets in this process's memory"""
+
+    name = 'memory'
+
+    def __init__(self):
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def take(self, key, rate, burst):
+        """Take one token; returns (allowed, tokens left)"""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (burst, now))
+            tokens = min(burst, tokens + (now - updated) * rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self._buckets[key] = (tokens, now)
+        return allowed, tokens
+
+    def prune(self, idle=IDLE_BUCKET_SECONDS):
+        cutoff = time.monotonic() - idle
+        with self._lock:
+            for key in [key for key, (_, updated) in self._buckets.items() if updated < cutoff]:
+                del self._buckets[key]
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+# Refill, take and expire in one step on the Redis server's clock
+_REDIS_TAKE = '''
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(state[1]) or burst
+local updated = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - updated) * rate)
+local allowed = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+return {allowed, tostring(tokens)}
+'''
+
+
+class RedisBucketStore:
+    """Token buckets shared through Redis (one script call per request)"""
+
+    name = 'redis'
+
+    def __init__(self, url, prefix='shoptracker:ratelimit:'):
+        import redis
+        self._errors = (redis.RedisError,)
+        self._client = redis.Redis.from_url(url, socket_timeout=0.05, socket_connect_timeout=0.05)
+        self._take = self._client.register_script(_REDIS_TAKE)
+        self.prefix = prefix
+
+    def take(self, key, rate, burst):
+        try:
+            allowed, tokens = self._take(keys=[self.prefix + key], args=[rate, burst])
+        except self._errors:
+            # Fail open: an unreachable Redis must not take the API down
+            return True, float(burst)
+        return bool(allowed), float(tokens)
+
+    def prune(self, idle=IDLE_BUCKET_SECONDS):
+        """Keys expire on their own"""
+
+    def __len__(self):
+        return 0
+
+
+def make_store(url=None):
+    """Bucket store for RATE_LIMIT_STORE (None: this process's memory)"""
+    if not url:
+        return MemoryBucketStore()
+    if url.startswith(('redis://', 'rediss://', 'unix://')):
+        return RedisBucketStore(url)
+    raise ValueError(f'Unsupported RATE_LIMIT_STORE: {url}')
+
+
+class Decision:
+    """Outcome of taking a token, with the headers to send"""
+    __slots__ = ('allowed', 'rate', 'burst', 'tokens')
+
+    def __init__(self, allowed, rate, burst, tokens):
+        self.allowed = allowed
+        self.rate = rate
+        self.burst = burst
+        self.tokens = tokens
+
+    @property
+    def retry_after(self):
+        """Whole seconds until a token is available"""
+        return max(1, math.ceil((1 - self.tokens) / self.rate))
+
+    def headers(self):
+        headers = [
+            ('RateLimit-Limit', str(self.burst)),
+            ('RateLimit-Remaining', str(max(0, math.floor(self.tokens)))),
+            ('RateLimit-Reset', str(math.ceil((self.burst - self.tokens) / self.rate))),
+        ]
+        if not self.allowed:
+            headers.append(('Retry-After', str(self.retry_after)))
+        return headers
+
+
+class RateLimiter:
+    """Token buckets per (scope, shop) with limits from the shop's tier"""
+
+    def __init__(self):
+        self.limits = None
+        self.store = MemoryBucketStore()
+        self.tiers = {}  # shop_id -> tier, for shops not on DEFAULT_TIER
+        self.tiers_loaded_at = None
+        self.allowed = {}
+        self.throttled = {}
+        self._refresher = None
+
+    def configure(self, limits, store=None):
+        """`limits` is {tier: {scope: (tokens per second, burst)}}; None disables throttling"""
+        if limits is not None and DEFAULT_TIER not in limits:
+            raise ValueError(f'RATE_LIMITS must define the {DEFAULT_TIER!r} tier')
+        self.limits = limits
+        self.store = make_store(store)
+
+    @property
+    def enabled(self):
+        return bool(self.limits)
+
+    def tier_of(self, shop_id):
+        return self.tiers.get(shop_id, DEFAULT_TIER)
+
+    def check(self, shop_id, scope):
+        """Take a token from the shop's `scope` bucket; None if the scope is not limited"""
+        if not self.limits:
+            return None
+        tier_limits = self.limits.get(self.tier_of(shop_id)) or self.limits[DEFAULT_TIER]
+        limit = tier_limits.get(scope)
+        if limit is None:
+            return None
+        rate, burst = limit
+        allowed, tokens = self.store.take(f'{scope}:{shop_id}', rate, burst)
+        counters = self.allowed if allowed else self.throttled
+        counters[scope] = counters.get(scope, 0) + 1
+        return Decision(allowed, rate, burst, tokens)
+
+    def refresh_tiers(self):
+        """Reload every shop's tier from the database and drop idle buckets"""
+        conn = get_read_connection()
+        try:
+            rows = queries.SHOP_TIERS.fetchall(conn, (DEFAULT_TIER,))
+        finally:
+            conn.close()
+        self.tiers = {row['id']: row['subscription_tier'] for row in rows}
+        self.tiers_loaded_at = time.time()
+        self.store.prune()
+        return len(self.tiers)
+
+    def start_tier_refresher(self, interval):
+        """Refresh tiers now and then every `interval` seconds (once per worker)"""
+        if not self.limits:
+            return None
+        self.refresh_tiers()
+        if self._refresher is None:
+            self._refresher = PeriodicTask('tier-refresher', interval, self.refresh_tiers)
+        return self._refresher.start()
+
+    def reset(self):
+        self.allowed = {}
+        self.throttled = {}
+
+    def stats(self):
+        return {'enabled': self.enabled, 'store': self.store.name, 'buckets': len(self.store),
+                'tiered_shops': len(self.tiers), 'tiers_loaded_at': self.tiers_loaded_at,
+                'allowed': dict(self.allowed), 'throttled': dict(self.throttled)}
+
+
+limiter = RateLimiter()
+
+
+def too_many_requests(decision):
+    """429 JSON response for a refused request"""
+    response = jsonify({'success': False, 'error': 'Rate limit exceeded',
+                        'retry_after': decision.retry_after})
+    response.status_code = 429
+    response.headers.extend(decision.headers())
+    return response
+
+
+def _request_shop_id(view_args):
+    shop_id = view_args.get('shop_id')
+    if shop_id is None:
+        data = request.get_json(silent=True)
+        if isinstance(data, dict):
+            shop_id = data.get('shop_id')
+    return shop_id if isinstance(shop_id, str) else None
+
+
+def rate_limited(scope):
+    """Throttle a route per shop (URL or JSON body shop_id) with its tier's `scope` bucket"""
+    def decorator(view):
+        @wraps(view)
+        def decorated(*args, **kwargs):
+            shop_id = _request_shop_id(kwargs) if limiter.enabled else None
+            decision = limiter.check(shop_id, scope) if shop_id else None
+            if decision is None:
+                return view(*args, **kwargs)
+            if not decision.allowed:
+                return too_many_requests(decision)
+
+            response = current_app.make_response(view(*args, **kwargs))
+            response.headers.extend(decision.headers())
+            return response
+
+        return decorated
+    return decorator
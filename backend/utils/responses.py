@@ -0,0 +1,23 @@
+# backend/utils/responses.py
+import json
+from flask import Response
+
+
+def records_body(key, records, record_type):
+    """{"success": true, key: [...], "count": n} written straight from records
+
+    The list is written by `record_type.dumps_many`, so large listings never
+    go through a dict per row.
+    """
+    return ''.join((
+        '{"success":true,',
+        json.dumps(key), ':', record_type.dumps_many(records),
+        ',"count":', str(len(records)),
+        '}',
+    ))
+
+
+def records_response(key, records, record_type, status=200):
+    """JSON response with the records_body of `records`"""
+    return Response(records_body(key, records, record_type), status=status,
+                    mimetype='application/json')
@@ -0,0 +1,129 @@
+# backend/utils/singleflight.py
+"""Request coalescing: concurrent calls with the same key share one execution
+
+When several devices of a shop refresh at once, the first request for a key
+runs the query and serializes the response; requests that arrive while it is
+in flight wait for it and get the same bytes. Nothing is kept once the call
+returns -- this is not a cache, a request never sees a result computed
+before it arrived unless that computation was still running.
+
+Writes call `forget` for the keys they affect, so a request that follows a
+write in this worker starts a fresh execution instead of joining one that
+began before the write committed.
+"""
+import asyncio
+import threading
+
+
+class _Call:
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Coalesces concurrent calls by key, for threads (`do`) and coroutines (`do_async`)"""
+
+    def __init__(self):
+        self.calls = 0
+        self.executions = 0
+        self.coalesced = 0
+        self.errors = 0
+        self._calls = {}
+        self._tasks = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, func):
+        """Return func(), shared with every concurrent caller of the same key
+
+        An exception raised by func() is raised in every caller that shared
+        the execution.
+        """
+        with self._lock:
+            self.calls += 1
+            call = self._calls.get(key)
+            if call is None:
+                call = self._calls[key] = _Call()
+                self.executions += 1
+                leader = True
+            else:
+                self.coalesced += 1
+                leader = False
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            with self._lock:
+                self.errors += 1
+            raise
+        finally:
+            with self._lock:
+                if self._calls.get(key) is call:
+                    del self._calls[key]
+            call.done.set()
+
+    async def do_async(self, key, func):
+        """Await func(), shared with every concurrent awaiter of the same key
+
+        The execution runs as its own task, so a caller that is cancelled
+        (its client went away) does not cancel it for the others.
+        """
+        with self._lock:
+            self.calls += 1
+            task = self._tasks.get(key)
+            if task is None:
+                task = self._tasks[key] = asyncio.ensure_future(func())
+                task.add_done_callback(lambda done: self._finished(key, done))
+                self.executions += 1
+            else:
+                self.coalesced += 1
+        return await asyncio.shield(task)
+
+    def _finished(self, key, task):
+        with self._lock:
+            if self._tasks.get(key) is task:
+                del self._tasks[key]
+            if not task.cancelled() and task.exception() is not None:
+                self.errors += 1
+
+    def forget(self, predicate):
+        """Later calls for keys matching `predicate` start a fresh execution
+
+        Callers already waiting keep their shared result.
+        """
+        with self._lock:
+            for calls in (self._calls, self._tasks):
+                for key in [key for key in calls if predicate(key)]:
+                    del calls[key]
+
+    def in_flight(self):
+        return len(self._calls) + len(self._tasks)
+
+    def stats(self):
+        return {'calls': self.calls, 'executions': self.executions,
+                'coalesced': self.coalesced, 'errors': self.errors,
+                'in_flight': self.in_flight()}
+
+    def reset(self):
+        with self._lock:
+            self.calls = self.executions = self.coalesced = self.errors = 0
+
+
+# Shop-scoped reads served by app.py and asgi.py, keyed (route, shop_id, max_staleness)
+read_flights = SingleFlight()
+
+
+def forget_shop(shop_id):
+    """Stop sharing in-flight reads of a shop after it changed"""
+    read_flights.forget(lambda key: key[1] == shop_id)
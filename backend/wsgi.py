@@ -0,0 +1,13 @@
+# backend/wsgi.py
+"""WSGI entry point for production servers
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Schema checks run once in the gunicorn master (see gunicorn.conf.py);
+workers only build the app and warm up.
+"""
+import os
+
+from app import create_app
+
+app = create_app(os.environ.get('SHOPTRACKER_CONFIG', 'production'))